@@ -0,0 +1,242 @@
+"""
+Admission Control
+
+Searches and script runs each cost a Tradera call and a round of database
+writes, so a single client hammering them can use up the worker and the
+Tradera quota for everyone. Requests to these expensive routes are admitted
+under two concurrency limits:
+- Global: at most ADMISSION_GLOBAL_LIMIT expensive requests run at once
+- Per user: at most ADMISSION_USER_LIMIT of them belong to the same user
+
+A request over a limit waits in a FIFO queue (bounded globally by
+ADMISSION_GLOBAL_QUEUE and per user by ADMISSION_USER_QUEUE) for up to
+ADMISSION_QUEUE_TIMEOUT seconds. When its queue is full, or it times out,
+it is rejected at once with 429 and a `Retry-After` estimated from recent
+service times, instead of piling up.
+
+Only routes listed in EXPENSIVE_ROUTES are limited. Bids are never
+limited, so a bid never waits behind searches.
+
+Users are identified by the X-User-Id header, falling back to the client
+address. The API has no authentication, so the header is trusted as sent.
+"""
+
+import asyncio
+import math
+import os
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Pattern, Tuple
+import logging
+
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+USER_HEADER = "x-user-id"
+
+# (method, path pattern) of the routes admission control applies to
+EXPENSIVE_ROUTES: Tuple[Tuple[str, Pattern], ...] = (
+    ("POST", re.compile(r"^/api/search$")),
+    ("POST", re.compile(r"^/api/scripts/[^/]+/run$")),
+)
+
+
+def is_expensive(method: str, path: str) -> bool:
+    """Whether a request is subject to admission control"""
+    return any(method == route_method and pattern.match(path) for route_method, pattern in EXPENSIVE_ROUTES)
+
+
+def user_key(scope) -> str:
+    """User a request is counted against: X-User-Id, or the client address"""
+    for name, value in scope.get("headers", []):
+        if name.decode("latin-1").lower() == USER_HEADER:
+            user = value.decode("latin-1").strip()
+            if user:
+                return f"user:{user}"
+    client = scope.get("client")
+    return f"addr:{client[0]}" if client else "addr:unknown"
+
+
+class _Waiter:
+    __slots__ = ("user", "future", "granted")
+
+    def __init__(self, user: str, future: asyncio.Future):
+        self.user = user
+        self.future = future
+        self.granted = False
+
+
+class AdmissionController:
+    """Global and per-user concurrency limits with bounded FIFO queues"""
+
+    def __init__(self, global_limit: Optional[int] = None, user_limit: Optional[int] = None,
+                 global_queue: Optional[int] = None, user_queue: Optional[int] = None,
+                 queue_timeout: Optional[float] = None):
+        """
+        Initialize the controller (unset arguments are read from the environment)
+
+        Args:
+            global_limit: Expensive requests running at once (ADMISSION_GLOBAL_LIMIT, default 8)
+            user_limit: Expensive requests running at once per user (ADMISSION_USER_LIMIT, default 2)
+            global_queue: Requests waiting at once (ADMISSION_GLOBAL_QUEUE, default 64)
+            user_queue: Requests waiting at once per user (ADMISSION_USER_QUEUE, default 4)
+            queue_timeout: Seconds a request waits before it is rejected (ADMISSION_QUEUE_TIMEOUT, default 10)
+        """
+        self.global_limit = global_limit if global_limit is not None else int(os.getenv("ADMISSION_GLOBAL_LIMIT", "8"))
+        self.user_limit = user_limit if user_limit is not None else int(os.getenv("ADMISSION_USER_LIMIT", "2"))
+        self.global_queue = global_queue if global_queue is not None else int(os.getenv("ADMISSION_GLOBAL_QUEUE", "64"))
+        self.user_queue = user_queue if user_queue is not None else int(os.getenv("ADMISSION_USER_QUEUE", "4"))
+        self.queue_timeout = (queue_timeout if queue_timeout is not None
+                              else float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10")))
+        self.active = 0
+        self._active_by_user: Dict[str, int] = {}
+        self._waiting: Deque[_Waiter] = deque()
+        self._waiting_by_user: Dict[str, int] = {}
+        # Moving average of how long an admitted request holds its slot
+        self._service_time = 1.0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _has_capacity(self, user: str) -> bool:
+        return self.active < self.global_limit and self._active_by_user.get(user, 0) < self.user_limit
+
+    def _start(self, user: str):
+        self.active += 1
+        self._active_by_user[user] = self._active_by_user.get(user, 0) + 1
+        self.admitted += 1
+
+    def _dequeue(self, waiter: _Waiter):
+        self._waiting.remove(waiter)
+        remaining = self._waiting_by_user[waiter.user] - 1
+        if remaining:
+            self._waiting_by_user[waiter.user] = remaining
+        else:
+            del self._waiting_by_user[waiter.user]
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait: time to drain the queue ahead of it"""
+        return max(1, math.ceil(self._service_time * (len(self._waiting) + 1) / max(self.global_limit, 1)))
+
+    async def acquire(self, user: str) -> Optional[int]:
+        """
+        Admit a request, waiting in the queue if needed
+
+        Returns:
+            None once admitted (call `release` when done), or the Retry-After seconds if rejected
+        """
+        # A user's requests are admitted in order, so only skip the queue if none of theirs wait
+        if self._has_capacity(user) and not self._waiting_by_user.get(user):
+            self._start(user)
+            return None
+        if len(self._waiting) >= self.global_queue or self._waiting_by_user.get(user, 0) >= self.user_queue:
+            self.rejected += 1
+            return self.retry_after()
+
+        waiter = _Waiter(user, asyncio.get_running_loop().create_future())
+        self._waiting.append(waiter)
+        self._waiting_by_user[user] = self._waiting_by_user.get(user, 0) + 1
+        self.queued += 1
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+            return None
+        except asyncio.TimeoutError:
+            if waiter.granted:
+                return None
+            self._dequeue(waiter)
+            self.timed_out += 1
+            return self.retry_after()
+        except asyncio.CancelledError:
+            # Client went away: give back a slot handed over meanwhile, or leave the queue
+            if waiter.granted:
+                self.release(user)
+            else:
+                self._dequeue(waiter)
+            raise
+
+    def release(self, user: str, duration: Optional[float] = None):
+        """Free a slot and hand it to the first waiter that may run"""
+        self.active -= 1
+        remaining = self._active_by_user[user] - 1
+        if remaining:
+            self._active_by_user[user] = remaining
+        else:
+            del self._active_by_user[user]
+        if duration is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * duration
+        self._grant()
+
+    def _grant(self):
+        # Slots are handed over directly, so newly arriving requests cannot overtake waiters
+        for waiter in list(self._waiting):
+            if self.active >= self.global_limit:
+                break
+            if self._has_capacity(waiter.user) and not waiter.future.done():
+                self._dequeue(waiter)
+                self._start(waiter.user)
+                waiter.granted = True
+                waiter.future.set_result(True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Limits, current load and counters"""
+        return {
+            "global_limit": self.global_limit,
+            "user_limit": self.user_limit,
+            "active": self.active,
+            "waiting": len(self._waiting),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "service_time_ms": round(self._service_time * 1000, 1),
+        }
+
+
+def admission_enabled() -> bool:
+    """Whether expensive routes are admission controlled (ADMISSION_CONTROL_ENABLED)"""
+    return os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+
+
+class AdmissionMiddleware:
+    """Apply admission control to EXPENSIVE_ROUTES, rejecting overflow with 429 and Retry-After"""
+
+    def __init__(self, app, enabled: Optional[bool] = None, controller: Optional[AdmissionController] = None):
+        """
+        Initialize the middleware
+
+        Args:
+            app: ASGI application
+            enabled: Whether to limit at all (default from ADMISSION_CONTROL_ENABLED)
+            controller: Limits to apply (default: the process-wide controller)
+        """
+        self.app = app
+        self.enabled = enabled if enabled is not None else admission_enabled()
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled or not is_expensive(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller or admission_controller
+        user = user_key(scope)
+        retry_after = await controller.acquire(user)
+        if retry_after is not None:
+            logger.warning(f"Rejected {scope['method']} {scope['path']} for {user}, retry after {retry_after}s")
+            response = JSONResponse({"detail": "Too many concurrent requests, retry later"}, status_code=429,
+                                    headers={"Retry-After": str(retry_after)})
+            await response(scope, receive, send)
+            return
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(user, time.monotonic() - start)
+
+
+# Process-wide limits shared by all expensive routes
+admission_controller = AdmissionController()
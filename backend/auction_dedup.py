@@ -0,0 +1,256 @@
+"""
+Cross-Script Auction Deduplication
+
+Many overlapping scripts find the same Tradera items. Instead of looking up
+and re-writing every item on every run, ingest consults an in-memory index of
+known `tradera_id`s with a fingerprint of their mutable fields:
+- new items are inserted (updated instead if another process stored them first)
+- changed items (price, bid count, end time, title or status) are updated
+- unchanged items cost no database call at all
+
+Which scripts matched an auction is recorded in the many-to-many
+`auction_scripts` table (only pairs not already known are written, in one
+batch per run). `auctions.script_id` keeps pointing at the first script that
+found the auction.
+"""
+
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+from db import select_all
+from profiling import span
+
+logger = logging.getLogger(__name__)
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+# Columns needed to rebuild the index from the database
+INDEX_COLUMNS = "id, tradera_id, title, current_price, bid_count, end_time, status, created_at"
+
+
+def _normalize_time(value: Any) -> Any:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return str(value)
+
+
+def fingerprint(row: Dict[str, Any]) -> Tuple:
+    """Values that make an update worth writing"""
+    return (
+        str(row.get("title") or ""),
+        float(row.get("current_price") or 0),
+        int(row.get("bid_count") or 0),
+        _normalize_time(row.get("end_time")),
+        row.get("status") or "active",
+    )
+
+
+class SeenAuctionIndex:
+    """tradera_id -> (auction ID, fingerprint, created_at), plus known script matches"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._entries: Dict[str, Tuple[int, Tuple, Optional[str]]] = {}
+        self._tradera_ids: Dict[int, str] = {}
+        self._matches: Set[Tuple[int, int]] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, tradera_id: Any) -> bool:
+        return str(tradera_id) in self._entries
+
+    def load(self, rows: Iterable[Dict[str, Any]], matches: Iterable[Dict[str, Any]] = ()):
+        """Replace the index with auction rows (and optionally auction_scripts rows)"""
+        with self._lock:
+            self._entries.clear()
+            self._tradera_ids.clear()
+            self._matches = {(int(match["auction_id"]), int(match["script_id"])) for match in matches}
+            for row in rows:
+                self.record(row)
+            self.loaded = True
+
+    def ensure_loaded(self, loader: Callable[[], Iterable[Dict[str, Any]]]):
+        """Load the index with `loader` unless it is already loaded"""
+        if self.loaded:
+            return
+        with self._lock:
+            if not self.loaded:
+                self.load(loader())
+
+    def get(self, tradera_id: Any) -> Optional[Dict[str, Any]]:
+        """Known auction ID and creation time for a Tradera item, or None"""
+        entry = self._entries.get(str(tradera_id))
+        if entry is None:
+            return None
+        return {"id": entry[0], "created_at": entry[2]}
+
+    def classify(self, auction_data: Dict[str, Any]) -> str:
+        """Whether an item is NEW, CHANGED or UNCHANGED compared to what is stored"""
+        entry = self._entries.get(str(auction_data.get("tradera_id")))
+        if entry is None:
+            return NEW
+        return UNCHANGED if entry[1] == fingerprint(auction_data) else CHANGED
+
+    def record(self, row: Dict[str, Any]):
+        """Remember a stored auction row (must include `id` and `tradera_id`)"""
+        if row.get("id") is None or row.get("tradera_id") in (None, ""):
+            return
+        with self._lock:
+            key = str(row["tradera_id"])
+            auction_id = int(row["id"])
+            previous = self._entries.get(key)
+            created_at = row.get("created_at") or (previous[2] if previous else None)
+            self._entries[key] = (auction_id, fingerprint(row), created_at)
+            self._tradera_ids[auction_id] = key
+
+    def remove(self, auction_id: int):
+        """Forget a deleted auction"""
+        with self._lock:
+            key = self._tradera_ids.pop(int(auction_id), None)
+            if key is not None:
+                self._entries.pop(key, None)
+            self._matches = {match for match in self._matches if match[0] != int(auction_id)}
+
+    def new_matches(self, script_id: int, auction_ids: Iterable[int]) -> List[int]:
+        """
+        Mark auctions as matched by a script
+
+        Returns:
+            Auction IDs not previously known to be matched by the script
+        """
+        new = []
+        with self._lock:
+            for auction_id in auction_ids:
+                pair = (int(auction_id), int(script_id))
+                if pair not in self._matches:
+                    self._matches.add(pair)
+                    new.append(int(auction_id))
+        return new
+
+    def forget_matches(self, script_id: int, auction_ids: Iterable[int]):
+        """Undo `new_matches` for pairs that could not be stored"""
+        with self._lock:
+            for auction_id in auction_ids:
+                self._matches.discard((int(auction_id), int(script_id)))
+
+
+# Process-wide index shared by the routes and the worker
+seen_auctions = SeenAuctionIndex()
+
+
+def _load_seen_auctions(supabase) -> List[Dict[str, Any]]:
+    return select_all(lambda: supabase.table("auctions").select(INDEX_COLUMNS).order("id"))
+
+
+def _store_new(supabase, auction_data: Dict[str, Any], script_id: Optional[int]) -> bool:
+    """
+    Insert an auction missing from the index, or update it if another process stored it first
+
+    The index only knows what this process has seen: the worker or another
+    API process may have inserted the item since it was loaded.
+
+    Returns:
+        Whether the auction was inserted (as opposed to updated)
+    """
+    row = dict(auction_data, script_id=script_id) if script_id is not None else auction_data
+    result = supabase.table("auctions").upsert(row, on_conflict="tradera_id", ignore_duplicates=True).execute()
+    if result.data:
+        auction_data.update(result.data[0])
+        return True
+    # Already stored: update it, keeping the script that found it first
+    result = supabase.table("auctions").update(auction_data).eq("tradera_id", auction_data["tradera_id"]).execute()
+    auction_data.update(result.data[0])
+    return False
+
+
+def ingest_items(supabase, items: Iterable[Dict[str, Any]], script_id: Optional[int] = None,
+                 index: Optional[SeenAuctionIndex] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Store search items, writing only new and changed auctions
+
+    Args:
+        supabase: Supabase client
+        items: Items from `TraderaAPI._process_search_items` (after result filtering)
+        script_id: Script that found the items (recorded in auction_scripts)
+        index: Seen-auction index (default: the process-wide one)
+
+    Returns:
+        Tuple of (all auctions, newly inserted auctions, auctions that were written)
+    """
+    if index is None:
+        index = seen_auctions
+    if not index.loaded:
+        with span("cache.seen_auctions.load"):
+            index.ensure_loaded(lambda: _load_seen_auctions(supabase))
+
+    auctions = []
+    new_auctions = []
+    written = []
+    for item in items:
+        auction_data = {
+            "title": item["title"],
+            "description": item.get("description", ""),
+            # Both are TEXT columns; items carry Tradera's integers
+            "tradera_id": str(item["id"]),
+            "current_price": float(item["current_price"]),
+            "end_time": item.get("end_time", item.get("end_date")),
+            "image_url": item.get("image_url", ""),
+            "seller_id": str(item.get("seller_id", "")),
+            "seller_rating": float(item.get("seller_rating", 0)),
+            # Search results only carry the category ID (0 when Tradera didn't give one)
+            "category": str(item["category_id"]) if item.get("category_id") else "",
+            "bid_count": int(item.get("bid_count", 0)),
+            "next_bid": item.get("next_bid"),
+        }
+
+        state = index.classify(auction_data)
+        known = index.get(auction_data["tradera_id"])
+        if state == NEW:
+            if _store_new(supabase, auction_data, script_id):
+                new_auctions.append(auction_data)
+            written.append(auction_data)
+        elif state == CHANGED:
+            result = supabase.table("auctions").update(auction_data).eq("id", known["id"]).execute()
+            if result.data:
+                auction_data.update(result.data[0])
+            elif _store_new(supabase, auction_data, script_id):
+                # Deleted since the index was loaded
+                new_auctions.append(auction_data)
+            written.append(auction_data)
+        else:
+            auction_data.update(id=known["id"], created_at=known["created_at"])
+
+        index.record(auction_data)
+        auctions.append(auction_data)
+
+    if script_id is not None:
+        record_script_matches(supabase, script_id, [auction["id"] for auction in auctions], index)
+
+    logger.info(f"Ingested {len(auctions)} items: {len(new_auctions)} new, "
+                f"{len(written) - len(new_auctions)} changed, {len(auctions) - len(written)} unchanged")
+    return auctions, new_auctions, written
+
+
+def record_script_matches(supabase, script_id: int, auction_ids: List[int],
+                          index: Optional[SeenAuctionIndex] = None):
+    """Write auction_scripts rows for matches not already recorded"""
+    if index is None:
+        index = seen_auctions
+    new = index.new_matches(script_id, auction_ids)
+    if not new:
+        return
+    rows = [{"auction_id": auction_id, "script_id": script_id} for auction_id in new]
+    try:
+        supabase.table("auction_scripts").upsert(rows, on_conflict="auction_id,script_id", ignore_duplicates=True).execute()
+    except Exception as e:
+        index.forget_matches(script_id, new)
+        logger.error(f"Error recording matches for script {script_id}: {e}")
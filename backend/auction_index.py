@@ -0,0 +1,258 @@
+"""
+In-Memory Auction Index
+
+A columnar snapshot of active auctions used to answer dashboard queries
+(filtered lists, counts and price histograms) without a database round trip.
+
+Columns are stored in `array` buffers indexed by row position. When NumPy is
+installed the buffers are viewed as NumPy arrays (zero-copy) and filters are
+evaluated vectorized; otherwise a plain Python scan over the arrays is used.
+The database stays the source of truth: the index is loaded from it on first
+use and then kept current by upserts from the ingest paths.
+"""
+
+import threading
+from array import array
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Filters the index can answer; anything else must go to the database
+SUPPORTED_FILTERS = {"status", "category", "category_id", "min_price", "max_price",
+                     "end_time_gt", "end_time_lt", "min_bid_count"}
+
+
+def _to_timestamp(value: Any) -> float:
+    """Convert an ISO timestamp (or datetime) to epoch seconds"""
+    if value is None or value == "":
+        return 0.0
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+class AuctionIndex:
+    """Columnar snapshot of active auctions"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._clear()
+
+    def _clear(self):
+        self._ids = array("q")
+        self._price = array("d")
+        self._end_time = array("d")
+        self._bid_count = array("l")
+        self._category = array("l")
+        self._alive = array("b")
+        self._rows: List[Optional[Dict[str, Any]]] = []
+        self._positions: Dict[int, int] = {}
+        self._categories: Dict[str, int] = {}
+        self._free: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def load(self, rows: Iterable[Dict[str, Any]]):
+        """Replace the snapshot with the given auction rows"""
+        with self._lock:
+            self._clear()
+            self.upsert(rows)
+            self.loaded = True
+
+    def ensure_loaded(self, loader: Callable[[], Iterable[Dict[str, Any]]]):
+        """Load the snapshot with `loader` unless it is already loaded"""
+        if self.loaded:
+            return
+        with self._lock:
+            if not self.loaded:
+                self.load(loader())
+
+    def upsert(self, rows: Iterable[Dict[str, Any]]):
+        """
+        Insert or update auctions in the snapshot
+
+        Auctions whose status is no longer active are dropped from the index.
+
+        Args:
+            rows: Auction rows (must include `id`)
+        """
+        with self._lock:
+            for row in rows:
+                if row.get("id") is None:
+                    continue
+                auction_id = int(row["id"])
+                if row.get("status", "active") != "active":
+                    self._remove(auction_id)
+                    continue
+
+                position = self._positions.get(auction_id)
+                if position is not None:
+                    # Keep fields from the stored row that the update doesn't carry
+                    row = {**self._rows[position], **row}
+                elif self._free:
+                    position = self._free.pop()
+                else:
+                    position = len(self._ids)
+                    self._ids.append(0)
+                    self._price.append(0.0)
+                    self._end_time.append(0.0)
+                    self._bid_count.append(0)
+                    self._category.append(0)
+                    self._alive.append(0)
+                    self._rows.append(None)
+
+                self._ids[position] = auction_id
+                self._price[position] = float(row.get("current_price") or 0)
+                self._end_time[position] = _to_timestamp(row.get("end_time"))
+                self._bid_count[position] = int(row.get("bid_count") or 0)
+                self._category[position] = self._category_code(self._category_of(row))
+                self._alive[position] = 1
+                self._rows[position] = row
+                self._positions[auction_id] = position
+
+    def remove(self, auction_id: int):
+        """Remove an auction from the snapshot"""
+        with self._lock:
+            self._remove(int(auction_id))
+
+    def _remove(self, auction_id: int):
+        position = self._positions.pop(auction_id, None)
+        if position is None:
+            return
+        self._alive[position] = 0
+        self._rows[position] = None
+        self._free.append(position)
+
+    @staticmethod
+    def _category_of(row: Dict[str, Any]) -> str:
+        category = row.get("category_id", row.get("category"))
+        return "" if category is None else str(category)
+
+    def _category_code(self, category: str) -> int:
+        code = self._categories.get(category)
+        if code is None:
+            code = self._categories[category] = len(self._categories) + 1
+        return code
+
+    @staticmethod
+    def supports(filters: Optional[Dict[str, Any]]) -> bool:
+        """Whether a filter dictionary can be answered from the index (it must ask for active auctions explicitly)"""
+        if not filters or not set(filters) <= SUPPORTED_FILTERS:
+            return False
+        status = filters.get("status")
+        statuses = status if isinstance(status, list) else [status]
+        return statuses == ["active"]
+
+    def _matches(self, filters: Dict[str, Any]) -> List[int]:
+        """Return the row positions matching the filters"""
+        category = filters.get("category", filters.get("category_id"))
+        category_code = None
+        if category is not None:
+            category_code = self._categories.get(str(category), -1)
+        min_price = filters.get("min_price")
+        max_price = filters.get("max_price")
+        end_after = _to_timestamp(filters["end_time_gt"]) if filters.get("end_time_gt") else None
+        end_before = _to_timestamp(filters["end_time_lt"]) if filters.get("end_time_lt") else None
+        min_bids = filters.get("min_bid_count")
+
+        if np is not None and len(self._ids):
+            mask = np.frombuffer(self._alive, dtype=np.int8) == 1
+            price = np.frombuffer(self._price, dtype=np.float64)
+            end_time = np.frombuffer(self._end_time, dtype=np.float64)
+            if category_code is not None:
+                mask &= np.frombuffer(self._category, dtype=np.dtype(f"i{self._category.itemsize}")) == category_code
+            if min_price is not None:
+                mask &= price >= float(min_price)
+            if max_price is not None:
+                mask &= price <= float(max_price)
+            if end_after is not None:
+                mask &= end_time > end_after
+            if end_before is not None:
+                mask &= end_time < end_before
+            if min_bids is not None:
+                mask &= np.frombuffer(self._bid_count, dtype=np.dtype(f"i{self._bid_count.itemsize}")) >= int(min_bids)
+            return np.flatnonzero(mask).tolist()
+
+        positions = []
+        for position in range(len(self._ids)):
+            if not self._alive[position]:
+                continue
+            if category_code is not None and self._category[position] != category_code:
+                continue
+            price = self._price[position]
+            if min_price is not None and price < min_price:
+                continue
+            if max_price is not None and price > max_price:
+                continue
+            end_time = self._end_time[position]
+            if end_after is not None and end_time <= end_after:
+                continue
+            if end_before is not None and end_time >= end_before:
+                continue
+            if min_bids is not None and self._bid_count[position] < min_bids:
+                continue
+            positions.append(position)
+        return positions
+
+    def query(self, filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get auctions matching the filters, ordered by end time
+
+        Args:
+            filters: Filters (see SUPPORTED_FILTERS)
+            limit: Maximum number of auctions to return
+
+        Returns:
+            List of auction rows
+        """
+        with self._lock:
+            positions = self._matches(filters or {})
+            positions.sort(key=self._end_time.__getitem__)
+            if limit is not None:
+                positions = positions[:limit]
+            return [self._rows[position] for position in positions]
+
+    def count(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        """Count auctions matching the filters"""
+        with self._lock:
+            return len(self._matches(filters or {}))
+
+    def price_histogram(self, bins: int = 10, filters: Optional[Dict[str, Any]] = None) -> Dict[str, List[float]]:
+        """
+        Histogram of current prices for auctions matching the filters
+
+        Args:
+            bins: Number of equal-width bins
+            filters: Filters (see SUPPORTED_FILTERS)
+
+        Returns:
+            Dictionary with `edges` (bins + 1 values) and `counts` (bins values)
+        """
+        with self._lock:
+            prices = [self._price[position] for position in self._matches(filters or {})]
+        if not prices:
+            return {"edges": [], "counts": []}
+
+        low, high = min(prices), max(prices)
+        if np is not None:
+            counts, edges = np.histogram(prices, bins=bins, range=(low, high if high > low else low + 1))
+            return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+        width = (high - low) / bins if high > low else 1.0 / bins
+        counts = [0] * bins
+        for price in prices:
+            counts[min(bins - 1, int((price - low) / width))] += 1
+        return {"edges": [low + width * i for i in range(bins + 1)], "counts": counts}
+
+
+# Process-wide index shared by the routes
+auction_index = AuctionIndex()
@@ -0,0 +1,59 @@
+"""
+Benchmark: in-memory auction index
+
+Measures filtered list, count and price histogram queries against an
+AuctionIndex holding a synthetic set of active auctions.
+
+Usage:
+    python benchmarks/bench_auction_index.py [--auctions 5000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auction_index as auction_index_module
+from auction_index import AuctionIndex
+
+
+def _time(fn, rounds=200):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--auctions", type=int, default=5000)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    index = AuctionIndex()
+    index.load(
+        {
+            "id": i,
+            "current_price": random.uniform(10, 5000),
+            "bid_count": random.randint(0, 30),
+            "category_id": random.choice([100, 200, 300, 400]),
+            "end_time": (now + timedelta(minutes=random.randint(1, 10000))).isoformat(),
+            "status": "active",
+        }
+        for i in range(args.auctions)
+    )
+    filters = {"category_id": 200, "max_price": 1000, "end_time_lt": (now + timedelta(days=2)).isoformat()}
+
+    backend = "numpy" if auction_index_module.np is not None else "pure python"
+    print(f"{args.auctions} active auctions ({backend})")
+    print(f"query (limit 50)   {_time(lambda: index.query(filters, limit=50)):9.1f} us")
+    print(f"count              {_time(lambda: index.count(filters)):9.1f} us")
+    print(f"price_histogram    {_time(lambda: index.price_histogram(20, filters)):9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
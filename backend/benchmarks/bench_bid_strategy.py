@@ -0,0 +1,53 @@
+"""
+Benchmark: bid strategy engine
+
+Measures how many bid configs per second the strategy engine evaluates
+against a synthetic set of auctions.
+
+Usage:
+    python benchmarks/bench_bid_strategy.py [--configs 10000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bid_strategy import STRATEGIES, decide_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--configs", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    auctions = {
+        i: {
+            "id": i,
+            "current_price": random.uniform(10, 8000),
+            "bid_count": random.randint(0, 30),
+            "next_bid": random.choice([None, random.randint(10, 8000)]),
+            "status": "active",
+        }
+        for i in range(args.configs)
+    }
+    configs = [
+        {"id": i, "auction_id": i, "max_bid_amount": random.uniform(10, 10000), "strategy": random.choice(STRATEGIES)}
+        for i in range(args.configs)
+    ]
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        decide_batch(configs, auctions)
+    elapsed = (time.perf_counter() - start) / args.rounds
+
+    print(f"{args.configs} configs: {elapsed * 1000:.2f} ms per batch, "
+          f"{args.configs / elapsed:,.0f} configs/s, {elapsed / args.configs * 1e6:.2f} us per decision")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: list response serialization
+
+Compares serving a list of auctions through the default FastAPI path
+(`response_model=List[Auction]` validation + JSONResponse) with the fast
+path from fast_json (no validation, orjson when installed, and streaming
+above the threshold). Requests go through a TestClient, so the numbers
+include the ASGI round trip.
+
+Usage:
+    python benchmarks/bench_json_responses.py [--auctions 5000] [--rounds 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_json
+from fast_json import list_response
+
+
+# Mirrors routes.auctions.Auction (importing the routes needs a configured environment)
+class Auction(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    tradera_id: str
+    current_price: float
+    end_time: str
+    image_url: Optional[str] = None
+    seller_id: Optional[str] = None
+    seller_rating: Optional[float] = None
+    category: Optional[str] = None
+    bid_count: Optional[int] = 0
+    created_at: str
+    updated_at: Optional[str] = None
+
+
+def make_rows(count: int):
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": i,
+            "title": f"Vintage item {i}",
+            "description": "Fint skick, hämtas i Stockholm. " * 4,
+            "tradera_id": str(400000000 + i),
+            "current_price": round(random.uniform(10, 5000), 2),
+            "end_time": (now + timedelta(minutes=random.randint(1, 10000))).isoformat(),
+            "image_url": f"https://img.tradera.net/images/{i}.jpg",
+            "seller_id": str(random.randint(1, 10000)),
+            "seller_rating": round(random.uniform(90, 100), 1),
+            "category": str(random.choice([100, 200, 300, 400])),
+            "bid_count": random.randint(0, 30),
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def create_app(rows):
+    app = FastAPI()
+
+    @app.get("/default", response_model=List[Auction])
+    async def default():
+        return rows
+
+    @app.get("/fast")
+    async def fast():
+        return list_response(rows, stream_threshold=len(rows))
+
+    @app.get("/stream")
+    async def stream():
+        return list_response(rows, stream_threshold=0)
+
+    return app
+
+
+def _time(client, path, rounds):
+    client.get(path)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        response = client.get(path)
+        response.raise_for_status()
+    return (time.perf_counter() - start) / rounds * 1000, len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--auctions", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    client = TestClient(create_app(make_rows(args.auctions)))
+    serializer = "orjson" if fast_json.orjson is not None else "json"
+    print(f"{args.auctions} auctions, {args.rounds} rounds (fast path uses {serializer})")
+    for label, path in (("List[Auction]", "/default"), ("fast", "/fast"), ("fast streamed", "/stream")):
+        ms, size = _time(client, path, args.rounds)
+        print(f"{label:15} {ms:8.2f} ms/request  {size / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: place_bid vs prepared bids
+
+Measures the latency seen at fire time for a regular TraderaAPI.place_bid call
+and for a bid staged with TraderaAPI.prepare_bid, against the local stand-in.
+
+Usage:
+    python benchmarks/bench_prepared_bid.py [--rounds 200]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tradera_api import TraderaAPI
+from benchmarks.tradera_standin import TraderaStandIn
+
+
+def _summary(name, samples):
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:<28} mean {statistics.mean(samples) * 1000:7.3f} ms  "
+          f"p50 {p50 * 1000:7.3f} ms  p99 {p99 * 1000:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    api = TraderaAPI(app_id="12345", app_key="bench", sandbox=1)
+    api.set_user_token(12345, "bench_token")
+
+    with TraderaStandIn() as standin:
+        standin.point(api)
+
+        cold = []
+        for i in range(args.rounds):
+            start = time.perf_counter()
+            api.place_bid(item_id=100000 + i, bid_amount=550)
+            cold.append(time.perf_counter() - start)
+
+        fire = []
+        for i in range(args.rounds):
+            prepared = api.prepare_bid(item_id=100000 + i, bid_amount=550)
+            start = time.perf_counter()
+            prepared.fire()
+            fire.append(time.perf_counter() - start)
+
+    print(f"{args.rounds} rounds against {standin.url}")
+    _summary("place_bid", cold)
+    _summary("prepare_bid + fire (fire)", fire)
+
+
+if __name__ == "__main__":
+    main()
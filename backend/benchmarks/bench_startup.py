@@ -0,0 +1,58 @@
+"""
+Benchmark: application startup
+
+Measures how long `import main` takes in a fresh interpreter, and which heavy
+modules it pulls in. The Supabase and Tradera clients are created on first
+use, so startup should not import `supabase` or `xmltodict`.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported when first needed
+DEFERRED_MODULES = ("supabase", "xmltodict")
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(m for m in {deferred!r} if m in sys.modules))
+"""
+
+
+def measure_import() -> tuple:
+    """Import main in a subprocess; returns (seconds, deferred modules that were imported)"""
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(deferred=DEFERRED_MODULES)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(output[0]), output[1].split(",") if len(output) > 1 else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    timings = []
+    loaded = []
+    for _ in range(args.runs):
+        elapsed, loaded = measure_import()
+        timings.append(elapsed)
+
+    print(f"import main: median {statistics.median(timings) * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms over {args.runs} runs")
+    print(f"deferred modules imported at startup: {', '.join(loaded) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
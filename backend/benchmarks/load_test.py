@@ -0,0 +1,366 @@
+"""
+Load test: the API under concurrent clients
+
+Drives the ASGI app in-process (httpx.ASGITransport, with the app's lifespan
+running) with many concurrent clients over a weighted mix of list, search,
+script-run and bid requests. The database is the in-memory Supabase stand-in
+and Tradera is the local HTTP stand-in, both with configurable latency, so
+the run needs no credentials and measures the app itself: routing,
+validation, serialization and, above all, the synchronous database and
+Tradera calls that stall the event loop for every other client.
+
+Reports p50/p95/p99/max latency per request kind, errors (5xx responses and
+exceptions), requests rejected by admission control (429), throughput and event loop lag. With --slo, exits non-zero when a
+latency objective or the error budget is breached, so it can gate CI:
+
+    python benchmarks/load_test.py --clients 200 --requests 4000 \\
+        --slo "p95=250,p99=500,search.p99=800,bid.p99=300" --max-error-rate 0.01
+
+SLO keys are `pNN` or `max` (milliseconds), optionally prefixed with a
+request kind (list, search, script_run, bid); unprefixed keys apply to all
+requests together.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.supabase_standin import SupabaseStandIn
+from benchmarks.tradera_standin import TraderaStandIn
+
+KINDS = ("list", "search", "script_run", "bid")
+
+# Share of requests per kind: dashboards mostly read
+DEFAULT_MIX = {"list": 0.6, "search": 0.15, "script_run": 0.1, "bid": 0.15}
+
+LIST_PATHS = ("/api/auctions", "/api/scripts", "/api/bids", "/api/auctions/query?limit=50")
+
+QUERIES = ("lego", "vinyl", "kamera", "cykel", "klocka")
+
+SEARCH_ITEM = """
+        <Items>
+          <Id>{id}</Id>
+          <ShortDescription>Item {id}</ShortDescription>
+          <MaxBid>{price}</MaxBid>
+          <NextBid>{next_bid}</NextBid>
+          <SellerId>42</SellerId>
+          <SellerAlias>seller</SellerAlias>
+          <EndDate>{end_date}</EndDate>
+          <HasBids>true</HasBids>
+          <IsEnded>false</IsEnded>
+          <ItemType>Auction</ItemType>
+          <CategoryId>1</CategoryId>
+          <BidCount>3</BidCount>
+        </Items>"""
+
+SEARCH_RESPONSE = """<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+  <soap:Body>
+    <SearchAdvancedResponse xmlns="http://api.tradera.com">
+      <SearchAdvancedResult>
+        <TotalNumberOfItems>{count}</TotalNumberOfItems>
+        <TotalNumberOfPages>{pages}</TotalNumberOfPages>
+{items}
+      </SearchAdvancedResult>
+    </SearchAdvancedResponse>
+  </soap:Body>
+</soap:Envelope>
+"""
+
+
+def search_response(count: int = 10, pages: int = 5) -> str:
+    """Canned SearchAdvanced response with `count` active items, reporting `pages` pages"""
+    end_date = (datetime.now(timezone.utc) + timedelta(days=2)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    items = "".join(SEARCH_ITEM.format(id=900000 + i, price=100 + i, next_bid=110 + i, end_date=end_date)
+                    for i in range(count))
+    return SEARCH_RESPONSE.format(count=count * pages, pages=pages, items=items)
+
+
+def seed_tables(auctions: int = 500, scripts: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+    """Active auctions ending over the next days and active search scripts"""
+    now = datetime.now(timezone.utc)
+    return {
+        "auctions": [{
+            "id": i,
+            "title": f"Auction {i}",
+            "tradera_id": str(100000 + i),
+            "current_price": float(50 + i % 500),
+            "end_time": (now + timedelta(hours=1 + i % 72)).isoformat(),
+            "category": f"category-{i % 8}",
+            "bid_count": i % 5,
+            "next_bid": float(60 + i % 500),
+            "status": "active",
+        } for i in range(1, auctions + 1)],
+        "search_scripts": [{
+            "id": i,
+            "user_id": str(1 + i % 5),
+            "name": f"Script {i}",
+            "query": QUERIES[i % len(QUERIES)],
+            "schedule": "hourly",
+            "is_active": True,
+        } for i in range(1, scripts + 1)],
+        "bids": [],
+    }
+
+
+def _request(kind: str, rng: random.Random, auctions: int, scripts: int) -> Tuple[str, str, Optional[dict]]:
+    """(method, path, JSON body) of one request of `kind`"""
+    if kind == "list":
+        return "GET", rng.choice(LIST_PATHS), None
+    if kind == "search":
+        # Users mostly look at the first page, some page forward
+        return "POST", "/api/search", {"query": rng.choice(QUERIES), "limit": 10, "page": rng.choice((1, 1, 2, 3))}
+    if kind == "script_run":
+        return "POST", f"/api/scripts/{rng.randint(1, scripts)}/run", None
+    auction_id = rng.randint(1, auctions)
+    return "POST", f"/api/auctions/{auction_id}/bid", {
+        "auction_id": auction_id, "amount": 600, "user_id": 1 + auction_id % 5, "token": "load-test",
+    }
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of sorted samples"""
+    return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+
+def summarize(latencies: List[float]) -> Dict[str, Any]:
+    """Count and p50/p95/p99/max in milliseconds of latencies in seconds"""
+    samples = sorted(latency * 1000 for latency in latencies)
+    if not samples:
+        return {"count": 0}
+    summary = {"count": len(samples)}
+    for percentile in (50, 95, 99):
+        summary[f"p{percentile}"] = round(_percentile(samples, percentile), 3)
+    summary["max"] = round(samples[-1], 3)
+    return summary
+
+
+@contextmanager
+def stand_ins(db_latency: float, tradera_latency: float, auctions: int, scripts: int):
+    """Install the Supabase and Tradera stand-ins in place of the real clients, restoring them afterwards"""
+    import db
+    from tradera_api import shared_tradera_api
+    from auction_index import auction_index
+    from auction_dedup import seen_auctions
+    import search_cache
+
+    supabase = SupabaseStandIn(seed_tables(auctions, scripts), latency=db_latency)
+    api = shared_tradera_api.get()
+    urls = (api.search_service_url, api.buyer_service_url, api.public_service_url)
+    previous = db._supabase
+    with TraderaStandIn(latency=tradera_latency,
+                        responses={"http://api.tradera.com/SearchAdvanced": search_response()}) as tradera:
+        tradera.point(api)
+        db._supabase = supabase
+        # The process-wide indexes must describe the stand-in's tables
+        auction_index.load(supabase.tables["auctions"])
+        seen_auctions.load(supabase.tables["auctions"])
+        search_cache.search_cache.clear()
+        try:
+            yield supabase, tradera
+        finally:
+            db._supabase = previous
+            api.search_service_url, api.buyer_service_url, api.public_service_url = urls
+            auction_index.loaded = False
+            seen_auctions.loaded = False
+
+
+async def _drive(app, clients: int, requests: int, mix: Dict[str, float], seed: int,
+                 auctions: int, scripts: int):
+    """Run the clients; returns per-kind latencies, error and rejection counts and the wall time"""
+    from loop_monitor import EventLoopMonitor
+
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=requests)
+    plan = iter([(kind, *_request(kind, rng, auctions, scripts)) for kind in kinds])
+    latencies: Dict[str, List[float]] = {kind: [] for kind in mix}
+    errors: Dict[str, int] = {}
+    rejected: Dict[str, int] = {}
+
+    async def client(http: httpx.AsyncClient, started: float, user: str):
+        # Latency counts from when the client is ready to send, not from when it
+        # gets to run: a request queued behind a blocked event loop is slow too
+        ready = started
+        for kind, method, path, body in plan:
+            try:
+                response = await http.request(method, path, json=body, headers={"X-User-Id": user})
+                error = str(response.status_code) if response.status_code >= 500 else None
+            except Exception as e:
+                response, error = None, type(e).__name__
+            done = time.perf_counter()
+            if response is not None and response.status_code == 429:
+                # Turned away by admission control: counted, but not as a served request
+                rejected[kind] = rejected.get(kind, 0) + 1
+            else:
+                latencies[kind].append(done - ready)
+            if error:
+                errors[f"{kind}:{error}"] = errors.get(f"{kind}:{error}", 0) + 1
+            ready = done
+            # In-process requests never yield on their own; let the other clients in, as a network hop would
+            await asyncio.sleep(0)
+
+    monitor = EventLoopMonitor(interval=0.01, debug=False)
+    stop = asyncio.Event()
+    async with app.router.lifespan_context(app):
+        monitor_task = asyncio.create_task(monitor.run(stop))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as http:
+            start = time.perf_counter()
+            await asyncio.gather(*(client(http, start, f"load-{i}") for i in range(clients)))
+            elapsed = time.perf_counter() - start
+        stop.set()
+        await monitor_task
+    return latencies, errors, rejected, elapsed, monitor.stats()["lag"]
+
+
+def run_load_test(clients: int = 100, requests: int = 2000, mix: Optional[Dict[str, float]] = None,
+                  db_latency: float = 0.002, tradera_latency: float = 0.02, auctions: int = 500,
+                  scripts: int = 20, seed: int = 1) -> Dict[str, Any]:
+    """
+    Run a load test against the app in this process
+
+    Args:
+        clients: Concurrent clients, each a separate user (X-User-Id) sending one request at a time
+        requests: Total requests across all clients
+        mix: Share of requests per kind (default DEFAULT_MIX)
+        db_latency: Seconds each database call blocks
+        tradera_latency: Seconds the Tradera stand-in takes per request
+        auctions: Seeded active auctions
+        scripts: Seeded search scripts
+        seed: Seed for the request mix
+
+    Returns:
+        Report with latency summaries ("all" and per kind, excluding requests rejected with 429),
+        errors, rejections, throughput and event loop lag
+    """
+    from main import app
+    import search_cache
+
+    mix = mix or DEFAULT_MIX
+    with stand_ins(db_latency, tradera_latency, auctions, scripts) as (supabase, tradera):
+        latencies, errors, rejected, elapsed, lag = asyncio.run(
+            _drive(app, clients, requests, mix, seed, auctions, scripts))
+        db_calls, tradera_calls = supabase.calls, len(tradera.requests)
+        search_stats = search_cache.stats()
+
+    error_count = sum(errors.values())
+    return {
+        "clients": clients,
+        "requests": requests,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else None,
+        "errors": error_count,
+        "error_rate": round(error_count / requests, 4) if requests else 0,
+        "errors_by_kind": errors,
+        "rejected": sum(rejected.values()),
+        "rejected_by_kind": rejected,
+        "latency_ms": {
+            "all": summarize([latency for kind in latencies for latency in latencies[kind]]),
+            **{kind: summarize(latencies[kind]) for kind in latencies},
+        },
+        "event_loop_lag_ms": {key: lag[key] for key in ("count", "p50_ms", "p99_ms", "max_ms")},
+        "db_calls": db_calls,
+        "tradera_calls": tradera_calls,
+        "search_cache": search_stats,
+    }
+
+
+def parse_slo(text: str) -> Dict[str, float]:
+    """
+    Parse "p95=250,p99=500,search.p99=800" into {"all.p95": 250, "all.p99": 500, "search.p99": 800}
+
+    Raises:
+        ValueError: For malformed entries, unknown kinds or unknown statistics
+    """
+    slo = {}
+    for entry in filter(None, (part.strip() for part in text.split(","))):
+        key, _, value = entry.partition("=")
+        kind, _, stat = key.strip().rpartition(".")
+        kind = kind or "all"
+        if kind not in ("all", *KINDS) or stat not in ("p50", "p95", "p99", "max") or not value:
+            raise ValueError(f"Invalid SLO entry: {entry!r}")
+        slo[f"{kind}.{stat}"] = float(value)
+    return slo
+
+
+def check_slo(report: Dict[str, Any], slo: str, max_error_rate: Optional[float] = None) -> List[str]:
+    """
+    Compare a report with latency objectives and an error budget
+
+    Args:
+        report: Report from run_load_test
+        slo: Objectives in milliseconds, e.g. "p95=250,search.p99=800"
+        max_error_rate: Highest acceptable share of failed requests
+
+    Returns:
+        Descriptions of breached objectives (empty if all are met)
+    """
+    breaches = []
+    for key, limit in parse_slo(slo).items():
+        kind, stat = key.split(".")
+        actual = report["latency_ms"].get(kind, {}).get(stat)
+        if actual is not None and actual > limit:
+            breaches.append(f"{key} {actual:.1f} ms > {limit:g} ms")
+    if max_error_rate is not None and report["error_rate"] > max_error_rate:
+        breaches.append(f"error rate {report['error_rate']:.2%} > {max_error_rate:.2%}")
+    return breaches
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Human-readable latency table"""
+    lines = [f"{report['requests']} requests from {report['clients']} clients in {report['duration_s']:.2f}s "
+             f"({report['throughput_rps']} req/s), {report['errors']} errors, "
+             f"{report['rejected']} rejected (429)",
+             f"{'kind':<12}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)"]
+    for kind, summary in report["latency_ms"].items():
+        if summary["count"]:
+            lines.append(f"{kind:<12}{summary['count']:>7}" +
+                         "".join(f"{summary[stat]:>10.1f}" for stat in ("p50", "p95", "p99", "max")))
+    cache = report["search_cache"]
+    lines.append(f"search cache {cache['cache']['hits']} hits, {cache['cache']['misses']} misses; "
+                 f"prefetched {cache['prefetch']['completed']}, skipped {cache['prefetch']['skipped']}, "
+                 f"cancelled {cache['prefetch']['cancelled']}; {report['tradera_calls']} Tradera calls")
+    lag = report["event_loop_lag_ms"]
+    lines.append(f"event loop lag p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms")
+    for key, count in sorted(report["errors_by_kind"].items()):
+        lines.append(f"  error {key}: {count}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--db-latency", type=float, default=0.002, help="seconds per database call")
+    parser.add_argument("--tradera-latency", type=float, default=0.02, help="seconds per Tradera call")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--slo", default="", help='latency objectives in ms, e.g. "p95=250,search.p99=800"')
+    parser.add_argument("--max-error-rate", type=float, default=None)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    report = run_load_test(clients=args.clients, requests=args.requests, db_latency=args.db_latency,
+                           tradera_latency=args.tradera_latency, seed=args.seed)
+    breaches = check_slo(report, args.slo, args.max_error_rate)
+    print(json.dumps({**report, "slo_breaches": breaches}, indent=2) if args.json else format_report(report))
+    if breaches:
+        print("SLO breached:\n  " + "\n  ".join(breaches), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Local OTLP Collector Stand-in
+
+A minimal HTTP server accepting OTLP/JSON trace exports on /v1/traces, so
+tracing can be exercised end to end without running a collector. Received
+spans are kept in memory and, if a path is given, appended to a file in the
+same format FileSpanExporter writes.
+
+Run standalone and point the API at it (TRACING_EXPORTER=otlp,
+OTEL_EXPORTER_OTLP_ENDPOINT=http://127.0.0.1:4318) to print traces as they
+arrive:
+    python benchmarks/otlp_standin.py
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.path != "/v1/traces" or "json" not in self.headers.get("Content-Type", ""):
+            # Only OTLP/JSON is understood; protobuf exports are rejected
+            status = 404 if self.path != "/v1/traces" else 415
+        else:
+            try:
+                request = json.loads(body)
+                spans = [span for resource in request["resourceSpans"]
+                         for scope in resource["scopeSpans"] for span in scope["spans"]]
+                status = 200
+            except (ValueError, KeyError, TypeError):
+                status = 400
+        if status == 200:
+            with self.server.lock:
+                self.server.spans.extend(spans)
+                if self.server.path:
+                    with open(self.server.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(request) + "\n")
+            if self.server.on_export:
+                self.server.on_export(spans)
+
+        data = b"{}" if status == 200 else b'{"error": "bad request"}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OTLPCollectorStandIn:
+    """Threaded local server collecting OTLP/JSON trace exports"""
+
+    def __init__(self, port: int = 0, path: Optional[str] = None, on_export=None):
+        """
+        Initialize the stand-in
+
+        Args:
+            port: Port to listen on (0: any free port)
+            path: File to append each export request to
+            on_export: Called with the spans of each export request
+        """
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.server.daemon_threads = True
+        self.server.spans = []
+        self.server.lock = threading.Lock()
+        self.server.path = path
+        self.server.on_export = on_export
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        """Base URL to use as OTEL_EXPORTER_OTLP_ENDPOINT"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def spans(self) -> List[Dict[str, Any]]:
+        """OTLP/JSON spans received so far"""
+        with self.server.lock:
+            return list(self.server.spans)
+
+    def start(self) -> "OTLPCollectorStandIn":
+        """Start serving in a background thread"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the socket"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    from tracing import format_traces
+
+    collector = OTLPCollectorStandIn(port=4318, on_export=lambda spans: print(format_traces(spans), flush=True))
+    print(f"Collecting traces on {collector.endpoint}/v1/traces")
+    try:
+        collector.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,243 @@
+"""
+In-memory Supabase Stand-in
+
+Emulates the subset of the supabase-py client the backend uses (table
+queries with filters, ordering and limits, inserts, updates, upserts,
+deletes and `rpc` calls) on in-memory tables, so routes can be exercised
+without a database. Like the real (synchronous) client, every `execute()`
+blocks the calling thread, optionally for an artificial `latency`, which
+makes the cost of database calls made on the event loop visible under load.
+
+Writes bump `table_versions` the way the triggers from migration 0002 do.
+
+Install it in place of the real client with:
+    db._supabase = SupabaseStandIn(...)
+"""
+
+import copy
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class StandInResult:
+    """Result of `execute()`, shaped like postgrest's APIResponse"""
+
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    """Query builder for one table, collecting filters until `execute()`"""
+
+    def __init__(self, standin: "SupabaseStandIn", table: str):
+        self.standin = standin
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.values: Any = None
+        self.on_conflict = "id"
+        self.ignore_duplicates = False
+        self.count = None
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.ordering: List[tuple] = []
+        self.offset = 0
+        self.max_rows: Optional[int] = None
+
+    # Operations
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "_Query":
+        self.operation, self.columns, self.count = "select", columns, count
+        return self
+
+    def insert(self, values) -> "_Query":
+        self.operation, self.values = "insert", values
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "_Query":
+        self.operation, self.values = "update", values
+        return self
+
+    def upsert(self, values, on_conflict: str = "id", ignore_duplicates: bool = False) -> "_Query":
+        self.operation, self.values = "upsert", values
+        self.on_conflict, self.ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    def delete(self) -> "_Query":
+        self.operation = "delete"
+        return self
+
+    # Filters
+    def _filter(self, column: str, test: Callable[[Any], bool]) -> "_Query":
+        self.filters.append(lambda row: test(row.get(column)))
+        return self
+
+    def eq(self, column: str, value) -> "_Query":
+        return self._filter(column, lambda actual: _same(actual, value))
+
+    def neq(self, column: str, value) -> "_Query":
+        return self._filter(column, lambda actual: not _same(actual, value))
+
+    def gt(self, column: str, value) -> "_Query":
+        return self._filter(column, lambda actual: actual is not None and actual > value)
+
+    def gte(self, column: str, value) -> "_Query":
+        return self._filter(column, lambda actual: actual is not None and actual >= value)
+
+    def lt(self, column: str, value) -> "_Query":
+        return self._filter(column, lambda actual: actual is not None and actual < value)
+
+    def lte(self, column: str, value) -> "_Query":
+        return self._filter(column, lambda actual: actual is not None and actual <= value)
+
+    def in_(self, column: str, values: Iterable) -> "_Query":
+        values = list(values)
+        return self._filter(column, lambda actual: any(_same(actual, value) for value in values))
+
+    # Modifiers
+    def order(self, column: str, desc: bool = False) -> "_Query":
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "_Query":
+        self.max_rows = count
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        self.offset, self.max_rows = start, end - start + 1
+        return self
+
+    def execute(self) -> StandInResult:
+        return self.standin._execute(self)
+
+    def matches(self, row: Dict[str, Any]) -> bool:
+        return all(test(row) for test in self.filters)
+
+
+def _same(actual, value) -> bool:
+    """PostgREST compares filter values as text, so 1 matches "1" """
+    return actual == value or (actual is not None and str(actual) == str(value))
+
+
+class SupabaseStandIn:
+    """Thread-safe in-memory tables behind a supabase-py-like interface"""
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None, latency: float = 0.0,
+                 functions: Optional[Dict[str, Callable[[Dict[str, Any]], List[Dict[str, Any]]]]] = None,
+                 max_rows: Optional[int] = None):
+        """
+        Initialize the stand-in
+
+        Args:
+            tables: Initial rows per table (rows without an id get one)
+            latency: Seconds each `execute()` blocks, emulating a database round trip
+            functions: Handlers for `rpc(name, params)`, returning rows (unknown functions return [])
+            max_rows: Rows a select returns at most, like PostgREST's max-rows (None: unlimited)
+        """
+        self.latency = latency
+        self.max_rows = max_rows
+        self.functions = dict(functions or {})
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.calls = 0
+        self._next_id: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        for table, rows in (tables or {}).items():
+            self.tables[table] = []
+            for row in rows:
+                self._insert_row(table, dict(row))
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def from_(self, name: str) -> _Query:
+        return self.table(name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None):
+        standin = self
+
+        class _Call:
+            def execute(self) -> StandInResult:
+                standin._block()
+                handler = standin.functions.get(name)
+                return StandInResult(handler(params or {}) if handler else [])
+
+        return _Call()
+
+    def _block(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _insert_row(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        rows = self.tables.setdefault(table, [])
+        if row.get("id") is None:
+            row["id"] = self._next_id.get(table, 0) + 1
+        self._next_id[table] = max(self._next_id.get(table, 0), int(row["id"]))
+        row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        rows.append(row)
+        return row
+
+    def _bump_version(self, table: str):
+        if table == "table_versions":
+            return
+        versions = self.tables.setdefault("table_versions", [])
+        for row in versions:
+            if row["table_name"] == table:
+                row["version"] += 1
+                return
+        versions.append({"table_name": table, "version": 1})
+
+    def _execute(self, query: _Query) -> StandInResult:
+        self._block()
+        with self._lock:
+            rows = self.tables.setdefault(query.table, [])
+            if query.operation == "select":
+                result = self._select(rows, query)
+                return StandInResult(result, len(result) if query.count else None)
+
+            if query.operation == "insert":
+                values = query.values if isinstance(query.values, list) else [query.values]
+                result = [self._insert_row(query.table, dict(value)) for value in values]
+            elif query.operation == "upsert":
+                result = self._upsert(query)
+            elif query.operation == "update":
+                result = []
+                for row in rows:
+                    if query.matches(row):
+                        row.update(query.values)
+                        result.append(row)
+            else:
+                result = [row for row in rows if query.matches(row)]
+                self.tables[query.table] = [row for row in rows if not query.matches(row)]
+            if result:
+                self._bump_version(query.table)
+            return StandInResult(copy.deepcopy(result))
+
+    def _select(self, rows: List[Dict[str, Any]], query: _Query) -> List[Dict[str, Any]]:
+        result = [row for row in rows if query.matches(row)]
+        for column, desc in reversed(query.ordering):
+            result.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        limits = [limit for limit in (query.max_rows, self.max_rows) if limit is not None]
+        end = query.offset + min(limits) if limits else None
+        result = result[query.offset:end]
+        # Embedded resources ("*, auctions(*)") are not joined; plain column lists are projected
+        columns = [column.strip() for column in query.columns.split(",")]
+        if "*" in columns or any("(" in column for column in columns):
+            return copy.deepcopy(result)
+        return [{column: copy.deepcopy(row.get(column)) for column in columns} for row in result]
+
+    def _upsert(self, query: _Query) -> List[Dict[str, Any]]:
+        keys = [key.strip() for key in query.on_conflict.split(",")]
+        values = query.values if isinstance(query.values, list) else [query.values]
+        result = []
+        for value in values:
+            existing = next((row for row in self.tables[query.table]
+                             if all(_same(row.get(key), value.get(key)) for key in keys)), None)
+            if existing is None:
+                result.append(self._insert_row(query.table, dict(value)))
+            elif not query.ignore_duplicates:
+                existing.update(value)
+                result.append(existing)
+        return result
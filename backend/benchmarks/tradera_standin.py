@@ -0,0 +1,112 @@
+"""
+Local Tradera Stand-in
+
+A minimal HTTP server that answers Tradera SOAP requests with canned
+responses. It is used by the benchmarks and tests to exercise the real
+network path of TraderaAPI without talking to api.tradera.com.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+BUY_RESPONSE = """<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"
+               xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+               xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+  <soap:Body>
+    <BuyResponse xmlns="http://api.tradera.com">
+      <BuyResult>
+        <NextBid>600</NextBid>
+        <Status>Bought</Status>
+      </BuyResult>
+    </BuyResponse>
+  </soap:Body>
+</soap:Envelope>
+"""
+
+# Canned responses keyed by SOAPAction
+RESPONSES: Dict[str, str] = {
+    "http://api.tradera.com/Buy": BUY_RESPONSE,
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        action = self.headers.get("SOAPAction", "").strip('"')
+        self.server.requests.append((self.path, action, body))
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        payload = self.server.responses.get(action)
+        status = 200 if payload is not None else 500
+        data = (payload or "Unknown SOAPAction").encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TraderaStandIn:
+    """Threaded local server emulating the Tradera SOAP services"""
+
+    def __init__(self, latency: float = 0.0, responses: Optional[Dict[str, str]] = None):
+        """
+        Initialize the stand-in
+
+        Args:
+            latency: Artificial server-side processing time per request in seconds
+            responses: Canned response bodies keyed by SOAPAction
+        """
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.responses = dict(RESPONSES, **(responses or {}))
+        self.server.requests = []
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running stand-in"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        """List of (path, SOAPAction, body) tuples received so far"""
+        return self.server.requests
+
+    def start(self) -> "TraderaStandIn":
+        """Start serving in a background thread"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the socket"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def point(self, api):
+        """Point a TraderaAPI client at this stand-in"""
+        api.search_service_url = f"{self.url}/v3/searchservice.asmx"
+        api.buyer_service_url = f"{self.url}/v3/buyerservice.asmx"
+        api.public_service_url = f"{self.url}/v3/publicservice.asmx"
+        return api
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
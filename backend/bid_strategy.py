@@ -0,0 +1,129 @@
+"""
+Bid Strategy Engine
+
+Computes the amount to bid from the auction's state (current price, bid count
+and Tradera's `next_bid` when known), Tradera's bid increment ladder and the
+bid config's `max_bid_amount`. Decisions are pure functions over plain
+values, so the sniper can evaluate them at fire time without extra API calls.
+
+Strategies:
+- max_at_last_second: bid the full maximum once, at the last moment
+  (Tradera bids on our behalf up to that amount)
+- incremental: bid the lowest amount Tradera accepts, as long as it is within the maximum
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_AT_LAST_SECOND = "max_at_last_second"
+INCREMENTAL = "incremental"
+STRATEGIES = (MAX_AT_LAST_SECOND, INCREMENTAL)
+DEFAULT_STRATEGY = MAX_AT_LAST_SECOND
+
+# Minimum bid increments in SEK by current price (lower bound, increment),
+# highest bound first. Update if Tradera changes its ladder.
+INCREMENT_LADDER = (
+    (5000, 100),
+    (1000, 50),
+    (500, 20),
+    (100, 10),
+    (0, 5),
+)
+
+# Decision reasons
+BID = "bid"
+MAX_BELOW_REQUIRED = "max_below_required"
+AUCTION_ENDED = "auction_ended"
+
+
+class BidDecision(NamedTuple):
+    """Amount to bid (None to skip) and why"""
+    amount: Optional[int]
+    reason: str
+
+
+def increment_for(price: float) -> int:
+    """Minimum raise over `price` according to the increment ladder"""
+    for lower_bound, increment in INCREMENT_LADDER:
+        if price >= lower_bound:
+            return increment
+    return INCREMENT_LADDER[-1][1]
+
+
+def required_bid(current_price: float, bid_count: int = 0, next_bid: Optional[float] = None) -> int:
+    """
+    Lowest bid Tradera will accept, in whole kronor
+
+    Tradera's own `next_bid` is used when known; otherwise the opening price
+    for an auction without bids, or the current price plus one increment.
+    """
+    if next_bid:
+        return math.ceil(next_bid)
+    if not bid_count:
+        return math.ceil(current_price)
+    return math.ceil(current_price + increment_for(current_price))
+
+
+def decide(strategy: str, max_bid_amount: float, current_price: float, bid_count: int = 0,
+           next_bid: Optional[float] = None) -> BidDecision:
+    """
+    Decide what to bid
+
+    Args:
+        strategy: One of STRATEGIES
+        max_bid_amount: Most the user is willing to pay
+        current_price: Current price of the auction
+        bid_count: Number of bids so far
+        next_bid: Tradera's next acceptable bid, if known
+
+    Returns:
+        BidDecision
+
+    Raises:
+        ValueError: If the strategy is unknown
+    """
+    required = required_bid(current_price, bid_count, next_bid)
+    maximum = math.floor(max_bid_amount)
+    if maximum < required:
+        return BidDecision(None, MAX_BELOW_REQUIRED)
+    if strategy == MAX_AT_LAST_SECOND:
+        return BidDecision(maximum, BID)
+    if strategy == INCREMENTAL:
+        return BidDecision(required, BID)
+    raise ValueError(f"Unknown bid strategy: {strategy}")
+
+
+def decide_for(bid_config: Dict[str, Any], auction: Dict[str, Any]) -> BidDecision:
+    """Decide for a bid_configs row and its auction row"""
+    if auction.get("status", "active") != "active":
+        return BidDecision(None, AUCTION_ENDED)
+    return decide(
+        bid_config.get("strategy") or DEFAULT_STRATEGY,
+        float(bid_config["max_bid_amount"]),
+        float(auction.get("current_price") or 0),
+        int(auction.get("bid_count") or 0),
+        auction.get("next_bid"),
+    )
+
+
+def decide_batch(bid_configs: Iterable[Dict[str, Any]],
+                 auctions: Dict[Any, Dict[str, Any]]) -> List[Tuple[Dict[str, Any], BidDecision]]:
+    """
+    Decide for many bid configs at once
+
+    Args:
+        bid_configs: bid_configs rows
+        auctions: Auction rows by ID
+
+    Returns:
+        (bid config, decision) pairs for configs whose auction is known
+    """
+    decisions = []
+    for bid_config in bid_configs:
+        auction = auctions.get(bid_config["auction_id"])
+        if auction is not None:
+            decisions.append((bid_config, decide_for(bid_config, auction)))
+    return decisions
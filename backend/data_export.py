@@ -0,0 +1,188 @@
+"""
+Streaming Export and Bulk Import
+
+Exports read a table in fixed-size chunks using keyset pagination on `id`
+(`id > last_id ORDER BY id LIMIT n`), which PostgREST serves from an index
+just like a server-side cursor, and serialize each chunk as NDJSON or CSV
+as it arrives. Imports parse NDJSON or CSV incrementally and write in
+batches. Memory use is bounded by the chunk/batch size, not the table size.
+
+CSV cells are text, so imported CSV values are converted back by the column
+types in COLUMN_TYPES. Imported rows keep their IDs; afterwards the table's
+ID sequence is moved past them (`sync_id_sequence`).
+"""
+
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Exportable tables and the timestamp columns their time range filters may use
+EXPORT_TABLES = {
+    "auctions": ("created_at", "updated_at", "end_time"),
+    "bids": ("created_at",),
+}
+
+# Non-text columns of the exportable tables, for reading CSV cells back
+COLUMN_TYPES: Dict[str, Dict[str, str]] = {
+    "auctions": {"id": "integer", "current_price": "numeric", "seller_rating": "numeric", "bid_count": "integer",
+                 "next_bid": "numeric", "script_id": "integer"},
+    "bids": {"id": "integer", "auction_id": "integer", "amount": "numeric", "bid_config_id": "integer"},
+}
+
+CHUNK_SIZE = 1000
+BATCH_SIZE = 500
+
+
+def iter_rows(supabase, table: str, since: Optional[str] = None, until: Optional[str] = None,
+              time_field: str = "created_at", chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Read a table in chunks ordered by ID
+
+    Args:
+        supabase: Supabase client
+        table: Table name (see EXPORT_TABLES)
+        since: Only rows with `time_field` >= this ISO timestamp
+        until: Only rows with `time_field` < this ISO timestamp
+        time_field: Timestamp column the range applies to
+        chunk_size: Rows per database read
+
+    Yields:
+        Rows
+    """
+    last_id = None
+    while True:
+        query = supabase.table(table).select("*")
+        if since:
+            query = query.gte(time_field, since)
+        if until:
+            query = query.lt(time_field, until)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.order("id").limit(chunk_size).execute().data or []
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def iter_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Serialize rows as newline-delimited JSON"""
+    for row in rows:
+        yield (json.dumps(row, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """
+    Serialize rows as CSV
+
+    Columns are taken from the first row; nested values are written as JSON.
+    """
+    buffer = io.StringIO()
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row), extrasaction="ignore")
+            writer.writeheader()
+        writer.writerow({
+            key: json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+            for key, value in row.items()
+        })
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def parse_ndjson_lines(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse NDJSON lines, skipping blank ones
+
+    Raises:
+        ValueError: On a line that is not a JSON object
+    """
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError(f"Line {number} is not a JSON object")
+        yield row
+
+
+def _convert(value: str, column_type: Optional[str]) -> Any:
+    if column_type == "integer":
+        return int(value)
+    if column_type == "numeric":
+        return float(value)
+    if column_type == "json":
+        return json.loads(value)
+    return value
+
+
+def parse_csv_lines(lines: Iterable[str], column_types: Optional[Dict[str, str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Parse CSV lines with a header row; empty cells become NULL
+
+    Args:
+        lines: CSV lines
+        column_types: Type of each non-text column (`integer`, `numeric` or `json`, see COLUMN_TYPES)
+
+    Raises:
+        ValueError: On a cell that does not match its column type
+    """
+    column_types = column_types or {}
+    for number, row in enumerate(csv.DictReader(lines), start=2):
+        try:
+            yield {key: (_convert(value, column_types.get(key)) if value != "" else None) for key, value in row.items()}
+        except ValueError as e:
+            raise ValueError(f"Line {number}: {e}")
+
+
+class BatchImporter:
+    """Collects rows and upserts them in batches"""
+
+    def __init__(self, supabase, table: str, batch_size: int = BATCH_SIZE,
+                 on_flush: Optional[Callable[[List[Dict[str, Any]]], None]] = None):
+        """
+        Initialize the importer
+
+        Args:
+            supabase: Supabase client
+            table: Table name (see EXPORT_TABLES)
+            batch_size: Rows per write
+            on_flush: Called with the stored rows after each batch (e.g. to update in-memory indexes)
+        """
+        self.supabase = supabase
+        self.table = table
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.batch: List[Dict[str, Any]] = []
+        self.imported = 0
+        self.batches = 0
+
+    def add(self, row: Dict[str, Any]):
+        """Queue a row, writing the batch when it is full"""
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the queued rows (rows with an existing ID are updated, so re-imports are safe)"""
+        if not self.batch:
+            return
+        result = self.supabase.table(self.table).upsert(self.batch, on_conflict="id").execute()
+        self.imported += len(self.batch)
+        self.batches += 1
+        self.batch = []
+        if self.on_flush is not None:
+            self.on_flush(result.data or [])
+
+    def finish(self):
+        """Write the remaining rows and move the table's ID sequence past the imported IDs"""
+        self.flush()
+        if self.imported:
+            self.supabase.rpc("sync_id_sequence", {"p_table": self.table}).execute()
@@ -1,130 +1,104 @@
-from supabase import create_client
+import asyncio
 import os
-from dotenv import load_dotenv
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Any, Callable, Dict, List, Optional
 import json
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from auction_index import auction_index
+from user_stats import UserStatsAggregator
+from profiling import instrument_httpx
 
-# Load environment variables
-load_dotenv()
-
-# Initialize Supabase client
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_ANON_KEY")
-supabase = create_client(supabase_url, supabase_key)
+# The Supabase client is created on first use: importing supabase (and httpx)
+# dominates import time, and the app should start without credentials for
+# routes that don't need the database
+_supabase = None
+_supabase_lock = threading.Lock()
 
 # Function to get Supabase client
 def get_supabase_client():
-    """Return the initialized Supabase client"""
-    return supabase
+    """
+    Return the Supabase client, creating it on first use
+
+    Raises:
+        RuntimeError: If SUPABASE_URL or SUPABASE_ANON_KEY is not set
+    """
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                supabase_url = os.getenv("SUPABASE_URL")
+                supabase_key = os.getenv("SUPABASE_ANON_KEY")
+                if not supabase_url or not supabase_key:
+                    raise RuntimeError("SUPABASE_URL and SUPABASE_ANON_KEY must be set")
+                from supabase import create_client
+                client = create_client(supabase_url, supabase_key)
+                # Every PostgREST call becomes a span of profiled requests
+                instrument_httpx(client.postgrest.session, prefix="db")
+                _supabase = client
+    return _supabase
+
+# PostgREST caps every response at its max-rows setting (1000 on Supabase)
+SELECT_PAGE_SIZE = 1000
+
+def select_all(build_query: Callable[[], Any], page_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Run a select page by page, so large tables are not silently cut off at max-rows
+
+    Args:
+        build_query: Returns a new select query with a stable order (a query can't be reused between pages)
+        page_size: Rows requested per page, at most PostgREST's max-rows (default SELECT_PAGE_SIZE)
+
+    Returns:
+        All matching rows
+    """
+    page_size = page_size or SELECT_PAGE_SIZE
+    rows = []
+    while True:
+        page = build_query().range(len(rows), len(rows) + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+
+# SQLSTATE classes of errors caused by the rows written rather than the deployment:
+# data exceptions (22) and integrity violations such as a foreign key to a deleted
+# row (23). Anything else (permissions, a missing table or column, PostgREST
+# errors, the connection) is fixed outside the rows, so they stay queued
+PERMANENT_ERROR_PREFIXES = ("22", "23")
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Whether a failed write was rejected for its rows, so writing the same rows again can't succeed"""
+    code = str(getattr(error, "code", None) or "")
+    return code.startswith(PERMANENT_ERROR_PREFIXES)
+
+
+# Incrementally maintained per-user statistics, persisted in user_statistics
+user_stats = UserStatsAggregator(get_client=get_supabase_client)
 
 # Database helper functions
 async def create_tables():
     """
-    Create the necessary tables in Supabase if they don't exist.
-    This function is used for initial setup and should be run once.
-    """
-    # Define SQL for creating tables
-    create_tables_sql = """
-    -- Users table (linked to Clerk)
-    CREATE TABLE IF NOT EXISTS users (
-        id SERIAL PRIMARY KEY,
-        clerk_user_id TEXT UNIQUE NOT NULL,
-        email TEXT,
-        name TEXT,
-        preferences JSONB DEFAULT '{}'::jsonb,
-        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-    );
-
-    -- Search scripts table
-    CREATE TABLE IF NOT EXISTS search_scripts (
-        id SERIAL PRIMARY KEY,
-        name TEXT NOT NULL,
-        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-        search_parameters JSONB NOT NULL,
-        is_active BOOLEAN DEFAULT TRUE,
-        schedule TEXT NOT NULL, -- cron format
-        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-        last_run_at TIMESTAMP WITH TIME ZONE
-    );
-
-    -- Auctions table
-    CREATE TABLE IF NOT EXISTS auctions (
-        id SERIAL PRIMARY KEY,
-        tradera_id TEXT UNIQUE NOT NULL,
-        title TEXT NOT NULL,
-        description TEXT,
-        category_id INTEGER,
-        seller_id TEXT,
-        seller_name TEXT,
-        current_price DECIMAL(10, 2) NOT NULL,
-        buy_now_price DECIMAL(10, 2),
-        shipping_cost DECIMAL(10, 2),
-        image_urls JSONB DEFAULT '[]'::jsonb,
-        start_time TIMESTAMP WITH TIME ZONE NOT NULL,
-        end_time TIMESTAMP WITH TIME ZONE NOT NULL,
-        url TEXT NOT NULL,
-        bid_count INTEGER DEFAULT 0,
-        status TEXT DEFAULT 'active',
-        script_id INTEGER REFERENCES search_scripts(id) ON DELETE SET NULL,
-        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-    );
-
-    -- Bid configurations table
-    CREATE TABLE IF NOT EXISTS bid_configs (
-        id SERIAL PRIMARY KEY,
-        auction_id INTEGER REFERENCES auctions(id) ON DELETE CASCADE,
-        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-        max_bid_amount DECIMAL(10, 2) NOT NULL,
-        bid_seconds_before_end INTEGER DEFAULT 5,
-        is_active BOOLEAN DEFAULT TRUE,
-        status TEXT DEFAULT 'pending',
-        error_message TEXT,
-        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-    );
-
-    -- Bids table
-    CREATE TABLE IF NOT EXISTS bids (
-        id SERIAL PRIMARY KEY,
-        auction_id INTEGER REFERENCES auctions(id) ON DELETE CASCADE,
-        bid_config_id INTEGER REFERENCES bid_configs(id) ON DELETE CASCADE,
-        amount DECIMAL(10, 2) NOT NULL,
-        status TEXT DEFAULT 'scheduled',
-        placed_at TIMESTAMP WITH TIME ZONE,
-        response_status TEXT,
-        response_message TEXT,
-        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-    );
-
-    -- Create indexes for performance
-    CREATE INDEX IF NOT EXISTS idx_auctions_end_time ON auctions(end_time);
-    CREATE INDEX IF NOT EXISTS idx_auctions_status ON auctions(status);
-    CREATE INDEX IF NOT EXISTS idx_search_scripts_user_id ON search_scripts(user_id);
-    CREATE INDEX IF NOT EXISTS idx_bid_configs_auction_id ON bid_configs(auction_id);
-    CREATE INDEX IF NOT EXISTS idx_bids_auction_id ON bids(auction_id);
+    Create or upgrade the schema by applying pending migrations (see migrate.py).
+    Equivalent to running setup_db.py.
     """
-    
-    # Execute the SQL
+    from migrate import get_target, migrate
+    target = None
     try:
-        # Note: In a real implementation, we would use a migration tool
-        # or execute this directly in the Supabase SQL editor
-        # For this example, we'll just print the SQL that would be executed
-        print("SQL for creating tables would be executed here:")
-        print(create_tables_sql)
-        return {"status": "success", "message": "Tables would be created"}
+        target = get_target()
+        applied = await asyncio.to_thread(migrate, target)
+        return {"status": "success", "message": f"Applied {len(applied)} migrations",
+                "applied": [migration.version for migration in applied]}
     except Exception as e:
         print(f"Error creating tables: {str(e)}")
         return {"status": "error", "message": str(e)}
+    finally:
+        if target is not None:
+            target.close()
 
 # User functions
 async def get_or_create_user(clerk_user_id: str, email: str, name: str) -> Dict[str, Any]:
     """Get a user by Clerk ID or create if not exists"""
-    user = supabase.table("users").select("*").eq("clerk_user_id", clerk_user_id).execute()
+    user = get_supabase_client().table("users").select("*").eq("clerk_user_id", clerk_user_id).execute()
     
     if user.data and len(user.data) > 0:
         return user.data[0]
@@ -136,7 +110,7 @@ async def get_or_create_user(clerk_user_id: str, email: str, name: str) -> Dict[
         "name": name
     }
     
-    result = supabase.table("users").insert(new_user).execute()
+    result = get_supabase_client().table("users").insert(new_user).execute()
     if result.data and len(result.data) > 0:
         return result.data[0]
     
@@ -153,7 +127,7 @@ async def create_search_script(user_id: int, name: str, search_parameters: Dict,
         "is_active": True
     }
     
-    result = supabase.table("search_scripts").insert(script).execute()
+    result = get_supabase_client().table("search_scripts").insert(script).execute()
     if result.data and len(result.data) > 0:
         return result.data[0]
     
@@ -161,7 +135,7 @@ async def create_search_script(user_id: int, name: str, search_parameters: Dict,
 
 async def get_search_scripts(user_id: int) -> List[Dict[str, Any]]:
     """Get all search scripts for a user"""
-    result = supabase.table("search_scripts").select("*").eq("user_id", user_id).execute()
+    result = get_supabase_client().table("search_scripts").select("*").eq("user_id", user_id).execute()
     return result.data if result.data else []
 
 async def update_search_script(script_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -171,7 +145,7 @@ async def update_search_script(script_id: int, data: Dict[str, Any]) -> Dict[str
     
     data["updated_at"] = datetime.now().isoformat()
     
-    result = supabase.table("search_scripts").update(data).eq("id", script_id).execute()
+    result = get_supabase_client().table("search_scripts").update(data).eq("id", script_id).execute()
     if result.data and len(result.data) > 0:
         return result.data[0]
     
@@ -183,7 +157,7 @@ async def create_auction(auction_data: Dict[str, Any]) -> Dict[str, Any]:
     if "image_urls" in auction_data and not isinstance(auction_data["image_urls"], str):
         auction_data["image_urls"] = json.dumps(auction_data["image_urls"])
     
-    result = supabase.table("auctions").insert(auction_data).execute()
+    result = get_supabase_client().table("auctions").insert(auction_data).execute()
     if result.data and len(result.data) > 0:
         return result.data[0]
     
@@ -191,7 +165,11 @@ async def create_auction(auction_data: Dict[str, Any]) -> Dict[str, Any]:
 
 async def get_auctions(filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
     """Get auctions with optional filters"""
-    query = supabase.table("auctions").select("*")
+    # Queries for status "active" are served from the in-memory index once it is warm
+    if filters and auction_index.loaded and auction_index.supports(filters):
+        return auction_index.query(filters)
+    
+    query = get_supabase_client().table("auctions").select("*")
     
     if filters:
         for key, value in filters.items():
@@ -210,7 +188,7 @@ async def get_auctions(filters: Optional[Dict[str, Any]] = None) -> List[Dict[st
 # Bid configuration functions
 async def create_bid_config(bid_config_data: Dict[str, Any]) -> Dict[str, Any]:
     """Create a new bid configuration"""
-    result = supabase.table("bid_configs").insert(bid_config_data).execute()
+    result = get_supabase_client().table("bid_configs").insert(bid_config_data).execute()
     if result.data and len(result.data) > 0:
         return result.data[0]
     
@@ -218,13 +196,59 @@ async def create_bid_config(bid_config_data: Dict[str, Any]) -> Dict[str, Any]:
 
 async def get_bid_configs(user_id: int) -> List[Dict[str, Any]]:
     """Get all bid configurations for a user"""
-    result = supabase.table("bid_configs").select("*, auctions(*)").eq("user_id", user_id).execute()
+    result = get_supabase_client().table("bid_configs").select("*, auctions(*)").eq("user_id", user_id).execute()
     return result.data if result.data else []
 
+# Scheduler and sniper lookups (SQL functions from migration 0003, each an index-only scan)
+SCHEDULE_INTERVALS = {
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+
+def next_run_time(schedule: Optional[str], after: datetime) -> datetime:
+    """When a script with `schedule` is next due after a run at `after` (unknown schedules run hourly)"""
+    return after + SCHEDULE_INTERVALS.get((schedule or "hourly").lower(), SCHEDULE_INTERVALS["hourly"])
+
+async def get_bid_configs_ending_within(minutes: int = 10) -> List[Dict[str, Any]]:
+    """
+    Active bid configs whose auction ends within the next `minutes`, soonest first
+
+    Returns:
+        Rows with bid_config_id, auction_id, end_time and bid_seconds_before_end
+    """
+    result = get_supabase_client().rpc("bid_configs_ending_within", {"window_minutes": minutes}).execute()
+    return result.data if result.data else []
+
+async def get_due_scripts(limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    Active search scripts due to run now, most overdue first
+
+    Returns:
+        Rows with script_id and next_run_at
+    """
+    result = get_supabase_client().rpc("due_search_scripts", {"max_scripts": limit}).execute()
+    return result.data if result.data else []
+
+async def mark_script_run(script_id: int, schedule: Optional[str], run_at: Optional[datetime] = None) -> datetime:
+    """
+    Record that a script ran and when it is next due
+
+    Returns:
+        The script's next run time
+    """
+    run_at = run_at or datetime.now(timezone.utc)
+    next_run_at = next_run_time(schedule, run_at)
+    get_supabase_client().table("search_scripts").update({
+        "last_run_at": run_at.isoformat(),
+        "next_run_at": next_run_at.isoformat(),
+    }).eq("id", script_id).execute()
+    return next_run_at
+
 # Bid functions
 async def create_bid(bid_data: Dict[str, Any]) -> Dict[str, Any]:
     """Create a new bid record"""
-    result = supabase.table("bids").insert(bid_data).execute()
+    result = get_supabase_client().table("bids").insert(bid_data).execute()
     if result.data and len(result.data) > 0:
         return result.data[0]
     
@@ -232,18 +256,10 @@ async def create_bid(bid_data: Dict[str, Any]) -> Dict[str, Any]:
 
 async def get_bids(auction_id: int) -> List[Dict[str, Any]]:
     """Get all bids for an auction"""
-    result = supabase.table("bids").select("*").eq("auction_id", auction_id).execute()
+    result = get_supabase_client().table("bids").select("*").eq("auction_id", auction_id).execute()
     return result.data if result.data else []
 
 # Statistics functions
 async def get_user_statistics(user_id: int) -> Dict[str, Any]:
-    """Get statistics for a user"""
-    # This would be a more complex query in a real implementation
-    # For now, we'll return a placeholder
-    return {
-        "total_auctions_found": 0,
-        "auctions_with_bids": 0,
-        "auctions_won": 0,
-        "auctions_lost": 0,
-        "total_spent": 0
-    }
+    """Get statistics for a user from the precomputed aggregates"""
+    return user_stats.get(user_id)
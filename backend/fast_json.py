@@ -0,0 +1,96 @@
+"""
+Fast JSON Responses
+
+An opt-in response path for large list endpoints, enabled with
+FAST_JSON_RESPONSES=true:
+- Rows read from our own database are trusted and returned without
+  `response_model` validation
+- Serialization uses orjson when it is installed (falls back to the standard
+  `json` module)
+- Lists longer than FAST_JSON_STREAM_THRESHOLD rows are streamed in chunks
+  instead of being rendered into a single body
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+from fastapi import Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from http_cache import set_cache_headers
+from profiling import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+FAST_JSON_ENABLED = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+STREAM_THRESHOLD = int(os.getenv("FAST_JSON_STREAM_THRESHOLD", "5000"))
+CHUNK_SIZE = 500
+
+
+def fast_responses_enabled() -> bool:
+    """Whether list endpoints should use the fast response path"""
+    return FAST_JSON_ENABLED
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize a value to compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps` (orjson when available)"""
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return dumps(content)
+
+
+def iter_json_array(rows: List[Dict[str, Any]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Serialize a list as a JSON array, one chunk of rows at a time
+
+    Args:
+        rows: Rows to serialize
+        chunk_size: Rows per yielded chunk
+
+    Yields:
+        Pieces of the JSON document
+    """
+    yield b"["
+    for start in range(0, len(rows), chunk_size):
+        chunk = dumps(rows[start:start + chunk_size])
+        # Strip the chunk's own brackets and join it to the previous one
+        yield (b"," if start else b"") + chunk[1:-1]
+    yield b"]"
+
+
+def list_response(rows: List[Dict[str, Any]], etag: Optional[str] = None,
+                  stream_threshold: Optional[int] = None) -> Response:
+    """
+    Build a response for a list of trusted rows, skipping model validation
+
+    Args:
+        rows: Rows as returned by the database
+        etag: ETag to attach (see http_cache)
+        stream_threshold: Lists longer than this are streamed (default STREAM_THRESHOLD)
+
+    Returns:
+        FastJSONResponse, or a StreamingResponse for very large lists
+    """
+    if stream_threshold is None:
+        stream_threshold = STREAM_THRESHOLD
+    if len(rows) > stream_threshold:
+        response = StreamingResponse(iter_json_array(rows), media_type="application/json")
+    else:
+        response = FastJSONResponse(rows)
+    set_cache_headers(response, etag)
+    return response
@@ -0,0 +1,149 @@
+"""
+HTTP Caching and Compression
+
+- Strong ETags for list endpoints, derived from a per-table version counter
+  kept in the `table_versions` table (bumped by triggers on every write), so a
+  conditional GET can be answered with 304 after a single-row lookup, without
+  querying or serializing the list itself.
+- Response compression: brotli when the client accepts it and the `brotli`
+  package is installed, gzip otherwise.
+"""
+
+from typing import Optional
+import logging
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def get_table_version(table: str) -> Optional[int]:
+    """
+    Get the write version of a table
+
+    Returns:
+        Version counter, or None if versions are unavailable (e.g. schema not migrated)
+    """
+    from db import get_supabase_client
+    try:
+        response = get_supabase_client().table("table_versions").select("version").eq("table_name", table).execute()
+        return int(response.data[0]["version"]) if response.data else 0
+    except Exception as e:
+        logger.warning(f"Could not read version of {table}: {e}")
+        return None
+
+
+def table_etag(table: str) -> Optional[str]:
+    """Strong ETag for the current contents of a table, or None if unknown"""
+    version = get_table_version(table)
+    if version is None:
+        return None
+    return f'"{table}-v{version}"'
+
+
+def is_not_modified(request: Request, etag: Optional[str]) -> bool:
+    """Whether the request's If-None-Match matches `etag`"""
+    if etag is None:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def not_modified_response(etag: str) -> Response:
+    """An empty 304 response"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_cache_headers(response: Response, etag: Optional[str]):
+    """Attach the ETag and revalidation headers to a response"""
+    if etag is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip depending on Accept-Encoding"""
+
+    def __init__(self, app, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 4):
+        """
+        Initialize the middleware
+
+        Args:
+            app: ASGI application
+            minimum_size: Responses smaller than this are sent uncompressed
+            gzip_level: gzip compression level
+            brotli_quality: brotli quality (0-11; 4 is a good speed/size trade-off for JSON)
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.brotli_quality = brotli_quality
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and brotli is not None:
+            accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+            if "br" in accept_encoding:
+                await _BrotliResponder(self.app, self.minimum_size, self.brotli_quality)(scope, receive, send)
+                return
+        await self.gzip(scope, receive, send)
+
+
+class _BrotliResponder:
+    """Buffers a complete response and sends it brotli-compressed; streams pass through"""
+
+    def __init__(self, app, minimum_size: int, quality: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.quality = quality
+        self.start_message = None
+        self.body = []
+        self.passthrough = False
+
+    async def __call__(self, scope, receive, send):
+        async def wrapped_send(message):
+            if message["type"] == "http.response.start":
+                self.start_message = message
+                headers = Headers(raw=message["headers"])
+                self.passthrough = "content-encoding" in headers
+                if self.passthrough:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or self.passthrough:
+                await send(message)
+                return
+
+            if message.get("more_body", False) and not self.body:
+                # Streaming response: don't buffer it
+                self.passthrough = True
+                await send(self.start_message)
+                await send(message)
+                return
+
+            self.body.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(self.body)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if len(body) >= self.minimum_size:
+                body = brotli.compress(body, quality=self.quality)
+                headers["Content-Encoding"] = "br"
+                headers.add_vary_header("Accept-Encoding")
+            headers["Content-Length"] = str(len(body))
+            await send(self.start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, wrapped_send)
@@ -0,0 +1,282 @@
+"""
+Image Proxy Cache
+
+Search results carry Tradera thumbnail and image URLs, and the dashboard
+used to hotlink every one of them. With IMAGE_PROXY_ENABLED=true,
+GET /api/images?url=... serves them from an on-disk cache instead:
+- Content-addressed: image bytes are stored once under their SHA-256
+  (`blobs/ab/abcd...`), however many URLs point at them. Each URL maps to
+  its blob through a small pointer file (`urls/<sha256 of url>.json`), which
+  also records the content type
+- Bounded by bytes: when the blobs exceed IMAGE_CACHE_MAX_BYTES, the least
+  recently served are deleted. Recency is kept in file modification times,
+  so it survives restarts. A pointer whose blob was evicted counts as a miss
+- Served as files (FileResponse, which streams from disk without loading the
+  image) with `Cache-Control: immutable` and the content hash as ETag
+
+Only http(s) URLs on IMAGE_PROXY_ALLOWED_HOSTS (Tradera's image hosts by
+default) are fetched, redirects only to other allowed URLs, and only image/*
+responses up to IMAGE_PROXY_MAX_BYTES are stored, so the proxy cannot be used
+to reach arbitrary servers. SVG is refused: it can carry scripts that would run
+on the API's origin.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALLOWED_HOSTS = "tradera.net,tradera.com"
+MAX_REDIRECTS = 3
+# Image types that can run scripts when opened directly
+REFUSED_CONTENT_TYPES = ("image/svg+xml",)
+
+
+class ImageProxyError(Exception):
+    """An image could not be fetched or stored (status_code: HTTP status to answer with)"""
+
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def image_proxy_enabled() -> bool:
+    """Whether GET /api/images is served (IMAGE_PROXY_ENABLED)"""
+    return os.getenv("IMAGE_PROXY_ENABLED", "false").lower() == "true"
+
+
+class CachedImage:
+    """A cached image file"""
+
+    __slots__ = ("path", "digest", "content_type", "size")
+
+    def __init__(self, path: str, digest: str, content_type: str, size: int):
+        self.path = path
+        self.digest = digest
+        self.content_type = content_type
+        self.size = size
+
+
+class ImageCache:
+    """On-disk, content-addressed LRU cache of proxied images"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None,
+                 max_image_bytes: Optional[int] = None, allowed_hosts: Optional[str] = None,
+                 fetch: Optional[Callable[[str], Tuple[bytes, str]]] = None, timeout: float = 10.0):
+        """
+        Initialize the cache (unset arguments are read from the environment)
+
+        Args:
+            directory: Cache directory (IMAGE_CACHE_DIR, default image_cache)
+            max_bytes: Total size of cached images (IMAGE_CACHE_MAX_BYTES, default 256 MiB)
+            max_image_bytes: Largest image fetched (IMAGE_PROXY_MAX_BYTES, default 10 MiB)
+            allowed_hosts: Comma-separated hosts that may be fetched, subdomains included
+                (IMAGE_PROXY_ALLOWED_HOSTS, default tradera.net,tradera.com)
+            fetch: Called with a URL, returns (bytes, content type) (default: HTTP GET)
+            timeout: Seconds allowed for fetching an image
+        """
+        self.directory = directory or os.getenv("IMAGE_CACHE_DIR", "image_cache")
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.max_image_bytes = (max_image_bytes if max_image_bytes is not None
+                                else int(os.getenv("IMAGE_PROXY_MAX_BYTES", str(10 * 1024 * 1024))))
+        hosts = allowed_hosts if allowed_hosts is not None else os.getenv("IMAGE_PROXY_ALLOWED_HOSTS", DEFAULT_ALLOWED_HOSTS)
+        self.allowed_hosts = tuple(host.strip().lower() for host in hosts.split(",") if host.strip())
+        self.fetch = fetch or self._http_fetch
+        self.timeout = timeout
+        self._blobs: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loaded = False
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Layout
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest)
+
+    def _pointer_path(self, url: str) -> str:
+        return os.path.join(self.directory, "urls", hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _ensure_loaded(self):
+        """Rebuild the LRU order from the blobs on disk, least recently served first"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            blobs = []
+            for root, _, files in os.walk(os.path.join(self.directory, "blobs")):
+                for name in files:
+                    if name.startswith("."):
+                        continue
+                    stat = os.stat(os.path.join(root, name))
+                    blobs.append((stat.st_mtime, name, stat.st_size))
+            for _, digest, size in sorted(blobs):
+                self._blobs[digest] = size
+                self.total_bytes += size
+            self._loaded = True
+
+    def check_url(self, url: str):
+        """
+        Raises:
+            ImageProxyError: (400) If the URL is not an http(s) URL on an allowed host
+        """
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if parts.scheme not in ("http", "https") or not host:
+            raise ImageProxyError("Only http(s) image URLs can be proxied", status_code=400)
+        if not any(host == allowed or host.endswith("." + allowed) for allowed in self.allowed_hosts):
+            raise ImageProxyError(f"Images from {host} are not proxied", status_code=400)
+
+    def lookup(self, url: str) -> Optional[CachedImage]:
+        """The cached image for a URL, marking it recently used, or None"""
+        self._ensure_loaded()
+        try:
+            with open(self._pointer_path(url), encoding="utf-8") as f:
+                pointer = json.load(f)
+        except (OSError, ValueError):
+            return None
+        digest = pointer.get("sha256", "")
+        path = self._blob_path(digest)
+        with self._lock:
+            if digest not in self._blobs:
+                return None
+            self._blobs.move_to_end(digest)
+            size = self._blobs[digest]
+        try:
+            os.utime(path)
+        except OSError:
+            # Deleted behind our back
+            with self._lock:
+                self.total_bytes -= self._blobs.pop(digest, 0)
+            return None
+        content_type = pointer.get("content_type", "application/octet-stream")
+        if content_type in REFUSED_CONTENT_TYPES:
+            return None
+        return CachedImage(path, digest, content_type, size)
+
+    def store(self, url: str, data: bytes, content_type: str) -> CachedImage:
+        """Store image bytes under their hash, point `url` at them and evict beyond the byte budget"""
+        self._ensure_loaded()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            known = digest in self._blobs
+        if not known:
+            self._write_atomic(path, data)
+        self._write_atomic(self._pointer_path(url),
+                           json.dumps({"url": url, "sha256": digest, "content_type": content_type}).encode("utf-8"))
+        with self._lock:
+            if digest not in self._blobs:
+                self._blobs[digest] = len(data)
+                self.total_bytes += len(data)
+            self._blobs.move_to_end(digest)
+            evicted = self._evict_locked(keep=digest)
+        for old in evicted:
+            try:
+                os.remove(self._blob_path(old))
+            except OSError:
+                pass
+        return CachedImage(path, digest, content_type, len(data))
+
+    def _evict_locked(self, keep: str):
+        evicted = []
+        while self.total_bytes > self.max_bytes and len(self._blobs) > 1:
+            digest, size = next(iter(self._blobs.items()))
+            if digest == keep:
+                break
+            del self._blobs[digest]
+            self.total_bytes -= size
+            self.evictions += 1
+            evicted.append(digest)
+        return evicted
+
+    def _write_atomic(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _http_fetch(self, url: str) -> Tuple[bytes, str]:
+        import requests
+
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                # Each hop is checked against the allowed hosts before it is requested
+                with requests.get(url, timeout=self.timeout, stream=True, allow_redirects=False) as response:
+                    if not response.is_redirect:
+                        return self._read_response(response)
+                    url = urljoin(url, response.headers["Location"])
+                try:
+                    self.check_url(url)
+                except ImageProxyError as e:
+                    raise ImageProxyError(f"Image redirected elsewhere: {e}")
+            raise ImageProxyError("Image fetch failed: too many redirects")
+        except requests.RequestException as e:
+            raise ImageProxyError(f"Image fetch failed: {e}")
+
+    def _read_response(self, response: Any) -> Tuple[bytes, str]:
+        if response.status_code != 200:
+            raise ImageProxyError(f"Image fetch failed: {response.status_code}")
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+        chunks, size = [], 0
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > self.max_image_bytes:
+                raise ImageProxyError("Image too large")
+            chunks.append(chunk)
+        return b"".join(chunks), content_type
+
+    def _fetch_and_store(self, url: str) -> CachedImage:
+        data, content_type = self.fetch(url)
+        if not content_type.startswith("image/"):
+            raise ImageProxyError(f"Not an image: {content_type or 'unknown content type'}")
+        if content_type.lower() in REFUSED_CONTENT_TYPES:
+            raise ImageProxyError(f"Refusing to proxy {content_type}")
+        if len(data) > self.max_image_bytes:
+            raise ImageProxyError("Image too large")
+        return self.store(url, data, content_type)
+
+    async def get(self, url: str) -> CachedImage:
+        """
+        The cached image for a URL, fetching it on a miss (concurrent misses share one fetch)
+
+        Raises:
+            ImageProxyError: If the URL is not allowed or the image cannot be fetched
+        """
+        self.check_url(url)
+        image = await asyncio.to_thread(self.lookup, url)
+        if image is not None:
+            self.hits += 1
+            return image
+        future = self._inflight.get(url)
+        if future is None:
+            self.misses += 1
+            future = asyncio.ensure_future(asyncio.to_thread(self._fetch_and_store, url))
+            self._inflight[url] = future
+            future.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"images": len(self._blobs), "bytes": self.total_bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+# Process-wide cache behind GET /api/images
+image_cache = ImageCache()
@@ -0,0 +1,325 @@
+"""
+Durable Job Queue
+
+A persistent queue for background work (script runs, auction refreshes and
+bid executions) backed by SQLite, so queued work survives restarts.
+
+Features:
+- Priorities (higher runs first) and delayed jobs (`run_at`)
+- Deduplication keys: enqueuing a key that is already queued or running returns the existing job
+- Leasing: workers claim jobs in batches for a limited time; expired leases are handed out again
+- Retries with exponential backoff and jitter, up to `max_attempts`
+- Trace context: the enqueuing span's `traceparent` is stored in the payload,
+  so the worker continues the trace (see tracing.py)
+- Sealed secrets: `seal()` encrypts values such as user tokens before they go
+  into a payload (Fernet, key from JOB_PAYLOAD_KEY or a `<database>.key` file
+  created on first use), so the database never holds them in plain text
+"""
+
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import logging
+
+import tracing
+from profiling import span
+
+logger = logging.getLogger(__name__)
+
+# Job types
+RUN_SCRIPT = "run_script"
+REFRESH_AUCTION = "refresh_auction"
+FIRE_BID = "fire_bid"
+DOWNSAMPLE_HISTORY = "downsample_history"
+
+# Default priorities; bids must never wait behind searches
+DEFAULT_PRIORITIES = {
+    FIRE_BID: 100,
+    REFRESH_AUCTION: 50,
+    RUN_SCRIPT: 10,
+    DOWNSAMPLE_HISTORY: 1,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    priority INTEGER NOT NULL DEFAULT 0,
+    dedup_key TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, priority DESC, run_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedup_key ON jobs(dedup_key)
+    WHERE dedup_key IS NOT NULL AND status IN ('queued', 'leased');
+"""
+
+
+class JobQueue:
+    """SQLite-backed durable job queue"""
+
+    def __init__(self, path: Optional[str] = None,
+                 backoff_base: float = 2.0, backoff_max: float = 300.0):
+        """
+        Initialize the queue
+
+        Args:
+            path: SQLite database file (default from JOB_QUEUE_PATH, or jobs.db)
+            backoff_base: Base delay in seconds for retry backoff
+            backoff_max: Maximum retry delay in seconds
+        """
+        self.path = path or os.getenv("JOB_QUEUE_PATH", "jobs.db")
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._local = threading.local()
+        self._cipher = None
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers and a writer work concurrently"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, job_type: str, payload: Optional[Dict[str, Any]] = None,
+                priority: Optional[int] = None, dedup_key: Optional[str] = None,
+                run_at: Optional[float] = None, max_attempts: int = 5) -> int:
+        """
+        Add a job to the queue
+
+        Args:
+            job_type: One of RUN_SCRIPT, REFRESH_AUCTION, FIRE_BID, DOWNSAMPLE_HISTORY (or a custom type)
+            payload: JSON-serializable job arguments
+            priority: Higher runs first (default from DEFAULT_PRIORITIES)
+            dedup_key: If a queued or running job has this key, it is returned instead
+            run_at: Epoch seconds before which the job won't be leased (default now)
+            max_attempts: Attempts before the job is marked dead
+
+        Returns:
+            Job ID
+        """
+        now = time.time()
+        if priority is None:
+            priority = DEFAULT_PRIORITIES.get(job_type, 0)
+        with span("job.enqueue", tracing.PRODUCER, **{"job.type": job_type}):
+            payload = tracing.inject(dict(payload or {}))
+            return self._insert(job_type, payload, priority, dedup_key, run_at, max_attempts, now)
+
+    def _insert(self, job_type: str, payload: Dict[str, Any], priority: int, dedup_key: Optional[str],
+                run_at: Optional[float], max_attempts: int, now: float) -> int:
+        conn = self._connection()
+        try:
+            cursor = conn.execute(
+                """INSERT INTO jobs (type, payload, priority, dedup_key, run_at, max_attempts, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (job_type, json.dumps(payload), priority, dedup_key,
+                 run_at if run_at is not None else now, max_attempts, now, now)
+            )
+            return cursor.lastrowid
+        except sqlite3.IntegrityError:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'leased')", (dedup_key,)
+            ).fetchone()
+            if row is None:
+                raise
+            return row["id"]
+
+    def lease(self, worker_id: str, batch_size: int = 10, lease_seconds: float = 30.0,
+              types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Claim a batch of ready jobs
+
+        Jobs whose lease has expired (their worker died) are eligible again.
+
+        Args:
+            worker_id: Identifier of the claiming worker
+            batch_size: Maximum number of jobs to claim
+            lease_seconds: How long the worker owns the jobs
+            types: Only claim these job types
+
+        Returns:
+            List of job dictionaries
+        """
+        now = time.time()
+        conn = self._connection()
+        type_filter = ""
+        params: List[Any] = [now, now]
+        if types:
+            type_filter = f"AND type IN ({', '.join('?' * len(types))})"
+            params.extend(types)
+        params.append(batch_size)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose worker died on their final attempt are not retried again
+            conn.execute(
+                """UPDATE jobs SET status = 'dead', last_error = 'Lease expired', lease_owner = NULL,
+                   lease_until = NULL, updated_at = ?
+                   WHERE status = 'leased' AND lease_until < ? AND attempts >= max_attempts""",
+                (now, now)
+            )
+            rows = conn.execute(
+                f"""SELECT * FROM jobs
+                    WHERE ((status = 'queued' AND run_at <= ?) OR (status = 'leased' AND lease_until < ?))
+                    {type_filter}
+                    ORDER BY priority DESC, run_at, id
+                    LIMIT ?""",
+                params
+            ).fetchall()
+            ids = [row["id"] for row in rows]
+            if ids:
+                conn.execute(
+                    f"""UPDATE jobs SET status = 'leased', lease_owner = ?, lease_until = ?,
+                        attempts = attempts + 1, updated_at = ?
+                        WHERE id IN ({', '.join('?' * len(ids))})""",
+                    [worker_id, now + lease_seconds, now, *ids]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        jobs = []
+        for row in rows:
+            job = self._to_dict(row)
+            job.update(status="leased", lease_owner=worker_id, lease_until=now + lease_seconds,
+                       attempts=row["attempts"] + 1)
+            jobs.append(job)
+        return jobs
+
+    def extend_lease(self, job_id: int, worker_id: str, lease_seconds: float = 30.0) -> bool:
+        """Extend a lease held by `worker_id`; returns False if the lease was lost"""
+        now = time.time()
+        cursor = self._connection().execute(
+            """UPDATE jobs SET lease_until = ?, updated_at = ?
+               WHERE id = ? AND status = 'leased' AND lease_owner = ?""",
+            (now + lease_seconds, now, job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: Optional[str] = None):
+        """Mark a leased job as done"""
+        self._finish(job_id, worker_id, "UPDATE jobs SET status = 'done', lease_owner = NULL, lease_until = NULL, updated_at = ?", [time.time()])
+
+    def fail(self, job_id: int, error: str, worker_id: Optional[str] = None, retry: bool = True):
+        """
+        Record a failed attempt
+
+        The job is retried after an exponential backoff with jitter, or marked
+        dead once it has used all its attempts (or if `retry` is False).
+        """
+        row = self.get(job_id)
+        if row is None:
+            return
+        now = time.time()
+        if retry and row["attempts"] < row["max_attempts"]:
+            delay = min(self.backoff_max, self.backoff_base * (2 ** (row["attempts"] - 1)))
+            delay = random.uniform(delay / 2, delay)
+            self._finish(job_id, worker_id,
+                         "UPDATE jobs SET status = 'queued', run_at = ?, last_error = ?, lease_owner = NULL, lease_until = NULL, updated_at = ?",
+                         [now + delay, error, now])
+        else:
+            self._finish(job_id, worker_id,
+                         "UPDATE jobs SET status = 'dead', last_error = ?, lease_owner = NULL, lease_until = NULL, updated_at = ?",
+                         [error, now])
+
+    def _finish(self, job_id: int, worker_id: Optional[str], statement: str, params: List[Any]):
+        # Only the current lease holder may finish a job, so a worker whose
+        # lease expired can't overwrite the outcome of the worker that took over
+        statement += " WHERE id = ? AND status = 'leased'"
+        params = [*params, job_id]
+        if worker_id is not None:
+            statement += " AND lease_owner = ?"
+            params.append(worker_id)
+        self._connection().execute(statement, params)
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Get a job by ID"""
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        rows = self._connection().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def _fernet(self):
+        if self._cipher is None:
+            from cryptography.fernet import Fernet
+            self._cipher = Fernet(os.getenv("JOB_PAYLOAD_KEY") or self._key_file())
+        return self._cipher
+
+    def _key_file(self) -> str:
+        """Key shared by every process using this database, created by whichever needs it first"""
+        from cryptography.fernet import Fernet
+
+        key_path = self.path + ".key"
+        if not os.path.exists(key_path):
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(key_path)))
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(Fernet.generate_key().decode())
+                # Linking fails if another process got there first; its key wins
+                os.link(tmp, key_path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp)
+        with open(key_path) as f:
+            return f.read().strip()
+
+    def seal(self, value: str) -> str:
+        """Encrypt a secret for a job payload"""
+        return self._fernet().encrypt(value.encode("utf-8")).decode("ascii")
+
+    def unseal(self, sealed: str) -> str:
+        """
+        Decrypt a secret sealed by `seal()`
+
+        Raises:
+            ValueError: If the value was not sealed with this queue's key
+        """
+        from cryptography.fernet import InvalidToken
+
+        try:
+            return self._fernet().decrypt(sealed.encode("ascii")).decode("utf-8")
+        except InvalidToken:
+            raise ValueError("Sealed value can't be decrypted with this queue's key")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, opening it on first use"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
@@ -0,0 +1,190 @@
+"""
+Event Loop Monitor
+
+Routes mix synchronous I/O (the Supabase client, Tradera calls) into
+`async def` handlers, and every such call stalls the whole event loop,
+including a bid waiting to fire. The monitor makes those stalls visible:
+- Lag: a task asks to wake every `interval` seconds and records how late it
+  actually woke, into a histogram (LOOP_MONITOR_ENABLED, on by default)
+- Blocking calls (LOOP_MONITOR_DEBUG=true): a watchdog thread notices when
+  the loop has not come back for longer than the threshold and captures the
+  loop thread's stack at that moment, i.e. the code that is blocking. Each
+  stall is recorded once, with its total duration, when the loop resumes
+
+Histograms are reported by GET /health; recent blocking calls with their
+stacks by GET /api/admin/event-loop.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS: Tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+MAX_STACK_FRAMES = 30
+
+
+class Histogram:
+    """Bucketed counts of millisecond durations, plus percentiles over a recent window"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS_MS, window: int = 1000):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float):
+        with self._lock:
+            index = next((i for i, bound in enumerate(self.buckets) if ms <= bound), len(self.buckets))
+            self._counts[index] += 1
+            self._recent.append(ms)
+            self.count += 1
+            self.sum_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Percentile (0-100) of the recent window, or None before any samples"""
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Count, sum, max, recent percentiles and cumulative counts per bucket (`le` in ms)"""
+        with self._lock:
+            counts = list(self._counts)
+            snapshot = {"count": self.count, "sum_ms": round(self.sum_ms, 3), "max_ms": round(self.max_ms, 3)}
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip([*(f"{bound:g}" for bound in self.buckets), "+Inf"], counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        for percentile in (50, 99):
+            value = self.percentile(percentile)
+            snapshot[f"p{percentile}_ms"] = None if value is None else round(value, 3)
+        snapshot["buckets"] = buckets
+        return snapshot
+
+
+class EventLoopMonitor:
+    """Measures event loop lag and, in debug mode, captures the stacks of blocking calls"""
+
+    def __init__(self, interval: float = 0.1, blocking_threshold: Optional[float] = None,
+                 debug: Optional[bool] = None, keep: int = 50):
+        """
+        Initialize the monitor
+
+        Args:
+            interval: Seconds between lag samples
+            blocking_threshold: A stall at least this long (seconds) counts as a blocking call
+                (default from LOOP_MONITOR_BLOCKING_MS, or 100 ms)
+            debug: Capture stacks of blocking calls with a watchdog thread (default from LOOP_MONITOR_DEBUG)
+            keep: Number of recent blocking calls kept
+        """
+        self.interval = interval
+        self.blocking_threshold = (blocking_threshold if blocking_threshold is not None
+                                   else float(os.getenv("LOOP_MONITOR_BLOCKING_MS", "100")) / 1000)
+        self.debug = debug if debug is not None else os.getenv("LOOP_MONITOR_DEBUG", "false").lower() == "true"
+        self.lag = Histogram()
+        self.blocking = Histogram()
+        self.blocking_calls: deque = deque(maxlen=keep)
+        self.running = False
+        self._heartbeat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._captured: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    async def run(self, stop: asyncio.Event):
+        """Sample lag until `stop` is set"""
+        loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self.running = True
+        watchdog_stop = threading.Event()
+        watchdog = None
+        if self.debug:
+            watchdog = threading.Thread(target=self._watch, args=(watchdog_stop,), name="loop-watchdog", daemon=True)
+            watchdog.start()
+        try:
+            while not stop.is_set():
+                start = loop.time()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    break
+                self.record_lag(max(0.0, loop.time() - start - self.interval))
+        finally:
+            self.running = False
+            watchdog_stop.set()
+            if watchdog is not None:
+                watchdog.join()
+
+    def record_lag(self, lag: float):
+        """Record one lag sample (seconds) and close the stall it ended, if any"""
+        self._heartbeat = time.monotonic()
+        self.lag.record(lag * 1000)
+        with self._lock:
+            captured, self._captured = self._captured, None
+        if lag < self.blocking_threshold:
+            return
+        self.blocking.record(lag * 1000)
+        event = {"at": time.time(), "duration_ms": round(lag * 1000, 3), "stack": captured["stack"] if captured else None}
+        self.blocking_calls.append(event)
+        where = f" in {captured['stack'][-1].strip()}" if captured and captured["stack"] else ""
+        logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms{where}")
+
+    def _watch(self, stop: threading.Event):
+        """Watchdog thread: capture the loop thread's stack once per stall"""
+        check_every = max(self.blocking_threshold / 4, 0.005)
+        captured_beat = None
+        while not stop.wait(check_every):
+            beat = self._heartbeat
+            if beat == captured_beat or time.monotonic() - beat < self.interval + self.blocking_threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame)[-MAX_STACK_FRAMES:]
+            with self._lock:
+                self._captured = {"stack": stack}
+            captured_beat = beat
+
+    def stats(self) -> Dict[str, Any]:
+        """Lag and blocking-call histograms"""
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "blocking_threshold_ms": self.blocking_threshold * 1000,
+            "debug": self.debug,
+            "lag": self.lag.snapshot(),
+            "blocking": self.blocking.snapshot(),
+        }
+
+    def recent_blocking_calls(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Newest first; `stack` is only captured in debug mode"""
+        return list(reversed(self.blocking_calls))[:limit]
+
+
+def loop_monitor_enabled() -> bool:
+    """Whether the API process runs the monitor (LOOP_MONITOR_ENABLED)"""
+    return os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+
+
+# Process-wide monitor started by the API lifespan and the standalone worker
+event_loop_monitor = EventLoopMonitor()
@@ -1,29 +1,86 @@
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import logging
+from http_cache import CompressionMiddleware
+from write_behind import write_behind, write_behind_enabled
 
 # Load environment variables
 load_dotenv()
 
+import tracing
+from profiling import ProfiledJSONResponse, ProfilingMiddleware
+from loop_monitor import event_loop_monitor, loop_monitor_enabled
+from admission import AdmissionMiddleware, admission_controller, admission_enabled
+import search_cache
+from image_cache import image_cache, image_proxy_enabled
+
 # Import routes
-from routes import scripts, auctions, bidding
+from routes import scripts, auctions, bidding, statistics, jobs, export, admin, images
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    format="%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s",
 )
+# Log lines carry the trace ID of the request or job they belong to ("-" outside one)
+tracing.add_trace_ids_to_logs()
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop the event loop monitor, in-process job worker, scheduler and write-behind flusher, flush buffers on shutdown"""
+    stop = asyncio.Event()
+    monitor_task = None
+    worker_task = None
+    scheduler_task = None
+    write_behind_task = None
+    if loop_monitor_enabled():
+        monitor_task = asyncio.create_task(event_loop_monitor.run(stop))
+    if os.getenv("JOB_WORKER_ENABLED", "false").lower() == "true":
+        from worker import JobWorker
+        worker_task = asyncio.create_task(JobWorker().run(stop))
+    if os.getenv("SCHEDULER_ENABLED", "false").lower() == "true":
+        from scheduler import run_scheduler
+        scheduler_task = asyncio.create_task(run_scheduler(stop))
+    if write_behind_enabled():
+        # Writes acknowledged before a crash or restart are stored first
+        await asyncio.to_thread(write_behind.replay)
+        write_behind_task = asyncio.create_task(write_behind.run(stop))
+    yield
+    stop.set()
+    if worker_task:
+        await worker_task
+    if scheduler_task:
+        await scheduler_task
+    if monitor_task:
+        await monitor_task
+    if write_behind_task:
+        await write_behind_task
+        write_behind.close()
+    # Write price observations still buffered
+    from price_history import price_history
+    await asyncio.to_thread(price_history.flush)
+    # Drop speculative searches still pending
+    search_cache.search_prefetcher.cancel_all()
+    # Export spans still queued
+    await asyncio.to_thread(tracing.shutdown)
+
 # Create FastAPI app
 app = FastAPI(
     title="Tradera Assistant API",
     description="API for automating Tradera auction monitoring and bidding",
     version="0.1.2",
+    lifespan=lifespan,
+    default_response_class=ProfiledJSONResponse,
 )
 
+# Limit concurrent searches and script runs (innermost, so 429s still get CORS headers)
+app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 origins = [
     "http://localhost:5173",  # Vite dev server
@@ -40,10 +97,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses (brotli if available, otherwise gzip)
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
+
+# Opt-in request profiling (outside compression, so compression is included)
+app.add_middleware(ProfilingMiddleware)
+
+# Opt-in tracing (outermost, so profiled work belongs to the request's trace)
+app.add_middleware(tracing.TracingMiddleware)
+
 # Include routers
 app.include_router(scripts.router)
 app.include_router(auctions.router)
 app.include_router(bidding.router)
+app.include_router(statistics.router)
+app.include_router(jobs.router)
+app.include_router(export.router)
+app.include_router(admin.router)
+app.include_router(images.router)
 
 @app.get("/")
 async def root():
@@ -57,10 +128,23 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint for monitoring"""
-    return {
+    health = {
         "status": "healthy",
         "version": "0.1.2",
     }
+    if write_behind_enabled():
+        health["write_behind"] = write_behind.stats()
+    if tracing.enabled():
+        health["tracing"] = tracing.stats()
+    if loop_monitor_enabled():
+        health["event_loop"] = event_loop_monitor.stats()
+    if admission_enabled():
+        health["admission"] = admission_controller.stats()
+    if search_cache.search_cache.ttl > 0:
+        health["search_cache"] = search_cache.stats()
+    if image_proxy_enabled():
+        health["image_cache"] = image_cache.stats()
+    return health
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,198 @@
+-- 0001: Initial schema
+--
+-- The schema as previously applied by setup_db.py. Every statement is
+-- idempotent, so this migration can be recorded on a database that was set
+-- up before migrations existed.
+
+-- Users table (linked to Clerk)
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    clerk_user_id TEXT UNIQUE NOT NULL,
+    email TEXT,
+    name TEXT,
+    preferences JSONB DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Search scripts table
+CREATE TABLE IF NOT EXISTS search_scripts (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    query TEXT NOT NULL,
+    category_id INTEGER,
+    min_price DECIMAL(10, 2),
+    max_price DECIMAL(10, 2),
+    sort_by TEXT DEFAULT 'EndDateAscending',
+    is_active BOOLEAN DEFAULT TRUE,
+    schedule TEXT DEFAULT 'hourly',
+    user_id TEXT,
+    result_filters JSONB DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Auctions table
+CREATE TABLE IF NOT EXISTS auctions (
+    id SERIAL PRIMARY KEY,
+    tradera_id TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT,
+    current_price DECIMAL(10, 2) NOT NULL,
+    end_time TIMESTAMP WITH TIME ZONE NOT NULL,
+    image_url TEXT,
+    seller_id TEXT,
+    seller_rating DECIMAL(5, 2),
+    category TEXT,
+    bid_count INTEGER DEFAULT 0,
+    next_bid DECIMAL(10, 2),
+    status TEXT DEFAULT 'active',
+    script_id INTEGER REFERENCES search_scripts(id) ON DELETE SET NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Scripts that matched each auction (an auction can be found by many scripts)
+CREATE TABLE IF NOT EXISTS auction_scripts (
+    auction_id INTEGER REFERENCES auctions(id) ON DELETE CASCADE,
+    script_id INTEGER REFERENCES search_scripts(id) ON DELETE CASCADE,
+    first_matched_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (auction_id, script_id)
+);
+
+-- Bid configurations table
+CREATE TABLE IF NOT EXISTS bid_configs (
+    id SERIAL PRIMARY KEY,
+    auction_id INTEGER REFERENCES auctions(id) ON DELETE CASCADE,
+    max_bid_amount DECIMAL(10, 2) NOT NULL,
+    bid_seconds_before_end INTEGER DEFAULT 10,
+    is_active BOOLEAN DEFAULT TRUE,
+    strategy TEXT DEFAULT 'max_at_last_second',
+    status TEXT DEFAULT 'pending',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Bids table
+CREATE TABLE IF NOT EXISTS bids (
+    id SERIAL PRIMARY KEY,
+    auction_id INTEGER REFERENCES auctions(id) ON DELETE CASCADE,
+    amount DECIMAL(10, 2) NOT NULL,
+    status TEXT DEFAULT 'pending',
+    tradera_response TEXT,
+    user_id TEXT,
+    idempotency_key TEXT UNIQUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Per-user statistics, maintained incrementally by the backend
+CREATE TABLE IF NOT EXISTS user_statistics (
+    user_id TEXT PRIMARY KEY,
+    total_auctions_found INTEGER DEFAULT 0,
+    auctions_with_bids INTEGER DEFAULT 0,
+    auctions_won INTEGER DEFAULT 0,
+    auctions_lost INTEGER DEFAULT 0,
+    total_spent DECIMAL(12, 2) DEFAULT 0,
+    categories JSONB DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Append-only price/bid-count observations (only changes are stored)
+CREATE TABLE IF NOT EXISTS auction_price_history (
+    id BIGSERIAL PRIMARY KEY,
+    auction_id INTEGER REFERENCES auctions(id) ON DELETE CASCADE,
+    observed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    price DECIMAL(10, 2) NOT NULL,
+    bid_count INTEGER DEFAULT 0,
+    UNIQUE (auction_id, observed_at)
+);
+
+-- Thin out old price history (called periodically by the downsample_history job)
+CREATE OR REPLACE FUNCTION downsample_price_history(older_than INTERVAL DEFAULT '7 days', bucket INTERVAL DEFAULT '1 hour')
+RETURNS INTEGER AS $$
+DECLARE
+    removed INTEGER;
+BEGIN
+    -- Keep the last observation per auction and bucket
+    DELETE FROM auction_price_history h
+    USING (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY auction_id, date_bin(bucket, observed_at, TIMESTAMPTZ '2000-01-01')
+            ORDER BY observed_at DESC
+        ) AS rank
+        FROM auction_price_history
+        WHERE observed_at < NOW() - older_than
+    ) ranked
+    WHERE h.id = ranked.id AND ranked.rank > 1;
+    GET DIAGNOSTICS removed = ROW_COUNT;
+    RETURN removed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Write version per table, used for ETags on list endpoints
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, version) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS auctions_bump_version ON auctions;
+CREATE TRIGGER auctions_bump_version AFTER INSERT OR UPDATE OR DELETE ON auctions
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+DROP TRIGGER IF EXISTS search_scripts_bump_version ON search_scripts;
+CREATE TRIGGER search_scripts_bump_version AFTER INSERT OR UPDATE OR DELETE ON search_scripts
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+DROP TRIGGER IF EXISTS bids_bump_version ON bids;
+CREATE TRIGGER bids_bump_version AFTER INSERT OR UPDATE OR DELETE ON bids
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+-- Create indexes for performance
+CREATE INDEX IF NOT EXISTS idx_auctions_end_time ON auctions(end_time);
+CREATE INDEX IF NOT EXISTS idx_search_scripts_is_active ON search_scripts(is_active);
+CREATE INDEX IF NOT EXISTS idx_bid_configs_auction_id ON bid_configs(auction_id);
+CREATE INDEX IF NOT EXISTS idx_bids_auction_id ON bids(auction_id);
+CREATE INDEX IF NOT EXISTS idx_auction_scripts_script_id ON auction_scripts(script_id);
+CREATE INDEX IF NOT EXISTS idx_auction_price_history_observed_at ON auction_price_history(observed_at);
+
+-- Enable Row Level Security (RLS)
+ALTER TABLE users ENABLE ROW LEVEL SECURITY;
+ALTER TABLE search_scripts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE auctions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE bid_configs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE bids ENABLE ROW LEVEL SECURITY;
+ALTER TABLE user_statistics ENABLE ROW LEVEL SECURITY;
+ALTER TABLE table_versions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE auction_scripts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE auction_price_history ENABLE ROW LEVEL SECURITY;
+
+-- Policies
+DROP POLICY IF EXISTS "Anyone can view auctions" ON auctions;
+CREATE POLICY "Anyone can view auctions" ON auctions FOR SELECT USING (true);
+
+DROP POLICY IF EXISTS "Anyone can view search scripts" ON search_scripts;
+CREATE POLICY "Anyone can view search scripts" ON search_scripts FOR SELECT USING (true);
+
+DROP POLICY IF EXISTS "Authenticated users can create search scripts" ON search_scripts;
+CREATE POLICY "Authenticated users can create search scripts" ON search_scripts FOR INSERT WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Anyone can view bid configs" ON bid_configs;
+CREATE POLICY "Anyone can view bid configs" ON bid_configs FOR SELECT USING (true);
+
+DROP POLICY IF EXISTS "Anyone can view bids" ON bids;
+CREATE POLICY "Anyone can view bids" ON bids FOR SELECT USING (true);
+
+DROP POLICY IF EXISTS "Anyone can view table versions" ON table_versions;
+CREATE POLICY "Anyone can view table versions" ON table_versions FOR SELECT USING (true);
+
+DROP POLICY IF EXISTS "Anyone can view auction scripts" ON auction_scripts;
+CREATE POLICY "Anyone can view auction scripts" ON auction_scripts FOR SELECT USING (true);
+
+DROP POLICY IF EXISTS "Anyone can view auction price history" ON auction_price_history;
+CREATE POLICY "Anyone can view auction price history" ON auction_price_history FOR SELECT USING (true);
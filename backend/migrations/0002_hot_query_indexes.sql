@@ -0,0 +1,13 @@
+-- 0002: Indexes for hot queries
+--
+-- auctions(tradera_id) is already served by the index behind its UNIQUE
+-- constraint (auctions_tradera_id_key), which ingest uses for lookups.
+
+-- Active bid configs (sniper)
+CREATE INDEX IF NOT EXISTS idx_bid_configs_is_active_status ON bid_configs(is_active, status);
+
+-- Active auctions by end time (refresh, sniper); also serves status-only filters
+CREATE INDEX IF NOT EXISTS idx_auctions_status_end_time ON auctions(status, end_time);
+
+-- Scripts per user (GET /api/scripts)
+CREATE INDEX IF NOT EXISTS idx_search_scripts_user_id ON search_scripts(user_id);
@@ -0,0 +1,42 @@
+-- 0003: Scheduler and sniper lookups
+--
+-- Partial covering indexes hold exactly the rows and columns the hot
+-- lookups read, so both stay index-only scans however many ended auctions,
+-- finished bid configs and inactive scripts accumulate.
+
+-- When each script last ran and is next due (new scripts are due immediately)
+ALTER TABLE search_scripts ADD COLUMN IF NOT EXISTS last_run_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE search_scripts ADD COLUMN IF NOT EXISTS next_run_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+CREATE INDEX IF NOT EXISTS idx_search_scripts_due ON search_scripts(next_run_at) INCLUDE (id)
+    WHERE is_active;
+
+CREATE INDEX IF NOT EXISTS idx_auctions_active_end_time ON auctions(end_time) INCLUDE (id)
+    WHERE status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_bid_configs_pending_auction_id ON bid_configs(auction_id) INCLUDE (id, bid_seconds_before_end)
+    WHERE is_active AND status = 'pending';
+
+-- Active bid configs whose auction ends within the next window_minutes, soonest first
+CREATE OR REPLACE FUNCTION bid_configs_ending_within(window_minutes INTEGER DEFAULT 10)
+RETURNS TABLE (bid_config_id INTEGER, auction_id INTEGER, end_time TIMESTAMP WITH TIME ZONE, bid_seconds_before_end INTEGER)
+LANGUAGE sql STABLE AS $$
+    SELECT c.id, a.id, a.end_time, c.bid_seconds_before_end
+    FROM auctions a
+    JOIN bid_configs c ON c.auction_id = a.id AND c.is_active AND c.status = 'pending'
+    WHERE a.status = 'active'
+      AND a.end_time >= NOW()
+      AND a.end_time < NOW() + make_interval(mins => window_minutes)
+    ORDER BY a.end_time
+$$;
+
+-- Active scripts due to run, most overdue first
+CREATE OR REPLACE FUNCTION due_search_scripts(max_scripts INTEGER DEFAULT 100)
+RETURNS TABLE (script_id INTEGER, next_run_at TIMESTAMP WITH TIME ZONE)
+LANGUAGE sql STABLE AS $$
+    SELECT s.id, s.next_run_at
+    FROM search_scripts s
+    WHERE s.is_active AND s.next_run_at <= NOW()
+    ORDER BY s.next_run_at
+    LIMIT max_scripts
+$$;
@@ -0,0 +1,8 @@
+-- 0004: Link bids to the bid config they were placed for
+--
+-- The sniper's idempotency guard records bid_config_id on the bid it
+-- claims; scheduled bids are looked up per config.
+
+ALTER TABLE bids ADD COLUMN IF NOT EXISTS bid_config_id INTEGER REFERENCES bid_configs(id) ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS idx_bids_bid_config_id ON bids(bid_config_id);
@@ -0,0 +1,47 @@
+-- 0005: Atomic user statistics increments
+--
+-- The API processes and the worker all record statistics events. Each event
+-- is added to the stored row in one statement, instead of a process writing
+-- back a whole row computed from its own (possibly stale) copy.
+--
+-- p_categories maps category keys to counter increments, e.g.
+-- {"100": {"auctions_won": 1, "total_spent": 550}}; counters missing from a
+-- stored category start at 0.
+
+CREATE OR REPLACE FUNCTION increment_user_statistics(
+    p_user_id TEXT,
+    p_total_auctions_found INTEGER DEFAULT 0,
+    p_auctions_with_bids INTEGER DEFAULT 0,
+    p_auctions_won INTEGER DEFAULT 0,
+    p_auctions_lost INTEGER DEFAULT 0,
+    p_total_spent DECIMAL DEFAULT 0,
+    p_categories JSONB DEFAULT '{}'::jsonb
+)
+RETURNS user_statistics
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    result user_statistics;
+BEGIN
+    INSERT INTO user_statistics (user_id) VALUES (p_user_id) ON CONFLICT (user_id) DO NOTHING;
+
+    UPDATE user_statistics s SET
+        total_auctions_found = COALESCE(s.total_auctions_found, 0) + p_total_auctions_found,
+        auctions_with_bids = COALESCE(s.auctions_with_bids, 0) + p_auctions_with_bids,
+        auctions_won = COALESCE(s.auctions_won, 0) + p_auctions_won,
+        auctions_lost = COALESCE(s.auctions_lost, 0) + p_auctions_lost,
+        total_spent = COALESCE(s.total_spent, 0) + p_total_spent,
+        categories = COALESCE(s.categories, '{}'::jsonb) || COALESCE((
+            SELECT jsonb_object_agg(category.key, COALESCE(s.categories -> category.key, '{}'::jsonb) || COALESCE((
+                SELECT jsonb_object_agg(counter.key,
+                    COALESCE((s.categories -> category.key ->> counter.key)::numeric, 0) + counter.value::numeric)
+                FROM jsonb_each_text(category.value) AS counter
+            ), '{}'::jsonb))
+            FROM jsonb_each(p_categories) AS category
+        ), '{}'::jsonb),
+        updated_at = NOW()
+    WHERE s.user_id = p_user_id
+    RETURNING * INTO result;
+
+    RETURN result;
+END;
+$$;
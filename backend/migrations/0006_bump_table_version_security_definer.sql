@@ -0,0 +1,15 @@
+-- 0006: Let writes through RLS bump table versions
+--
+-- table_versions has RLS with only a SELECT policy, and the backend writes
+-- with the anon key, so the statement-level version trigger failed (and
+-- with it the write that fired it). The trigger function now runs as its
+-- owner, with a fixed search_path.
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, version) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1;
+    RETURN NULL;
+END;
+$$;
@@ -0,0 +1,26 @@
+-- 0007: Sequence sync after bulk imports
+--
+-- Imports upsert rows with their exported IDs, which doesn't advance the
+-- SERIAL sequence, so the next ordinary insert would be given an imported ID
+-- and fail on the primary key. After an import the sequence is set to the
+-- table's highest ID.
+--
+-- Limited to the importable tables, since the table name is interpolated and
+-- the function runs with its owner's rights.
+
+CREATE OR REPLACE FUNCTION sync_id_sequence(p_table TEXT)
+RETURNS BIGINT
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    max_id BIGINT;
+BEGIN
+    IF p_table NOT IN ('auctions', 'bids') THEN
+        RAISE EXCEPTION 'sync_id_sequence: % is not an importable table', p_table;
+    END IF;
+    EXECUTE format('SELECT MAX(id) FROM %I', p_table) INTO max_id;
+    IF max_id IS NOT NULL THEN
+        PERFORM setval(pg_get_serial_sequence(p_table, 'id'), max_id);
+    END IF;
+    RETURN max_id;
+END;
+$$;
@@ -0,0 +1,233 @@
+"""
+Auction Price History
+
+An append-only time series of price and bid-count observations per auction,
+stored in `auction_price_history`:
+- Only observations that differ from the previous one for the auction are
+  kept, so an auction that doesn't move costs nothing
+- Observations are buffered and written in batches (when the buffer is full
+  or old enough, and on shutdown); a batch the database rejects is split to
+  drop the offending rows (e.g. of a deleted auction), the rest is retried
+- Old data is downsampled in the database by `downsample_price_history()`,
+  keeping the last observation per auction and bucket, so storage stays bounded
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from db import is_permanent_error
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = 500
+FLUSH_INTERVAL = 10.0
+# Observations kept in memory while the database is unreachable
+MAX_BUFFER = 50000
+
+
+def _parse_time(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+def downsample(points: List[Dict[str, Any]], bucket_seconds: int) -> List[Dict[str, Any]]:
+    """
+    Reduce points to one per time bucket
+
+    Each bucket keeps its last observation (the price at the end of the bucket).
+
+    Args:
+        points: Observations ordered by `observed_at`
+        bucket_seconds: Bucket width in seconds
+
+    Returns:
+        Downsampled observations
+    """
+    if bucket_seconds <= 0:
+        return list(points)
+    buckets: Dict[int, Dict[str, Any]] = {}
+    for point in points:
+        bucket = int(_parse_time(point["observed_at"]).timestamp() // bucket_seconds)
+        buckets[bucket] = point
+    return [buckets[bucket] for bucket in sorted(buckets)]
+
+
+class PriceHistoryRecorder:
+    """Buffers price observations and writes them in batches"""
+
+    def __init__(self, get_client: Optional[Callable[[], Any]] = None,
+                 flush_size: int = FLUSH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        """
+        Initialize the recorder
+
+        Args:
+            get_client: Callable returning the Supabase client (None keeps observations in memory only)
+            flush_size: Buffered observations that trigger a write
+            flush_interval: Seconds after which buffered observations are written on the next observation
+        """
+        self.get_client = get_client
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._buffer: List[Dict[str, Any]] = []
+        self._last: Dict[int, Tuple[float, int]] = {}
+        self._last_flush = time.monotonic()
+        # Observations the database rejected (they are not retried)
+        self.dropped = 0
+
+    def observe(self, auction_id: int, price: float, bid_count: int,
+                observed_at: Optional[datetime] = None, ended: bool = False):
+        """
+        Record an observation if the price or bid count changed
+
+        Args:
+            auction_id: Auction ID
+            price: Current price
+            bid_count: Current bid count
+            observed_at: Observation time (default now)
+            ended: Whether the auction has ended (no further observations are expected)
+        """
+        auction_id = int(auction_id)
+        value = (float(price or 0), int(bid_count or 0))
+        with self._lock:
+            if self._last.get(auction_id) != value:
+                self._buffer.append({
+                    "auction_id": auction_id,
+                    "observed_at": (observed_at or datetime.now(timezone.utc)).isoformat(),
+                    "price": value[0],
+                    "bid_count": value[1],
+                })
+                if len(self._buffer) > MAX_BUFFER:
+                    del self._buffer[:len(self._buffer) - MAX_BUFFER]
+            if ended:
+                self._last.pop(auction_id, None)
+            else:
+                self._last[auction_id] = value
+            due = (len(self._buffer) >= self.flush_size
+                   or (self._buffer and time.monotonic() - self._last_flush >= self.flush_interval))
+        if due:
+            self.flush()
+
+    def observe_rows(self, rows: Iterable[Dict[str, Any]]):
+        """Record observations from auction rows (`id`, `current_price`, `bid_count`, optional `status`)"""
+        for row in rows:
+            if row.get("id") is None:
+                continue
+            self.observe(row["id"], row.get("current_price"), row.get("bid_count"),
+                         ended=row.get("status", "active") != "active")
+
+    def pending(self, auction_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Buffered observations not yet written"""
+        with self._lock:
+            return [point for point in self._buffer if auction_id is None or point["auction_id"] == int(auction_id)]
+
+    def flush(self) -> int:
+        """
+        Write buffered observations
+
+        Observations the database rejects are dropped; on any other error the
+        unwritten observations stay buffered for the next flush.
+
+        Returns:
+            Number of observations written
+        """
+        if self.get_client is None:
+            return 0
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        if not batch:
+            return 0
+        written, unwritten = self._write(self.get_client(), batch)
+        if unwritten:
+            with self._lock:
+                # Keep them for the next flush, oldest first
+                self._buffer[:0] = unwritten
+                if len(self._buffer) > MAX_BUFFER:
+                    del self._buffer[:len(self._buffer) - MAX_BUFFER]
+        return written
+
+    def _write(self, client: Any, batch: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Write a batch, halving it until the rows the database rejects are isolated
+
+        Returns:
+            Number of observations written, and the observations to retry
+        """
+        try:
+            client.table("auction_price_history").upsert(
+                batch, on_conflict="auction_id,observed_at", ignore_duplicates=True
+            ).execute()
+            return len(batch), []
+        except Exception as e:
+            if not is_permanent_error(e):
+                logger.error(f"Error writing {len(batch)} price observations: {e}")
+                return 0, batch
+            if len(batch) == 1:
+                logger.warning(f"Dropping price observation of auction {batch[0]['auction_id']}: {e}")
+                with self._lock:
+                    self.dropped += 1
+                return 0, []
+        middle = len(batch) // 2
+        written, unwritten = self._write(client, batch[:middle])
+        if unwritten:
+            return written, unwritten + batch[middle:]
+        more, unwritten = self._write(client, batch[middle:])
+        return written + more, unwritten
+
+    def history(self, auction_id: int, since: Optional[str] = None,
+                bucket_seconds: int = 0) -> List[Dict[str, Any]]:
+        """
+        Get the observations of an auction, including buffered ones
+
+        Args:
+            auction_id: Auction ID
+            since: Only observations at or after this ISO timestamp
+            bucket_seconds: Downsample to one point per bucket (0 returns every observation)
+
+        Returns:
+            Observations ordered by time
+        """
+        points = []
+        if self.get_client is not None:
+            query = self.get_client().table("auction_price_history").select("observed_at, price, bid_count").eq("auction_id", auction_id)
+            if since:
+                query = query.gte("observed_at", since)
+            points = query.order("observed_at").execute().data or []
+
+        pending = [
+            {key: point[key] for key in ("observed_at", "price", "bid_count")}
+            for point in self.pending(auction_id)
+            if not since or _parse_time(point["observed_at"]) >= _parse_time(since)
+        ]
+        if pending:
+            points = sorted(points + pending, key=lambda point: _parse_time(point["observed_at"]))
+        return downsample(points, bucket_seconds)
+
+    def downsample_stored(self, older_than_days: int = 7, bucket_minutes: int = 60) -> int:
+        """
+        Downsample stored observations older than `older_than_days`
+
+        Returns:
+            Number of observations removed
+        """
+        if self.get_client is None:
+            return 0
+        response = self.get_client().rpc("downsample_price_history", {
+            "older_than": f"{int(older_than_days)} days",
+            "bucket": f"{int(bucket_minutes)} minutes",
+        }).execute()
+        return int(response.data or 0)
+
+
+def _get_supabase_client():
+    from db import get_supabase_client
+    return get_supabase_client()
+
+
+# Process-wide recorder shared by the ingest and refresh paths
+price_history = PriceHistoryRecorder(get_client=_get_supabase_client)
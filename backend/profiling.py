@@ -0,0 +1,284 @@
+"""
+Request Profiling
+
+Opt-in, per-request breakdowns of where slow requests spend their time:
+- With PROFILING_ENABLED=true, a request is profiled when it carries the
+  `X-Profile` header or is sampled (PROFILING_SAMPLE_RATE, 0-1)
+- Instrumented code records spans with `span(name)`: Tradera calls and XML
+  parsing, every Supabase request (`instrument_httpx`) and JSON rendering.
+  Spans are collected through a context variable, so they follow the request
+  into `asyncio.to_thread` and into worker threads that copy the context.
+  The same spans are exported as trace spans when tracing is enabled (see
+  tracing.py)
+- Profiled responses carry `X-Profile-Id` and a `Server-Timing` header with
+  the time per span name
+- Profiled requests slower than PROFILING_SLOW_MS are kept in memory (the
+  last PROFILING_KEEP, see GET /api/admin/slow-requests). If
+  PROFILING_DUMP_DIR is set, profiled requests also run under cProfile and
+  the slow ones' stats are written there (one profiler at a time; it sees the
+  event loop thread only, including other requests interleaved with this one)
+"""
+
+import cProfile
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+
+
+class RequestProfile:
+    """Spans recorded while handling one request"""
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.status_code: Optional[int] = None
+        self.duration_ms: Optional[float] = None
+        self.dump_path: Optional[str] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration: float, **attributes):
+        """Record a span from perf_counter `start` lasting `duration` seconds"""
+        span = {"name": name, "start_ms": round((start - self._start) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3)}
+        if attributes:
+            span["attributes"] = attributes
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self, status_code: Optional[int]):
+        self.status_code = status_code
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """Count and total time per span name"""
+        totals: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for span in self.spans:
+                total = totals.setdefault(span["name"], {"count": 0, "total_ms": 0.0})
+                total["count"] += 1
+                total["total_ms"] = round(total["total_ms"] + span["duration_ms"], 3)
+        return totals
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "totals": self.totals(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start_ms"])
+        return {**self.summary(), "spans": spans, "dump_path": self.dump_path}
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    """Profile of the request being handled, if it is profiled"""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, kind: int = tracing.INTERNAL, **attributes) -> Iterator[Any]:
+    """
+    Time a block as a span of the current request's profile and of the current trace
+
+    Either is a no-op when not profiling or not tracing. Yields the trace span
+    (or tracing.NOOP_SPAN) so attributes known only later can be added.
+    """
+    with tracing.traced(name, kind, **attributes) as trace_span:
+        profile = _current.get()
+        if profile is None:
+            yield trace_span
+            return
+        start = time.perf_counter()
+        try:
+            yield trace_span
+        finally:
+            profile.add(name, start, time.perf_counter() - start, **attributes)
+
+
+def instrument_httpx(client, prefix: str = "db"):
+    """
+    Record a profile and trace span for every request made by an httpx client
+
+    Spans are named `<prefix>.<last path segment>` (the table or RPC function
+    for PostgREST) and end when the response headers arrive. A request that
+    fails without a response records no span.
+    """
+    def on_request(request):
+        request.extensions["profiling_start"] = time.perf_counter()
+        target = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        request.extensions["trace_span"] = tracing.start_span(
+            f"{prefix}.{target}", tracing.CLIENT, **{"http.method": request.method})
+
+    def on_response(response):
+        trace_span = response.request.extensions.get("trace_span")
+        if trace_span is not None:
+            trace_span.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 400:
+                trace_span.set_status(tracing.STATUS_ERROR)
+            trace_span.end()
+        profile = _current.get()
+        start = response.request.extensions.get("profiling_start")
+        if profile is None or start is None:
+            return
+        target = response.request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        profile.add(f"{prefix}.{target}", start, time.perf_counter() - start,
+                    method=response.request.method, status=response.status_code)
+
+    client.event_hooks["request"].append(on_request)
+    client.event_hooks["response"].append(on_response)
+
+
+class ProfiledJSONResponse(JSONResponse):
+    """JSONResponse whose rendering is recorded as a `serialize` span"""
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return super().render(content)
+
+
+class SlowRequestLog:
+    """The most recent slow request profiles"""
+
+    def __init__(self, maxlen: int = 50):
+        self._profiles: deque = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def recent(self, limit: int = 20) -> List[RequestProfile]:
+        """Newest first"""
+        with self._lock:
+            return list(reversed(self._profiles))[:limit]
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+# Process-wide log read by the admin endpoint
+slow_requests = SlowRequestLog(maxlen=int(os.getenv("PROFILING_KEEP", "50")))
+
+# cProfile can only run one profiler per process at a time
+_cprofile_lock = threading.Lock()
+
+
+def _server_timing(profile: RequestProfile) -> str:
+    metrics = [f'{name};dur={total["total_ms"]:.1f}' for name, total in profile.totals().items()]
+    metrics.append(f"total;dur={profile.elapsed_ms():.1f}")
+    return ", ".join(metrics)
+
+
+class ProfilingMiddleware:
+    """Profile requests selected by header or sampling (see module docstring)"""
+
+    def __init__(self, app, enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+                 slow_ms: Optional[float] = None, dump_dir: Optional[str] = None,
+                 log: Optional[SlowRequestLog] = None):
+        """
+        Initialize the middleware (unset arguments are read from the environment)
+
+        Args:
+            app: ASGI application
+            enabled: Whether profiling is available at all (PROFILING_ENABLED)
+            sample_rate: Fraction of requests profiled without the header (PROFILING_SAMPLE_RATE)
+            slow_ms: Profiled requests slower than this are kept (PROFILING_SLOW_MS)
+            dump_dir: Directory for cProfile dumps of slow requests (PROFILING_DUMP_DIR)
+            log: Where slow profiles are kept (default: the process-wide log)
+        """
+        self.app = app
+        self.enabled = enabled if enabled is not None else os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+        self.slow_ms = slow_ms if slow_ms is not None else float(os.getenv("PROFILING_SLOW_MS", "1000"))
+        self.dump_dir = dump_dir if dump_dir is not None else os.getenv("PROFILING_DUMP_DIR") or None
+        self.log = log if log is not None else slow_requests
+
+    def _selected(self, scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name.decode("latin-1").lower() == PROFILE_HEADER:
+                return value.decode("latin-1").strip().lower() not in ("", "0", "false")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope.get("method", ""), scope.get("path", ""))
+        status_code = None
+
+        async def profiled_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Profile-Id", profile.id)
+                headers.append("Server-Timing", _server_timing(profile))
+            await send(message)
+
+        profiler = None
+        if self.dump_dir and _cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            profiler.enable()
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            _current.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                _cprofile_lock.release()
+            profile.finish(status_code)
+            if profile.duration_ms >= self.slow_ms:
+                if profiler is not None:
+                    profile.dump_path = self._dump(profiler, profile)
+                self.log.add(profile)
+                logger.info(f"Slow request {profile.method} {profile.path} took {profile.duration_ms:.0f} ms "
+                            f"(profile {profile.id}): {profile.totals()}")
+
+    def _dump(self, profiler: cProfile.Profile, profile: RequestProfile) -> Optional[str]:
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            path = os.path.join(self.dump_dir, f"{int(profile.started_at)}-{profile.id}.prof")
+            profiler.dump_stats(path)
+            return path
+        except OSError as e:
+            logger.error(f"Error writing profile {profile.id}: {e}")
+            return None
@@ -0,0 +1,138 @@
+"""
+Resilience Module
+
+Retry policies and circuit breakers for calls to external services:
+- RetryPolicy: bounded retries with exponential backoff and full jitter,
+  optionally limited by a deadline (e.g. the end of an auction)
+- CircuitBreaker: fails calls fast while a service keeps failing, then lets a
+  single trial call through after a cool-down
+"""
+
+import random
+import threading
+import time
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TraderaUnavailableError(Exception):
+    """Raised when a call is rejected by an open circuit or all retries failed"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """How often and how quickly an operation is retried"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0,
+                 timeout: float = 10.0, retry_statuses=(500, 502, 503, 504), retry_after_send: bool = True):
+        """
+        Initialize the policy
+
+        Args:
+            max_attempts: Total attempts including the first
+            base_delay: Backoff base in seconds (doubles per attempt)
+            max_delay: Upper bound for a single backoff in seconds
+            timeout: Per-attempt request timeout in seconds
+            retry_statuses: HTTP status codes considered transient
+            retry_after_send: Whether a timeout or connection error after the request
+                may have reached the server is retried (False for calls that must not
+                run twice)
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.retry_statuses = set(retry_statuses)
+        self.retry_after_send = retry_after_send
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (1-based), with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def attempt_timeout(self, deadline: Optional[float]) -> Optional[float]:
+        """
+        Timeout for the next attempt, capped by the deadline
+
+        Returns:
+            Timeout in seconds, or None if the deadline has passed
+        """
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        return min(self.timeout, remaining)
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize the breaker
+
+        Args:
+            name: Name used in logs and errors
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """
+        Check whether a call may proceed
+
+        Raises:
+            TraderaUnavailableError: If the circuit is open (or a half-open trial is already running)
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if elapsed >= self.reset_timeout and not self._trial_in_flight:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = True
+                return
+            retry_after = max(0.0, self.reset_timeout - elapsed)
+        raise TraderaUnavailableError(f"Tradera {self.name} unavailable (circuit open)", retry_after=retry_after)
+
+    def record_success(self):
+        """Record a successful call, closing the circuit"""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Record a failed call, opening the circuit if the threshold is reached"""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit for Tradera {self.name} opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
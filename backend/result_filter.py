@@ -0,0 +1,222 @@
+"""
+Search Result Filtering
+
+A filter/score stage between `TraderaAPI._process_search_items` and ingest,
+so items that are irrelevant to a script are never stored.
+
+A script's `result_filters` may contain:
+- negative_keywords: drop items whose title or description contains any of these words
+- max_total_price: drop items whose price (the higher of current price and next bid) exceeds this
+- title_pattern: regular expression the title must match (case-insensitive)
+- min_score: drop items whose relevance score (share of query terms in the title) is below this
+
+Tradera search results carry neither seller ratings nor shipping costs, so
+`max_total_price` excludes shipping until the cost is available, and
+`min_seller_rating` is rejected, since it could not drop anything.
+
+Filters are compiled once per script version and applied column-wise over a
+whole result page; drop counts are kept per script and reason.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from profiling import span
+
+logger = logging.getLogger(__name__)
+
+FILTER_KEYS = ("negative_keywords", "min_seller_rating", "max_total_price", "title_pattern", "min_score")
+
+# Filters on item data that search results don't include
+UNSUPPORTED_FILTERS = ("min_seller_rating",)
+
+# Drop reasons, in the order filters are applied
+DROP_REASONS = ("negative_keyword", "total_price", "title_pattern", "score")
+
+
+def total_price(item: Dict[str, Any]) -> float:
+    """Price we would at least pay for an item: current price or next bid (shipping isn't in search results)"""
+    return max(float(item.get("current_price") or 0), float(item.get("next_bid") or 0))
+
+
+class CompiledFilter:
+    """A script's result filters, compiled for repeated use"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, query: str = ""):
+        """
+        Compile filters
+
+        Args:
+            config: Filter configuration (see module docstring)
+            query: Search text of the script, used for relevance scoring
+
+        Raises:
+            ValueError: If a pattern does not compile, a threshold is not a number or a filter is unsupported
+        """
+        config = config or {}
+        unknown = set(config) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown result filters: {', '.join(sorted(unknown))}")
+        unsupported = [key for key in UNSUPPORTED_FILTERS if config.get(key) is not None]
+        if unsupported:
+            raise ValueError(f"Unsupported result filters: {', '.join(unsupported)} "
+                             f"(Tradera search results include no seller ratings)")
+
+        keywords = [keyword.strip() for keyword in config.get("negative_keywords") or [] if keyword.strip()]
+        self.negative = None
+        if keywords:
+            alternatives = "|".join(re.escape(keyword) for keyword in keywords)
+            self.negative = re.compile(rf"\b(?:{alternatives})\b", re.IGNORECASE)
+
+        self.title_pattern = None
+        if config.get("title_pattern"):
+            try:
+                self.title_pattern = re.compile(config["title_pattern"], re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"Invalid title_pattern: {e}")
+
+        try:
+            self.max_total_price = _optional_float(config.get("max_total_price"))
+            self.min_score = _optional_float(config.get("min_score"))
+        except (TypeError, ValueError):
+            raise ValueError("Result filter thresholds must be numbers")
+
+        self.terms = [term for term in re.findall(r"\w+", (query or "").lower()) if len(term) > 1]
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether the filter keeps every item"""
+        return (self.negative is None and self.max_total_price is None and self.title_pattern is None
+                and self.min_score is None)
+
+    def score(self, title: str) -> float:
+        """Relevance of a title: share of query terms it contains (1.0 without a query)"""
+        if not self.terms:
+            return 1.0
+        words = set(re.findall(r"\w+", title.lower()))
+        return sum(1 for term in self.terms if term in words) / len(self.terms)
+
+    def apply(self, items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Filter a page of search items
+
+        Args:
+            items: Items from `_process_search_items`
+
+        Returns:
+            Tuple of (kept items, drop counts by reason)
+        """
+        drops = {reason: 0 for reason in DROP_REASONS}
+        if self.is_empty or not items:
+            return list(items), drops
+
+        # Each predicate runs over a column of the page; `alive` holds the
+        # positions still in the result so later predicates skip dropped rows
+        titles = [str(item.get("title") or "") for item in items]
+        alive = list(range(len(items)))
+
+        def keep(reason, predicate):
+            nonlocal alive
+            kept = [position for position in alive if predicate(position)]
+            drops[reason] = len(alive) - len(kept)
+            alive = kept
+
+        if self.negative is not None:
+            texts = [f"{title} {items[i].get('description') or ''}" for i, title in enumerate(titles)]
+            keep("negative_keyword", lambda i: self.negative.search(texts[i]) is None)
+        if self.max_total_price is not None:
+            prices = [total_price(item) for item in items]
+            keep("total_price", lambda i: prices[i] <= self.max_total_price)
+        if self.title_pattern is not None:
+            keep("title_pattern", lambda i: self.title_pattern.search(titles[i]) is not None)
+        if self.min_score is not None:
+            keep("score", lambda i: self.score(titles[i]) >= self.min_score)
+
+        return [items[position] for position in alive], drops
+
+
+def _optional_float(value: Any) -> Optional[float]:
+    return None if value is None or value == "" else float(value)
+
+
+class FilterCache:
+    """Compiled filters per script, recompiled when the script changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filters: Dict[Any, Tuple[Any, CompiledFilter]] = {}
+
+    def get(self, script: Dict[str, Any]) -> CompiledFilter:
+        """Get the compiled filter for a script row"""
+        config = script.get("result_filters") or {}
+        fingerprint = (repr(sorted(config.items())), script.get("query", ""))
+        script_id = script.get("id")
+        with span("cache.compiled_filters", script_id=script_id) as trace_span:
+            with self._lock:
+                cached = self._filters.get(script_id)
+                if cached is not None and cached[0] == fingerprint:
+                    trace_span.set_attribute("cache.hit", True)
+                    return cached[1]
+            trace_span.set_attribute("cache.hit", False)
+            compiled = CompiledFilter(config, script.get("query", ""))
+            with self._lock:
+                self._filters[script_id] = (fingerprint, compiled)
+            return compiled
+
+    def invalidate(self, script_id: Any):
+        """Forget a script's compiled filter"""
+        with self._lock:
+            self._filters.pop(script_id, None)
+
+
+class FilterStats:
+    """Per-script counters of seen, kept and dropped items"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, script_id: Any, seen: int, kept: int, drops: Dict[str, int]):
+        """Add the outcome of filtering one page"""
+        with self._lock:
+            stats = self._stats.setdefault(str(script_id), {
+                "seen": 0, "kept": 0, "dropped": 0, "dropped_by_reason": {reason: 0 for reason in DROP_REASONS},
+            })
+            stats["seen"] += seen
+            stats["kept"] += kept
+            stats["dropped"] += seen - kept
+            for reason, count in drops.items():
+                stats["dropped_by_reason"][reason] = stats["dropped_by_reason"].get(reason, 0) + count
+
+    def get(self, script_id: Any) -> Dict[str, Any]:
+        """Counters for a script"""
+        with self._lock:
+            stats = self._stats.get(str(script_id))
+            if stats is None:
+                return {"seen": 0, "kept": 0, "dropped": 0, "dropped_by_reason": {reason: 0 for reason in DROP_REASONS}}
+            return {**stats, "dropped_by_reason": dict(stats["dropped_by_reason"])}
+
+
+# Process-wide instances shared by the routes and the worker
+compiled_filters = FilterCache()
+filter_stats = FilterStats()
+
+
+def filter_search_items(script: Dict[str, Any], items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Apply a script's result filters to a page of items and record the counts
+
+    Args:
+        script: Script row (uses `id`, `query` and `result_filters`)
+        items: Items from `_process_search_items`
+
+    Returns:
+        Items to ingest
+    """
+    kept, drops = compiled_filters.get(script).apply(items)
+    filter_stats.record(script.get("id"), len(items), len(kept), drops)
+    if len(kept) < len(items):
+        logger.info(f"Script {script.get('id')}: dropped {len(items) - len(kept)} of {len(items)} items")
+    return kept
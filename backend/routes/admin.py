@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, Query
+import logging
+from profiling import slow_requests
+from loop_monitor import event_loop_monitor
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter(tags=["admin"])
+
+# Routes
+@router.get("/api/admin/slow-requests")
+async def get_slow_requests(limit: int = Query(20, ge=1, le=500)):
+    """Get the most recent slow profiled requests (newest first) with time per span name"""
+    return [profile.summary() for profile in slow_requests.recent(limit)]
+
+@router.get("/api/admin/slow-requests/{profile_id}")
+async def get_slow_request(profile_id: str):
+    """Get one slow request's full span timeline"""
+    profile = slow_requests.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.to_dict()
+
+@router.get("/api/admin/event-loop")
+async def get_event_loop(limit: int = Query(20, ge=1, le=100)):
+    """Get event loop lag and blocking-call histograms and the most recent blocking calls"""
+    return {
+        **event_loop_monitor.stats(),
+        "blocking_calls": event_loop_monitor.recent_blocking_calls(limit),
+    }
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import logging
-from db import get_supabase_client
+from http_cache import table_etag, is_not_modified, not_modified_response, set_cache_headers
+from fast_json import fast_responses_enabled, list_response
+from db import get_supabase_client, select_all, user_stats
 import sys
 import os
 
 # Add the parent directory to sys.path to allow absolute imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tradera_api import TraderaAPI
+from tradera_api import shared_tradera_api
+from auction_index import auction_index
+from auction_dedup import ingest_items, seen_auctions
+from price_history import price_history
+import search_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -16,8 +23,8 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter(tags=["auctions"])
 
-# Initialize TraderaAPI
-tradera_api = TraderaAPI()
+# Shared TraderaAPI client (created on first use)
+tradera_api = shared_tradera_api
 
 # Models
 class AuctionBase(BaseModel):
@@ -31,6 +38,7 @@ class AuctionBase(BaseModel):
     seller_rating: Optional[float] = None
     category: Optional[str] = None
     bid_count: Optional[int] = 0
+    next_bid: Optional[float] = None
 
 class AuctionCreate(AuctionBase):
     pass
@@ -50,19 +58,224 @@ class SearchParams(BaseModel):
     max_price: Optional[float] = None
     sort_by: Optional[str] = "EndDateAscending"
     limit: Optional[int] = 20
+    page: int = Field(1, ge=1)
+
+class RefreshRequest(BaseModel):
+    auction_ids: List[int]
+
+def _load_active_auctions():
+    """Cold path for the in-memory auction index"""
+    supabase = get_supabase_client()
+    return select_all(lambda: supabase.table("auctions").select("*").eq("status", "active").order("id"))
+
+def _index_filters(category: Optional[str], min_price: Optional[float], max_price: Optional[float],
+                   ends_after: Optional[str], ends_before: Optional[str]) -> dict:
+    """Build an AuctionIndex filter dictionary from query parameters"""
+    filters = {
+        "category": category,
+        "min_price": min_price,
+        "max_price": max_price,
+        "end_time_gt": ends_after,
+        "end_time_lt": ends_before,
+    }
+    return {key: value for key, value in filters.items() if value is not None}
 
 # Routes
 @router.get("/api/auctions", response_model=List[Auction])
-async def get_auctions():
+async def get_auctions(request: Request, response: Response):
     """Get all auctions from the database"""
     try:
+        # Answer conditional requests from the table version alone
+        etag = table_etag("auctions")
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        
         supabase = get_supabase_client()
-        response = supabase.table("auctions").select("*").execute()
-        return response.data
+        result = supabase.table("auctions").select("*").execute()
+        if fast_responses_enabled():
+            # Trusted DB rows: skip response_model validation
+            return list_response(result.data, etag)
+        set_cache_headers(response, etag)
+        return result.data
     except Exception as e:
         logger.error(f"Error getting auctions: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/api/auctions/query")
+async def query_active_auctions(
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    ends_after: Optional[str] = None,
+    ends_before: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+):
+    """Filter active auctions from the in-memory index, ordered by end time"""
+    try:
+        auction_index.ensure_loaded(_load_active_auctions)
+        filters = _index_filters(category, min_price, max_price, ends_after, ends_before)
+        auctions = auction_index.query(filters, limit=limit)
+        if fast_responses_enabled():
+            return list_response(auctions)
+        return auctions
+    except Exception as e:
+        logger.error(f"Error querying auctions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/auctions/count")
+async def count_active_auctions(
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    ends_after: Optional[str] = None,
+    ends_before: Optional[str] = None,
+):
+    """Count active auctions matching the filters from the in-memory index"""
+    try:
+        auction_index.ensure_loaded(_load_active_auctions)
+        filters = _index_filters(category, min_price, max_price, ends_after, ends_before)
+        return {"count": auction_index.count(filters)}
+    except Exception as e:
+        logger.error(f"Error counting auctions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/auctions/price-histogram")
+async def active_auction_price_histogram(
+    bins: int = Query(10, ge=1, le=100),
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    ends_after: Optional[str] = None,
+    ends_before: Optional[str] = None,
+):
+    """Histogram of current prices of active auctions from the in-memory index"""
+    try:
+        auction_index.ensure_loaded(_load_active_auctions)
+        filters = _index_filters(category, min_price, max_price, ends_after, ends_before)
+        return auction_index.price_histogram(bins, filters)
+    except Exception as e:
+        logger.error(f"Error building price histogram: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _record_results(supabase, ended):
+    """
+    Record who won and who lost the auctions that just ended
+
+    Tradera doesn't name the winner, so the outcome comes from the final price:
+    the highest of our users' bids won if it reached the final price (the price
+    stops at the winning bid), every other bidder lost. Users whose Buy went
+    through were already counted as winners when they bought.
+
+    Args:
+        supabase: Supabase client
+        ended: Ended auctions by ID, with their final price in `current_price`
+    """
+    bids = supabase.table("bids").select("auction_id, user_id, amount, status").in_("auction_id", list(ended)).execute()
+    highest = {}
+    bought = set()
+    for bid in bids.data or []:
+        if bid.get("user_id") is None or bid.get("status") == "failed":
+            continue
+        key = (bid["auction_id"], bid["user_id"])
+        if bid.get("status") == "won":
+            bought.add(key)
+        highest[key] = max(highest.get(key, 0.0), float(bid.get("amount") or 0))
+
+    top = {}
+    for (auction_id, user_id), amount in highest.items():
+        if amount > top.get(auction_id, (None, -1.0))[1]:
+            top[auction_id] = (user_id, amount)
+    bought_auctions = {auction_id for auction_id, _ in bought}
+    for (auction_id, user_id), amount in highest.items():
+        if auction_id in bought_auctions:
+            if (auction_id, user_id) not in bought:
+                user_stats.record_result(user_id, ended[auction_id], won=False)
+            continue
+        final_price = float(ended[auction_id].get("current_price") or 0)
+        won = top[auction_id][0] == user_id and amount >= final_price
+        user_stats.record_result(user_id, ended[auction_id], won=won, amount=final_price if won else 0)
+
+@router.post("/api/auctions/refresh")
+async def refresh_auctions(refresh_request: RefreshRequest):
+    """Refresh price, bid count and end state of specific auctions from Tradera"""
+    try:
+        supabase = get_supabase_client()
+        response = supabase.table("auctions").select("*").in_("id", refresh_request.auction_ids).execute()
+        rows = response.data or []
+        
+        items = await run_in_threadpool(tradera_api.get_items, [int(row["tradera_id"]) for row in rows])
+        
+        updates = []
+        failed = []
+        newly_ended = {}
+        for row in rows:
+            item = items.get(int(row["tradera_id"]), {})
+            if "error" in item:
+                failed.append(row["id"])
+                continue
+            
+            # The NOT NULL columns come along because an upsert is checked as an insert
+            update = {
+                "id": row["id"],
+                "tradera_id": row["tradera_id"],
+                "title": row["title"],
+                "current_price": float(item["current_price"]),
+                "end_time": item.get("end_date") or row["end_time"],
+                "bid_count": int(item.get("bid_count", 0)),
+                "status": item["status"],
+                "next_bid": item.get("next_bid"),
+            }
+            updates.append(update)
+            if item["status"] == "ended" and row.get("status", "active") == "active":
+                newly_ended[row["id"]] = {**row, **update}
+        
+        # One round trip for the whole batch
+        refreshed = []
+        if updates:
+            refreshed = supabase.table("auctions").upsert(updates, on_conflict="id").execute().data or []
+        for updated in refreshed:
+            seen_auctions.record(updated)
+        auction_index.upsert(refreshed)
+        price_history.observe_rows(refreshed)
+        
+        if newly_ended:
+            _record_results(supabase, newly_ended)
+        
+        found_ids = {row["id"] for row in rows}
+        return {
+            "refreshed": refreshed,
+            "failed": failed,
+            "not_found": [auction_id for auction_id in refresh_request.auction_ids if auction_id not in found_ids],
+        }
+    except Exception as e:
+        logger.error(f"Error refreshing auctions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/auctions/{auction_id}/scripts")
+async def get_auction_scripts(auction_id: int):
+    """Get the scripts whose searches matched an auction"""
+    try:
+        supabase = get_supabase_client()
+        response = supabase.table("auction_scripts").select("script_id, first_matched_at").eq("auction_id", auction_id).execute()
+        return response.data
+    except Exception as e:
+        logger.error(f"Error getting scripts for auction {auction_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/auctions/{auction_id}/history")
+async def get_auction_history(
+    auction_id: int,
+    since: Optional[str] = None,
+    bucket_seconds: int = Query(0, ge=0),
+):
+    """Get the price and bid-count history of an auction, optionally downsampled"""
+    try:
+        points = price_history.history(auction_id, since=since, bucket_seconds=bucket_seconds)
+        return {"auction_id": auction_id, "points": points}
+    except Exception as e:
+        logger.error(f"Error getting history for auction {auction_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/api/auctions/{auction_id}", response_model=Auction)
 async def get_auction(auction_id: int):
     """Get a specific auction by ID"""
@@ -81,57 +294,33 @@ async def get_auction(auction_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/api/search", response_model=List[Auction])
-async def search_auctions(search_params: SearchParams):
+async def search_auctions(search_params: SearchParams, response: Response):
     """Search for auctions on Tradera and store results in database"""
     try:
-        # Search Tradera API
-        search_results = tradera_api.search_advanced(
-            search_text=search_params.query,
-            category_id=search_params.category_id,
-            min_price=search_params.min_price,
-            max_price=search_params.max_price,
-            sort_order=search_params.sort_by,
-            items_per_page=search_params.limit
-        )
+        # Search Tradera API (through the search cache, which prefetches the next page)
+        search_results, cached = await search_cache.search(tradera_api, {
+            "search_words": search_params.query,
+            "category_id": search_params.category_id or 0,
+            "price_minimum": int(search_params.min_price) if search_params.min_price is not None else None,
+            "price_maximum": int(search_params.max_price) if search_params.max_price is not None else None,
+            "order_by": search_params.sort_by,
+            "items_per_page": search_params.limit,
+        }, page=search_params.page)
         
         if "error" in search_results:
-            raise HTTPException(status_code=500, detail=search_results["error"])
+            # Tradera is degraded (circuit open or retries exhausted): tell the client to back off
+            status_code = 503 if search_results.get("unavailable") else 500
+            raise HTTPException(status_code=status_code, detail=search_results["error"])
         
-        # Process and store results
-        auctions = []
+        # Store new and changed items only
         supabase = get_supabase_client()
+        auctions, _, written = ingest_items(supabase, search_results.get("items", []))
         
-        for item in search_results.get("items", []):
-            # Check if auction already exists
-            existing = supabase.table("auctions").select("*").eq("tradera_id", item["id"]).execute()
-            
-            auction_data = {
-                "title": item["title"],
-                "description": item.get("description", ""),
-                "tradera_id": item["id"],
-                "current_price": float(item["current_price"]),
-                "end_time": item["end_time"],
-                "image_url": item.get("image_url", ""),
-                "seller_id": item.get("seller_id", ""),
-                "seller_rating": float(item.get("seller_rating", 0)),
-                "category": item.get("category_name", ""),
-                "bid_count": int(item.get("bid_count", 0))
-            }
-            
-            if existing.data:
-                # Update existing auction
-                auction_id = existing.data[0]["id"]
-                supabase.table("auctions").update(auction_data).eq("id", auction_id).execute()
-                auction_data["id"] = auction_id
-                auction_data["created_at"] = existing.data[0]["created_at"]
-                auction_data["updated_at"] = "now()"
-            else:
-                # Insert new auction
-                result = supabase.table("auctions").insert(auction_data).execute()
-                auction_data.update(result.data[0])
-            
-            auctions.append(auction_data)
+        auction_index.upsert(written)
+        price_history.observe_rows(written)
         
+        response.headers["X-Cache"] = "hit" if cached else "miss"
+        response.headers["X-Total-Pages"] = str(search_results.get("total_pages", 0))
         return auctions
     except HTTPException:
         raise
@@ -149,6 +338,9 @@ async def delete_auction(auction_id: int):
         if not response.data:
             raise HTTPException(status_code=404, detail="Auction not found")
         
+        auction_index.remove(auction_id)
+        seen_auctions.remove(auction_id)
+        
         return {"message": "Auction deleted successfully"}
     except HTTPException:
         raise
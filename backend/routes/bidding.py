@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
 from typing import List, Optional
 from pydantic import BaseModel
 import logging
-from db import get_supabase_client
+import uuid
+from datetime import datetime, timezone
+from http_cache import table_etag, is_not_modified, not_modified_response, set_cache_headers
+from fast_json import fast_responses_enabled, list_response
+from db import get_supabase_client, user_stats, get_bid_configs_ending_within
 import sys
 import os
 
 # Add the parent directory to sys.path to allow absolute imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tradera_api import TraderaAPI
+from tradera_api import shared_tradera_api
+from sniper import hedge_metrics
+from bid_strategy import DEFAULT_STRATEGY, STRATEGIES, decide_for
+from write_behind import write_behind, write_behind_enabled
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -16,8 +23,8 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter(tags=["bidding"])
 
-# Initialize TraderaAPI
-tradera_api = TraderaAPI()
+# Shared TraderaAPI client (created on first use)
+tradera_api = shared_tradera_api
 
 # Models
 class BidConfigBase(BaseModel):
@@ -25,6 +32,7 @@ class BidConfigBase(BaseModel):
     max_bid_amount: float
     bid_seconds_before_end: int
     is_active: bool = True
+    strategy: str = DEFAULT_STRATEGY
 
 class BidConfigCreate(BidConfigBase):
     pass
@@ -40,7 +48,7 @@ class BidConfig(BidConfigBase):
 
 class BidBase(BaseModel):
     auction_id: int
-    amount: float
+    amount: Optional[float] = None  # None: computed from the auction's bid config strategy
     user_id: Optional[int] = None
     token: Optional[str] = None
 
@@ -48,9 +56,10 @@ class BidCreate(BidBase):
     pass
 
 class Bid(BidBase):
-    id: int
+    id: Optional[int] = None  # None until a written-behind bid is stored (see idempotency_key)
     status: str
     created_at: str
+    idempotency_key: Optional[str] = None
     tradera_response: Optional[str] = None
     tradera_status: Optional[str] = None
     next_bid: Optional[float] = None
@@ -58,6 +67,11 @@ class Bid(BidBase):
     class Config:
         orm_mode = True
 
+def _check_strategy(bid_config: BidConfigCreate):
+    """Reject unknown bid strategies with 400"""
+    if bid_config.strategy not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Unknown bid strategy: {bid_config.strategy}")
+
 # Routes
 @router.get("/api/bid-configs", response_model=List[BidConfig])
 async def get_bid_configs():
@@ -70,10 +84,20 @@ async def get_bid_configs():
         logger.error(f"Error getting bid configs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/api/bid-configs/ending-soon")
+async def get_bid_configs_ending_soon(minutes: int = Query(10, ge=1, le=1440)):
+    """Get active bid configurations whose auction ends within the next `minutes`, soonest first"""
+    try:
+        return await get_bid_configs_ending_within(minutes)
+    except Exception as e:
+        logger.error(f"Error getting bid configs ending soon: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/api/auctions/{auction_id}/bid-config", response_model=BidConfig)
 async def create_bid_config(auction_id: int, bid_config: BidConfigCreate):
     """Create a new bid configuration for an auction"""
     try:
+        _check_strategy(bid_config)
         supabase = get_supabase_client()
         
         # Check if auction exists
@@ -102,6 +126,7 @@ async def create_bid_config(auction_id: int, bid_config: BidConfigCreate):
 async def update_bid_config(auction_id: int, bid_config: BidConfigCreate):
     """Update an existing bid configuration"""
     try:
+        _check_strategy(bid_config)
         supabase = get_supabase_client()
         
         # Check if bid config exists
@@ -144,7 +169,7 @@ async def delete_bid_config(auction_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/api/auctions/{auction_id}/bid", response_model=Bid)
-async def place_bid(auction_id: int, bid: BidCreate):
+async def place_bid(auction_id: int, bid: BidCreate, background_tasks: BackgroundTasks):
     """Place a bid on an auction"""
     try:
         supabase = get_supabase_client()
@@ -156,14 +181,29 @@ async def place_bid(auction_id: int, bid: BidCreate):
         
         auction = auction_response.data[0]
         
+        # Without an explicit amount, let the bid config's strategy decide
+        amount = bid.amount
+        if amount is None:
+            config_response = supabase.table("bid_configs").select("*").eq("auction_id", auction_id).eq("is_active", True).execute()
+            if not config_response.data:
+                raise HTTPException(status_code=400, detail="No amount given and no active bid configuration for this auction")
+            decision = decide_for(config_response.data[0], auction)
+            if decision.amount is None:
+                raise HTTPException(status_code=409, detail=f"Not bidding: {decision.reason}")
+            amount = decision.amount
+        
         # Set user token if provided
         if bid.user_id and bid.token:
             tradera_api.set_user_token(bid.user_id, bid.token)
         
-        # Place bid via Tradera API
+        # Place bid via Tradera API, never retrying past the auction end
+        deadline = None
+        if auction.get("end_time"):
+            deadline = datetime.fromisoformat(str(auction["end_time"]).replace("Z", "+00:00")).timestamp()
         bid_result = tradera_api.place_bid(
             item_id=int(auction["tradera_id"]),
-            bid_amount=bid.amount
+            bid_amount=amount,
+            deadline=deadline
         )
         
         if "error" in bid_result:
@@ -172,20 +212,35 @@ async def place_bid(auction_id: int, bid: BidCreate):
         # Determine bid status
         status = "won" if bid_result.get("status") == "Bought" else "placed"
         
+        # The bid is confirmed: answer now and store the bookkeeping in the background
+        if write_behind_enabled():
+            return _record_bid_behind(auction, amount, status, bid, bid_result, background_tasks)
+        
+        # Check whether this is the user's first bid on the auction (for statistics)
+        previous_bids = None
+        if bid.user_id:
+            previous_bids = (supabase.table("bids").select("id").eq("auction_id", auction_id)
+                             .eq("user_id", str(bid.user_id)).limit(1).execute())
+        
         # Store bid in database
         bid_data = {
             "auction_id": auction_id,
-            "amount": bid.amount,
+            "amount": amount,
             "status": status,
+            "user_id": str(bid.user_id) if bid.user_id else None,
             "tradera_response": str(bid_result)
         }
         
         bid_response = supabase.table("bids").insert(bid_data).execute()
         
-        # Update auction bid count
-        supabase.table("auctions").update({
-            "bid_count": (auction.get("bid_count", 0) or 0) + 1
-        }).eq("id", auction_id).execute()
+        # Update statistics aggregates
+        if previous_bids is not None and not previous_bids.data:
+            user_stats.record_first_bid(bid.user_id, auction)
+        if status == "won":
+            user_stats.record_result(bid.user_id, auction, won=True, amount=amount)
+        
+        # Update auction bid count (and the next acceptable bid, for the strategy engine)
+        supabase.table("auctions").update(_auction_update(auction, bid_result)).eq("id", auction_id).execute()
         
         # Return bid with additional info
         result = bid_response.data[0]
@@ -199,13 +254,69 @@ async def place_bid(auction_id: int, bid: BidCreate):
         logger.error(f"Error placing bid: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _auction_update(auction, bid_result):
+    """Bid count (and the next acceptable bid, for the strategy engine) after our bid"""
+    auction_update = {"bid_count": (auction.get("bid_count", 0) or 0) + 1}
+    if bid_result.get("next_bid"):
+        auction_update["next_bid"] = bid_result["next_bid"]
+    return auction_update
+
+def _record_bid_behind(auction, amount, status, bid, bid_result, background_tasks):
+    """Queue the bid row and auction update in the write-behind buffer and build the response"""
+    bid_data = {
+        "auction_id": auction["id"],
+        "amount": amount,
+        "status": status,
+        "user_id": str(bid.user_id) if bid.user_id else None,
+        "tradera_response": str(bid_result),
+        "idempotency_key": f"bid-{uuid.uuid4().hex}",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    write_behind.insert("bids", bid_data, on_conflict="idempotency_key")
+    write_behind.update("auctions", auction["id"], _auction_update(auction, bid_result))
+    background_tasks.add_task(_record_bid_stats, bid.user_id, auction, status, amount, bid_data["idempotency_key"])
+    return {**bid_data, "id": None, "tradera_status": bid_result.get("status"), "next_bid": bid_result.get("next_bid")}
+
+def _record_bid_stats(user_id, auction, status, amount, idempotency_key):
+    """Update statistics for a written-behind bid (runs after the response is sent)"""
+    if user_id is None:
+        return
+    try:
+        # The user's first bid on the auction, counting bids still queued
+        queued = any(op["row"]["auction_id"] == auction["id"] and op["row"]["user_id"] == str(user_id)
+                     and op["row"]["idempotency_key"] != idempotency_key
+                     for op in write_behind.pending("bids") if op["op"] == "insert")
+        if not queued:
+            previous_bids = (get_supabase_client().table("bids").select("id").eq("auction_id", auction["id"])
+                             .eq("user_id", str(user_id)).neq("idempotency_key", idempotency_key).limit(1).execute())
+            if not previous_bids.data:
+                user_stats.record_first_bid(user_id, auction)
+        if status == "won":
+            user_stats.record_result(user_id, auction, won=True, amount=amount)
+    except Exception as e:
+        logger.error(f"Error updating statistics for bid on auction {auction['id']}: {e}")
+
 @router.get("/api/bids", response_model=List[Bid])
-async def get_bids():
+async def get_bids(request: Request, response: Response):
     """Get all bids"""
     try:
+        # Answer conditional requests from the table version alone
+        etag = table_etag("bids")
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        
         supabase = get_supabase_client()
-        response = supabase.table("bids").select("*").execute()
-        return response.data
+        result = supabase.table("bids").select("*").execute()
+        if fast_responses_enabled():
+            # Trusted DB rows: skip response_model validation
+            return list_response(result.data, etag)
+        set_cache_headers(response, etag)
+        return result.data
     except Exception as e:
         logger.error(f"Error getting bids: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/bids/hedge-metrics")
+async def get_hedge_metrics():
+    """Get counters for hedged bid submissions"""
+    return hedge_metrics.snapshot()
@@ -0,0 +1,89 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import codecs
+import logging
+import tempfile
+from db import get_supabase_client
+from data_export import (COLUMN_TYPES, EXPORT_TABLES, BatchImporter, iter_csv, iter_ndjson, iter_rows,
+                         parse_csv_lines, parse_ndjson_lines)
+from auction_index import auction_index
+from auction_dedup import seen_auctions
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter(tags=["export"])
+
+# Request bodies above this size are spooled to disk while importing
+SPOOL_SIZE = 8 * 1024 * 1024
+
+def _check_table(table: str, time_field: str = "created_at"):
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown table: {table}")
+    if time_field not in EXPORT_TABLES[table]:
+        raise HTTPException(status_code=400, detail=f"Cannot filter {table} by {time_field}")
+
+def _update_indexes(rows):
+    """Keep the in-memory auction indexes in line with imported auctions"""
+    auction_index.upsert(rows)
+    for row in rows:
+        seen_auctions.record(row)
+
+# Routes
+@router.get("/api/export/{table}")
+async def export_table(
+    table: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    time_field: str = "created_at",
+):
+    """Stream a table as NDJSON or CSV, optionally limited to a time range"""
+    _check_table(table, time_field)
+    try:
+        rows = iter_rows(get_supabase_client(), table, since=since, until=until, time_field=time_field)
+        if format == "csv":
+            body, media_type = iter_csv(rows), "text/csv"
+        else:
+            body, media_type = iter_ndjson(rows), "application/x-ndjson"
+        return StreamingResponse(
+            body,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'},
+        )
+    except Exception as e:
+        logger.error(f"Error exporting {table}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/api/import/{table}")
+async def import_table(table: str, request: Request, batch_size: int = Query(500, ge=1, le=5000)):
+    """Bulk import NDJSON or CSV (by Content-Type) rows into a table, upserting by ID"""
+    _check_table(table)
+    csv_body = request.headers.get("content-type", "").startswith("text/csv")
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+
+        def run_import():
+            lines = codecs.getreader("utf-8")(spool)
+            rows = parse_csv_lines(lines, COLUMN_TYPES[table]) if csv_body else parse_ndjson_lines(lines)
+            importer = BatchImporter(get_supabase_client(), table, batch_size=batch_size,
+                                     on_flush=_update_indexes if table == "auctions" else None)
+            for row in rows:
+                importer.add(row)
+            importer.finish()
+            return importer
+
+        try:
+            importer = await run_in_threadpool(run_import)
+        except ValueError as e:
+            # Also covers json.JSONDecodeError
+            raise HTTPException(status_code=400, detail=f"Invalid import data: {e}")
+        except Exception as e:
+            logger.error(f"Error importing {table}: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+    return {"table": table, "imported": importer.imported, "batches": importer.batches}
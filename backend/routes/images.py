@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import logging
+from image_cache import ImageProxyError, image_cache, image_proxy_enabled
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter(tags=["images"])
+
+# Cached images never change under their URL
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _headers(image):
+    return {"ETag": f'"{image.digest}"', "Cache-Control": CACHE_CONTROL}
+
+def _read_blob(blob, chunk_size=64 * 1024):
+    with blob:
+        while chunk := blob.read(chunk_size):
+            yield chunk
+
+# Routes
+@router.get("/api/images")
+async def get_image(request: Request, url: str = Query(..., min_length=1)):
+    """Serve a Tradera image from the on-disk image cache, fetching it on first use"""
+    if not image_proxy_enabled():
+        raise HTTPException(status_code=404, detail="Image proxy is disabled")
+    try:
+        image = await image_cache.get(url)
+        if request.headers.get("if-none-match") == f'"{image.digest}"':
+            return Response(status_code=304, headers=_headers(image))
+        try:
+            blob = await run_in_threadpool(open, image.path, "rb")
+        except FileNotFoundError:
+            # Evicted by a concurrent store since the lookup, so now it's a miss
+            image = await image_cache.get(url)
+            blob = await run_in_threadpool(open, image.path, "rb")
+        # Served from the open file, which stays readable if the blob is evicted meanwhile
+        return StreamingResponse(_read_blob(blob), media_type=image.content_type,
+                                 headers={**_headers(image), "Content-Length": str(image.size)})
+    except ImageProxyError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error proxying image {url}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
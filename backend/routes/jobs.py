@@ -0,0 +1,68 @@
+from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+import logging
+from job_queue import get_job_queue, RUN_SCRIPT, REFRESH_AUCTION, FIRE_BID, DOWNSAMPLE_HISTORY
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter(tags=["jobs"])
+
+JOB_TYPES = {RUN_SCRIPT, REFRESH_AUCTION, FIRE_BID, DOWNSAMPLE_HISTORY}
+
+def _redact(job):
+    """Never echo user tokens back, not even sealed ones"""
+    job["payload"] = {key: value for key, value in job["payload"].items() if key not in ("token", "sealed_token")}
+    return job
+
+# Models
+class JobCreate(BaseModel):
+    type: str
+    payload: Dict[str, Any] = {}
+    priority: Optional[int] = None
+    dedup_key: Optional[str] = None
+    run_at: Optional[float] = None
+    max_attempts: int = 5
+
+# Routes
+@router.post("/api/jobs")
+async def create_job(job: JobCreate):
+    """Enqueue a background job"""
+    if job.type not in JOB_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown job type: {job.type}")
+    try:
+        payload = dict(job.payload)
+        if "token" in payload:
+            # Only the encrypted token is stored
+            payload["sealed_token"] = get_job_queue().seal(str(payload.pop("token")))
+        job_id = get_job_queue().enqueue(
+            job.type,
+            payload,
+            priority=job.priority,
+            dedup_key=job.dedup_key,
+            run_at=job.run_at,
+            max_attempts=job.max_attempts
+        )
+        return _redact(get_job_queue().get(job_id))
+    except Exception as e:
+        logger.error(f"Error enqueuing job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/jobs")
+async def get_job_counts():
+    """Get the number of jobs per status"""
+    try:
+        return get_job_queue().counts()
+    except Exception as e:
+        logger.error(f"Error getting job counts: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/jobs/{job_id}")
+async def get_job(job_id: int):
+    """Get a job by ID"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _redact(job)
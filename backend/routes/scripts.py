@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from typing import List, Optional
 from pydantic import BaseModel
 import logging
-from db import get_supabase_client
+from http_cache import table_etag, is_not_modified, not_modified_response, set_cache_headers
+from fast_json import fast_responses_enabled, list_response
+from db import get_supabase_client, user_stats, get_due_scripts, mark_script_run
 import sys
 import os
 
 # Add the parent directory to sys.path to allow absolute imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tradera_api import TraderaAPI
+from tradera_api import shared_tradera_api
+from auction_index import auction_index
+from auction_dedup import ingest_items
+from price_history import price_history
+from result_filter import CompiledFilter, compiled_filters, filter_search_items, filter_stats
+from search_cache import foreground_call
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -16,10 +23,17 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter(tags=["scripts"])
 
-# Initialize TraderaAPI
-tradera_api = TraderaAPI()
+# Shared TraderaAPI client (created on first use)
+tradera_api = shared_tradera_api
 
 # Models
+class ResultFilters(BaseModel):
+    negative_keywords: List[str] = []
+    min_seller_rating: Optional[float] = None
+    max_total_price: Optional[float] = None
+    title_pattern: Optional[str] = None
+    min_score: Optional[float] = None
+
 class SearchScriptBase(BaseModel):
     name: str
     query: str
@@ -30,6 +44,7 @@ class SearchScriptBase(BaseModel):
     is_active: bool = True
     schedule: Optional[str] = "hourly"
     user_id: Optional[str] = None
+    result_filters: Optional[ResultFilters] = None
 
 class SearchScriptCreate(SearchScriptBase):
     pass
@@ -38,22 +53,51 @@ class SearchScript(SearchScriptBase):
     id: int
     created_at: str
     updated_at: Optional[str] = None
+    last_run_at: Optional[str] = None
+    next_run_at: Optional[str] = None
 
     class Config:
         orm_mode = True
 
+def _validate_result_filters(script: SearchScriptCreate):
+    """Compile the script's result filters, rejecting invalid patterns with 400"""
+    if script.result_filters is None:
+        return
+    try:
+        CompiledFilter(script.result_filters.dict(), script.query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Routes
 @router.get("/api/scripts", response_model=List[SearchScript])
-async def get_scripts():
+async def get_scripts(request: Request, response: Response):
     """Get all search scripts"""
     try:
+        # Answer conditional requests from the table version alone
+        etag = table_etag("search_scripts")
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        
         supabase = get_supabase_client()
-        response = supabase.table("search_scripts").select("*").execute()
-        return response.data
+        result = supabase.table("search_scripts").select("*").execute()
+        if fast_responses_enabled():
+            # Trusted DB rows: skip response_model validation
+            return list_response(result.data, etag)
+        set_cache_headers(response, etag)
+        return result.data
     except Exception as e:
         logger.error(f"Error getting scripts: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/api/scripts/due")
+async def get_scripts_due(limit: int = Query(100, ge=1, le=1000)):
+    """Get active scripts that are due to run, most overdue first"""
+    try:
+        return await get_due_scripts(limit)
+    except Exception as e:
+        logger.error(f"Error fetching due scripts: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/api/scripts/{script_id}", response_model=SearchScript)
 async def get_script(script_id: int):
     """Get a specific search script by ID"""
@@ -74,6 +118,7 @@ async def get_script(script_id: int):
 @router.post("/api/scripts", response_model=SearchScript)
 async def create_script(script: SearchScriptCreate):
     """Create a new search script"""
+    _validate_result_filters(script)
     try:
         supabase = get_supabase_client()
         response = supabase.table("search_scripts").insert(script.dict()).execute()
@@ -85,6 +130,7 @@ async def create_script(script: SearchScriptCreate):
 @router.put("/api/scripts/{script_id}", response_model=SearchScript)
 async def update_script(script_id: int, script: SearchScriptCreate):
     """Update an existing search script"""
+    _validate_result_filters(script)
     try:
         supabase = get_supabase_client()
         
@@ -95,6 +141,7 @@ async def update_script(script_id: int, script: SearchScriptCreate):
         
         # Update script
         response = supabase.table("search_scripts").update(script.dict()).eq("id", script_id).execute()
+        compiled_filters.invalidate(script_id)
         return response.data[0]
     except HTTPException:
         raise
@@ -115,6 +162,7 @@ async def delete_script(script_id: int):
         
         # Delete script
         supabase.table("search_scripts").delete().eq("id", script_id).execute()
+        compiled_filters.invalidate(script_id)
         
         return {"message": "Script deleted successfully"}
     except HTTPException:
@@ -136,52 +184,33 @@ async def run_script(script_id: int):
         
         script = script_response.data[0]
         
-        # Run search
+        # Run search (always fresh, but counted against the Tradera budget prefetches draw from)
+        foreground_call()
         search_results = tradera_api.search_advanced(
-            search_text=script["query"],
-            category_id=script.get("category_id"),
-            min_price=script.get("min_price"),
-            max_price=script.get("max_price"),
-            sort_order=script.get("sort_by", "EndDateAscending")
+            search_words=script["query"],
+            category_id=script.get("category_id") or 0,
+            price_minimum=int(script["min_price"]) if script.get("min_price") is not None else None,
+            price_maximum=int(script["max_price"]) if script.get("max_price") is not None else None,
+            order_by=script.get("sort_by") or "EndDateAscending"
         )
         
         if "error" in search_results:
-            raise HTTPException(status_code=500, detail=search_results["error"])
-        
-        # Process and store results
-        auctions = []
-        
-        for item in search_results.get("items", []):
-            # Check if auction already exists
-            existing = supabase.table("auctions").select("*").eq("tradera_id", item["id"]).execute()
-            
-            auction_data = {
-                "title": item["title"],
-                "description": item.get("description", ""),
-                "tradera_id": item["id"],
-                "current_price": float(item["current_price"]),
-                "end_time": item["end_time"],
-                "image_url": item.get("image_url", ""),
-                "seller_id": item.get("seller_id", ""),
-                "seller_rating": float(item.get("seller_rating", 0)),
-                "category": item.get("category_name", ""),
-                "bid_count": int(item.get("bid_count", 0))
-            }
-            
-            if existing.data:
-                # Update existing auction
-                auction_id = existing.data[0]["id"]
-                supabase.table("auctions").update(auction_data).eq("id", auction_id).execute()
-                auction_data["id"] = auction_id
-            else:
-                # Insert new auction
-                result = supabase.table("auctions").insert(auction_data).execute()
-                auction_data.update(result.data[0])
-            
-            auctions.append(auction_data)
-        
-        # Update last run time
-        supabase.table("search_scripts").update({"updated_at": "now()"}).eq("id", script_id).execute()
+            # Tradera is degraded (circuit open or retries exhausted): tell the client to back off
+            status_code = 503 if search_results.get("unavailable") else 500
+            raise HTTPException(status_code=status_code, detail=search_results["error"])
+        
+        # Drop items the script's result filters reject before touching the DB
+        items = filter_search_items(script, search_results.get("items", []))
+        
+        # Store new and changed items only, and record that this script matched them
+        auctions, new_auctions, written = ingest_items(supabase, items, script_id=script_id)
+        
+        auction_index.upsert(written)
+        price_history.observe_rows(written)
+        user_stats.record_auctions_found(script.get("user_id"), new_auctions)
+        
+        # Record the run and when the script is next due
+        await mark_script_run(script_id, script.get("schedule"))
         
         return auctions
     except HTTPException:
@@ -189,3 +218,8 @@ async def run_script(script_id: int):
     except Exception as e:
         logger.error(f"Error running script {script_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/scripts/{script_id}/filter-stats")
+async def get_script_filter_stats(script_id: int):
+    """Get how many search results a script's result filters kept and dropped (since process start)"""
+    return {"script_id": script_id, **filter_stats.get(script_id)}
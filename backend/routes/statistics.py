@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException
+import logging
+from db import get_user_statistics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter(tags=["statistics"])
+
+# Routes
+@router.get("/api/statistics")
+async def get_statistics(user_id: str):
+    """Get precomputed statistics for a user"""
+    try:
+        return await get_user_statistics(user_id)
+    except Exception as e:
+        logger.error(f"Error getting statistics for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,111 @@
+"""
+Script Scheduler
+
+Every tick, active search scripts whose `next_run_at` has passed (see the
+`due_search_scripts` SQL function) are enqueued as run_script jobs. The
+dedup key keeps a script that is already queued or running from being queued
+again; the run itself records when the script is next due.
+
+Each tick is a trace span, and the context travels with the jobs, so a trace
+shows the whole path from the tick to the Tradera search and the stored rows.
+
+Each tick also keeps one downsample_history job scheduled, so old price history
+is thinned out every PRICE_HISTORY_DOWNSAMPLE_INTERVAL seconds.
+
+Run inside the API process by setting SCHEDULER_ENABLED=true, or standalone:
+    python scheduler.py
+"""
+
+import asyncio
+import os
+import time
+from typing import List, Optional
+import logging
+
+import tracing
+from db import get_due_scripts
+from job_queue import JobQueue, get_job_queue, RUN_SCRIPT, DOWNSAMPLE_HISTORY
+from profiling import span
+
+logger = logging.getLogger(__name__)
+
+
+async def schedule_tick(queue: Optional[JobQueue] = None, limit: int = 100) -> List[int]:
+    """
+    Enqueue every due script once
+
+    Args:
+        queue: Job queue (default: the process-wide queue)
+        limit: Maximum number of scripts enqueued per tick
+
+    Returns:
+        IDs of the run_script jobs (existing ones for scripts already queued)
+    """
+    queue = queue or get_job_queue()
+    with span("scheduler.tick", limit=limit) as trace_span:
+        due = await get_due_scripts(limit)
+        job_ids = []
+        for row in due:
+            job_ids.append(await asyncio.to_thread(
+                queue.enqueue, RUN_SCRIPT, {"script_id": row["script_id"]},
+                dedup_key=f"{RUN_SCRIPT}:{row['script_id']}",
+            ))
+        trace_span.set_attribute("scripts_due", len(due))
+    if due:
+        logger.info(f"Scheduled {len(due)} due scripts")
+    return job_ids
+
+
+async def schedule_downsampling(queue: Optional[JobQueue] = None,
+                                interval: Optional[float] = None) -> Optional[int]:
+    """
+    Keep a downsample_history job scheduled `interval` seconds ahead
+
+    The dedup key returns the pending job while one is queued or running, so
+    however many schedulers tick, one job runs per interval.
+
+    Args:
+        queue: Job queue (default: the process-wide queue)
+        interval: Seconds between runs (default from PRICE_HISTORY_DOWNSAMPLE_INTERVAL, or 3600; 0 disables)
+
+    Returns:
+        ID of the pending downsample_history job, or None if disabled
+    """
+    interval = interval if interval is not None else float(os.getenv("PRICE_HISTORY_DOWNSAMPLE_INTERVAL", "3600"))
+    if interval <= 0:
+        return None
+    queue = queue or get_job_queue()
+    return await asyncio.to_thread(
+        queue.enqueue, DOWNSAMPLE_HISTORY, {},
+        dedup_key=DOWNSAMPLE_HISTORY, run_at=time.time() + interval,
+    )
+
+
+async def run_scheduler(stop: asyncio.Event, interval: Optional[float] = None,
+                        queue: Optional[JobQueue] = None):
+    """Tick every `interval` seconds (default from SCHEDULER_INTERVAL, or 30) until `stop` is set"""
+    interval = interval if interval is not None else float(os.getenv("SCHEDULER_INTERVAL", "30"))
+    logger.info(f"Scheduler started, ticking every {interval:g}s")
+    while not stop.is_set():
+        try:
+            await schedule_tick(queue)
+            await schedule_downsampling(queue)
+        except Exception as e:
+            logger.error(f"Scheduler tick failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+    logger.info("Scheduler stopped")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s",
+    )
+    tracing.add_trace_ids_to_logs()
+    asyncio.run(run_scheduler(asyncio.Event()))
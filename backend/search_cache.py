@@ -0,0 +1,300 @@
+"""
+Search Cache and Prefetching
+
+Every page of Tradera search results costs a blocking SearchAdvanced call.
+Users page forward far more often than they jump, so when page N of a search
+is served, page N+1 is fetched speculatively in the background into a
+short-lived cache, and paging forward is usually a cache hit.
+
+- SearchCache: LRU cache of SearchAdvanced results keyed by the search
+  parameters and page, each entry kept for SEARCH_CACHE_TTL seconds (default
+  60, Tradera's max result age; 0 disables caching and prefetching)
+- RateLimiter: token bucket for Tradera calls (TRADERA_RATE_LIMIT calls per
+  second, bursts of TRADERA_RATE_BURST). Searches users wait for always go
+  through and are counted. Prefetches only spend tokens above a reserve of
+  SEARCH_PREFETCH_RESERVE, which is kept for those searches
+- SearchPrefetcher: runs prefetches as low-priority background tasks
+  (SEARCH_PREFETCH_ENABLED). A prefetch waits briefly before asking for a
+  token, and prefetches still waiting are cancelled as soon as a user's
+  search finds the budget down to the reserve. A request for a page that is
+  being prefetched waits for that call instead of making its own
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def search_cache_ttl() -> float:
+    """Seconds search results are cached (SEARCH_CACHE_TTL; 0 disables the cache)"""
+    return float(os.getenv("SEARCH_CACHE_TTL", "60"))
+
+
+def cache_key(params: Dict[str, Any], page: int) -> Tuple:
+    """Cache key for one page of a search"""
+    return (tuple(sorted(params.items())), page)
+
+
+class SearchCache:
+    """LRU cache of search results with a time-to-live"""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache
+
+        Args:
+            ttl: Seconds an entry is served (default from SEARCH_CACHE_TTL)
+            max_entries: Entries kept before the least recently used is evicted (SEARCH_CACHE_SIZE, default 256)
+            clock: Monotonic time source
+        """
+        self.ttl = ttl if ttl is not None else search_cache_ttl()
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Cached result, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and self.clock() - entry[0] < self.ttl
+
+    def put(self, key: Hashable, result: Dict[str, Any]):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class RateLimiter:
+    """Token bucket for Tradera calls, with a reserve low-priority calls may not spend"""
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None,
+                 reserve: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the limiter
+
+        Args:
+            rate: Tokens added per second (TRADERA_RATE_LIMIT, default 5)
+            burst: Bucket size (TRADERA_RATE_BURST, default 10)
+            reserve: Tokens low-priority calls leave in the bucket (SEARCH_PREFETCH_RESERVE, default 2)
+            clock: Monotonic time source
+        """
+        self.rate = rate if rate is not None else float(os.getenv("TRADERA_RATE_LIMIT", "5"))
+        self.burst = burst if burst is not None else float(os.getenv("TRADERA_RATE_BURST", "10"))
+        self.reserve = reserve if reserve is not None else float(os.getenv("SEARCH_PREFETCH_RESERVE", "2"))
+        self.clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.over_budget = 0
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def consume(self) -> bool:
+        """
+        Count a call a user is waiting for; it is never refused
+
+        Returns:
+            Whether the bucket still holds more than the reserve afterwards
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                self.over_budget += 1
+            # Overdrafts are paid back before prefetches get tokens again
+            self._tokens = max(self._tokens - 1, -self.burst)
+            return self._tokens > self.reserve
+
+    def try_acquire_low(self) -> bool:
+        """Take a token for a low-priority call if one is available above the reserve"""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1 + self.reserve:
+                return False
+            self._tokens -= 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tokens": round(self.tokens, 2), "rate": self.rate, "burst": self.burst,
+                "reserve": self.reserve, "over_budget": self.over_budget}
+
+
+def prefetch_enabled() -> bool:
+    """Whether next pages are prefetched (SEARCH_PREFETCH_ENABLED)"""
+    return os.getenv("SEARCH_PREFETCH_ENABLED", "true").lower() == "true"
+
+
+class SearchPrefetcher:
+    """Fetches likely next pages into the cache as cancellable background tasks"""
+
+    def __init__(self, cache: SearchCache, limiter: RateLimiter, delay: Optional[float] = None,
+                 enabled: Optional[bool] = None):
+        """
+        Initialize the prefetcher
+
+        Args:
+            cache: Cache prefetched pages are stored in
+            limiter: Budget prefetches draw low-priority tokens from
+            delay: Seconds a prefetch waits before asking for a token (SEARCH_PREFETCH_DELAY, default 0.05),
+                leaving room for the requests that triggered it
+            enabled: Whether to prefetch at all (default from SEARCH_PREFETCH_ENABLED)
+        """
+        self.cache = cache
+        self.limiter = limiter
+        self.delay = delay if delay is not None else float(os.getenv("SEARCH_PREFETCH_DELAY", "0.05"))
+        self.enabled = enabled if enabled is not None else prefetch_enabled()
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._running: set = set()
+        self.scheduled = 0
+        self.completed = 0
+        self.skipped = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def schedule(self, api, params: Dict[str, Any], page: int):
+        """Prefetch `page` of a search unless it is cached or already being fetched"""
+        key = cache_key(params, page)
+        if not self.enabled or self.cache.ttl <= 0 or key in self._tasks or key in self.cache:
+            return
+        task = asyncio.get_running_loop().create_task(self._prefetch(api, params, page, key))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        self.scheduled += 1
+
+    async def _prefetch(self, api, params: Dict[str, Any], page: int, key: Hashable):
+        try:
+            await asyncio.sleep(self.delay)
+            if key in self.cache or not self.limiter.try_acquire_low():
+                self.skipped += 1
+                return
+            # From here on the token is spent, so the call is no longer cancelled for budget
+            self._running.add(key)
+            result = await asyncio.to_thread(api.search_advanced, **params, page_number=page)
+            if "error" in result:
+                self.failed += 1
+                return
+            self.cache.put(key, result)
+            self.completed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Prefetch of page {page} failed: {e}")
+        finally:
+            self._running.discard(key)
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a prefetch has already started calling Tradera for `key`"""
+        return key in self._running
+
+    async def wait(self, key: Hashable):
+        """Wait for the running prefetch of `key`"""
+        task = self._tasks.get(key)
+        if task is not None:
+            await asyncio.wait({task})
+
+    def cancel_pending(self) -> int:
+        """Cancel prefetches that have not spent a token yet; returns how many"""
+        pending = [task for key, task in self._tasks.items() if key not in self._running and not task.done()]
+        for task in pending:
+            task.cancel()
+        self.cancelled += len(pending)
+        return len(pending)
+
+    def cancel_all(self):
+        """Cancel every prefetch (on shutdown)"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "pending": len(self._tasks), "scheduled": self.scheduled,
+                "completed": self.completed, "skipped": self.skipped, "cancelled": self.cancelled,
+                "failed": self.failed}
+
+
+def foreground_call():
+    """Count a Tradera call a user waits for, cancelling waiting prefetches if the budget is down to the reserve"""
+    if not tradera_rate_limiter.consume():
+        cancelled = search_prefetcher.cancel_pending()
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} pending prefetches to keep Tradera budget for requests")
+
+
+async def search(api, params: Dict[str, Any], page: int = 1) -> Tuple[Dict[str, Any], bool]:
+    """
+    One page of SearchAdvanced results, from the cache when possible, prefetching the next page
+
+    Args:
+        api: TraderaAPI client
+        params: Keyword arguments for `search_advanced` other than `page_number`
+        page: Page number (starting from 1)
+
+    Returns:
+        Tuple of (search result as returned by `search_advanced`, whether it came from the cache)
+    """
+    key = cache_key(params, page)
+    if search_prefetcher.in_flight(key):
+        # Paged forward while the prefetch was still running: share its call
+        await search_prefetcher.wait(key)
+    result = search_cache.get(key)
+    hit = result is not None
+    if not hit:
+        foreground_call()
+        result = await asyncio.to_thread(api.search_advanced, **params, page_number=page)
+        if "error" not in result:
+            search_cache.put(key, result)
+    if "error" not in result and page < int(result.get("total_pages") or 0):
+        search_prefetcher.schedule(api, params, page + 1)
+    return result, hit
+
+
+def stats() -> Dict[str, Any]:
+    """Cache, budget and prefetch counters"""
+    return {"cache": search_cache.stats(), "rate_limit": tradera_rate_limiter.stats(),
+            "prefetch": search_prefetcher.stats()}
+
+
+# Process-wide cache, Tradera budget and prefetcher shared by the search routes
+search_cache = SearchCache()
+tradera_rate_limiter = RateLimiter()
+search_prefetcher = SearchPrefetcher(search_cache, tradera_rate_limiter)
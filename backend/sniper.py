@@ -0,0 +1,313 @@
+"""
+Bid Sniping Module
+
+This module handles firing bids in the final seconds of an auction, including:
+- Staging bids on pre-warmed connections (see TraderaAPI.prepare_bid)
+- Optional hedging: a duplicate Buy over a second connection when the first is slow
+- An idempotency guard so a bid config is never placed or recorded twice
+- Latency tracking and hedge metrics
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from tradera_api import TraderaAPI, PreparedBid
+from profiling import span
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Rolling window of observed Buy latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """Record one observed latency in seconds"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """
+        Get a latency percentile
+
+        Args:
+            percentile: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, or None if nothing has been observed yet
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+
+class HedgeMetrics:
+    """Counters describing how hedged bids behave"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Reset all counters"""
+        with self._lock:
+            self.bids_fired = 0
+            self.hedges_sent = 0
+            self.primary_wins = 0
+            self.hedge_wins = 0
+            self.failures = 0
+            self.duplicates_blocked = 0
+
+    def incr(self, name: str, amount: int = 1):
+        """Increment a counter"""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the counters as a dictionary"""
+        with self._lock:
+            return {
+                "bids_fired": self.bids_fired,
+                "hedges_sent": self.hedges_sent,
+                "primary_wins": self.primary_wins,
+                "hedge_wins": self.hedge_wins,
+                "failures": self.failures,
+                "duplicates_blocked": self.duplicates_blocked,
+                "hedge_win_rate": self.hedge_wins / self.hedges_sent if self.hedges_sent else 0.0,
+            }
+
+
+class BidIdempotencyGuard:
+    """
+    Ensures a bid is placed and recorded at most once per (item, amount, config)
+
+    Claims are recorded as `scheduled` rows in the `bids` table, keyed on the
+    unique `idempotency_key` column, and cached in memory so repeated checks in
+    the same process don't hit the database.
+    """
+
+    def __init__(self, get_client: Optional[Callable[[], Any]] = None):
+        """
+        Initialize the guard
+
+        Args:
+            get_client: Callable returning the Supabase client (None keeps claims in memory only)
+        """
+        self.get_client = get_client
+        self._claimed = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(item_id: int, amount: float, bid_config_id: Optional[int]) -> str:
+        """Build the idempotency key for a bid"""
+        return f"{item_id}:{amount:.2f}:{bid_config_id or 0}"
+
+    def claim(self, auction_id: int, item_id: int, amount: float,
+              bid_config: Optional[Dict[str, Any]] = None, user_id: Any = None) -> Optional[Dict[str, Any]]:
+        """
+        Claim the right to place a bid
+
+        Args:
+            auction_id: Database ID of the auction
+            item_id: Tradera item ID
+            amount: Bid amount in SEK
+            bid_config: The bid configuration the bid is placed for, if any
+            user_id: The user the bid is placed for, if any
+
+        Returns:
+            The recorded bid row, or None if the bid was already claimed or exceeds the configured maximum
+        """
+        bid_config_id = bid_config.get("id") if bid_config else None
+        if bid_config and amount > float(bid_config.get("max_bid_amount", 0)):
+            logger.error(f"Refusing bid of {amount} on item {item_id}: exceeds max_bid_amount")
+            return None
+
+        key = self.key(item_id, amount, bid_config_id)
+        with self._lock:
+            if key in self._claimed:
+                return None
+            self._claimed.add(key)
+
+        bid_data = {
+            "auction_id": auction_id,
+            "amount": amount,
+            "status": "scheduled",
+            "idempotency_key": key,
+        }
+        if bid_config_id:
+            bid_data["bid_config_id"] = bid_config_id
+        if user_id is not None:
+            bid_data["user_id"] = str(user_id)
+
+        if self.get_client is None:
+            return bid_data
+
+        try:
+            supabase = self.get_client()
+            existing = supabase.table("bids").select("id").eq("idempotency_key", key).execute()
+            if existing.data:
+                return None
+            result = supabase.table("bids").insert(bid_data).execute()
+            return result.data[0] if result.data else bid_data
+        except Exception as e:
+            # A unique violation means another worker claimed it first; any other
+            # failure leaves the bid unclaimed, so a retry may claim it again
+            logger.error(f"Could not claim bid {key}: {e}")
+            with self._lock:
+                self._claimed.discard(key)
+            return None
+
+
+class BidSniper:
+    """Fires prepared bids, optionally hedging slow Buy calls"""
+
+    def __init__(self, api: TraderaAPI,
+                 guard: Optional[BidIdempotencyGuard] = None,
+                 hedging: Optional[bool] = None,
+                 hedge_percentile: Optional[float] = None,
+                 default_hedge_delay: float = 0.3,
+                 latency: Optional[LatencyTracker] = None,
+                 metrics: Optional[HedgeMetrics] = None):
+        """
+        Initialize the sniper
+
+        Args:
+            api: Tradera API client with a user token set
+            guard: Idempotency guard used to claim bids
+            hedging: Send a hedge request when the first Buy is slow (default from BID_HEDGING_ENABLED)
+            hedge_percentile: Latency percentile after which to hedge (default from BID_HEDGE_PERCENTILE)
+            default_hedge_delay: Hedge delay in seconds before any latency has been observed
+            latency: Shared latency tracker
+            metrics: Shared hedge metrics
+        """
+        self.api = api
+        self.guard = guard or BidIdempotencyGuard()
+        self.hedging = hedging if hedging is not None else os.getenv("BID_HEDGING_ENABLED", "false").lower() == "true"
+        self.hedge_percentile = hedge_percentile if hedge_percentile is not None else float(os.getenv("BID_HEDGE_PERCENTILE", "95"))
+        self.default_hedge_delay = default_hedge_delay
+        self.latency = latency or bid_latency
+        self.metrics = metrics or hedge_metrics
+
+    def prepare(self, item_id: int, amount: int) -> List[PreparedBid]:
+        """
+        Stage a bid a few seconds before the deadline
+
+        Opens one warm connection, or two when hedging is enabled.
+
+        Args:
+            item_id: Tradera item ID
+            amount: Bid amount in SEK
+
+        Returns:
+            List of prepared bids; the first is the primary
+        """
+        copies = 2 if self.hedging else 1
+        with span("sniper.prepare", item_id=item_id, amount=amount, connections=copies):
+            return [self.api.prepare_bid(item_id, amount) for _ in range(copies)]
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary Buy before sending the hedge"""
+        observed = self.latency.percentile(self.hedge_percentile)
+        return observed if observed is not None else self.default_hedge_delay
+
+    def fire(self, auction_id: int, prepared: List[PreparedBid],
+             bid_config: Optional[Dict[str, Any]] = None, user_id: Any = None) -> Dict:
+        """
+        Fire a staged bid
+
+        Args:
+            auction_id: Database ID of the auction
+            prepared: Prepared bids returned by prepare()
+            bid_config: The bid configuration the bid is placed for, if any
+            user_id: The user the bid is placed for, if any
+
+        Returns:
+            Dictionary with bid result, in the same format as TraderaAPI.place_bid
+        """
+        primary = prepared[0]
+        with span("sniper.fire", auction_id=auction_id, item_id=primary.item_id,
+                  amount=primary.bid_amount, hedged=len(prepared) > 1) as trace_span:
+            claimed = self.guard.claim(auction_id, primary.item_id, primary.bid_amount, bid_config, user_id)
+            if claimed is None:
+                self.metrics.incr("duplicates_blocked")
+                trace_span.set_attribute("outcome", "duplicate")
+                for p in prepared:
+                    p.close()
+                return {"error": "Bid already placed or exceeds configured maximum"}
+
+            self.metrics.incr("bids_fired")
+            if len(prepared) == 1:
+                result = self._timed_fire(primary)
+            else:
+                result = self._fire_hedged(primary, prepared[1])
+
+            if "error" in result:
+                self.metrics.incr("failures")
+            trace_span.set_attribute("outcome", "failed" if "error" in result else "placed")
+            self._record_result(claimed, result)
+            return result
+
+    def _timed_fire(self, prepared: PreparedBid, role: str = "primary") -> Dict:
+        """Fire one prepared bid and record its latency"""
+        start = time.monotonic()
+        with span("sniper.buy", role=role):
+            result = prepared.fire()
+        if "error" not in result:
+            self.latency.record(time.monotonic() - start)
+        return result
+
+    def _fire_hedged(self, primary: PreparedBid, hedge: PreparedBid) -> Dict:
+        """Fire the primary, and the hedge if the primary hasn't answered in time"""
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            # Each Buy runs in a copy of the caller's context, so its span joins the trace
+            futures = {executor.submit(contextvars.copy_context().run, self._timed_fire, primary): "primary"}
+            done, _ = wait(futures, timeout=self.hedge_delay())
+            if not done:
+                self.metrics.incr("hedges_sent")
+                futures[executor.submit(contextvars.copy_context().run, self._timed_fire, hedge, "hedge")] = "hedge"
+            else:
+                hedge.close()
+
+            pending = set(futures)
+            result = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if "error" not in result:
+                        self.metrics.incr("primary_wins" if futures[future] == "primary" else "hedge_wins")
+                        return result
+            return result
+        finally:
+            executor.shutdown(wait=False)
+
+    def _record_result(self, claimed: Dict[str, Any], result: Dict):
+        """Update the claimed bid row with the outcome"""
+        if self.guard.get_client is None or "id" not in claimed:
+            return
+        update = {
+            "status": "failed" if "error" in result else ("won" if result.get("status") == "Bought" else "placed"),
+            "tradera_response": str(result),
+        }
+        try:
+            self.guard.get_client().table("bids").update(update).eq("id", claimed["id"]).execute()
+        except Exception as e:
+            logger.error(f"Error recording bid result: {e}")
+
+
+# Shared across snipers so percentiles reflect all observed Buy calls
+bid_latency = LatencyTracker()
+hedge_metrics = HedgeMetrics()
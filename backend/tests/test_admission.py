@@ -0,0 +1,121 @@
+import unittest
+import asyncio
+import os
+import sys
+
+import httpx
+from fastapi import FastAPI
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionController, AdmissionMiddleware, is_expensive, user_key
+
+
+class TestAdmissionController(unittest.TestCase):
+    """Test cases for the concurrency limits and queues"""
+
+    def test_per_user_limit_and_fifo_handoff(self):
+        """Test a user over their limit waits while others are admitted, and gets the next free slot"""
+        async def scenario():
+            controller = AdmissionController(global_limit=3, user_limit=2, global_queue=10, user_queue=2, queue_timeout=5)
+            self.assertIsNone(await controller.acquire("a"))
+            self.assertIsNone(await controller.acquire("a"))
+            waiting = asyncio.create_task(controller.acquire("a"))
+            await asyncio.sleep(0)
+            self.assertFalse(waiting.done())
+            self.assertIsNone(await controller.acquire("b"))
+            # Global limit reached: b waits too, behind a
+            waiting_b = asyncio.create_task(controller.acquire("b"))
+            await asyncio.sleep(0)
+
+            controller.release("a", 0.5)
+            self.assertIsNone(await waiting)
+            self.assertFalse(waiting_b.done())
+            controller.release("b")
+            self.assertIsNone(await waiting_b)
+            return controller.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual((stats["active"], stats["waiting"]), (3, 0))
+        self.assertEqual((stats["admitted"], stats["queued"], stats["rejected"]), (5, 2, 0))
+
+    def test_full_queue_rejects_at_once(self):
+        """Test a request finding its queue full is rejected with a Retry-After estimate"""
+        async def scenario():
+            controller = AdmissionController(global_limit=1, user_limit=1, global_queue=5, user_queue=1, queue_timeout=5)
+            await controller.acquire("a")
+            waiting = asyncio.create_task(controller.acquire("a"))
+            await asyncio.sleep(0)
+            retry_after = await controller.acquire("a")
+            waiting.cancel()
+            return controller, retry_after
+
+        controller, retry_after = asyncio.run(scenario())
+        self.assertGreaterEqual(retry_after, 1)
+        self.assertEqual(controller.rejected, 1)
+        self.assertEqual(controller.stats()["waiting"], 0)
+
+    def test_queue_timeout(self):
+        """Test a request waiting longer than the timeout is rejected and leaves the queue"""
+        async def scenario():
+            controller = AdmissionController(global_limit=1, user_limit=1, global_queue=5, user_queue=5, queue_timeout=0.05)
+            await controller.acquire("a")
+            retry_after = await controller.acquire("b")
+            return controller, retry_after
+
+        controller, retry_after = asyncio.run(scenario())
+        self.assertIsNotNone(retry_after)
+        self.assertEqual((controller.timed_out, controller.stats()["waiting"], controller.active), (1, 0, 1))
+
+
+class TestAdmissionMiddleware(unittest.TestCase):
+    """Test cases for limiting expensive routes"""
+
+    def test_expensive_routes(self):
+        """Test only searches and script runs are limited"""
+        self.assertTrue(is_expensive("POST", "/api/search"))
+        self.assertTrue(is_expensive("POST", "/api/scripts/12/run"))
+        self.assertFalse(is_expensive("GET", "/api/scripts/12"))
+        self.assertFalse(is_expensive("POST", "/api/auctions/12/bid"))
+
+    def test_user_key(self):
+        """Test users are keyed by X-User-Id, falling back to the client address"""
+        self.assertEqual(user_key({"headers": [(b"x-user-id", b"42")], "client": ("10.0.0.1", 1)}), "user:42")
+        self.assertEqual(user_key({"headers": [], "client": ("10.0.0.1", 1)}), "addr:10.0.0.1")
+
+    def test_overflow_gets_429_and_bids_pass(self):
+        """Test overflowing searches are rejected with Retry-After while a bid goes through"""
+        async def scenario():
+            release = asyncio.Event()
+            app = FastAPI()
+
+            @app.post("/api/search")
+            async def search():
+                await release.wait()
+                return []
+
+            @app.post("/api/auctions/{auction_id}/bid")
+            async def bid(auction_id: int):
+                return {"auction_id": auction_id}
+
+            controller = AdmissionController(global_limit=1, user_limit=1, global_queue=0, user_queue=0, queue_timeout=5)
+            app.add_middleware(AdmissionMiddleware, enabled=True, controller=controller)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                first = asyncio.create_task(client.post("/api/search", headers={"X-User-Id": "1"}))
+                await asyncio.sleep(0.05)
+                rejected = await client.post("/api/search", headers={"X-User-Id": "2"})
+                bid = await client.post("/api/auctions/7/bid", headers={"X-User-Id": "1"})
+                release.set()
+                return (await first), rejected, bid, controller
+
+        first, rejected, bid, controller = asyncio.run(scenario())
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(rejected.status_code, 429)
+        self.assertGreaterEqual(int(rejected.headers["Retry-After"]), 1)
+        self.assertEqual(bid.status_code, 200)
+        self.assertEqual((controller.active, controller.admitted, controller.rejected), (0, 1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from auction_dedup import SeenAuctionIndex, ingest_items, NEW, CHANGED, UNCHANGED
+from benchmarks.supabase_standin import SupabaseStandIn
+
+
+def make_item(item_id, price=100, bid_count=0, title="Canon AE-1"):
+    return {
+        "id": item_id,
+        "title": title,
+        "current_price": price,
+        "end_date": "2030-01-01T12:00:00+00:00",
+        "bid_count": bid_count,
+    }
+
+
+class TestSeenAuctionIndex(unittest.TestCase):
+    """Test cases for the seen-auction index"""
+
+    def setUp(self):
+        self.index = SeenAuctionIndex()
+        self.index.load([{
+            "id": 1, "tradera_id": "42", "title": "Canon AE-1", "current_price": "100.00", "bid_count": 0,
+            "end_time": "2030-01-01T12:00:00Z", "status": "active", "created_at": "2024-01-01T00:00:00+00:00",
+        }])
+
+    def test_classify(self):
+        """Test items are classified against the stored fingerprint"""
+        unchanged = {"tradera_id": 42, "title": "Canon AE-1", "current_price": 100.0, "bid_count": 0,
+                     "end_time": "2030-01-01T12:00:00+00:00"}
+        self.assertEqual(self.index.classify(unchanged), UNCHANGED)
+        self.assertEqual(self.index.classify({**unchanged, "current_price": 150.0}), CHANGED)
+        self.assertEqual(self.index.classify({**unchanged, "tradera_id": 43}), NEW)
+        self.assertIn(42, self.index)
+
+    def test_remove(self):
+        """Test deleted auctions are forgotten"""
+        self.index.remove(1)
+        self.assertNotIn("42", self.index)
+        self.assertIsNone(self.index.get(42))
+
+    def test_new_matches(self):
+        """Test script matches are reported once per pair"""
+        self.assertEqual(self.index.new_matches(7, [1, 2]), [1, 2])
+        self.assertEqual(self.index.new_matches(7, [1, 2, 3]), [3])
+        self.assertEqual(self.index.new_matches(8, [1]), [1])
+
+
+class TestIngestItems(unittest.TestCase):
+    """Test cases for deduplicated ingest"""
+
+    def setUp(self):
+        self.index = SeenAuctionIndex()
+        self.index.load([])
+        self.supabase = SupabaseStandIn()
+
+    def test_only_new_and_changed_items_are_written(self):
+        """Test a second run of overlapping results writes only what changed"""
+        auctions, new, written = ingest_items(self.supabase, [make_item(1), make_item(2)], script_id=7, index=self.index)
+        self.assertEqual(len(new), 2)
+        self.assertEqual(len(written), 2)
+        self.assertEqual(auctions[0]["script_id"], 7)
+
+        calls = self.supabase.calls
+        auctions, new, written = ingest_items(self.supabase, [make_item(1), make_item(2, price=150)], script_id=8, index=self.index)
+        self.assertEqual(new, [])
+        self.assertEqual([auction["tradera_id"] for auction in written], ["2"])
+        self.assertEqual({auction["id"] for auction in auctions}, {1, 2})
+        # One update, one auction_scripts batch
+        self.assertEqual(self.supabase.calls - calls, 2)
+        stored = {row["tradera_id"]: row for row in self.supabase.tables["auctions"]}
+        self.assertEqual((stored["2"]["current_price"], stored["2"]["script_id"]), (150.0, 7))
+        self.assertEqual(written[0]["created_at"], stored["2"]["created_at"])
+
+    def test_item_stored_by_another_process(self):
+        """Test an item missing from a stale index is updated instead of failing on the unique tradera_id"""
+        self.supabase = SupabaseStandIn({"auctions": [{"id": 9, "tradera_id": "1", "title": "Canon AE-1",
+                                                       "current_price": 80.0, "script_id": 3}]})
+        auctions, new, written = ingest_items(self.supabase, [make_item(1)], script_id=7, index=self.index)
+        self.assertEqual(new, [])
+        self.assertEqual((written[0]["id"], written[0]["script_id"]), (9, 3))
+        self.assertEqual(len(self.supabase.tables["auctions"]), 1)
+        self.assertEqual(self.supabase.tables["auctions"][0]["current_price"], 100.0)
+
+    def test_category_is_stored(self):
+        """Test the item's category ID is stored, and a missing one (0) is left empty"""
+        items = [{**make_item(1), "category_id": 100}, {**make_item(2), "category_id": 0}]
+        auctions, new, written = ingest_items(self.supabase, items, script_id=7, index=self.index)
+        self.assertEqual([auction["category"] for auction in new], ["100", ""])
+
+    def test_script_matches_written_once(self):
+        """Test auction_scripts rows are written only for new pairs"""
+        ingest_items(self.supabase, [make_item(1)], script_id=7, index=self.index)
+        self.assertEqual(len(self.supabase.tables["auction_scripts"]), 1)
+
+        calls = self.supabase.calls
+        ingest_items(self.supabase, [make_item(1)], script_id=7, index=self.index)
+        self.assertEqual(self.supabase.calls, calls)
+
+        ingest_items(self.supabase, [make_item(1)], script_id=8, index=self.index)
+        self.assertEqual([(row["auction_id"], row["script_id"]) for row in self.supabase.tables["auction_scripts"]],
+                         [(1, 7), (1, 8)])
+
+    def test_failed_match_write_is_retried(self):
+        """Test matches that could not be stored are written on the next run"""
+        table = self.supabase.table
+        failing = MagicMock()
+        failing.upsert.return_value.execute.side_effect = Exception("connection reset")
+        with patch.object(self.supabase, "table", side_effect=lambda name: failing if name == "auction_scripts" else table(name)):
+            ingest_items(self.supabase, [make_item(1)], script_id=7, index=self.index)
+        self.assertNotIn("auction_scripts", self.supabase.tables)
+
+        ingest_items(self.supabase, [make_item(1)], script_id=7, index=self.index)
+        self.assertEqual(len(self.supabase.tables["auction_scripts"]), 1)
+
+    def test_loads_index_on_first_use(self):
+        """Test a cold index is loaded from the auctions table, page by page"""
+        rows = [{"id": n + 5, "tradera_id": str(n), "title": "Canon AE-1", "current_price": 100, "bid_count": 0,
+                 "end_time": "2030-01-01T12:00:00+00:00", "status": "active", "created_at": "2024-01-01T00:00:00+00:00"}
+                for n in range(1, 6)]
+        self.supabase = SupabaseStandIn({"auctions": rows}, max_rows=2)
+        index = SeenAuctionIndex()
+        with patch.object(db, "SELECT_PAGE_SIZE", 2):
+            auctions, new, written = ingest_items(self.supabase, [make_item(5)], index=index)
+        self.assertEqual(len(index), 5)
+        self.assertEqual((new, written), ([], []))
+        self.assertEqual(auctions[0]["id"], 10)
+        self.assertEqual(auctions[0]["created_at"], "2024-01-01T00:00:00+00:00")
+
+
+if __name__ == "__main__":
+    unittest.main()
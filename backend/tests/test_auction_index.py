@@ -0,0 +1,90 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auction_index as auction_index_module
+from auction_index import AuctionIndex
+
+
+class TestAuctionIndex(unittest.TestCase):
+    """Test cases for the in-memory columnar auction index"""
+    
+    def setUp(self):
+        """Set up test environment"""
+        self.index = AuctionIndex()
+        self.index.load([
+            {"id": 1, "title": "Camera", "current_price": 150.0, "bid_count": 3, "category_id": 100,
+             "end_time": "2025-04-21T10:00:00Z", "status": "active"},
+            {"id": 2, "title": "Lens", "current_price": 400.0, "bid_count": 0, "category_id": 100,
+             "end_time": "2025-04-20T10:00:00Z", "status": "active"},
+            {"id": 3, "title": "Chair", "current_price": 50.0, "bid_count": 1, "category_id": 200,
+             "end_time": "2025-04-22T10:00:00Z", "status": "active"},
+            {"id": 4, "title": "Ended", "current_price": 75.0, "bid_count": 2, "category_id": 200,
+             "end_time": "2025-04-01T10:00:00Z", "status": "ended"},
+        ])
+    
+    def test_load_skips_inactive(self):
+        """Test that only active auctions are indexed"""
+        self.assertTrue(self.index.loaded)
+        self.assertEqual(len(self.index), 3)
+    
+    def test_query_filters_and_orders_by_end_time(self):
+        """Test filtered list queries"""
+        self.assertEqual([a["id"] for a in self.index.query()], [2, 1, 3])
+        self.assertEqual([a["id"] for a in self.index.query({"category_id": 100})], [2, 1])
+        self.assertEqual([a["id"] for a in self.index.query({"min_price": 100, "max_price": 200})], [1])
+        self.assertEqual([a["id"] for a in self.index.query({"end_time_gt": "2025-04-20T12:00:00Z"})], [1, 3])
+        self.assertEqual([a["id"] for a in self.index.query({"end_time_lt": "2025-04-21T12:00:00Z"}, limit=1)], [2])
+        self.assertEqual(self.index.query({"category": "999"}), [])
+    
+    def test_count(self):
+        """Test counts"""
+        self.assertEqual(self.index.count(), 3)
+        self.assertEqual(self.index.count({"min_bid_count": 1}), 2)
+    
+    def test_upsert_updates_and_drops_ended(self):
+        """Test incremental updates from ingest"""
+        self.index.upsert([{"id": 1, "current_price": 500.0, "bid_count": 4}])
+        self.assertEqual(self.index.query({"min_price": 450})[0]["title"], "Camera")
+        
+        self.index.upsert([{"id": 2, "status": "ended"}])
+        self.assertEqual(self.index.count(), 2)
+        
+        # Freed rows are reused
+        self.index.upsert([{"id": 5, "current_price": 10.0, "end_time": "2025-04-23T10:00:00Z"}])
+        self.assertEqual(self.index.count(), 3)
+        self.assertEqual(len(self.index._ids), 3)
+        
+        self.index.remove(5)
+        self.assertEqual(self.index.count(), 2)
+    
+    def test_price_histogram(self):
+        """Test price histograms"""
+        histogram = self.index.price_histogram(bins=2)
+        self.assertEqual(histogram["counts"], [2, 1])
+        self.assertEqual(histogram["edges"][0], 50.0)
+        self.assertEqual(histogram["edges"][-1], 400.0)
+        self.assertEqual(self.index.price_histogram(filters={"category": "300"}), {"edges": [], "counts": []})
+    
+    def test_pure_python_fallback(self):
+        """Test that results match without NumPy"""
+        with patch.object(auction_index_module, "np", None):
+            self.assertEqual([a["id"] for a in self.index.query({"category_id": 100})], [2, 1])
+            self.assertEqual(self.index.price_histogram(bins=2)["counts"], [2, 1])
+    
+    def test_supports(self):
+        """Test which filters are answered from the index"""
+        self.assertTrue(AuctionIndex.supports({"status": "active", "end_time_lt": "2025-04-21T00:00:00Z"}))
+        self.assertTrue(AuctionIndex.supports({"status": ["active"]}))
+        self.assertFalse(AuctionIndex.supports({"status": ["active", "ended"]}))
+        self.assertFalse(AuctionIndex.supports({"tradera_id": "123"}))
+        # The index only holds active auctions, so other queries must not silently narrow to them
+        self.assertFalse(AuctionIndex.supports({"category_id": 100}))
+        self.assertFalse(AuctionIndex.supports({}))
+
+if __name__ == '__main__':
+    unittest.main()
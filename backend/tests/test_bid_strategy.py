@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bid_strategy import (BidDecision, decide, decide_batch, decide_for, increment_for, required_bid,
+                          MAX_AT_LAST_SECOND, INCREMENTAL, BID, MAX_BELOW_REQUIRED, AUCTION_ENDED)
+
+
+class TestIncrementLadder(unittest.TestCase):
+    """Test cases for Tradera's increment ladder"""
+
+    def test_increments(self):
+        """Test increments grow with the price"""
+        self.assertEqual(increment_for(0), 5)
+        self.assertEqual(increment_for(99), 5)
+        self.assertEqual(increment_for(100), 10)
+        self.assertEqual(increment_for(750), 20)
+        self.assertEqual(increment_for(1000), 50)
+        self.assertEqual(increment_for(12000), 100)
+
+    def test_required_bid(self):
+        """Test the lowest acceptable bid"""
+        self.assertEqual(required_bid(50, bid_count=0), 50)
+        self.assertEqual(required_bid(50, bid_count=2), 55)
+        self.assertEqual(required_bid(480, bid_count=2), 490)
+        self.assertEqual(required_bid(480, bid_count=2, next_bid=500), 500)
+        self.assertEqual(required_bid(99.5, bid_count=1), 105)
+
+
+class TestStrategies(unittest.TestCase):
+    """Test cases for bid strategies"""
+
+    def test_max_at_last_second(self):
+        """Test the full maximum is bid, in whole kronor"""
+        self.assertEqual(decide(MAX_AT_LAST_SECOND, 1234.75, 500, 3), BidDecision(1234, BID))
+
+    def test_incremental(self):
+        """Test the minimum acceptable bid is used"""
+        self.assertEqual(decide(INCREMENTAL, 1234, 500, 3), BidDecision(520, BID))
+        self.assertEqual(decide(INCREMENTAL, 1234, 500, 3, next_bid=530), BidDecision(530, BID))
+
+    def test_maximum_below_required(self):
+        """Test no bid is placed when the maximum is too low"""
+        for strategy in (MAX_AT_LAST_SECOND, INCREMENTAL):
+            self.assertEqual(decide(strategy, 515, 500, 3), BidDecision(None, MAX_BELOW_REQUIRED))
+
+    def test_unknown_strategy(self):
+        """Test unknown strategies are rejected"""
+        with self.assertRaises(ValueError):
+            decide("yolo", 1000, 100, 1)
+
+    def test_rows(self):
+        """Test decisions from database rows"""
+        config = {"id": 1, "auction_id": 7, "max_bid_amount": "800.00", "strategy": None}
+        auction = {"id": 7, "current_price": "300.00", "bid_count": 4, "next_bid": None, "status": "active"}
+        self.assertEqual(decide_for(config, auction), BidDecision(800, BID))
+        self.assertEqual(decide_for(config, {**auction, "status": "ended"}), BidDecision(None, AUCTION_ENDED))
+
+        configs = [config, {**config, "id": 2, "strategy": INCREMENTAL}, {**config, "id": 3, "auction_id": 8}]
+        decisions = decide_batch(configs, {7: auction})
+        self.assertEqual([(c["id"], d.amount) for c, d in decisions], [(1, 800), (2, 310)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import csv
+import io
+import json
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_export import COLUMN_TYPES, BatchImporter, iter_csv, iter_ndjson, iter_rows, parse_csv_lines, parse_ndjson_lines
+
+
+class FakeQuery:
+    """Chainable stand-in for a PostgREST query over an in-memory table"""
+
+    def __init__(self, rows, log):
+        self.rows = rows
+        self.log = log
+        self.filters = []
+        self.limit_value = None
+
+    def select(self, columns):
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row[column] < value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, count):
+        self.limit_value = count
+        return self
+
+    def execute(self):
+        rows = [row for row in sorted(self.rows, key=lambda row: row["id"]) if all(f(row) for f in self.filters)]
+        rows = rows[:self.limit_value]
+        self.log.append(len(rows))
+        return MagicMock(data=rows)
+
+
+def make_supabase(rows):
+    supabase = MagicMock()
+    supabase.reads = []
+    supabase.table.side_effect = lambda name: FakeQuery(rows, supabase.reads)
+    return supabase
+
+
+ROWS = [
+    {"id": i, "title": f"Auktion {i}", "current_price": i * 10.0, "image_urls": ["a.jpg"],
+     "created_at": f"2024-01-{i:02d}T00:00:00+00:00"}
+    for i in range(1, 26)
+]
+
+
+class TestExport(unittest.TestCase):
+    """Test cases for chunked export"""
+
+    def test_reads_in_chunks(self):
+        """Test every row is read exactly once, chunk by chunk"""
+        supabase = make_supabase(ROWS)
+        rows = list(iter_rows(supabase, "auctions", chunk_size=10))
+        self.assertEqual([row["id"] for row in rows], list(range(1, 26)))
+        self.assertEqual(supabase.reads, [10, 10, 5])
+
+    def test_time_range(self):
+        """Test the time range filter is applied to every chunk"""
+        supabase = make_supabase(ROWS)
+        rows = list(iter_rows(supabase, "auctions", since="2024-01-05", until="2024-01-15", chunk_size=4))
+        self.assertEqual([row["id"] for row in rows], list(range(5, 15)))
+
+    def test_ndjson(self):
+        """Test NDJSON output is one object per line and parses back"""
+        body = b"".join(iter_ndjson(ROWS[:3])).decode("utf-8")
+        self.assertEqual(body.count("\n"), 3)
+        self.assertEqual(list(parse_ndjson_lines(body.splitlines())), ROWS[:3])
+
+    def test_csv(self):
+        """Test CSV output has a header row and nested values as JSON"""
+        body = b"".join(iter_csv(ROWS[:2])).decode("utf-8")
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(json.loads(rows[0]["image_urls"]), ["a.jpg"])
+        self.assertEqual(b"".join(iter_csv([])), b"")
+
+
+class TestImport(unittest.TestCase):
+    """Test cases for batched import"""
+
+    def test_batches(self):
+        """Test rows are upserted in batches of the configured size"""
+        supabase = MagicMock()
+        supabase.table.return_value.upsert.return_value.execute.return_value = MagicMock(data=[{"id": 1}])
+        flushed = []
+        importer = BatchImporter(supabase, "auctions", batch_size=10, on_flush=flushed.append)
+        for row in ROWS:
+            importer.add(row)
+        importer.flush()
+
+        sizes = [len(call.args[0]) for call in supabase.table.return_value.upsert.call_args_list]
+        self.assertEqual(sizes, [10, 10, 5])
+        self.assertEqual((importer.imported, importer.batches, len(flushed)), (25, 3, 3))
+        supabase.table.return_value.upsert.assert_called_with(ROWS[20:], on_conflict="id")
+
+    def test_parse_csv(self):
+        """Test empty CSV cells become NULL"""
+        rows = list(parse_csv_lines(["id,title,description", "1,Kamera,"]))
+        self.assertEqual(rows, [{"id": "1", "title": "Kamera", "description": None}])
+
+    def test_parse_csv_converts_column_types(self):
+        """Test CSV cells are read back as the numbers and JSON values that were exported"""
+        body = b"".join(iter_csv([{"id": 7, "auction_id": 3, "amount": 150.5, "status": "won", "meta": {"a": 1}}]))
+        lines = io.StringIO(body.decode("utf-8"))
+        rows = list(parse_csv_lines(lines, {**COLUMN_TYPES["bids"], "meta": "json"}))
+        self.assertEqual(rows, [{"id": 7, "auction_id": 3, "amount": 150.5, "status": "won", "meta": {"a": 1}}])
+        with self.assertRaises(ValueError):
+            list(parse_csv_lines(["id,amount", "1,many"], COLUMN_TYPES["bids"]))
+
+    def test_finish_syncs_id_sequence(self):
+        """Test the ID sequence is moved past imported IDs once the import is written"""
+        supabase = MagicMock()
+        importer = BatchImporter(supabase, "bids", batch_size=10)
+        importer.finish()
+        supabase.rpc.assert_not_called()
+
+        importer.add({"id": 42, "auction_id": 1, "amount": 100})
+        importer.finish()
+        supabase.table.return_value.upsert.assert_called_once()
+        supabase.rpc.assert_called_once_with("sync_id_sequence", {"p_table": "bids"})
+
+    def test_parse_ndjson_rejects_non_objects(self):
+        """Test NDJSON lines must be objects"""
+        with self.assertRaises(ValueError):
+            list(parse_ndjson_lines(['{"id": 1}', "", "[1, 2]"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
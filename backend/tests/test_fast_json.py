@@ -0,0 +1,61 @@
+import unittest
+import json
+import os
+import sys
+from unittest.mock import patch
+
+from fastapi.responses import StreamingResponse
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_json
+from fast_json import FastJSONResponse, dumps, iter_json_array, list_response
+
+
+ROWS = [
+    {"id": i, "title": f"Auktion {i} – åäö", "current_price": i * 1.5, "description": None}
+    for i in range(7)
+]
+
+
+class TestFastJSON(unittest.TestCase):
+    """Test cases for the fast JSON response path"""
+
+    def test_dumps_matches_json(self):
+        """Test orjson and the json fallback produce the same document"""
+        expected = json.loads(json.dumps(ROWS))
+        self.assertEqual(json.loads(dumps(ROWS)), expected)
+        with patch.object(fast_json, "orjson", None):
+            self.assertEqual(json.loads(dumps(ROWS)), expected)
+
+    def test_iter_json_array(self):
+        """Test chunked serialization produces a valid array for any size"""
+        for count in (0, 1, 3, 7):
+            for chunk_size in (1, 2, 3, 10):
+                body = b"".join(iter_json_array(ROWS[:count], chunk_size=chunk_size))
+                self.assertEqual(json.loads(body), ROWS[:count])
+
+    def test_small_lists_are_rendered(self):
+        """Test lists under the threshold are rendered in one body with the ETag"""
+        response = list_response(ROWS, etag='"auctions-v2"', stream_threshold=10)
+        self.assertIsInstance(response, FastJSONResponse)
+        self.assertEqual(json.loads(response.body), ROWS)
+        self.assertEqual(response.headers["etag"], '"auctions-v2"')
+
+    def test_large_lists_are_streamed(self):
+        """Test lists over the threshold are streamed"""
+        response = list_response(ROWS, stream_threshold=5)
+        self.assertIsInstance(response, StreamingResponse)
+        self.assertEqual(response.media_type, "application/json")
+
+    def test_disabled_by_default(self):
+        """Test the fast path is opt-in"""
+        with patch.object(fast_json, "FAST_JSON_ENABLED", False):
+            self.assertFalse(fast_json.fast_responses_enabled())
+        with patch.object(fast_json, "FAST_JSON_ENABLED", True):
+            self.assertTrue(fast_json.fast_responses_enabled())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import gzip
+import os
+import sys
+from unittest.mock import patch
+
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_cache
+from http_cache import CompressionMiddleware, table_etag, is_not_modified, not_modified_response, set_cache_headers
+
+
+def create_app():
+    """Small app using the helpers the same way the list routes do"""
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+    app.state.queries = 0
+
+    @app.get("/items")
+    async def get_items(request: Request, response: Response):
+        etag = table_etag("auctions")
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        app.state.queries += 1
+        set_cache_headers(response, etag)
+        return [{"id": i, "title": f"Auction {i}"} for i in range(100)]
+
+    return app
+
+
+class TestETags(unittest.TestCase):
+    """Test cases for table-version ETags"""
+
+    def setUp(self):
+        self.app = create_app()
+        self.client = TestClient(self.app)
+
+    def test_etag_from_table_version(self):
+        """Test the ETag is derived from the table version"""
+        with patch.object(http_cache, "get_table_version", return_value=7):
+            self.assertEqual(table_etag("auctions"), '"auctions-v7"')
+        with patch.object(http_cache, "get_table_version", return_value=None):
+            self.assertIsNone(table_etag("auctions"))
+
+    def test_conditional_get_returns_304(self):
+        """Test a matching If-None-Match is answered without running the query"""
+        with patch.object(http_cache, "get_table_version", return_value=3):
+            first = self.client.get("/items")
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(first.headers["etag"], '"auctions-v3"')
+
+            second = self.client.get("/items", headers={"If-None-Match": first.headers["etag"]})
+            self.assertEqual(second.status_code, 304)
+            self.assertEqual(second.content, b"")
+
+        self.assertEqual(self.app.state.queries, 1)
+
+    def test_write_changes_etag(self):
+        """Test a new table version invalidates the cached response"""
+        with patch.object(http_cache, "get_table_version", return_value=4):
+            response = self.client.get("/items", headers={"If-None-Match": '"auctions-v3"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["etag"], '"auctions-v4"')
+
+    def test_unknown_version_disables_etag(self):
+        """Test responses are served normally when versions are unavailable"""
+        with patch.object(http_cache, "get_table_version", return_value=None):
+            response = self.client.get("/items", headers={"If-None-Match": "*"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("etag", response.headers)
+
+    def test_if_none_match_list(self):
+        """Test If-None-Match with several tags"""
+        request = Request({"type": "http", "headers": [(b"if-none-match", b'"a-v1", "auctions-v2"')]})
+        self.assertTrue(is_not_modified(request, '"auctions-v2"'))
+        self.assertFalse(is_not_modified(request, '"auctions-v3"'))
+
+
+class TestCompression(unittest.TestCase):
+    """Test cases for response compression"""
+
+    def setUp(self):
+        self.client = TestClient(create_app())
+
+    def test_gzip_large_response(self):
+        """Test large responses are gzip-compressed when accepted"""
+        with patch.object(http_cache, "get_table_version", return_value=1), \
+             patch.object(http_cache, "brotli", None):
+            response = self.client.get("/items", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(len(response.json()), 100)
+
+    def test_identity_without_accept_encoding(self):
+        """Test responses are not compressed for clients that don't accept it"""
+        with patch.object(http_cache, "get_table_version", return_value=1):
+            response = self.client.get("/items", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(len(response.json()), 100)
+
+    def test_not_modified_headers(self):
+        """Test 304 responses carry the ETag and revalidation policy"""
+        response = not_modified_response('"bids-v1"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["etag"], '"bids-v1"')
+        self.assertEqual(response.headers["cache-control"], http_cache.CACHE_CONTROL)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import unittest
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_cache import ImageCache, ImageProxyError
+from routes import images
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"a" * 92
+
+
+class FakeFetch:
+    """Image host stand-in serving fixed bodies per URL"""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.calls = []
+
+    def __call__(self, url):
+        self.calls.append(url)
+        return self.bodies[url], "image/png"
+
+
+class TestImageCache(unittest.TestCase):
+    """Test cases for the on-disk image cache"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, bodies, **kwargs):
+        kwargs.setdefault("max_bytes", 1000)
+        return ImageCache(directory=self.directory, max_image_bytes=500, allowed_hosts="tradera.net",
+                          fetch=FakeFetch(bodies), **kwargs)
+
+    def blob_count(self):
+        return sum(len(files) for _, _, files in os.walk(os.path.join(self.directory, "blobs")))
+
+    def test_content_addressed(self):
+        """Test URLs with the same bytes share one blob, and repeat requests are hits"""
+        cache = self.make_cache({"https://img.tradera.net/a.jpg": PNG, "https://img.tradera.net/b.jpg": PNG})
+
+        async def scenario():
+            first = await cache.get("https://img.tradera.net/a.jpg")
+            second = await cache.get("https://img.tradera.net/b.jpg")
+            again = await cache.get("https://img.tradera.net/a.jpg")
+            return first, second, again
+
+        first, second, again = asyncio.run(scenario())
+        self.assertEqual(first.path, second.path)
+        self.assertEqual(again.digest, first.digest)
+        with open(first.path, "rb") as f:
+            self.assertEqual(f.read(), PNG)
+        self.assertEqual(self.blob_count(), 1)
+        self.assertEqual(cache.stats(), {"images": 1, "bytes": 100, "max_bytes": 1000,
+                                         "hits": 1, "misses": 2, "evictions": 0})
+
+    def test_evicts_least_recently_served_beyond_budget(self):
+        """Test the cache stays under its byte budget, and the order survives a restart"""
+        bodies = {f"https://img.tradera.net/{n}.jpg": bytes([n]) * 100 for n in range(4)}
+        cache = self.make_cache(bodies, max_bytes=250)
+
+        async def scenario(cache, urls):
+            return [await cache.get(url) for url in urls]
+
+        urls = list(bodies)
+        # Serving 0 again makes 1 the least recently served
+        served = asyncio.run(scenario(cache, [urls[0], urls[1], urls[0], urls[2]]))
+        self.assertIsNone(cache.lookup(urls[1]))
+        self.assertEqual((cache.total_bytes, cache.evictions, self.blob_count()), (200, 1, 2))
+
+        # After a restart the order comes from modification times: 2 is now the older one
+        os.utime(served[3].path, (1, 1))
+        os.utime(served[0].path, (2, 2))
+        restarted = self.make_cache(bodies, max_bytes=250)
+        asyncio.run(scenario(restarted, [urls[3]]))
+        self.assertIsNone(restarted.lookup(urls[2]))
+        self.assertIsNotNone(restarted.lookup(urls[0]))
+        self.assertEqual(restarted.total_bytes, 200)
+
+    def test_rejects_other_hosts_and_non_images(self):
+        """Test only allowed hosts are fetched and only images are stored"""
+        cache = self.make_cache({})
+        for url in ("https://evil.example/a.jpg", "file:///etc/passwd", "https://tradera.net.evil.example/a.jpg"):
+            with self.assertRaises(ImageProxyError) as error:
+                asyncio.run(cache.get(url))
+            self.assertEqual(error.exception.status_code, 400)
+        self.assertEqual(cache.fetch.calls, [])
+
+        cache.fetch = lambda url: (b"<html>", "text/html")
+        with self.assertRaises(ImageProxyError) as error:
+            asyncio.run(cache.get("https://img.tradera.net/a.jpg"))
+        self.assertEqual(error.exception.status_code, 502)
+        self.assertEqual(self.blob_count(), 0)
+
+    def test_redirects_are_checked_and_svg_refused(self):
+        """Test redirects are only followed to allowed hosts, and SVG images are not proxied"""
+        class FakeResponse:
+            def __init__(self, status_code, headers, body=b""):
+                self.status_code, self.headers, self.body = status_code, headers, body
+                self.is_redirect = "Location" in headers
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def iter_content(self, size):
+                return [self.body]
+
+        responses = {
+            "https://img.tradera.net/a.jpg": FakeResponse(302, {"Location": "/b.jpg"}),
+            "https://img.tradera.net/b.jpg": FakeResponse(200, {"Content-Type": "image/png"}, PNG),
+            "https://img.tradera.net/c.jpg": FakeResponse(302, {"Location": "http://169.254.169.254/"}),
+            "https://img.tradera.net/d.svg": FakeResponse(200, {"Content-Type": "image/svg+xml"}, b"<svg/>"),
+        }
+        cache = ImageCache(directory=self.directory, max_bytes=1000, allowed_hosts="tradera.net")
+        with patch("requests.get", side_effect=lambda url, **kwargs: responses[url]) as get:
+            image = asyncio.run(cache.get("https://img.tradera.net/a.jpg"))
+            self.assertEqual(image.size, len(PNG))
+            self.assertFalse(get.call_args.kwargs["allow_redirects"])
+
+            for url in ("https://img.tradera.net/c.jpg", "https://img.tradera.net/d.svg"):
+                with self.assertRaises(ImageProxyError) as error:
+                    asyncio.run(cache.get(url))
+                self.assertEqual(error.exception.status_code, 502)
+            self.assertNotIn("http://169.254.169.254/", [call.args[0] for call in get.call_args_list])
+        self.assertEqual(self.blob_count(), 1)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        """Test simultaneous requests for an uncached image fetch it once"""
+        release = threading.Event()
+        fetch = FakeFetch({"https://img.tradera.net/a.jpg": PNG})
+        cache = self.make_cache({})
+        cache.fetch = lambda url: release.wait(5) and fetch(url)
+
+        async def scenario():
+            requests = [asyncio.create_task(cache.get("https://img.tradera.net/a.jpg")) for _ in range(5)]
+            await asyncio.sleep(0.05)
+            release.set()
+            return await asyncio.gather(*requests)
+
+        results = asyncio.run(scenario())
+        self.assertEqual(len({image.path for image in results}), 1)
+        self.assertEqual(fetch.calls, ["https://img.tradera.net/a.jpg"])
+
+
+class TestImageRoute(unittest.TestCase):
+    """Test cases for GET /api/images"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        cache = ImageCache(directory=self.directory, max_bytes=1000, allowed_hosts="tradera.net",
+                           fetch=FakeFetch({"https://img.tradera.net/a.jpg": PNG}))
+        self.patches = [patch.object(images, "image_cache", cache),
+                        patch.dict(os.environ, {"IMAGE_PROXY_ENABLED": "true"})]
+        for patcher in self.patches:
+            patcher.start()
+        self.app = FastAPI()
+        self.app.include_router(images.router)
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def request(self, url, headers=None):
+        async def scenario():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app), base_url="http://test") as client:
+                return await client.get("/api/images", params={"url": url}, headers=headers or {})
+
+        return asyncio.run(scenario())
+
+    def test_serves_file_with_long_cache_headers(self):
+        """Test images are served with immutable caching and revalidate to 304"""
+        response = self.request("https://img.tradera.net/a.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, PNG)
+        self.assertEqual(response.headers["content-type"], "image/png")
+        self.assertEqual(response.headers["cache-control"], images.CACHE_CONTROL)
+
+        revalidated = self.request("https://img.tradera.net/a.jpg", {"If-None-Match": response.headers["etag"]})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b"")
+
+    def test_image_evicted_while_serving_is_fetched_again(self):
+        """Test an image evicted between the lookup and the response is fetched again instead of failing"""
+        cache = images.image_cache
+        get = cache.get
+        evicted = []
+
+        async def get_then_evict(url):
+            image = await get(url)
+            if not evicted:
+                # What a concurrent store's eviction does
+                with cache._lock:
+                    cache.total_bytes -= cache._blobs.pop(image.digest)
+                os.remove(image.path)
+                evicted.append(image.digest)
+            return image
+
+        with patch.object(cache, "get", get_then_evict):
+            response = self.request("https://img.tradera.net/a.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, PNG)
+        self.assertEqual(response.headers["content-length"], str(len(PNG)))
+        self.assertEqual(len(cache.fetch.calls), 2)
+
+    def test_errors(self):
+        """Test disallowed hosts are a 400 and a disabled proxy a 404"""
+        self.assertEqual(self.request("https://evil.example/a.jpg").status_code, 400)
+        with patch.dict(os.environ, {"IMAGE_PROXY_ENABLED": "false"}):
+            self.assertEqual(self.request("https://img.tradera.net/a.jpg").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,273 @@
+import unittest
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import JobQueue, RUN_SCRIPT, REFRESH_AUCTION, FIRE_BID
+import worker
+from worker import JobWorker
+from routes import jobs
+from benchmarks.supabase_standin import SupabaseStandIn
+
+
+class TestJobQueue(unittest.TestCase):
+    """Test cases for the durable job queue"""
+    
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "jobs.db")
+        self.queue = JobQueue(self.path, backoff_base=10)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_lease_orders_by_priority(self):
+        """Test that bids are leased before refreshes and script runs"""
+        self.queue.enqueue(RUN_SCRIPT, {"script_id": 1})
+        self.queue.enqueue(REFRESH_AUCTION, {"auction_ids": [1]})
+        self.queue.enqueue(FIRE_BID, {"auction_id": 1})
+        
+        jobs = self.queue.lease("worker-1", batch_size=2)
+        
+        self.assertEqual([job["type"] for job in jobs], [FIRE_BID, REFRESH_AUCTION])
+        self.assertEqual(jobs[0]["attempts"], 1)
+        self.assertEqual(jobs[0]["payload"], {"auction_id": 1})
+        self.assertEqual([job["type"] for job in self.queue.lease("worker-2")], [RUN_SCRIPT])
+        self.assertEqual(self.queue.lease("worker-3"), [])
+    
+    def test_delayed_jobs_wait_for_run_at(self):
+        """Test that jobs aren't leased before run_at"""
+        self.queue.enqueue(FIRE_BID, {"auction_id": 1}, run_at=time.time() + 60)
+        self.assertEqual(self.queue.lease("worker-1"), [])
+    
+    def test_dedup_key(self):
+        """Test that duplicate keys return the existing job until it finishes"""
+        first = self.queue.enqueue(RUN_SCRIPT, {"script_id": 1}, dedup_key="script:1")
+        second = self.queue.enqueue(RUN_SCRIPT, {"script_id": 1}, dedup_key="script:1")
+        self.assertEqual(first, second)
+        
+        self.queue.lease("worker-1")
+        self.queue.complete(first, "worker-1")
+        
+        third = self.queue.enqueue(RUN_SCRIPT, {"script_id": 1}, dedup_key="script:1")
+        self.assertNotEqual(first, third)
+    
+    def test_expired_lease_is_released(self):
+        """Test that a crashed worker's jobs are picked up again"""
+        job_id = self.queue.enqueue(RUN_SCRIPT, {"script_id": 1})
+        self.queue.lease("worker-1", lease_seconds=-1)
+        
+        jobs = self.queue.lease("worker-2")
+        
+        self.assertEqual([job["id"] for job in jobs], [job_id])
+        self.assertEqual(jobs[0]["attempts"], 2)
+        
+        # The original worker can no longer finish the job
+        self.queue.complete(job_id, "worker-1")
+        self.assertEqual(self.queue.get(job_id)["status"], "leased")
+        self.assertTrue(self.queue.extend_lease(job_id, "worker-2"))
+        self.assertFalse(self.queue.extend_lease(job_id, "worker-1"))
+    
+    def test_retry_with_backoff_then_dead(self):
+        """Test retries and dead-lettering"""
+        job_id = self.queue.enqueue(RUN_SCRIPT, {"script_id": 1}, max_attempts=2)
+        
+        self.queue.lease("worker-1")
+        before = time.time()
+        self.queue.fail(job_id, "Tradera timeout", "worker-1")
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], "queued")
+        self.assertEqual(job["last_error"], "Tradera timeout")
+        self.assertGreaterEqual(job["run_at"], before + 5)
+        
+        with patch("time.time", return_value=job["run_at"] + 1):
+            self.queue.lease("worker-1")
+            self.queue.fail(job_id, "Tradera timeout", "worker-1")
+        self.assertEqual(self.queue.get(job_id)["status"], "dead")
+        self.assertEqual(self.queue.counts(), {"dead": 1})
+    
+    def test_sealed_secrets(self):
+        """Test sealed values are encrypted with a key every queue on the same database shares"""
+        with patch.dict(os.environ, {"JOB_PAYLOAD_KEY": ""}):
+            sealed = self.queue.seal("user-token")
+            self.assertNotIn("user-token", sealed)
+            self.assertEqual(JobQueue(self.path).unseal(sealed), "user-token")
+            self.assertEqual(oct(os.stat(self.path + ".key").st_mode & 0o777), "0o600")
+
+            other = JobQueue(os.path.join(self.tmp.name, "other.db"))
+            with self.assertRaises(ValueError):
+                other.unseal(sealed)
+
+    def test_survives_reopen(self):
+        """Test that queued jobs persist across restarts"""
+        job_id = self.queue.enqueue(FIRE_BID, {"auction_id": 1})
+        reopened = JobQueue(self.path)
+        self.assertEqual(reopened.lease("worker-1")[0]["id"], job_id)
+
+
+class TestJobWorker(unittest.TestCase):
+    """Test cases for the job worker"""
+    
+    def setUp(self):
+        """Set up test environment"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.tmp.name, "jobs.db"))
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_run_once(self):
+        """Test that a batch is executed and outcomes recorded"""
+        seen = []
+        
+        async def ok(payload):
+            seen.append(payload["script_id"])
+        
+        async def not_found(payload):
+            raise HTTPException(status_code=404, detail="Auction not found")
+        
+        async def flaky(payload):
+            raise RuntimeError("connection reset")
+        
+        worker = JobWorker(
+            queue=self.queue,
+            handlers={RUN_SCRIPT: ok, FIRE_BID: not_found, REFRESH_AUCTION: flaky},
+            worker_id="worker-1"
+        )
+        done = self.queue.enqueue(RUN_SCRIPT, {"script_id": 7})
+        dead = self.queue.enqueue(FIRE_BID, {"auction_id": 1})
+        retried = self.queue.enqueue(REFRESH_AUCTION, {"auction_ids": [1]})
+        
+        processed = asyncio.run(worker.run_once())
+        
+        self.assertEqual(processed, 3)
+        self.assertEqual(seen, [7])
+        self.assertEqual(self.queue.get(done)["status"], "done")
+        self.assertEqual(self.queue.get(dead)["status"], "dead")
+        self.assertEqual(self.queue.get(retried)["status"], "queued")
+
+    def test_free_slots_are_refilled_while_a_job_runs(self):
+        """Test a job enqueued while a long one runs starts without waiting for it"""
+        async def scenario():
+            release = asyncio.Event()
+            fired = asyncio.Event()
+
+            async def slow(payload):
+                await release.wait()
+
+            async def fire(payload):
+                fired.set()
+
+            worker = JobWorker(queue=self.queue, handlers={RUN_SCRIPT: slow, FIRE_BID: fire},
+                               worker_id="worker-1", concurrency=2, poll_interval=0.01)
+            slow_job = self.queue.enqueue(RUN_SCRIPT, {"script_id": 7})
+            stop = asyncio.Event()
+            task = asyncio.create_task(worker.run(stop))
+            await asyncio.sleep(0.05)
+            fire_job = self.queue.enqueue(FIRE_BID, {"auction_id": 1})
+            await asyncio.wait_for(fired.wait(), timeout=2)
+            running = self.queue.get(slow_job)["status"]
+            release.set()
+            stop.set()
+            await task
+            return running, self.queue.get(slow_job)["status"], fire_job
+
+        running, finished, fire_job = asyncio.run(scenario())
+        self.assertEqual((running, finished), ("leased", "done"))
+        self.assertEqual(self.queue.get(fire_job)["status"], "done")
+
+    def test_fire_bid_uses_sealed_token_and_environment_client(self):
+        """Test the fire_bid handler unseals the token into a client built like the shared one"""
+        supabase = SupabaseStandIn({"auctions": [{"id": 1, "tradera_id": "123"}]})
+        sniper = MagicMock()
+        sniper.return_value.fire.return_value = {"success": True}
+        with patch.object(worker, "get_job_queue", return_value=self.queue), \
+                patch("db.get_supabase_client", return_value=supabase), \
+                patch("db.user_stats"), \
+                patch("sniper.BidSniper", sniper), \
+                patch.dict(os.environ, {"TRADERA_SANDBOX": "1", "JOB_PAYLOAD_KEY": ""}):
+            payload = {"auction_id": 1, "amount": 550, "user_id": 7, "sealed_token": self.queue.seal("user-token")}
+            self.assertEqual(asyncio.run(worker.handle_fire_bid(payload)), {"success": True})
+
+        api = sniper.call_args.args[0]
+        self.assertEqual((api.sandbox, api.user_id, api.token), (1, 7, "user-token"))
+
+    def test_fire_bid_without_token_fails_permanently(self):
+        """Test a fire_bid job missing its sealed token is marked dead with a clear error"""
+        job_id = self.queue.enqueue(FIRE_BID, {"auction_id": 1, "user_id": 7, "token": "user-token"})
+        job_worker = JobWorker(queue=self.queue, handlers={FIRE_BID: worker.handle_fire_bid}, worker_id="worker-1")
+        with patch("db.get_supabase_client") as get_client:
+            asyncio.run(job_worker.run_once())
+
+        get_client.assert_not_called()
+        job = self.queue.get(job_id)
+        self.assertEqual((job["status"], job["last_error"]), ("dead", "fire_bid payload is missing sealed_token"))
+
+    def test_fire_bid_records_statistics(self):
+        """Test a fired bid is claimed for its user and counted in the user's statistics"""
+        auction = {"id": 1, "tradera_id": "123"}
+        supabase = SupabaseStandIn({"auctions": [auction], "bids": []})
+        sniper = MagicMock()
+        sniper.return_value.fire.return_value = {"status": "Bought", "success": True}
+        with patch.object(worker, "get_job_queue", return_value=self.queue), \
+                patch("db.get_supabase_client", return_value=supabase), \
+                patch("db.user_stats") as user_stats, \
+                patch("sniper.BidSniper", sniper), \
+                patch.dict(os.environ, {"JOB_PAYLOAD_KEY": ""}):
+            payload = {"auction_id": 1, "amount": 550, "user_id": 7, "sealed_token": self.queue.seal("user-token")}
+            asyncio.run(worker.handle_fire_bid(payload))
+
+        self.assertEqual(sniper.return_value.fire.call_args.args[3], 7)
+        auction = supabase.tables["auctions"][0]
+        user_stats.record_first_bid.assert_called_once_with(7, auction)
+        user_stats.record_result.assert_called_once_with(7, auction, won=True, amount=550)
+
+
+class TestJobRoutes(unittest.TestCase):
+    """Test cases for /api/jobs"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.tmp.name, "jobs.db"))
+        self.patches = [patch.object(jobs, "get_job_queue", return_value=self.queue),
+                        patch.dict(os.environ, {"JOB_PAYLOAD_KEY": ""})]
+        for patcher in self.patches:
+            patcher.start()
+        app = FastAPI()
+        app.include_router(jobs.router)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+        self.tmp.cleanup()
+
+    def test_token_is_sealed_and_never_returned(self):
+        """Test a fire_bid token is stored encrypted and left out of every response"""
+        response = self.client.post("/api/jobs", json={
+            "type": "fire_bid", "payload": {"auction_id": 1, "user_id": 7, "token": "user-token"},
+        })
+        self.assertEqual(response.status_code, 200)
+        job = response.json()
+        self.assertEqual(set(job["payload"]) - {"traceparent"}, {"auction_id", "user_id"})
+        self.assertNotIn("token", self.client.get(f"/api/jobs/{job['id']}").json()["payload"])
+
+        stored = self.queue.get(job["id"])["payload"]
+        self.assertNotIn("token", stored)
+        self.assertEqual(self.queue.unseal(stored["sealed_token"]), "user-token")
+        for path in (self.queue.path, self.queue.path + "-wal"):
+            with open(path, "rb") as f:
+                self.assertNotIn(b"user-token", f.read())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import check_slo, parse_slo, run_load_test
+from benchmarks.supabase_standin import SupabaseStandIn
+
+
+class TestSupabaseStandIn(unittest.TestCase):
+    """Test cases for the in-memory Supabase stand-in"""
+
+    def test_queries(self):
+        """Test filters, ordering, limits, projection and writes bumping table versions"""
+        supabase = SupabaseStandIn({"auctions": [
+            {"title": "a", "current_price": 30, "status": "active"},
+            {"title": "b", "current_price": 10, "status": "ended"},
+            {"title": "c", "current_price": 20, "status": "active"},
+        ]})
+        rows = supabase.table("auctions").select("id, title").eq("status", "active").order("current_price").execute().data
+        self.assertEqual(rows, [{"id": 3, "title": "c"}, {"id": 1, "title": "a"}])
+        self.assertEqual(len(supabase.table("auctions").select("*").in_("id", ["1", "2"]).limit(1).execute().data), 1)
+
+        inserted = supabase.table("auctions").insert({"title": "d"}).execute().data[0]
+        self.assertEqual(inserted["id"], 4)
+        self.assertIn("created_at", inserted)
+        supabase.table("auctions").update({"status": "ended"}).eq("id", 1).execute()
+        supabase.table("auction_scripts").upsert([{"auction_id": 1, "script_id": 7}], on_conflict="auction_id,script_id",
+                                                 ignore_duplicates=True).execute()
+        supabase.table("auction_scripts").upsert([{"auction_id": 1, "script_id": 7}], on_conflict="auction_id,script_id",
+                                                 ignore_duplicates=True).execute()
+        self.assertEqual(len(supabase.tables["auction_scripts"]), 1)
+        versions = supabase.table("table_versions").select("version").eq("table_name", "auctions").execute().data
+        self.assertEqual(versions, [{"version": 2}])
+        self.assertEqual(supabase.rpc("due_search_scripts", {"max_scripts": 10}).execute().data, [])
+
+
+class TestLoadTest(unittest.TestCase):
+    """Test cases for the in-process load test"""
+
+    def test_mixed_load(self):
+        """Test concurrent clients get through every request kind without errors"""
+        report = run_load_test(clients=20, requests=120, db_latency=0, tradera_latency=0)
+        self.assertEqual(report["errors"], 0, report["errors_by_kind"])
+        self.assertEqual(report["latency_ms"]["all"]["count"], 120)
+        for kind in ("list", "search", "script_run", "bid"):
+            self.assertGreater(report["latency_ms"][kind]["count"], 0)
+        self.assertGreater(report["tradera_calls"], 0)
+        self.assertEqual(check_slo(report, "p99=60000", max_error_rate=0), [])
+
+    def test_slo_breaches(self):
+        """Test latency objectives and the error budget are checked per kind"""
+        report = {"error_rate": 0.02, "latency_ms": {"all": {"p95": 120.0, "p99": 300.0}, "search": {"p99": 900.0}}}
+        self.assertEqual(check_slo(report, "p95=200,p99=250,search.p99=800,bid.p99=100", max_error_rate=0.01), [
+            "all.p99 300.0 ms > 250 ms",
+            "search.p99 900.0 ms > 800 ms",
+            "error rate 2.00% > 1.00%",
+        ])
+        for invalid in ("p97=1", "checkout.p99=1", "p99"):
+            with self.assertRaises(ValueError):
+                parse_slo(invalid)
+
+
+if __name__ == "__main__":
+    unittest.main()
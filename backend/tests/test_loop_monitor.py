@@ -0,0 +1,102 @@
+import unittest
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loop_monitor import EventLoopMonitor, Histogram
+
+
+def blocking_handler():
+    """Stands in for a route doing synchronous I/O on the event loop"""
+    time.sleep(0.3)
+
+
+async def run_with_stall(monitor: EventLoopMonitor, stall: bool = True):
+    stop = asyncio.Event()
+    task = asyncio.create_task(monitor.run(stop))
+    await asyncio.sleep(0.1)
+    if stall:
+        blocking_handler()
+    await asyncio.sleep(0.1)
+    stop.set()
+    await task
+
+
+class TestHistogram(unittest.TestCase):
+    """Test cases for the millisecond histogram"""
+
+    def test_snapshot(self):
+        """Test cumulative bucket counts, totals and percentiles"""
+        histogram = Histogram(buckets=(1, 10, 100))
+        for ms in (0.5, 0.8, 5, 50, 500):
+            histogram.record(ms)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["buckets"], {"1": 2, "10": 3, "100": 4, "+Inf": 5})
+        self.assertEqual((snapshot["count"], snapshot["sum_ms"], snapshot["max_ms"]), (5, 556.3, 500))
+        self.assertEqual((snapshot["p50_ms"], snapshot["p99_ms"]), (5, 500))
+
+    def test_empty(self):
+        """Test an empty histogram has no percentiles"""
+        snapshot = Histogram().snapshot()
+        self.assertEqual(snapshot["count"], 0)
+        self.assertIsNone(snapshot["p99_ms"])
+
+
+class TestEventLoopMonitor(unittest.TestCase):
+    """Test cases for lag sampling and blocking-call detection"""
+
+    def test_lag_is_sampled(self):
+        """Test an idle loop records small lag samples and stops promptly"""
+        monitor = EventLoopMonitor(interval=0.01, blocking_threshold=0.1, debug=False)
+        start = time.monotonic()
+        asyncio.run(run_with_stall(monitor, stall=False))
+        self.assertLess(time.monotonic() - start, 1)
+        stats = monitor.stats()
+        self.assertGreater(stats["lag"]["count"], 5)
+        self.assertEqual(stats["blocking"]["count"], 0)
+        self.assertFalse(stats["running"])
+
+    def test_blocking_call_stack_captured_in_debug(self):
+        """Test a stall is recorded once, with the stack of the blocking code"""
+        monitor = EventLoopMonitor(interval=0.02, blocking_threshold=0.1, debug=True)
+        asyncio.run(run_with_stall(monitor))
+        calls = monitor.recent_blocking_calls()
+        self.assertEqual(len(calls), 1)
+        self.assertGreaterEqual(calls[0]["duration_ms"], 200)
+        self.assertIn("blocking_handler", "".join(calls[0]["stack"]))
+        self.assertEqual(monitor.stats()["blocking"]["count"], 1)
+        self.assertGreaterEqual(monitor.stats()["lag"]["max_ms"], 200)
+
+    def test_no_stack_outside_debug(self):
+        """Test stalls are counted without stacks when not in debug mode"""
+        monitor = EventLoopMonitor(interval=0.02, blocking_threshold=0.1, debug=False)
+        asyncio.run(run_with_stall(monitor))
+        calls = monitor.recent_blocking_calls()
+        self.assertEqual(len(calls), 1)
+        self.assertIsNone(calls[0]["stack"])
+
+    def test_admin_endpoint(self):
+        """Test the admin endpoint returns histograms and recent blocking calls"""
+        from routes import admin
+        monitor = EventLoopMonitor(interval=0.1, blocking_threshold=0.05, debug=False)
+        monitor.record_lag(0.001)
+        monitor.record_lag(0.2)
+        app = FastAPI()
+        app.include_router(admin.router)
+        with patch.object(admin, "event_loop_monitor", monitor):
+            body = TestClient(app).get("/api/admin/event-loop").json()
+        self.assertEqual(body["lag"]["count"], 2)
+        self.assertEqual(body["blocking"]["count"], 1)
+        self.assertEqual(body["blocking_calls"][0]["duration_ms"], 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from postgrest.exceptions import APIError
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_history import PriceHistoryRecorder, downsample
+
+
+START = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class TestPriceHistoryRecorder(unittest.TestCase):
+    """Test cases for buffered price observations"""
+
+    def setUp(self):
+        self.supabase = MagicMock()
+        self.supabase.table.return_value.select.return_value.eq.return_value.order.return_value.execute.return_value = MagicMock(data=[])
+        self.recorder = PriceHistoryRecorder(get_client=lambda: self.supabase, flush_size=3, flush_interval=3600)
+
+    def test_only_changes_are_recorded(self):
+        """Test repeated observations of the same values are not stored"""
+        self.recorder.observe(1, 100, 0, observed_at=START)
+        self.recorder.observe(1, 100, 0, observed_at=START + timedelta(minutes=1))
+        self.recorder.observe(1, 120, 1, observed_at=START + timedelta(minutes=2))
+        self.assertEqual([point["price"] for point in self.recorder.pending(1)], [100.0, 120.0])
+
+    def test_batched_writes(self):
+        """Test observations are written in one call when the buffer is full"""
+        upsert = self.supabase.table.return_value.upsert
+        self.recorder.observe_rows([{"id": 1, "current_price": 10, "bid_count": 0},
+                                    {"id": 2, "current_price": 20, "bid_count": 0}])
+        upsert.assert_not_called()
+
+        self.recorder.observe_rows([{"id": 3, "current_price": 30, "bid_count": 0}])
+        upsert.assert_called_once()
+        self.assertEqual([row["auction_id"] for row in upsert.call_args[0][0]], [1, 2, 3])
+        self.assertEqual(self.recorder.pending(), [])
+
+    def test_failed_write_is_retried(self):
+        """Test observations stay buffered when the write fails"""
+        upsert = self.supabase.table.return_value.upsert
+        upsert.return_value.execute.side_effect = Exception("timeout")
+        self.recorder.observe(1, 100, 0)
+        self.assertEqual(self.recorder.flush(), 0)
+        self.assertEqual(len(self.recorder.pending()), 1)
+
+        upsert.return_value.execute.side_effect = None
+        self.assertEqual(self.recorder.flush(), 1)
+        self.assertEqual(self.recorder.pending(), [])
+
+    def test_rejected_observations_are_dropped(self):
+        """Test an observation of a deleted auction is dropped without holding back the others"""
+        upsert = self.supabase.table.return_value.upsert
+        written = []
+
+        def upsert_rows(rows, **kwargs):
+            query = MagicMock()
+            if any(row["auction_id"] == 2 for row in rows):
+                query.execute.side_effect = APIError({"code": "23503", "message": "violates foreign key constraint"})
+            else:
+                written.extend(row["auction_id"] for row in rows)
+            return query
+
+        upsert.side_effect = upsert_rows
+        self.recorder.flush_size = 10
+        for auction_id in (1, 2, 3, 4):
+            self.recorder.observe(auction_id, 100, 0)
+        self.assertEqual(self.recorder.flush(), 3)
+        self.assertEqual(sorted(written), [1, 3, 4])
+        self.assertEqual((self.recorder.pending(), self.recorder.dropped), ([], 1))
+
+    def test_permission_errors_keep_observations(self):
+        """Test observations refused by row-level security stay buffered instead of being dropped"""
+        upsert = self.supabase.table.return_value.upsert
+        upsert.return_value.execute.side_effect = APIError({"code": "42501", "message": "violates row-level security"})
+        self.recorder.observe(1, 100, 0)
+        self.assertEqual(self.recorder.flush(), 0)
+        self.assertEqual((len(self.recorder.pending()), self.recorder.dropped), (1, 0))
+
+    def test_ended_auctions_are_forgotten(self):
+        """Test the final observation of an ended auction is kept but not tracked"""
+        self.recorder.observe_rows([{"id": 1, "current_price": 10, "bid_count": 1, "status": "ended"}])
+        self.assertEqual(len(self.recorder.pending(1)), 1)
+        self.assertNotIn(1, self.recorder._last)
+
+    def test_history_includes_buffered_points(self):
+        """Test stored and buffered observations are merged in time order"""
+        self.supabase.table.return_value.select.return_value.eq.return_value.order.return_value.execute.return_value = MagicMock(data=[
+            {"observed_at": START.isoformat(), "price": 100, "bid_count": 0},
+        ])
+        self.recorder.observe(1, 150, 2, observed_at=START + timedelta(hours=1))
+        points = self.recorder.history(1)
+        self.assertEqual([point["price"] for point in points], [100, 150.0])
+
+
+class TestDownsample(unittest.TestCase):
+    """Test cases for downsampling"""
+
+    def test_last_point_per_bucket(self):
+        """Test each bucket keeps its last observation"""
+        points = [
+            {"observed_at": (START + timedelta(minutes=minute)).isoformat(), "price": minute, "bid_count": 0}
+            for minute in (0, 10, 50, 70, 130)
+        ]
+        result = downsample(points, 3600)
+        self.assertEqual([point["price"] for point in result], [50, 70, 130])
+        self.assertEqual(downsample(points, 0), points)
+
+
+if __name__ == "__main__":
+    unittest.main()
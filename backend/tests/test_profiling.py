@@ -0,0 +1,141 @@
+import unittest
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profiling
+from profiling import (ProfiledJSONResponse, ProfilingMiddleware, RequestProfile, SlowRequestLog,
+                       current_profile, instrument_httpx, span)
+
+
+def make_app(**middleware_options):
+    app = FastAPI(default_response_class=ProfiledJSONResponse)
+
+    @app.get("/work")
+    async def work():
+        with span("tradera.search"):
+            time.sleep(0.01)
+
+        def blocking_db_call():
+            with span("db.auctions"):
+                time.sleep(0.005)
+
+        await asyncio.to_thread(blocking_db_call)
+        return {"items": list(range(10))}
+
+    app.add_middleware(ProfilingMiddleware, **middleware_options)
+    return app
+
+
+class TestProfiling(unittest.TestCase):
+    """Test cases for request profiling"""
+
+    def setUp(self):
+        self.log = SlowRequestLog(maxlen=5)
+
+    def test_span_is_noop_without_profile(self):
+        """Test spans outside a profiled request record nothing"""
+        self.assertIsNone(current_profile())
+        with span("db.auctions"):
+            pass
+
+    def test_header_selects_request(self):
+        """Test the X-Profile header profiles a request and reports Server-Timing"""
+        client = TestClient(make_app(enabled=True, sample_rate=0, slow_ms=0, log=self.log))
+        response = client.get("/work", headers={"X-Profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-Profile-Id", response.headers)
+        self.assertIn("tradera.search;dur=", response.headers["Server-Timing"])
+        self.assertIn("db.auctions;dur=", response.headers["Server-Timing"])
+
+        profile = self.log.get(response.headers["X-Profile-Id"])
+        self.assertEqual((profile.method, profile.path, profile.status_code), ("GET", "/work", 200))
+        self.assertEqual(set(profile.totals()), {"tradera.search", "db.auctions", "serialize"})
+        self.assertGreaterEqual(profile.duration_ms, 15)
+
+    def test_unselected_and_disabled(self):
+        """Test requests without the header are not profiled, nor anything when disabled"""
+        client = TestClient(make_app(enabled=True, sample_rate=0, slow_ms=0, log=self.log))
+        self.assertNotIn("X-Profile-Id", client.get("/work").headers)
+        self.assertNotIn("X-Profile-Id", client.get("/work", headers={"X-Profile": "0"}).headers)
+        client = TestClient(make_app(enabled=False, slow_ms=0, log=self.log))
+        self.assertNotIn("X-Profile-Id", client.get("/work", headers={"X-Profile": "1"}).headers)
+        self.assertEqual(self.log.recent(), [])
+
+    def test_sampling(self):
+        """Test a sample rate of 1 profiles every request"""
+        client = TestClient(make_app(enabled=True, sample_rate=1.0, slow_ms=0, log=self.log))
+        for _ in range(3):
+            client.get("/work")
+        self.assertEqual(len(self.log.recent()), 3)
+
+    def test_only_slow_requests_are_kept(self):
+        """Test profiled requests under the threshold are not kept"""
+        client = TestClient(make_app(enabled=True, slow_ms=60000, log=self.log))
+        response = client.get("/work", headers={"X-Profile": "1"})
+        self.assertIn("X-Profile-Id", response.headers)
+        self.assertEqual(self.log.recent(), [])
+
+    def test_cprofile_dump(self):
+        """Test slow requests are dumped as cProfile stats when a dump directory is set"""
+        with tempfile.TemporaryDirectory() as directory:
+            client = TestClient(make_app(enabled=True, slow_ms=0, dump_dir=directory, log=self.log))
+            response = client.get("/work", headers={"X-Profile": "1"})
+            profile = self.log.get(response.headers["X-Profile-Id"])
+            self.assertTrue(profile.dump_path.startswith(directory))
+            self.assertTrue(os.path.getsize(profile.dump_path) > 0)
+
+    def test_instrument_httpx(self):
+        """Test every request of an instrumented httpx client becomes a span"""
+        client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=[])),
+                              base_url="http://localhost/rest/v1")
+        instrument_httpx(client, prefix="db")
+        profile = RequestProfile("GET", "/test")
+        token = profiling._current.set(profile)
+        try:
+            client.get("/auctions")
+            client.post("/rpc/due_search_scripts")
+        finally:
+            profiling._current.reset(token)
+        client.get("/bids")  # not profiled
+        self.assertEqual([s["name"] for s in profile.spans], ["db.auctions", "db.due_search_scripts"])
+        self.assertEqual(profile.spans[1]["attributes"], {"method": "POST", "status": 200})
+
+    def test_slow_request_log(self):
+        """Test the log keeps the newest profiles, newest first"""
+        profiles = [RequestProfile("GET", f"/{i}") for i in range(7)]
+        for profile in profiles:
+            self.log.add(profile)
+        self.assertEqual([p.path for p in self.log.recent(3)], ["/6", "/5", "/4"])
+        self.assertIsNone(self.log.get(profiles[0].id))
+
+    def test_admin_endpoints(self):
+        """Test slow requests are listed and fetched by ID"""
+        from routes import admin
+        app = FastAPI()
+        app.include_router(admin.router)
+        client = TestClient(app)
+        profile = RequestProfile("POST", "/api/scripts/1/run")
+        profile.add("tradera.search", profile._start, 0.5)
+        profile.finish(200)
+        with patch.object(admin, "slow_requests", self.log):
+            self.log.add(profile)
+            listed = client.get("/api/admin/slow-requests").json()
+            self.assertEqual(listed[0]["totals"]["tradera.search"], {"count": 1, "total_ms": 500.0})
+            detail = client.get(f"/api/admin/slow-requests/{profile.id}").json()
+            self.assertEqual(detail["spans"][0]["name"], "tradera.search")
+            self.assertEqual(client.get("/api/admin/slow-requests/missing").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes import auctions
+from benchmarks.supabase_standin import SupabaseStandIn
+
+
+def make_row(auction_id, tradera_id, price=100, status="active"):
+    return {"id": auction_id, "tradera_id": str(tradera_id), "title": f"Auction {auction_id}", "current_price": price,
+            "end_time": "2030-01-01T12:00:00+00:00", "bid_count": 0, "status": status, "script_id": 3}
+
+
+class TestRefreshAuctions(unittest.TestCase):
+    """Test cases for POST /api/auctions/refresh"""
+
+    def setUp(self):
+        self.supabase = SupabaseStandIn({"auctions": [make_row(1, 11), make_row(2, 22), make_row(3, 33)]})
+        self.api = MagicMock()
+        self.threads = []
+
+        def get_items(item_ids):
+            self.threads.append(threading.current_thread())
+            return {
+                11: {"current_price": 150, "bid_count": 2, "status": "active", "next_bid": 160,
+                     "end_date": "2030-01-01T12:05:00+00:00"},
+                22: {"error": "Item not found"},
+                33: {"current_price": 300, "bid_count": 4, "status": "active", "next_bid": 310},
+            }
+
+        self.api.get_items.side_effect = get_items
+        self.patches = [patch.object(auctions, "get_supabase_client", return_value=self.supabase),
+                        patch.object(auctions, "tradera_api", self.api),
+                        patch.object(auctions, "price_history", MagicMock())]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+
+    def test_updates_are_batched(self):
+        """Test refreshed auctions are written in one upsert, with the Tradera call off the event loop"""
+        calls = self.supabase.calls
+        result = asyncio.run(auctions.refresh_auctions(auctions.RefreshRequest(auction_ids=[1, 2, 3, 4])))
+
+        self.assertEqual((result["failed"], result["not_found"]), ([2], [4]))
+        self.assertEqual(sorted(row["id"] for row in result["refreshed"]), [1, 3])
+        # One select, one upsert
+        self.assertEqual(self.supabase.calls - calls, 2)
+        self.assertIsNot(self.threads[0], threading.main_thread())
+
+        stored = {row["id"]: row for row in self.supabase.tables["auctions"]}
+        self.assertEqual((stored[1]["current_price"], stored[1]["next_bid"], stored[1]["end_time"]),
+                         (150.0, 160, "2030-01-01T12:05:00+00:00"))
+        self.assertEqual((stored[3]["bid_count"], stored[3]["end_time"]), (4, "2030-01-01T12:00:00+00:00"))
+        self.assertEqual((stored[2]["current_price"], stored[3]["script_id"]), (100, 3))
+        self.assertEqual(len(stored), 3)
+
+    def test_outcomes_of_ended_auctions(self):
+        """Test the top bid reaching the final price won, other bidders lost, and a completed Buy isn't counted twice"""
+        self.supabase.tables["auctions"].append(make_row(4, 44))
+        self.supabase.tables["bids"] = [
+            {"id": 1, "auction_id": 1, "user_id": "a", "amount": 140, "status": "placed"},
+            {"id": 2, "auction_id": 1, "user_id": "b", "amount": 200, "status": "placed"},
+            {"id": 3, "auction_id": 3, "user_id": "a", "amount": 250, "status": "placed"},
+            {"id": 4, "auction_id": 4, "user_id": "a", "amount": 500, "status": "won"},
+            {"id": 5, "auction_id": 4, "user_id": "b", "amount": 450, "status": "placed"},
+        ]
+        self.api.get_items.side_effect = lambda item_ids: {
+            11: {"current_price": 180, "bid_count": 5, "status": "ended"},
+            22: {"error": "Item not found"},
+            33: {"current_price": 300, "bid_count": 4, "status": "ended"},
+            44: {"current_price": 500, "bid_count": 3, "status": "ended"},
+        }
+        with patch.object(auctions, "user_stats") as user_stats:
+            asyncio.run(auctions.refresh_auctions(auctions.RefreshRequest(auction_ids=[1, 2, 3, 4])))
+
+        outcomes = sorted((call.args[1]["id"], call.args[0], call.kwargs["won"], call.kwargs.get("amount", 0))
+                          for call in user_stats.record_result.call_args_list)
+        self.assertEqual(outcomes, [(1, "a", False, 0), (1, "b", True, 180.0), (3, "a", False, 0), (4, "b", False, 0)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import os
+import sys
+import time
+from unittest.mock import patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resilience import RetryPolicy, CircuitBreaker, TraderaUnavailableError
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Test cases for retry policies"""
+    
+    def test_backoff_is_bounded(self):
+        """Test exponential backoff with jitter stays within bounds"""
+        policy = RetryPolicy(base_delay=0.1, max_delay=0.5)
+        for attempt in range(1, 10):
+            delay = policy.backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(0.5, 0.1 * 2 ** (attempt - 1)))
+    
+    def test_attempt_timeout_respects_deadline(self):
+        """Test per-attempt timeouts are capped by the deadline"""
+        policy = RetryPolicy(timeout=10.0)
+        self.assertEqual(policy.attempt_timeout(None), 10.0)
+        self.assertLessEqual(policy.attempt_timeout(time.time() + 2), 2.0)
+        self.assertIsNone(policy.attempt_timeout(time.time() - 1))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for circuit breakers"""
+    
+    def setUp(self):
+        """Set up test environment"""
+        self.breaker = CircuitBreaker("search", failure_threshold=2, reset_timeout=30.0)
+    
+    def test_opens_after_threshold(self):
+        """Test that consecutive failures open the circuit"""
+        self.breaker.record_failure()
+        self.breaker.before_call()
+        self.breaker.record_failure()
+        
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(TraderaUnavailableError) as context:
+            self.breaker.before_call()
+        self.assertGreater(context.exception.retry_after, 0)
+    
+    def test_success_resets_failures(self):
+        """Test that a success resets the failure count"""
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+    
+    def test_half_open_allows_single_trial(self):
+        """Test the half-open trial after the cool-down"""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        
+        later = time.monotonic() + 31
+        with patch("time.monotonic", return_value=later):
+            self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+            self.breaker.before_call()
+            with self.assertRaises(TraderaUnavailableError):
+                self.breaker.before_call()
+            
+            # A failed trial re-opens the circuit immediately
+            self.breaker.record_failure()
+            self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        
+        with patch("time.monotonic", return_value=later + 31):
+            self.breaker.before_call()
+            self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+if __name__ == '__main__':
+    unittest.main()
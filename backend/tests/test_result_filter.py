@@ -0,0 +1,112 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_filter import CompiledFilter, FilterCache, FilterStats, filter_search_items, filter_stats, total_price
+
+
+def make_item(item_id, title, price=100, next_bid=None, description=""):
+    return {"id": item_id, "title": title, "description": description, "current_price": price, "next_bid": next_bid}
+
+
+PAGE = [
+    make_item(1, "Canon AE-1 kamera", price=800),
+    make_item(2, "Canon AE-1 trasig, reservdelar", price=100),
+    make_item(3, "Canon AE-1 med objektiv", price=1500, next_bid=1550),
+    make_item(4, "Canon AE-1 kamera", price=500),
+    make_item(5, "Nikon FM2", price=900),
+    make_item(6, "Kamera Canon AE-1", price=300, description="Defekt slutare"),
+]
+
+
+class TestCompiledFilter(unittest.TestCase):
+    """Test cases for compiled result filters"""
+
+    def test_empty_filter_keeps_everything(self):
+        """Test a script without filters keeps the whole page"""
+        kept, drops = CompiledFilter({}, "canon").apply(PAGE)
+        self.assertEqual(kept, PAGE)
+        self.assertEqual(sum(drops.values()), 0)
+
+    def test_negative_keywords(self):
+        """Test negative keywords match whole words in title or description"""
+        kept, drops = CompiledFilter({"negative_keywords": ["trasig", "defekt"]}).apply(PAGE)
+        self.assertEqual([item["id"] for item in kept], [1, 3, 4, 5])
+        self.assertEqual(drops["negative_keyword"], 2)
+
+    def test_max_total_price(self):
+        """Test the total price uses the next bid when it is higher"""
+        self.assertEqual(total_price({"current_price": 100, "next_bid": 110, "shipping_cost": 50}), 110)
+        kept, drops = CompiledFilter({"max_total_price": 1500}).apply(PAGE)
+        self.assertNotIn(3, [item["id"] for item in kept])
+        self.assertEqual(drops["total_price"], 1)
+
+    def test_title_pattern_and_score(self):
+        """Test regex title matching and relevance scoring"""
+        kept, _ = CompiledFilter({"title_pattern": r"^canon\b"}).apply(PAGE)
+        self.assertEqual([item["id"] for item in kept], [1, 2, 3, 4])
+
+        kept, drops = CompiledFilter({"min_score": 1.0}, "canon ae-1").apply(PAGE)
+        self.assertNotIn(5, [item["id"] for item in kept])
+        self.assertEqual(drops["score"], 1)
+
+    def test_dropped_items_counted_once(self):
+        """Test an item failing several filters is counted under the first one"""
+        kept, drops = CompiledFilter({"negative_keywords": ["trasig"], "title_pattern": "nikon"}).apply(PAGE)
+        self.assertEqual([item["id"] for item in kept], [5])
+        self.assertEqual(drops["negative_keyword"], 1)
+        self.assertEqual(drops["title_pattern"], 4)
+
+    def test_invalid_configuration(self):
+        """Test invalid patterns and unknown keys are rejected"""
+        with self.assertRaises(ValueError):
+            CompiledFilter({"title_pattern": "("})
+        with self.assertRaises(ValueError):
+            CompiledFilter({"max_price_total": 10})
+        with self.assertRaises(ValueError):
+            CompiledFilter({"min_score": "high"})
+
+    def test_seller_rating_filter_is_rejected(self):
+        """Test the seller rating filter is refused, since search results lack ratings"""
+        with self.assertRaises(ValueError) as error:
+            CompiledFilter({"min_seller_rating": 95})
+        self.assertIn("Unsupported", str(error.exception))
+        self.assertTrue(CompiledFilter({"min_seller_rating": None, "max_total_price": None}).is_empty)
+
+
+class TestFilterCacheAndStats(unittest.TestCase):
+    """Test cases for per-script compilation and counters"""
+
+    def test_compiled_once_per_script_version(self):
+        """Test filters are recompiled only when the script changes"""
+        cache = FilterCache()
+        script = {"id": 1, "query": "canon", "result_filters": {"negative_keywords": ["trasig"]}}
+        first = cache.get(script)
+        self.assertIs(cache.get(dict(script)), first)
+
+        changed = cache.get({**script, "result_filters": {"negative_keywords": ["defekt"]}})
+        self.assertIsNot(changed, first)
+
+    def test_stats_accumulate(self):
+        """Test counters accumulate across pages"""
+        stats = FilterStats()
+        stats.record(7, 10, 8, {"negative_keyword": 2})
+        stats.record(7, 5, 4, {"score": 1})
+        result = stats.get(7)
+        self.assertEqual((result["seen"], result["kept"], result["dropped"]), (15, 12, 3))
+        self.assertEqual(result["dropped_by_reason"]["negative_keyword"], 2)
+        self.assertEqual(stats.get(8)["seen"], 0)
+
+    def test_filter_search_items_records_stats(self):
+        """Test the pipeline helper filters and records counters"""
+        script = {"id": "test-filter-script", "query": "canon", "result_filters": {"max_total_price": 600}}
+        kept = filter_search_items(script, PAGE)
+        self.assertEqual([item["id"] for item in kept], [2, 4, 6])
+        self.assertEqual(filter_stats.get("test-filter-script")["dropped_by_reason"]["total_price"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import asyncio
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler
+import tracing
+from job_queue import JobQueue
+
+
+class TestScheduler(unittest.TestCase):
+    """Test cases for the scheduler tick"""
+
+    def setUp(self):
+        self.exporter = tracing.InMemorySpanExporter()
+        self.tracer = tracing.Tracer(self.exporter)
+        self.previous = tracing.configure(self.tracer)
+
+    def tearDown(self):
+        self.tracer.processor.shutdown()
+        tracing.configure(self.previous)
+
+    def test_tick_enqueues_due_scripts_once(self):
+        """Test due scripts are enqueued with a dedup key and the tick's trace context"""
+        with tempfile.TemporaryDirectory() as directory:
+            queue = JobQueue(os.path.join(directory, "jobs.db"))
+            due = [{"script_id": 1, "next_run_at": None}, {"script_id": 2, "next_run_at": None}]
+            with patch.object(scheduler, "get_due_scripts", return_value=due) as get_due_scripts:
+                first = asyncio.run(scheduler.schedule_tick(queue, limit=10))
+                second = asyncio.run(scheduler.schedule_tick(queue, limit=10))
+            get_due_scripts.assert_called_with(10)
+            self.assertEqual(first, second)
+            jobs = queue.lease("worker-1")
+
+        self.assertEqual(sorted(job["payload"]["script_id"] for job in jobs), [1, 2])
+        self.tracer.processor.force_flush()
+        first_tick = next(s for s in self.exporter.spans if s.name == "scheduler.tick")
+        self.assertEqual(first_tick.attributes["scripts_due"], 2)
+        self.assertEqual(tracing.extract(jobs[0]["payload"]).trace_id, first_tick.trace_id)
+
+    def test_downsampling_stays_scheduled_once(self):
+        """Test one downsample_history job is kept pending an interval ahead"""
+        with tempfile.TemporaryDirectory() as directory:
+            queue = JobQueue(os.path.join(directory, "jobs.db"))
+            first = asyncio.run(scheduler.schedule_downsampling(queue, interval=3600))
+            second = asyncio.run(scheduler.schedule_downsampling(queue, interval=3600))
+            self.assertEqual(first, second)
+            self.assertEqual(queue.lease("worker-1"), [])
+            job = queue.get(first)
+            self.assertIsNone(asyncio.run(scheduler.schedule_downsampling(queue, interval=0)))
+
+        self.assertEqual(job["type"], "downsample_history")
+        self.assertEqual(job["status"], "queued")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search_cache
+from search_cache import RateLimiter, SearchCache, SearchPrefetcher, cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_api(pages: int = 3):
+    """TraderaAPI stand-in returning `pages` pages of one item each"""
+    api = MagicMock()
+    api.search_advanced.side_effect = lambda **kwargs: {
+        "total_items": pages, "total_pages": pages, "items": [{"id": kwargs["page_number"]}], "errors": [],
+    }
+    return api
+
+
+class TestSearchCache(unittest.TestCase):
+    """Test cases for the search result cache"""
+
+    def test_ttl_and_lru(self):
+        """Test entries expire after the TTL and the least recently used entry is evicted"""
+        clock = FakeClock()
+        cache = SearchCache(ttl=60, max_entries=2, clock=clock)
+        cache.put("a", {"page": 1})
+        cache.put("b", {"page": 2})
+        self.assertEqual(cache.get("a"), {"page": 1})
+        cache.put("c", {"page": 3})
+        self.assertIsNone(cache.get("b"))
+        clock.now = 61
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats(), {"entries": 1, "hits": 1, "misses": 2})
+
+    def test_key_ignores_parameter_order(self):
+        """Test equal searches share a key regardless of argument order"""
+        self.assertEqual(cache_key({"search_words": "lego", "category_id": 0}, 2),
+                         cache_key({"category_id": 0, "search_words": "lego"}, 2))
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for the Tradera call budget"""
+
+    def test_low_priority_keeps_reserve(self):
+        """Test prefetches never spend the reserve, while user searches may overdraw"""
+        clock = FakeClock()
+        limiter = RateLimiter(rate=1, burst=4, reserve=2, clock=clock)
+        self.assertTrue(limiter.try_acquire_low())
+        self.assertTrue(limiter.try_acquire_low())
+        self.assertFalse(limiter.try_acquire_low())
+        self.assertFalse(limiter.consume())
+        limiter.consume()
+        limiter.consume()
+        self.assertEqual(limiter.over_budget, 1)
+        self.assertEqual(limiter.tokens, -1)
+        clock.now = 4
+        self.assertTrue(limiter.try_acquire_low())
+
+
+class TestPrefetch(unittest.TestCase):
+    """Test cases for speculative prefetching of the next page"""
+
+    def setUp(self):
+        self.cache = SearchCache(ttl=60)
+        self.limiter = RateLimiter(rate=100, burst=10, reserve=2)
+        self.prefetcher = SearchPrefetcher(self.cache, self.limiter, delay=0, enabled=True)
+        self.patches = [patch.object(search_cache, "search_cache", self.cache),
+                        patch.object(search_cache, "tradera_rate_limiter", self.limiter),
+                        patch.object(search_cache, "search_prefetcher", self.prefetcher)]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+
+    async def drain(self):
+        while self.prefetcher._tasks:
+            await asyncio.sleep(0.01)
+
+    def test_next_page_is_a_cache_hit(self):
+        """Test serving page N prefetches page N+1, up to the last page"""
+        api = make_api(pages=3)
+
+        async def scenario():
+            results = []
+            for page in (1, 2, 3):
+                results.append(await search_cache.search(api, {"search_words": "lego"}, page))
+                await self.drain()
+            return results
+
+        results = asyncio.run(scenario())
+        self.assertEqual([hit for _, hit in results], [False, True, True])
+        self.assertEqual([result["items"][0]["id"] for result, _ in results], [1, 2, 3])
+        self.assertEqual([call.kwargs["page_number"] for call in api.search_advanced.call_args_list], [1, 2, 3])
+        self.assertEqual(self.prefetcher.completed, 2)
+
+    def test_request_shares_running_prefetch(self):
+        """Test paging forward while the prefetch is running waits for it instead of calling again"""
+        api = make_api()
+        release = threading.Event()
+        search = api.search_advanced.side_effect
+        api.search_advanced.side_effect = lambda **kwargs: release.wait(5) and search(**kwargs)
+        release.set()
+
+        async def scenario():
+            await search_cache.search(api, {"search_words": "lego"}, 1)
+            release.clear()
+            while not self.prefetcher.in_flight(cache_key({"search_words": "lego"}, 2)):
+                await asyncio.sleep(0.001)
+            page = asyncio.create_task(search_cache.search(api, {"search_words": "lego"}, 2))
+            await asyncio.sleep(0.05)
+            release.set()
+            return await page
+
+        result, hit = asyncio.run(scenario())
+        self.assertTrue(hit)
+        self.assertEqual(result["items"], [{"id": 2}])
+        self.assertEqual([call.kwargs["page_number"] for call in api.search_advanced.call_args_list][:2], [1, 2])
+        self.assertEqual(self.prefetcher.completed, 1)
+
+    def test_pending_prefetch_cancelled_when_budget_needed(self):
+        """Test a user search finding the budget at the reserve cancels waiting prefetches"""
+        api = make_api(pages=3)
+        self.prefetcher.delay = 0.2
+        self.limiter.rate = 0
+        self.limiter._tokens = 4
+
+        async def scenario():
+            await search_cache.search(api, {"search_words": "lego"}, 1)
+            self.assertEqual(self.prefetcher.stats()["pending"], 1)
+            await search_cache.search(api, {"search_words": "vinyl"}, 1)
+            await self.drain()
+
+        asyncio.run(scenario())
+        # The first prefetch was cancelled; the second found no budget above the reserve
+        self.assertEqual((self.prefetcher.cancelled, self.prefetcher.skipped, self.prefetcher.completed), (1, 1, 0))
+        self.assertEqual(api.search_advanced.call_count, 2)
+
+    def test_cache_miss_runs_off_the_event_loop(self):
+        """Test the blocking Tradera call of a cache miss runs in a worker thread"""
+        api = make_api(pages=1)
+        search = api.search_advanced.side_effect
+        threads = []
+        api.search_advanced.side_effect = lambda **kwargs: threads.append(threading.current_thread()) or search(**kwargs)
+        asyncio.run(search_cache.search(api, {"search_words": "lego"}, 1))
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    def test_failed_search_is_not_cached(self):
+        """Test errors are neither cached nor followed by a prefetch"""
+        api = MagicMock()
+        api.search_advanced.return_value = {"error": "Tradera down", "unavailable": True}
+        result, hit = asyncio.run(search_cache.search(api, {"search_words": "lego"}, 1))
+        self.assertEqual((result["error"], hit), ("Tradera down", False))
+        self.assertEqual((self.cache.stats()["entries"], self.prefetcher.scheduled), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
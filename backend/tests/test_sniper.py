@@ -0,0 +1,164 @@
+import unittest
+import os
+import re
+import sys
+import time
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrate import load_migrations
+from sniper import BidSniper, BidIdempotencyGuard, LatencyTracker, HedgeMetrics
+
+
+def _migrated_columns(table):
+    """Columns of `table` after all shipped migrations (CREATE TABLE plus ADD COLUMN)"""
+    sql = "\n".join(migration.sql for migration in load_migrations())
+    body = re.search(rf"CREATE TABLE IF NOT EXISTS {table} \((.*?)\n\);", sql, re.S).group(1)
+    columns = {line.split()[0] for line in body.strip().splitlines() if not line.strip().startswith(("UNIQUE", "--"))}
+    columns.update(re.findall(rf"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS (\w+)", sql))
+    return columns
+
+
+def _prepared(item_id=123456, amount=550, delay=0.0, result=None):
+    """Create a fake PreparedBid whose fire() takes `delay` seconds"""
+    prepared = MagicMock()
+    prepared.item_id = item_id
+    prepared.bid_amount = amount
+
+    def fire():
+        time.sleep(delay)
+        return result or {"status": "Bought", "next_bid": 600, "success": True}
+
+    prepared.fire.side_effect = fire
+    return prepared
+
+
+class TestBidSniper(unittest.TestCase):
+    """Test cases for hedged bid submission"""
+    
+    def setUp(self):
+        """Set up test environment"""
+        self.metrics = HedgeMetrics()
+        self.latency = LatencyTracker()
+        self.sniper = BidSniper(
+            api=MagicMock(),
+            hedging=True,
+            hedge_percentile=95,
+            default_hedge_delay=0.05,
+            latency=self.latency,
+            metrics=self.metrics
+        )
+    
+    def test_latency_percentile(self):
+        """Test percentile over observed latencies"""
+        self.assertIsNone(self.latency.percentile(95))
+        for ms in range(1, 101):
+            self.latency.record(ms / 1000)
+        self.assertAlmostEqual(self.latency.percentile(50), 0.051)
+        self.assertAlmostEqual(self.latency.percentile(95), 0.096)
+    
+    def test_fast_primary_does_not_hedge(self):
+        """Test that no hedge is sent when the primary answers in time"""
+        primary, hedge = _prepared(), _prepared()
+        
+        result = self.sniper.fire(1, [primary, hedge])
+        
+        self.assertTrue(result["success"])
+        hedge.fire.assert_not_called()
+        hedge.close.assert_called_once()
+        self.assertEqual(self.metrics.snapshot()["hedges_sent"], 0)
+        self.assertEqual(self.metrics.snapshot()["primary_wins"], 1)
+    
+    def test_slow_primary_is_hedged(self):
+        """Test that a hedge is sent and wins when the primary is slow"""
+        primary, hedge = _prepared(delay=0.5), _prepared()
+        
+        result = self.sniper.fire(1, [primary, hedge])
+        
+        self.assertTrue(result["success"])
+        hedge.fire.assert_called_once()
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["hedges_sent"], 1)
+        self.assertEqual(snapshot["hedge_wins"], 1)
+        self.assertEqual(snapshot["hedge_win_rate"], 1.0)
+    
+    def test_duplicate_bid_is_blocked(self):
+        """Test that the same bid is never fired twice"""
+        self.sniper.hedging = False
+        bid_config = {"id": 7, "max_bid_amount": 600}
+        
+        first = self.sniper.fire(1, [_prepared()], bid_config)
+        second_prepared = _prepared()
+        second = self.sniper.fire(1, [second_prepared], bid_config)
+        
+        self.assertTrue(first["success"])
+        self.assertIn("error", second)
+        second_prepared.fire.assert_not_called()
+        self.assertEqual(self.metrics.snapshot()["duplicates_blocked"], 1)
+    
+    def test_bid_above_max_is_refused(self):
+        """Test that a bid above max_bid_amount is never fired"""
+        prepared = _prepared(amount=700)
+        
+        result = self.sniper.fire(1, [prepared], {"id": 7, "max_bid_amount": 600})
+        
+        self.assertIn("error", result)
+        prepared.fire.assert_not_called()
+    
+    def test_guard_records_claim_in_bids(self):
+        """Test that the guard records a scheduled bid with its idempotency key"""
+        supabase = MagicMock()
+        table = supabase.table.return_value
+        table.select.return_value.eq.return_value.execute.return_value.data = []
+        table.insert.return_value.execute.return_value.data = [{"id": 42}]
+        guard = BidIdempotencyGuard(get_client=lambda: supabase)
+        
+        claimed = guard.claim(1, 123456, 550, {"id": 7, "max_bid_amount": 600}, user_id=3)
+        
+        self.assertEqual(claimed, {"id": 42})
+        inserted = table.insert.call_args[0][0]
+        self.assertEqual(inserted["idempotency_key"], "123456:550.00:7")
+        self.assertEqual((inserted["status"], inserted["user_id"]), ("scheduled", "3"))
+        
+        # Already recorded by another worker
+        table.select.return_value.eq.return_value.execute.return_value.data = [{"id": 42}]
+        other = BidIdempotencyGuard(get_client=lambda: supabase)
+        self.assertIsNone(other.claim(1, 123456, 550, {"id": 7, "max_bid_amount": 600}))
+
+    def test_guard_writes_only_migrated_columns(self):
+        """Test the claimed and recorded bid rows only use columns the bids table has"""
+        supabase = MagicMock()
+        table = supabase.table.return_value
+        table.select.return_value.eq.return_value.execute.return_value.data = []
+        table.insert.return_value.execute.return_value.data = [{"id": 42}]
+        self.sniper.guard = BidIdempotencyGuard(get_client=lambda: supabase)
+        self.sniper.hedging = False
+
+        self.sniper.fire(1, [_prepared()], {"id": 7, "max_bid_amount": 600})
+
+        columns = _migrated_columns("bids")
+        self.assertIn("bid_config_id", table.insert.call_args[0][0])
+        self.assertLessEqual(set(table.insert.call_args[0][0]), columns)
+        self.assertLessEqual(set(table.update.call_args[0][0]), columns)
+        self.assertEqual(table.update.call_args[0][0]["status"], "won")
+
+        # Accepted without buying the item is an ordinary placed bid
+        self.sniper.guard = BidIdempotencyGuard(get_client=lambda: supabase)
+        self.sniper.fire(1, [_prepared(result={"status": "Accepted", "success": False})], {"id": 7, "max_bid_amount": 600})
+        self.assertEqual(table.update.call_args[0][0]["status"], "placed")
+
+    def test_failed_claim_can_be_retried(self):
+        """Test a claim whose insert fails is released instead of blocking the bid forever"""
+        supabase = MagicMock()
+        table = supabase.table.return_value
+        table.select.return_value.eq.return_value.execute.return_value.data = []
+        table.insert.return_value.execute.side_effect = [Exception("connection reset"), MagicMock(data=[{"id": 42}])]
+        guard = BidIdempotencyGuard(get_client=lambda: supabase)
+
+        self.assertIsNone(guard.claim(1, 123456, 550, {"id": 7, "max_bid_amount": 600}))
+        self.assertEqual(guard.claim(1, 123456, 550, {"id": 7, "max_bid_amount": 600}), {"id": 42})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import tradera_api
+from tradera_api import LazyTraderaAPI, TraderaAPI
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestStartup(unittest.TestCase):
+    """Test cases for lazy client construction at startup"""
+
+    def test_import_main_defers_clients(self):
+        """Test importing the app works without credentials and skips supabase and xmltodict"""
+        env = {key: value for key, value in os.environ.items()
+               if key not in ("SUPABASE_URL", "SUPABASE_ANON_KEY")}
+        script = "import sys, main; print(sorted(m for m in ('supabase', 'xmltodict') if m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "[]")
+
+    def test_supabase_client_requires_credentials(self):
+        """Test a missing configuration is reported on first use"""
+        with patch.object(db, "_supabase", None), patch.dict(os.environ, {"SUPABASE_URL": "", "SUPABASE_ANON_KEY": ""}):
+            with self.assertRaises(RuntimeError):
+                db.get_supabase_client()
+
+    def test_supabase_client_created_once(self):
+        """Test the client is created on first use and reused"""
+        client = MagicMock()
+        create_client = MagicMock(return_value=client)
+        env = {"SUPABASE_URL": "http://localhost:54321", "SUPABASE_ANON_KEY": "key"}
+        with patch.object(db, "_supabase", None), patch.dict(os.environ, env), \
+                patch.dict(sys.modules, {"supabase": MagicMock(create_client=create_client)}):
+            self.assertIs(db.get_supabase_client(), client)
+            self.assertIs(db.get_supabase_client(), client)
+        create_client.assert_called_once_with("http://localhost:54321", "key")
+
+    def test_lazy_tradera_api(self):
+        """Test the shared Tradera client is built from the environment on first use"""
+        lazy = LazyTraderaAPI()
+        env = {"TRADERA_APP_ID": "1234", "TRADERA_APP_KEY": "secret", "TRADERA_SANDBOX": "1"}
+        with patch.dict(os.environ, env):
+            self.assertIsNone(lazy._api)
+            self.assertEqual(lazy.app_id, "1234")
+        api = lazy.get()
+        self.assertIsInstance(api, TraderaAPI)
+        self.assertIs(lazy.get(), api)
+        self.assertEqual((api.app_key, api.sandbox), ("secret", 1))
+
+    def test_lazy_tradera_api_forwards_methods(self):
+        """Test method calls reach the underlying client"""
+        lazy = LazyTraderaAPI()
+        lazy.set_user_token(42, "token")
+        self.assertEqual((lazy.get().user_id, lazy.get().token), (42, "token"))
+        self.assertIsInstance(tradera_api.shared_tradera_api, LazyTraderaAPI)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+import unittest
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import MagicMock
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tracing
+from benchmarks.otlp_standin import OTLPCollectorStandIn
+from job_queue import JobQueue, RUN_SCRIPT
+from profiling import instrument_httpx, span
+from sniper import BidSniper, HedgeMetrics, LatencyTracker
+from worker import JobWorker
+
+
+class TracingTestCase(unittest.TestCase):
+    """Installs a tracer exporting to memory"""
+
+    def setUp(self):
+        self.exporter = tracing.InMemorySpanExporter()
+        self.tracer = tracing.Tracer(self.exporter)
+        self.previous = tracing.configure(self.tracer)
+
+    def tearDown(self):
+        self.tracer.processor.shutdown()
+        tracing.configure(self.previous)
+
+    def spans(self):
+        """Exported spans by name"""
+        self.tracer.processor.force_flush()
+        return {span.name: span for span in self.exporter.spans}
+
+
+class TestTracing(TracingTestCase):
+    """Test cases for spans and context propagation"""
+
+    def test_nested_spans(self):
+        """Test child spans share the trace and point at their parent"""
+        with tracing.traced("scheduler.tick") as tick:
+            with span("tradera.search", tracing.CLIENT, attempt=1):
+                pass
+        spans = self.spans()
+        child = spans["tradera.search"]
+        self.assertEqual(child.trace_id, tick.trace_id)
+        self.assertEqual(child.parent_span_id, tick.span_id)
+        self.assertEqual((child.kind, child.attributes), (tracing.CLIENT, {"attempt": 1}))
+        self.assertIsNone(spans["scheduler.tick"].parent_span_id)
+        self.assertIsNone(tracing.current_span())
+
+    def test_exception_marks_span_failed(self):
+        """Test an exception escaping a span sets error status and an event"""
+        with self.assertRaises(ValueError):
+            with tracing.traced("sniper.fire"):
+                raise ValueError("boom")
+        failed = self.spans()["sniper.fire"]
+        self.assertEqual((failed.status_code, failed.status_message), (tracing.STATUS_ERROR, "boom"))
+        self.assertEqual(failed.events[0]["attributes"]["exception.type"], "ValueError")
+
+    def test_disabled_tracing_is_noop(self):
+        """Test spans are not created or exported while tracing is off"""
+        tracing.configure(tracing.Tracer(enabled=False))
+        with span("db.auctions") as trace_span:
+            self.assertIs(trace_span, tracing.NOOP_SPAN)
+            self.assertEqual(tracing.inject({}), {})
+        tracing.configure(self.tracer)
+        self.assertEqual(self.spans(), {})
+
+    def test_traceparent_round_trip(self):
+        """Test inject and extract use the W3C traceparent format"""
+        with tracing.traced("job.enqueue") as producer:
+            carrier = tracing.inject({"script_id": 1})
+        self.assertEqual(carrier["traceparent"], f"00-{producer.trace_id}-{producer.span_id}-01")
+        self.assertEqual(tracing.extract(carrier), producer.context)
+        for invalid in ("", "garbage", "00-" + "0" * 32 + "-" + "1" * 16 + "-01"):
+            self.assertIsNone(tracing.extract({"traceparent": invalid}))
+        self.assertIsNone(tracing.extract(None))
+
+    def test_job_continues_trace(self):
+        """Test a job runs as a consumer span in the trace that enqueued it"""
+        handled = []
+
+        async def handler(payload):
+            with span("run_script.search"):
+                handled.append(payload)
+
+        with tempfile.TemporaryDirectory() as directory:
+            queue = JobQueue(os.path.join(directory, "jobs.db"))
+            with tracing.traced("scheduler.tick") as tick:
+                queue.enqueue(RUN_SCRIPT, {"script_id": 7})
+            worker = JobWorker(queue=queue, handlers={RUN_SCRIPT: handler})
+            self.assertEqual(asyncio.run(worker.run_once()), 1)
+
+        self.assertEqual(handled[0]["script_id"], 7)
+        spans = self.spans()
+        self.assertEqual({s.trace_id for s in spans.values()}, {tick.trace_id})
+        self.assertEqual(spans["job.enqueue"].parent_span_id, tick.span_id)
+        consumer = spans["job.run_script"]
+        self.assertEqual((consumer.kind, consumer.parent_span_id), (tracing.CONSUMER, spans["job.enqueue"].span_id))
+        self.assertEqual(spans["run_script.search"].parent_span_id, consumer.span_id)
+
+    def test_failed_job_span(self):
+        """Test a failing handler marks its job span as failed"""
+        async def handler(payload):
+            raise RuntimeError("Tradera down")
+
+        with tempfile.TemporaryDirectory() as directory:
+            queue = JobQueue(os.path.join(directory, "jobs.db"))
+            queue.enqueue(RUN_SCRIPT, {"script_id": 7})
+            asyncio.run(JobWorker(queue=queue, handlers={RUN_SCRIPT: handler}).run_once())
+        self.assertEqual(self.spans()["job.run_script"].status_code, tracing.STATUS_ERROR)
+
+    def test_hedged_snipe_spans(self):
+        """Test both Buy calls of a hedged snipe are children of the fire span"""
+        def prepared(delay):
+            bid = MagicMock(item_id=1, bid_amount=550)
+            bid.fire.side_effect = lambda: time.sleep(delay) or {"status": "Bought", "success": True}
+            return bid
+
+        sniper = BidSniper(api=MagicMock(), guard=MagicMock(), hedging=True, default_hedge_delay=0.01,
+                           latency=LatencyTracker(), metrics=HedgeMetrics())
+        sniper.guard.claim.return_value = {"idempotency_key": "k"}
+        sniper.fire(5, [prepared(0.1), prepared(0.0)])
+        time.sleep(0.15)
+
+        self.tracer.processor.force_flush()
+        fire = next(s for s in self.exporter.spans if s.name == "sniper.fire")
+        buys = [s for s in self.exporter.spans if s.name == "sniper.buy"]
+        self.assertEqual(sorted(s.attributes["role"] for s in buys), ["hedge", "primary"])
+        self.assertEqual({s.parent_span_id for s in buys}, {fire.span_id})
+        self.assertEqual(fire.attributes["outcome"], "placed")
+
+    def test_httpx_client_spans(self):
+        """Test database calls made through an instrumented httpx client are client spans"""
+        client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(404)),
+                              base_url="http://localhost/rest/v1")
+        instrument_httpx(client, prefix="db")
+        with tracing.traced("POST /api/scripts/{script_id}/run") as request_span:
+            client.get("/search_scripts")
+        db_span = self.spans()["db.search_scripts"]
+        self.assertEqual(db_span.parent_span_id, request_span.span_id)
+        self.assertEqual(db_span.attributes, {"http.method": "GET", "http.status_code": 404})
+        self.assertEqual(db_span.status_code, tracing.STATUS_ERROR)
+
+    def test_middleware(self):
+        """Test requests become server spans, continuing an incoming traceparent"""
+        app = FastAPI()
+
+        @app.get("/api/scripts/{script_id}")
+        async def get_script(script_id: int):
+            with span("db.search_scripts"):
+                pass
+            return {"id": script_id}
+
+        app.add_middleware(tracing.TracingMiddleware)
+        parent = tracing.SpanContext("ab" * 16, "cd" * 8)
+        response = TestClient(app).get("/api/scripts/3", headers={"traceparent": parent.traceparent})
+
+        self.assertEqual(response.headers["X-Trace-Id"], parent.trace_id)
+        spans = self.spans()
+        server = spans["GET /api/scripts/{script_id}"]
+        self.assertEqual((server.kind, server.parent_span_id), (tracing.SERVER, parent.span_id))
+        self.assertEqual(server.attributes["http.status_code"], 200)
+        self.assertEqual(spans["db.search_scripts"].parent_span_id, server.span_id)
+
+    def test_log_records_carry_trace_id(self):
+        """Test the log filter adds the current trace ID"""
+        record = logging.LogRecord("worker", logging.INFO, __file__, 1, "message", None, None)
+        log_filter = tracing.TraceLogFilter()
+        log_filter.filter(record)
+        self.assertEqual(record.trace_id, "-")
+        with tracing.traced("job.fire_bid") as job_span:
+            log_filter.filter(record)
+        self.assertEqual(record.trace_id, job_span.trace_id)
+
+
+class TestExporters(unittest.TestCase):
+    """Test cases for exporting spans as OTLP/JSON"""
+
+    def make_spans(self):
+        tracer = tracing.Tracer(tracing.InMemorySpanExporter())
+        parent = tracing.Span("scheduler.tick", tracer=None)
+        child = tracing.Span("tradera.search", parent.context, tracing.CLIENT, {"attempt": 2, "ok": True})
+        for span_ in (child, parent):
+            span_.end()
+        return [parent, child]
+
+    def test_file_exporter(self):
+        """Test the file exporter writes OTLP export requests that load back"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            tracing.FileSpanExporter(path).export(self.make_spans(), "tradera-assistant-api")
+            with open(path, encoding="utf-8") as f:
+                request = json.loads(f.readline())
+            spans = tracing.load_spans(path)
+
+        resource = request["resourceSpans"][0]["resource"]
+        self.assertEqual(resource["attributes"], [{"key": "service.name", "value": {"stringValue": "tradera-assistant-api"}}])
+        child = spans[1]
+        self.assertEqual(child["parentSpanId"], spans[0]["spanId"])
+        self.assertEqual(child["attributes"], [{"key": "attempt", "value": {"intValue": "2"}},
+                                               {"key": "ok", "value": {"boolValue": True}}])
+        tree = tracing.format_traces(spans)
+        self.assertIn("  scheduler.tick", tree)
+        self.assertIn("    tradera.search", tree)
+
+    def test_otlp_exporter(self):
+        """Test batches are posted to the collector stand-in through the background processor"""
+        with OTLPCollectorStandIn() as collector:
+            tracer = tracing.Tracer(tracing.OTLPHttpSpanExporter(collector.endpoint), interval=0.05)
+            previous = tracing.configure(tracer)
+            try:
+                with tracing.traced("scheduler.tick"):
+                    with tracing.traced("job.enqueue", tracing.PRODUCER):
+                        pass
+                deadline = time.time() + 5
+                while len(collector.spans) < 2 and time.time() < deadline:
+                    time.sleep(0.02)
+            finally:
+                tracer.processor.shutdown()
+                tracing.configure(previous)
+            self.assertEqual(sorted(s["name"] for s in collector.spans), ["job.enqueue", "scheduler.tick"])
+            self.assertEqual(tracer.processor.stats()["exported"], 2)
+
+    def test_failing_exporter_drops_spans(self):
+        """Test an unreachable collector only costs the spans, and a full queue drops new ones"""
+        processor = tracing.BatchSpanProcessor(tracing.OTLPHttpSpanExporter("http://127.0.0.1:9", timeout=0.5),
+                                               "test", interval=60, max_queue=1)
+        processor._stopped = True
+        for span_ in self.make_spans():
+            processor.on_end(span_)
+        self.assertEqual(processor.force_flush(), 0)
+        self.assertEqual(processor.stats(), {"queued": 0, "exported": 0, "dropped": 2, "failed_exports": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
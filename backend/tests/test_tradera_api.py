@@ -1,15 +1,20 @@
 import unittest
 import os
 import sys
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, PropertyMock
+import http.client
 import json
+import time
+import requests
+import urllib3
 import xmltodict
 from datetime import datetime
 
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from tradera_api import TraderaAPI
+from tradera_api import TraderaAPI, PreparedBid
+from benchmarks.tradera_standin import TraderaStandIn
 
 class TestTraderaAPI(unittest.TestCase):
     """Test cases for TraderaAPI class"""
@@ -104,6 +109,35 @@ class TestTraderaAPI(unittest.TestCase):
         </soap:Envelope>
         """
         
+        # Sample SOAP response for GetItem
+        self.sample_get_item_response = """<?xml version="1.0" encoding="utf-8"?>
+        <soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" 
+                      xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" 
+                      xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+          <soap:Body>
+            <GetItemResponse xmlns="http://api.tradera.com">
+              <GetItemResult>
+                <Id>123456</Id>
+                <ShortDescription>Test Item 1</ShortDescription>
+                <Seller>
+                  <Id>9876</Id>
+                  <Alias>TestSeller</Alias>
+                </Seller>
+                <MaxBid>650</MaxBid>
+                <NextBid>700</NextBid>
+                <TotalBids>4</TotalBids>
+                <EndDate>2025-05-01T12:00:00Z</EndDate>
+                <ItemLink>http://tradera.com/item/123456</ItemLink>
+                <CategoryId>100</CategoryId>
+                <Status>
+                  <Ended>true</Ended>
+                </Status>
+              </GetItemResult>
+            </GetItemResponse>
+          </soap:Body>
+        </soap:Envelope>
+        """
+        
         # Sample SOAP response for token
         self.sample_token_response = """<?xml version="1.0" encoding="utf-8"?>
         <soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" 
@@ -225,6 +259,190 @@ class TestTraderaAPI(unittest.TestCase):
         self.assertEqual(result['next_bid'], 600)
         self.assertTrue(result['success'])
     
+    @patch('requests.post')
+    def test_get_item(self, mock_post):
+        """Test get_item method"""
+        # Configure mock
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.text = self.sample_get_item_response
+        mock_post.return_value = mock_response
+        
+        # Call method
+        item = self.api.get_item(123456)
+        
+        # Verify request
+        args, kwargs = mock_post.call_args
+        self.assertEqual(args[0], self.api.public_service_url)
+        self.assertEqual(kwargs['headers']['SOAPAction'], "http://api.tradera.com/GetItem")
+        self.assertIn("<itemId>123456</itemId>", kwargs['data'])
+        
+        # Check result uses the search item format
+        self.assertEqual(item['id'], 123456)
+        self.assertEqual(item['current_price'], 650)
+        self.assertEqual(item['next_bid'], 700)
+        self.assertEqual(item['bid_count'], 4)
+        self.assertEqual(item['seller_id'], 9876)
+        self.assertEqual(item['url'], 'http://tradera.com/item/123456')
+        self.assertTrue(item['is_ended'])
+        self.assertEqual(item['status'], 'ended')
+    
+    @patch('requests.post')
+    def test_get_items_deduplicates(self, mock_post):
+        """Test that get_items fetches each distinct item once"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.text = self.sample_get_item_response
+        mock_post.return_value = mock_response
+        
+        result = self.api.get_items([123456, 123456, 123456], max_concurrency=2)
+        
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(list(result.keys()), [123456])
+        self.assertEqual(result[123456]['bid_count'], 4)
+        self.assertEqual(self.api._inflight_items, {})
+    
+    @patch('requests.post')
+    def test_get_items_reports_errors_per_item(self, mock_post):
+        """Test that a failed item doesn't fail the whole batch"""
+        ok = MagicMock(status_code=200, text=self.sample_get_item_response)
+        failed = MagicMock(status_code=404, text="Not found")
+        mock_post.side_effect = lambda url, **kwargs: ok if "<itemId>1</itemId>" in kwargs['data'] else failed
+        
+        result = self.api.get_items([1, 2])
+        
+        self.assertNotIn("error", result[1])
+        self.assertIn("error", result[2])
+    
+    @patch('time.sleep')
+    @patch('requests.post')
+    def test_search_retries_transient_errors(self, mock_post, mock_sleep):
+        """Test that 5xx responses and timeouts are retried with backoff"""
+        ok = MagicMock(status_code=200, text=self.sample_search_response)
+        unavailable = MagicMock(status_code=503, text="Service unavailable")
+        mock_post.side_effect = [requests.Timeout("timed out"), unavailable, ok]
+        
+        result = self.api.search_advanced(search_words="test")
+        
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(result['total_items'], 2)
+    
+    @patch('time.sleep')
+    @patch('requests.post')
+    def test_search_circuit_breaker_fails_fast(self, mock_post, mock_sleep):
+        """Test that searches fail fast while Tradera is down"""
+        mock_post.side_effect = requests.ConnectionError("connection refused")
+        breaker = self.api.circuit_breakers["search"]
+        
+        for _ in range(breaker.failure_threshold):
+            result = self.api.search_advanced(search_words="test")
+            self.assertTrue(result['unavailable'])
+        calls = mock_post.call_count
+        
+        result = self.api.search_advanced(search_words="test")
+        
+        self.assertEqual(mock_post.call_count, calls)
+        self.assertIn("circuit open", result['error'])
+        self.assertGreater(result['retry_after'], 0)
+    
+    @patch('random.uniform', return_value=0.1)
+    @patch('time.sleep')
+    @patch('requests.post')
+    def test_place_bid_never_retries_past_deadline(self, mock_post, mock_sleep, mock_uniform):
+        """Test that Buy is not retried once the auction has ended"""
+        self.api.set_user_token(12345, "test_token")
+        mock_post.return_value = MagicMock(status_code=503, text="Service unavailable")
+        
+        result = self.api.place_bid(item_id=123456, bid_amount=550, deadline=time.time() + 0.01)
+        
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertLessEqual(mock_post.call_args[1]['timeout'], 0.01)
+        self.assertEqual(result['error'], "API error: 503")
+        
+        mock_post.reset_mock()
+        result = self.api.place_bid(item_id=123456, bid_amount=550, deadline=time.time() - 1)
+        mock_post.assert_not_called()
+        self.assertIn("error", result)
+    
+    @patch('time.sleep')
+    @patch('requests.post')
+    def test_place_bid_is_not_resent_after_a_read_timeout(self, mock_post, mock_sleep):
+        """Test that Buy is only retried when it can't have reached Tradera"""
+        self.api.set_user_token(12345, "test_token")
+        mock_post.side_effect = requests.ReadTimeout("read timed out")
+        
+        result = self.api.place_bid(item_id=123456, bid_amount=550)
+        
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertIn("may have been placed", result['error'])
+        self.assertNotIn("unavailable", result)
+        
+        mock_post.reset_mock()
+        mock_post.side_effect = None
+        mock_post.return_value = MagicMock(status_code=500, text="Internal error")
+        self.assertEqual(self.api.place_bid(item_id=123456, bid_amount=550)['error'], "API error: 500")
+        self.assertEqual(mock_post.call_count, 1)
+        
+        mock_post.reset_mock()
+        refused = requests.ConnectionError(urllib3.exceptions.MaxRetryError(
+            None, "/", urllib3.exceptions.NewConnectionError(None, "connection refused")))
+        ok = MagicMock(status_code=200, text=self.sample_bid_response)
+        mock_post.side_effect = [requests.ConnectTimeout("connect timed out"), refused, ok]
+        result = self.api.place_bid(item_id=123456, bid_amount=550)
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertTrue(result['success'])
+    
+    def test_prepare_bid_requires_token(self):
+        """Test that prepare_bid refuses to stage a bid without a user token"""
+        with self.assertRaises(ValueError):
+            self.api.prepare_bid(item_id=123456, bid_amount=550)
+    
+    def test_prepared_bid_fire(self):
+        """Test that a prepared bid sends the pre-built Buy request"""
+        self.api.set_user_token(12345, "test_token")
+        
+        with TraderaStandIn() as standin:
+            standin.point(self.api)
+            prepared = self.api.prepare_bid(item_id=123456, bid_amount=550)
+            
+            # Nothing is sent until the bid is fired
+            self.assertEqual(standin.requests, [])
+            self.assertTrue(prepared.is_connected)
+            
+            result = prepared.fire()
+            
+            # Check request
+            path, action, body = standin.requests[0]
+            self.assertEqual(path, "/v3/buyerservice.asmx")
+            self.assertEqual(action, "http://api.tradera.com/Buy")
+            self.assertIn(b"<itemId>123456</itemId>", body)
+            self.assertIn(b"<buyAmount>550</buyAmount>", body)
+            self.assertIn(b"<Token>test_token</Token>", body)
+            
+            # Check result
+            self.assertEqual(result['status'], 'Bought')
+            self.assertEqual(result['next_bid'], 600)
+            self.assertTrue(result['success'])
+            
+            # A prepared bid can only be fired once
+            self.assertIn("error", prepared.fire())
+            self.assertEqual(len(standin.requests), 1)
+    
+    def test_prepared_bid_reconnects_lost_connection(self):
+        """Test that a prepared bid reconnects if the warm connection was dropped"""
+        self.api.set_user_token(12345, "test_token")
+        
+        with TraderaStandIn() as standin:
+            standin.point(self.api)
+            prepared = self.api.prepare_bid(item_id=123456, bid_amount=550)
+            prepared.close()
+            
+            result = prepared.fire()
+            
+            self.assertTrue(result['success'])
+            self.assertEqual(len(standin.requests), 1)
+    
     @patch('requests.post')
     def test_fetch_token(self, mock_post):
         """Test fetch_token method"""
@@ -316,5 +534,54 @@ class TestTraderaAPI(unittest.TestCase):
         self.assertEqual(item['image_urls'], ['http://example.com/image.jpg'])
         self.assertEqual(item['status'], 'active')
 
+class TestPreparedBid(unittest.TestCase):
+    """Test cases for firing prepared bids over a warm connection"""
+
+    def setUp(self):
+        self.api = MagicMock()
+        self.api._parse_buy_response.return_value = {"success": True}
+        self.sockets = []
+        self.prepared = PreparedBid(self.api, 123, 550, "https://api.tradera.com/v3/buyerservice.asmx", b"POST ...")
+        patcher = patch.object(PreparedBid, "is_connected", new_callable=PropertyMock, return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self, *sendall_effects):
+        """Give the bid a fresh fake connection per connect(), with the given sendall outcomes"""
+        effects = list(sendall_effects)
+
+        def connect():
+            connection = MagicMock()
+            connection.sock.sendall.side_effect = effects.pop(0)
+            self.sockets.append(connection.sock)
+            self.prepared._connection = connection
+
+        connect()
+        self.prepared.connect = connect
+
+    def response(self, *begin_effects):
+        response = MagicMock()
+        response.status = 200
+        response.read.return_value = b"<ok/>"
+        response.begin.side_effect = list(begin_effects)
+        return patch("tradera_api.http.client.HTTPResponse", return_value=response)
+
+    def test_reset_before_send_is_retried(self):
+        """Test a connection that fails while writing the request is retried on a fresh one"""
+        self.connect(BrokenPipeError("broken pipe"), None)
+        with self.response(None):
+            result = self.prepared.fire()
+        self.assertEqual(result, {"success": True})
+        self.assertEqual(len(self.sockets), 2)
+
+    def test_reset_after_send_is_not_retried(self):
+        """Test a connection lost while waiting for the response is not sent again (it could double-bid)"""
+        self.connect(None, None)
+        with self.response(http.client.RemoteDisconnected("closed")):
+            result = self.prepared.fire()
+        self.assertIn("may have been placed", result["error"])
+        self.assertEqual(len(self.sockets), 1)
+        self.sockets[0].sendall.assert_called_once_with(b"POST ...")
+
 if __name__ == '__main__':
     unittest.main()
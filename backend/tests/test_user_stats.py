@@ -0,0 +1,112 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_stats import UserStatsAggregator
+
+
+class TestUserStatsAggregator(unittest.TestCase):
+    """Test cases for incrementally maintained user statistics"""
+    
+    def setUp(self):
+        """Set up test environment"""
+        self.stats = UserStatsAggregator()
+        self.camera = {"id": 1, "category_id": 100}
+        self.chair = {"id": 2, "category_id": 200}
+    
+    def test_new_user_has_zeroes(self):
+        """Test statistics for a user without history"""
+        self.assertEqual(self.stats.get(1), {
+            "total_auctions_found": 0,
+            "auctions_with_bids": 0,
+            "auctions_won": 0,
+            "auctions_lost": 0,
+            "total_spent": 0,
+            "categories": {}
+        })
+    
+    def test_events_update_totals_and_categories(self):
+        """Test that ingest and bid events update the aggregates"""
+        self.stats.record_auctions_found(1, [self.camera, self.chair])
+        self.stats.record_first_bid(1, self.camera)
+        self.stats.record_first_bid(1, self.chair)
+        self.stats.record_result(1, self.camera, won=True, amount=550)
+        self.stats.record_result(1, self.chair, won=False, amount=80)
+        
+        result = self.stats.get(1)
+        self.assertEqual(result["total_auctions_found"], 2)
+        self.assertEqual(result["auctions_with_bids"], 2)
+        self.assertEqual(result["auctions_won"], 1)
+        self.assertEqual(result["auctions_lost"], 1)
+        self.assertEqual(result["total_spent"], 550)
+        self.assertEqual(result["categories"]["100"]["auctions_won"], 1)
+        self.assertEqual(result["categories"]["100"]["total_spent"], 550)
+        self.assertEqual(result["categories"]["200"]["auctions_lost"], 1)
+        self.assertEqual(result["categories"]["200"]["total_spent"], 0)
+        
+        # Other users are unaffected, and events without a user are ignored
+        self.stats.record_auctions_found(None, [self.camera])
+        self.assertEqual(self.stats.get(2)["total_auctions_found"], 0)
+    
+    def test_stored_auctions_are_keyed_on_category(self):
+        """Test that stored auction rows are counted under their category column"""
+        self.stats.record_auctions_found(1, [{"id": 3, "category": "100"}, {"id": 4, "category": ""}])
+        
+        categories = self.stats.get(1)["categories"]
+        self.assertEqual(categories["100"]["total_auctions_found"], 1)
+        self.assertEqual(categories["uncategorized"]["total_auctions_found"], 1)
+    
+    def test_get_returns_copy(self):
+        """Test that callers can't mutate the aggregates"""
+        self.stats.record_auctions_found(1, [self.camera])
+        self.stats.get(1)["categories"]["100"]["total_auctions_found"] = 99
+        self.assertEqual(self.stats.get(1)["categories"]["100"]["total_auctions_found"], 1)
+    
+    def test_events_are_written_as_increments(self):
+        """Test that events are added to the stored row atomically instead of upserting whole rows"""
+        supabase = MagicMock()
+        stats = UserStatsAggregator(get_client=lambda: supabase)
+        
+        stats.record_result(1, self.camera, won=True, amount=550)
+        
+        name, params = supabase.rpc.call_args[0]
+        self.assertEqual(name, "increment_user_statistics")
+        self.assertEqual(params["p_user_id"], "1")
+        self.assertEqual((params["p_auctions_won"], params["p_auctions_lost"], params["p_total_spent"]), (1, 0, 550))
+        self.assertEqual(params["p_categories"]["100"]["auctions_won"], 1)
+        self.assertEqual(params["p_categories"]["100"]["total_spent"], 550)
+        supabase.table.return_value.upsert.assert_not_called()
+        supabase.table.return_value.select.assert_not_called()
+    
+    def test_row_is_read_every_time(self):
+        """Test that reads see other processes' increments and a failed read is not cached"""
+        supabase = MagicMock()
+        execute = supabase.table.return_value.select.return_value.eq.return_value.execute
+        row = {
+            "user_id": "1",
+            "total_auctions_found": 10,
+            "auctions_with_bids": 4,
+            "auctions_won": 2,
+            "auctions_lost": 1,
+            "total_spent": "1200.00",
+            "categories": {}
+        }
+        execute.return_value.data = [row]
+        stats = UserStatsAggregator(get_client=lambda: supabase)
+        
+        self.assertEqual(stats.get(1)["total_auctions_found"], 10)
+        self.assertEqual(stats.get(1)["total_spent"], 1200.0)
+        
+        execute.side_effect = Exception("connection reset")
+        with self.assertRaises(Exception):
+            stats.get(1)
+        execute.side_effect = None
+        execute.return_value.data = [{**row, "total_auctions_found": 11}]
+        self.assertEqual(stats.get(1)["total_auctions_found"], 11)
+
+if __name__ == '__main__':
+    unittest.main()
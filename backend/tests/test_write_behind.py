@@ -0,0 +1,237 @@
+import unittest
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from write_behind import WriteBehindBuffer, coalesce, default_log_path
+
+
+class TestWriteBehindBuffer(unittest.TestCase):
+    """Test cases for the write-behind buffer"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.directory.name, "write_behind.log")
+        self.supabase = MagicMock()
+        self.buffer = self.make_buffer()
+
+    def tearDown(self):
+        self.buffer.close()
+        self.directory.cleanup()
+
+    def make_buffer(self):
+        return WriteBehindBuffer(get_client=lambda: self.supabase, log_path=self.log_path, fsync=False)
+
+    def test_coalesce(self):
+        """Test inserts are grouped per table and updates to one row are merged"""
+        inserts, updates = coalesce([
+            {"op": "insert", "table": "bids", "on_conflict": "key", "row": {"key": "a", "amount": 1}},
+            {"op": "update", "table": "auctions", "id": 1, "values": {"bid_count": 1}},
+            {"op": "insert", "table": "bids", "on_conflict": "key", "row": {"key": "b", "amount": 2}},
+            {"op": "update", "table": "auctions", "id": 1, "values": {"bid_count": 2, "next_bid": 110}},
+            {"op": "insert", "table": "bids", "on_conflict": "key", "row": {"key": "a", "amount": 1}},
+        ])
+        self.assertEqual(inserts, {("bids", "key"): [{"key": "a", "amount": 1}, {"key": "b", "amount": 2}]})
+        self.assertEqual(updates, {("auctions", 1): {"bid_count": 2, "next_bid": 110}})
+
+    def test_flush_batches_writes(self):
+        """Test queued writes are stored in one upsert plus one update per row"""
+        table = self.supabase.table.return_value
+        self.buffer.insert("bids", {"idempotency_key": "a", "auction_id": 1}, on_conflict="idempotency_key")
+        self.buffer.insert("bids", {"idempotency_key": "b", "auction_id": 1}, on_conflict="idempotency_key")
+        self.buffer.update("auctions", 1, {"bid_count": 1})
+        self.buffer.update("auctions", 1, {"bid_count": 2})
+        table.upsert.assert_not_called()
+
+        self.assertEqual(self.buffer.flush(), 4)
+        table.upsert.assert_called_once_with(
+            [{"idempotency_key": "a", "auction_id": 1}, {"idempotency_key": "b", "auction_id": 1}],
+            on_conflict="idempotency_key", ignore_duplicates=True,
+        )
+        table.update.assert_called_once_with({"bid_count": 2})
+        self.assertEqual(self.buffer.pending(), [])
+        self.assertEqual(os.path.getsize(self.log_path), 0)
+
+    def test_insert_needs_conflict_key(self):
+        """Test inserts without their unique key are rejected (they could not be replayed safely)"""
+        with self.assertRaises(ValueError):
+            self.buffer.insert("bids", {"auction_id": 1}, on_conflict="idempotency_key")
+
+    def test_failed_flush_keeps_writes(self):
+        """Test writes stay queued and logged when the database is unavailable"""
+        self.supabase.table.return_value.upsert.return_value.execute.side_effect = Exception("timeout")
+        self.buffer.insert("bids", {"idempotency_key": "a"}, on_conflict="idempotency_key")
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer.pending()), 1)
+        self.assertEqual(self.buffer.stats()["failed_flushes"], 1)
+
+        self.supabase.table.return_value.upsert.return_value.execute.side_effect = None
+        self.assertEqual(self.buffer.flush(), 1)
+
+    def test_rejected_write_does_not_block_the_others(self):
+        """Test a write the database rejects is dropped while the rest of the batch is stored"""
+        stored = []
+
+        def upsert_rows(rows, **kwargs):
+            query = MagicMock()
+            if any(row["auction_id"] == 2 for row in rows):
+                query.execute.side_effect = APIError({"code": "23503", "message": "violates foreign key constraint"})
+            else:
+                stored.extend(row["idempotency_key"] for row in rows)
+            return query
+
+        self.supabase.table.return_value.upsert.side_effect = upsert_rows
+        for key, auction_id in (("a", 1), ("b", 2), ("c", 3)):
+            self.buffer.insert("bids", {"idempotency_key": key, "auction_id": auction_id}, on_conflict="idempotency_key")
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(sorted(stored), ["a", "c"])
+        self.assertEqual(self.buffer.pending(), [])
+        self.assertEqual(self.buffer.stats()["rejected"], 1)
+        self.assertEqual(os.path.getsize(self.log_path), 0)
+
+    def test_deployment_errors_keep_writes_queued(self):
+        """Test a permission or schema error keeps the writes for a later flush instead of dropping them"""
+        for code in ("42501", "42703", "PGRST204"):
+            self.supabase.table.return_value.upsert.return_value.execute.side_effect = APIError(
+                {"code": code, "message": "deployment fault"})
+            self.buffer.insert("bids", {"idempotency_key": code, "auction_id": 1}, on_conflict="idempotency_key")
+            self.buffer.flush()
+            self.assertEqual(len(self.buffer.pending()), 1)
+            self.assertEqual(self.buffer.stats()["rejected"], 0)
+
+            self.supabase.table.return_value.upsert.return_value.execute.side_effect = None
+            self.assertEqual(self.buffer.flush(), 1)
+
+    def test_default_log_per_process(self):
+        """Test the default log carries the PID, and logs of stopped processes are taken over"""
+        base = os.path.join(self.directory.name, "spill.log")
+        stopped = subprocess.Popen([sys.executable, "-c", ""])
+        stopped.wait()
+        with patch.dict(os.environ, {"WRITE_BEHIND_LOG": base}):
+            self.assertEqual(default_log_path(), os.path.join(self.directory.name, f"spill.{os.getpid()}.log"))
+            previous = WriteBehindBuffer(get_client=lambda: self.supabase,
+                                         log_path=os.path.join(self.directory.name, f"spill.{stopped.pid}.log"), fsync=False)
+            previous.insert("bids", {"idempotency_key": "a"}, on_conflict="idempotency_key")
+            previous.close()
+
+            buffer = WriteBehindBuffer(get_client=lambda: self.supabase, fsync=False)
+            self.assertEqual(buffer.replay(), 1)
+            buffer.close()
+
+            self.assertEqual(buffer.pending()[0]["row"], {"idempotency_key": "a"})
+            self.assertEqual(os.listdir(self.directory.name), [f"spill.{os.getpid()}.log"])
+            # Taken over once: the writes are now in this process's log
+            self.assertEqual(WriteBehindBuffer(get_client=lambda: self.supabase, fsync=False).replay(), 1)
+
+    def test_replay_after_crash(self):
+        """Test a new process re-queues logged writes after the last checkpoint"""
+        self.buffer.insert("bids", {"idempotency_key": "a"}, on_conflict="idempotency_key")
+        self.buffer.flush()
+        self.buffer.insert("bids", {"idempotency_key": "b"}, on_conflict="idempotency_key")
+        self.buffer.update("auctions", 1, {"bid_count": 1})
+        self.buffer.close()
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write('{"op": "insert", "tab')  # torn write
+
+        restarted = self.make_buffer()
+        self.assertEqual(restarted.replay(), 2)
+        self.assertEqual([op["op"] for op in restarted.pending()], ["insert", "update"])
+        self.assertEqual(restarted.pending("bids")[0]["row"], {"idempotency_key": "b"})
+
+        # New writes continue the sequence
+        restarted.update("auctions", 2, {"bid_count": 1})
+        self.assertEqual(restarted.pending()[-1]["seq"], 4)
+        restarted.close()
+
+    def test_checkpoint_with_writes_still_pending(self):
+        """Test a partial flush records a checkpoint so stored writes are not replayed"""
+        self.buffer.insert("bids", {"idempotency_key": "a"}, on_conflict="idempotency_key")
+
+        def add_during_write(*args, **kwargs):
+            self.buffer.update("auctions", 1, {"bid_count": 1})
+            return MagicMock()
+
+        self.supabase.table.return_value.upsert.return_value.execute.side_effect = add_during_write
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(len(self.buffer.pending()), 1)
+        self.buffer.close()
+
+        restarted = self.make_buffer()
+        self.assertEqual(restarted.replay(), 1)
+        self.assertEqual(restarted.pending()[0]["op"], "update")
+        restarted.close()
+
+    def test_run_flushes_on_stop(self):
+        """Test the background loop stores what is left when stopped"""
+        async def scenario():
+            stop = asyncio.Event()
+            task = asyncio.create_task(self.buffer.run(stop))
+            self.buffer.update("auctions", 1, {"bid_count": 1})
+            stop.set()
+            await task
+
+        asyncio.run(scenario())
+        self.assertEqual(self.buffer.pending(), [])
+
+
+class TestWriteBehindBid(unittest.TestCase):
+    """Test cases for placing a bid with write-behind bookkeeping"""
+
+    def setUp(self):
+        from routes import bidding
+        self.bidding = bidding
+        self.directory = tempfile.TemporaryDirectory()
+        self.buffer = WriteBehindBuffer(get_client=MagicMock(), log_path=os.path.join(self.directory.name, "wb.log"),
+                                        fsync=False)
+        self.supabase = MagicMock()
+        auction = {"id": 5, "tradera_id": "123", "bid_count": 2, "status": "active", "end_time": None}
+        self.supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [auction]
+        self.patchers = [
+            patch.object(bidding, "write_behind", self.buffer),
+            patch.object(bidding, "get_supabase_client", return_value=self.supabase),
+            patch.object(bidding, "tradera_api"),
+            patch.object(bidding, "user_stats"),
+            patch.dict(os.environ, {"WRITE_BEHIND_ENABLED": "true"}),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        bidding.tradera_api.place_bid.return_value = {"status": "Bid", "next_bid": 150}
+        app = FastAPI()
+        app.include_router(bidding.router)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.buffer.close()
+        self.directory.cleanup()
+
+    def test_bid_acknowledged_before_bookkeeping_is_stored(self):
+        """Test the response only needs the Buy result; the bid row and auction update are queued"""
+        response = self.client.post("/api/auctions/5/bid", json={"auction_id": 5, "amount": 140, "user_id": 7})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertIsNone(body["id"])
+        self.assertTrue(body["idempotency_key"].startswith("bid-"))
+        self.assertEqual((body["status"], body["next_bid"]), ("placed", 150))
+
+        self.supabase.table.return_value.insert.assert_not_called()
+        self.supabase.table.return_value.update.assert_not_called()
+        queued = self.buffer.pending()
+        self.assertEqual([(op["op"], op["table"]) for op in queued], [("insert", "bids"), ("update", "auctions")])
+        self.assertEqual(queued[0]["row"]["idempotency_key"], body["idempotency_key"])
+        self.assertEqual(queued[1]["values"], {"bid_count": 3, "next_bid": 150})
+
+
+if __name__ == "__main__":
+    unittest.main()
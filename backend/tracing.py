@@ -0,0 +1,526 @@
+"""
+Tracing
+
+OpenTelemetry-compatible distributed tracing without the SDK dependency:
+- Spans carry W3C trace context (`traceparent`), so a trace follows a script
+  run or bid from the HTTP request or scheduler tick that started it, through
+  the job queue (the context is stored in the job payload), into the worker
+  and down to Tradera and database calls
+- Instrumented code uses `profiling.span(name)`, which records both a profile
+  span and, when tracing is enabled, a trace span; database calls are traced
+  through `profiling.instrument_httpx`
+- Finished spans are batched by a background thread and exported as OTLP/JSON
+  (ExportTraceServiceRequest): appended to a local file, one request per line
+  (TRACING_EXPORTER=file, TRACING_FILE), or posted to an OTLP/HTTP collector
+  (TRACING_EXPORTER=otlp, OTEL_EXPORTER_OTLP_ENDPOINT/v1/traces)
+
+Tracing is off unless TRACING_ENABLED=true. Print the traces in a file with:
+    python tracing.py traces.jsonl
+"""
+
+import atexit
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+import logging
+
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# Span kinds, numbered as in OTLP
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+PRODUCER = 4
+CONSUMER = 5
+
+# Status codes, numbered as in OTLP
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+TRACEPARENT = "traceparent"
+TRACEPARENT_FORMAT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+MAX_QUEUE = 2048
+MAX_BATCH = 512
+EXPORT_INTERVAL = 1.0
+
+
+class SpanContext(NamedTuple):
+    """Identifies a span, possibly one in another process"""
+    trace_id: str
+    span_id: str
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    def __init__(self, name: str, parent: Optional[SpanContext] = None, kind: int = INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None, tracer: Optional["Tracer"] = None):
+        self.name = name
+        self.kind = kind
+        self.context = SpanContext(parent.trace_id if parent else secrets.token_hex(16), secrets.token_hex(8))
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._tracer = tracer
+
+    @property
+    def trace_id(self) -> str:
+        return self.context.trace_id
+
+    @property
+    def span_id(self) -> str:
+        return self.context.span_id
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def set_status(self, code: int, message: str = ""):
+        self.status_code = code
+        self.status_message = message
+
+    def record_exception(self, error: BaseException):
+        self.add_event("exception", **{"exception.type": type(error).__name__, "exception.message": str(error)})
+        self.set_status(STATUS_ERROR, str(error))
+
+    def end(self):
+        """Finish the span and queue it for export (ending twice has no effect)"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self._tracer is not None:
+            self._tracer.processor.on_end(self)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON representation"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.events:
+            span["events"] = [{"name": event["name"], "timeUnixNano": str(event["time_ns"]),
+                               "attributes": _otlp_attributes(event["attributes"])} for event in self.events]
+        return span
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled"""
+    context = None
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def add_event(self, name: str, **attributes):
+        pass
+
+    def set_status(self, code: int, message: str = ""):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def otlp_request(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """Wrap spans in an OTLP ExportTraceServiceRequest"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+            "scopeSpans": [{
+                "scope": {"name": "tradera-assistant"},
+                "spans": [span.to_otlp() for span in spans],
+            }],
+        }],
+    }
+
+
+class InMemorySpanExporter:
+    """Keeps exported spans in a list (tests)"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, spans: List[Span], service_name: str):
+        self.spans.extend(spans)
+
+
+class FileSpanExporter:
+    """Appends one OTLP/JSON export request per batch to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span], service_name: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(otlp_request(spans, service_name)) + "\n")
+
+
+class OTLPHttpSpanExporter:
+    """Posts OTLP/JSON export requests to a collector's /v1/traces endpoint"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    def export(self, spans: List[Span], service_name: str):
+        import requests
+        response = requests.post(self.url, json=otlp_request(spans, service_name), timeout=self.timeout)
+        response.raise_for_status()
+
+
+class BatchSpanProcessor:
+    """Queues finished spans and exports them in batches from a background thread"""
+
+    def __init__(self, exporter, service_name: str, interval: float = EXPORT_INTERVAL,
+                 max_queue: int = MAX_QUEUE, max_batch: int = MAX_BATCH):
+        self.exporter = exporter
+        self.service_name = service_name
+        self.interval = interval
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self._queue: List[Span] = []
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.exported = 0
+        self.dropped = 0
+        self.failed_exports = 0
+
+    def on_end(self, span: Span):
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                # Never let tracing hold memory or block the caller when the exporter is down
+                self.dropped += 1
+                return
+            self._queue.append(span)
+            full = len(self._queue) >= self.max_batch
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.force_flush()
+
+    def force_flush(self) -> int:
+        """
+        Export every queued span now
+
+        Returns:
+            Number of spans exported
+        """
+        exported = 0
+        with self._export_lock:
+            while True:
+                with self._lock:
+                    batch = self._queue[:self.max_batch]
+                    del self._queue[:self.max_batch]
+                if not batch:
+                    return exported
+                try:
+                    self.exporter.export(batch, self.service_name)
+                    exported += len(batch)
+                    self.exported += len(batch)
+                except Exception as e:
+                    self.failed_exports += 1
+                    self.dropped += len(batch)
+                    logger.warning(f"Error exporting {len(batch)} spans: {e}")
+
+    def shutdown(self):
+        self._stopped = True
+        self._wake.set()
+        self.force_flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": len(self._queue), "exported": self.exported, "dropped": self.dropped,
+                "failed_exports": self.failed_exports}
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the batch processor"""
+
+    def __init__(self, exporter=None, service_name: str = "tradera-assistant-api",
+                 enabled: bool = True, interval: float = EXPORT_INTERVAL):
+        """
+        Initialize the tracer
+
+        Args:
+            exporter: Object with `export(spans, service_name)`
+            service_name: Reported as the `service.name` resource attribute
+            enabled: When False, every span is a no-op
+            interval: Seconds between background exports
+        """
+        self.enabled = enabled and exporter is not None
+        self.service_name = service_name
+        self.processor = BatchSpanProcessor(exporter, service_name, interval)
+
+
+def _tracer_from_env() -> Tracer:
+    if os.getenv("TRACING_ENABLED", "false").lower() != "true":
+        return Tracer(enabled=False)
+    service_name = os.getenv("OTEL_SERVICE_NAME", "tradera-assistant-api")
+    if os.getenv("TRACING_EXPORTER", "file").lower() == "otlp":
+        exporter = OTLPHttpSpanExporter(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"))
+    else:
+        exporter = FileSpanExporter(os.getenv("TRACING_FILE", "traces.jsonl"))
+    logger.info(f"Tracing enabled, exporting with {type(exporter).__name__}")
+    return Tracer(exporter, service_name)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def get_tracer() -> Tracer:
+    """The process-wide tracer, configured from the environment on first use"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = _tracer_from_env()
+    return _tracer
+
+
+def configure(tracer: Optional[Tracer]) -> Optional[Tracer]:
+    """
+    Replace the process-wide tracer (None: configure from the environment on next use)
+
+    Returns:
+        The previous tracer
+    """
+    global _tracer
+    with _tracer_lock:
+        previous, _tracer = _tracer, tracer
+    return previous
+
+
+def enabled() -> bool:
+    return get_tracer().enabled
+
+
+def current_span() -> Optional[Span]:
+    """The active span, if any"""
+    return _current_span.get()
+
+
+def start_span(name: str, kind: int = INTERNAL, parent: Optional[SpanContext] = None, **attributes):
+    """
+    Start a span without making it current (end it with `span.end()`)
+
+    Args:
+        name: Span name
+        kind: INTERNAL, SERVER, CLIENT, PRODUCER or CONSUMER
+        parent: Parent context (default: the current span)
+        attributes: Span attributes
+
+    Returns:
+        The span, or NOOP_SPAN when tracing is disabled
+    """
+    tracer = get_tracer()
+    if not tracer.enabled:
+        return NOOP_SPAN
+    if parent is None:
+        active = _current_span.get()
+        parent = active.context if active is not None else None
+    return Span(name, parent, kind, attributes, tracer)
+
+
+@contextmanager
+def traced(name: str, kind: int = INTERNAL, parent: Optional[SpanContext] = None, **attributes) -> Iterator[Any]:
+    """Run a block as the current span; exceptions are recorded on it"""
+    span = start_span(name, kind, parent, **attributes)
+    if span is NOOP_SPAN:
+        yield span
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def inject(carrier: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the current span's `traceparent` to a payload or header dict (if tracing)"""
+    active = _current_span.get()
+    if active is not None:
+        carrier[TRACEPARENT] = active.context.traceparent
+    return carrier
+
+
+def extract(carrier: Optional[Dict[str, Any]]) -> Optional[SpanContext]:
+    """Parent context from a `traceparent` value in a payload or header dict"""
+    if not carrier:
+        return None
+    match = TRACEPARENT_FORMAT.match(str(carrier.get(TRACEPARENT, "")).strip().lower())
+    if not match or set(match.group(1)) == {"0"} or set(match.group(2)) == {"0"}:
+        return None
+    return SpanContext(match.group(1), match.group(2))
+
+
+def stats() -> Dict[str, int]:
+    """Export counters of the process-wide tracer"""
+    return get_tracer().processor.stats()
+
+
+def shutdown():
+    """Export spans still queued"""
+    if _tracer is not None and _tracer.enabled:
+        _tracer.processor.shutdown()
+
+
+atexit.register(shutdown)
+
+
+class TracingMiddleware:
+    """Trace every HTTP request as a server span, continuing an incoming `traceparent`"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled():
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        with traced(f"{scope.get('method', '')} {scope.get('path', '')}", kind=SERVER, parent=extract(headers),
+                    **{"http.method": scope.get("method"), "http.target": scope.get("path")}) as span:
+            async def traced_send(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(STATUS_ERROR)
+                    MutableHeaders(scope=message).append("X-Trace-Id", span.trace_id)
+                await send(message)
+
+            await self.app(scope, receive, traced_send)
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                span.name = f"{scope.get('method', '')} {route.path}"
+                span.set_attribute("http.route", route.path)
+
+
+class TraceLogFilter(logging.Filter):
+    """Adds `trace_id` to log records (`-` outside a trace) so logs can be joined with traces"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        active = _current_span.get()
+        record.trace_id = active.trace_id if active is not None else "-"
+        return True
+
+
+def add_trace_ids_to_logs():
+    """Attach TraceLogFilter to the root logger's handlers (their format may use %(trace_id)s)"""
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(TraceLogFilter())
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    """Read spans from a file written by FileSpanExporter (or collected by the OTLP stand-in)"""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                for resource in json.loads(line)["resourceSpans"]:
+                    for scope in resource["scopeSpans"]:
+                        spans.extend(scope["spans"])
+    return spans
+
+
+def format_traces(spans: List[Dict[str, Any]]) -> str:
+    """Render OTLP/JSON spans as one indented tree per trace, with durations and offsets"""
+    by_trace: Dict[str, List[Dict[str, Any]]] = {}
+    for span in spans:
+        by_trace.setdefault(span["traceId"], []).append(span)
+
+    lines = []
+    for trace_id, trace_spans in by_trace.items():
+        trace_spans.sort(key=lambda span: int(span["startTimeUnixNano"]))
+        ids = {span["spanId"] for span in trace_spans}
+        children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for span in trace_spans:
+            parent = span.get("parentSpanId")
+            children.setdefault(parent if parent in ids else None, []).append(span)
+        start = int(trace_spans[0]["startTimeUnixNano"])
+        lines.append(f"trace {trace_id}")
+
+        def walk(span, depth):
+            offset = (int(span["startTimeUnixNano"]) - start) / 1e6
+            duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+            error = " ERROR" if span.get("status", {}).get("code") == STATUS_ERROR else ""
+            lines.append(f"{'  ' * (depth + 1)}{span['name']}  +{offset:.1f}ms  {duration:.1f}ms{error}")
+            for child in children.get(span["spanId"], []):
+                walk(child, depth + 1)
+
+        for root in children.get(None, []):
+            walk(root, 0)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(format_traces(load_spans(sys.argv[1] if len(sys.argv) > 1 else "traces.jsonl")))
@@ -8,15 +8,186 @@ This module handles all interactions with the Tradera API, including:
 - Token-based authorization for restricted operations
 """
 
+import contextvars
 import os
+import socket
+import select
+import ssl
+import time
+import http.client
+import threading
 import requests
-import xmltodict
-from typing import Dict, List, Optional, Any
+import urllib3
+from typing import Dict, List, Optional, Any, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlparse
 import logging
 
+from resilience import RetryPolicy, CircuitBreaker, TraderaUnavailableError
+from profiling import span
+from tracing import CLIENT
+
 logger = logging.getLogger(__name__)
 
+
+class _RequestNotSent(Exception):
+    """The connection failed before the whole request was written"""
+
+
+class _OutcomeUnknown(Exception):
+    """A request that must not run twice failed after it may have reached the server"""
+
+
+def _failed_before_send(error: requests.RequestException) -> bool:
+    """Whether a requests failure happened while connecting, before any of the request was sent"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+class PreparedBid:
+    """
+    A Buy request staged ahead of an auction deadline.
+
+    The connection to BuyerService is opened (DNS, TCP and TLS) when the bid is
+    prepared, and the complete HTTP request is serialized to bytes up front, so
+    firing the bid is a single socket write followed by reading the response.
+    """
+
+    def __init__(self, api: "TraderaAPI", item_id: int, bid_amount: int,
+                 url: str, payload: bytes, timeout: float = 10.0):
+        """
+        Initialize a prepared bid
+
+        Args:
+            api: The TraderaAPI client used to parse the response
+            item_id: Tradera item ID
+            bid_amount: Bid amount in SEK
+            url: BuyerService endpoint URL
+            payload: Complete pre-serialized HTTP request (headers and body)
+            timeout: Socket timeout in seconds
+        """
+        self.api = api
+        self.item_id = item_id
+        self.bid_amount = bid_amount
+        self.url = url
+        self.payload = payload
+        self.timeout = timeout
+        self.prepared_at = time.monotonic()
+        self.fired = False
+        # Whether the whole request was written (the bid may have been placed)
+        self.sent = False
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def connect(self):
+        """Resolve DNS and open (and keep alive) the connection to BuyerService"""
+        parsed = urlparse(self.url)
+        if parsed.scheme == "https":
+            connection = http.client.HTTPSConnection(
+                parsed.hostname, parsed.port or 443,
+                timeout=self.timeout, context=ssl.create_default_context()
+            )
+        else:
+            connection = http.client.HTTPConnection(
+                parsed.hostname, parsed.port or 80, timeout=self.timeout
+            )
+        connection.connect()
+        connection.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._connection = connection
+
+    @property
+    def is_connected(self) -> bool:
+        """Whether the warm connection is still usable"""
+        if self._connection is None or self._connection.sock is None:
+            return False
+        # A warm socket that is readable before we've written anything means the
+        # server closed it (or sent garbage) while we were waiting for the deadline
+        readable, _, _ = select.select([self._connection.sock], [], [], 0)
+        return not readable
+
+    def fire(self) -> Dict:
+        """
+        Send the pre-built Buy request over the warm connection
+
+        Returns:
+            Dictionary with bid result, in the same format as TraderaAPI.place_bid
+        """
+        if self.fired:
+            return {"error": "Prepared bid has already been fired"}
+        self.fired = True
+
+        try:
+            if not self.is_connected:
+                logger.warning(f"Warm connection for item {self.item_id} was lost, reconnecting")
+                self.close()
+                self.connect()
+            status_code, text = self._send()
+        except _RequestNotSent:
+            # The server dropped the idle connection before it had our whole
+            # request, so it can't have placed the bid: send it once more on a
+            # fresh connection. A failure after the request was written is not
+            # retried, since the bid may have gone through.
+            logger.warning(f"Warm connection for item {self.item_id} was reset, retrying once")
+            self.close()
+            try:
+                self.connect()
+                status_code, text = self._send()
+            except Exception as e:
+                return self._connection_error(e)
+        except Exception as e:
+            return self._connection_error(e)
+        finally:
+            self.close()
+
+        if status_code != 200:
+            logger.error(f"Error placing bid: {status_code} - {text}")
+            return {"error": f"API error: {status_code}", "details": text}
+
+        return self.api._parse_buy_response(text)
+
+    def _connection_error(self, error: Exception) -> Dict:
+        logger.error(f"Error placing prepared bid: {str(error)}")
+        if self.sent:
+            return {"error": f"Connection lost after the bid was sent, it may have been placed: {str(error)}"}
+        return {"error": f"Connection error: {str(error)}"}
+
+    def _send(self):
+        """
+        Write the payload and read the HTTP response
+
+        Raises:
+            _RequestNotSent: If writing the payload failed
+        """
+        sock = self._connection.sock
+        try:
+            sock.sendall(self.payload)
+        except OSError as e:
+            raise _RequestNotSent(str(e)) from e
+        self.sent = True
+        response = http.client.HTTPResponse(sock, method="POST")
+        response.begin()
+        try:
+            return response.status, response.read().decode("utf-8")
+        finally:
+            response.close()
+
+    def close(self):
+        """Close the warm connection"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def _parse_xml(text: str) -> Dict[str, Any]:
+    """Parse a SOAP response (xmltodict is imported on first use to keep startup fast)"""
+    import xmltodict
+    with span("tradera.parse"):
+        return xmltodict.parse(text)
+
+
 class TraderaAPI:
     """Client for interacting with Tradera's SOAP API"""
     
@@ -52,6 +223,26 @@ class TraderaAPI:
         # User token for restricted operations
         self.user_id = None
         self.token = None
+        
+        # Per-operation retry policies. Buy is only retried within the auction
+        # deadline passed to place_bid, and is never blocked by a breaker. It is
+        # retried only when Tradera can't have acted on it: a failure to connect,
+        # or a 503 (a 500 or a read timeout may come after the bid was placed).
+        self.retry_policies = {
+            "search": RetryPolicy(max_attempts=3, base_delay=0.25, max_delay=2.0, timeout=15.0),
+            "get_item": RetryPolicy(max_attempts=3, base_delay=0.2, max_delay=1.0, timeout=10.0),
+            "buy": RetryPolicy(max_attempts=3, base_delay=0.05, max_delay=0.2, timeout=5.0,
+                               retry_statuses=(503,), retry_after_send=False),
+            "fetch_token": RetryPolicy(max_attempts=2, base_delay=0.5, max_delay=1.0, timeout=10.0),
+        }
+        self.circuit_breakers = {
+            "search": CircuitBreaker("search", failure_threshold=5, reset_timeout=30.0),
+            "get_item": CircuitBreaker("get_item", failure_threshold=5, reset_timeout=30.0),
+        }
+        
+        # In-flight GetItem calls, so concurrent refreshes of the same item share one request
+        self._inflight_items: Dict[int, Future] = {}
+        self._inflight_lock = threading.Lock()
     
     def set_user_token(self, user_id: int, token: str):
         """
@@ -124,6 +315,75 @@ class TraderaAPI:
         </soap:Envelope>
         """
     
+    def _post(self, operation: str, url: str, headers: Dict[str, str], data: str,
+              deadline: Optional[float] = None) -> requests.Response:
+        """
+        POST a SOAP request with the operation's retry policy and circuit breaker
+        
+        Transient failures (timeouts, connection errors and 5xx responses) are
+        retried with exponential backoff and jitter. Retries never start after
+        `deadline`, and each attempt's timeout is capped by it. Without
+        `retry_after_send`, only failures to connect are retried.
+        
+        Args:
+            operation: Key into retry_policies / circuit_breakers
+            url: Service URL
+            headers: HTTP headers
+            data: SOAP envelope
+            deadline: Epoch seconds after which the call is pointless (e.g. auction end)
+            
+        Returns:
+            The final HTTP response (which may still be a non-200 response)
+            
+        Raises:
+            TraderaUnavailableError: If the circuit is open or every attempt failed to connect
+            _OutcomeUnknown: If a request that must not be retried failed after it may have been sent
+        """
+        policy = self.retry_policies.get(operation, RetryPolicy(max_attempts=1))
+        breaker = self.circuit_breakers.get(operation)
+        if breaker:
+            breaker.before_call()
+        
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = policy.attempt_timeout(deadline)
+            if timeout is None:
+                if breaker:
+                    breaker.record_failure()
+                raise TraderaUnavailableError(f"Deadline passed before Tradera {operation} could complete")
+            
+            try:
+                with span(f"tradera.{operation}", CLIENT, attempt=attempt):
+                    response = requests.post(url, headers=headers, data=data, timeout=timeout)
+                transient = response.status_code in policy.retry_statuses
+                failure = None
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if not policy.retry_after_send and not _failed_before_send(e):
+                    if breaker:
+                        breaker.record_failure()
+                    raise _OutcomeUnknown(str(e)) from e
+                response = None
+                transient = True
+                failure = e
+            
+            if not transient:
+                if breaker:
+                    breaker.record_success()
+                return response
+            
+            delay = policy.backoff(attempt)
+            out_of_time = deadline is not None and time.time() + delay >= deadline
+            if attempt >= policy.max_attempts or out_of_time:
+                if breaker:
+                    breaker.record_failure()
+                if response is not None:
+                    return response
+                raise TraderaUnavailableError(f"Tradera {operation} failed after {attempt} attempts: {failure}")
+            
+            logger.warning(f"Transient Tradera {operation} failure (attempt {attempt}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+    
     def search_advanced(self, 
                        search_words: Optional[str] = None,
                        category_id: int = 0,
@@ -171,18 +431,18 @@ class TraderaAPI:
         </SearchAdvanced>
         """
         
-        # Set SOAPAction header
-        self.headers["SOAPAction"] = "http://api.tradera.com/SearchAdvanced"
+        # Per-call headers: searches also run in background threads (see search_cache.py)
+        headers = dict(self.headers, SOAPAction="http://api.tradera.com/SearchAdvanced")
         
         # Create full SOAP envelope
         soap_envelope = self._create_soap_envelope(request_body, include_auth=False)
         
         # Make the request
-        response = requests.post(
-            self.search_service_url,
-            headers=self.headers,
-            data=soap_envelope
-        )
+        try:
+            response = self._post("search", self.search_service_url, headers, soap_envelope)
+        except TraderaUnavailableError as e:
+            logger.error(f"Error searching Tradera: {e}")
+            return {"error": str(e), "unavailable": True, "retry_after": e.retry_after}
         
         # Check for errors
         if response.status_code != 200:
@@ -191,7 +451,7 @@ class TraderaAPI:
         
         # Parse XML response
         try:
-            response_dict = xmltodict.parse(response.text)
+            response_dict = _parse_xml(response.text)
             soap_body = response_dict.get('soap:Envelope', {}).get('soap:Body', {})
             search_result = soap_body.get('SearchAdvancedResponse', {}).get('SearchAdvancedResult', {})
             
@@ -274,13 +534,125 @@ class TraderaAPI:
         
         return urls
     
-    def place_bid(self, item_id: int, bid_amount: int) -> Dict:
+    def get_item(self, item_id: int) -> Dict:
+        """
+        Fetch the current state of a single item
+        
+        Args:
+            item_id: Tradera item ID
+            
+        Returns:
+            Processed item dictionary (same format as search items)
+        """
+        request_body = f"""
+        <GetItem xmlns="{self.api_ns}">
+          <itemId>{item_id}</itemId>
+        </GetItem>
+        """
+        
+        # Headers are built per call since get_items runs these concurrently
+        headers = dict(self.headers, SOAPAction="http://api.tradera.com/GetItem")
+        
+        # Create full SOAP envelope
+        soap_envelope = self._create_soap_envelope(request_body, include_auth=False)
+        
+        # Make the request
+        try:
+            response = self._post("get_item", self.public_service_url, headers, soap_envelope)
+        except TraderaUnavailableError as e:
+            logger.error(f"Error fetching item {item_id}: {e}")
+            return {"error": str(e), "unavailable": True, "retry_after": e.retry_after}
+        
+        # Check for errors
+        if response.status_code != 200:
+            logger.error(f"Error fetching item {item_id}: {response.status_code} - {response.text}")
+            return {"error": f"API error: {response.status_code}", "details": response.text}
+        
+        # Parse XML response
+        try:
+            response_dict = _parse_xml(response.text)
+            soap_body = response_dict.get('soap:Envelope', {}).get('soap:Body', {})
+            item = soap_body.get('GetItemResponse', {}).get('GetItemResult')
+            if not item:
+                return {"error": f"Item {item_id} not found"}
+            
+            processed = self._process_search_items(self._normalize_get_item(item))
+            if not processed:
+                return {"error": f"Could not process item {item_id}"}
+            return processed[0]
+        except Exception as e:
+            logger.error(f"Error parsing item response: {str(e)}")
+            return {"error": f"Response parsing error: {str(e)}"}
+    
+    def get_items(self, item_ids: Iterable[int], max_concurrency: int = 8) -> Dict[int, Dict]:
+        """
+        Fetch the current state of many items
+        
+        Duplicate IDs are fetched once, at most `max_concurrency` requests are
+        in flight, and IDs already being fetched by another caller share that
+        request instead of issuing a new one.
+        
+        Args:
+            item_ids: Tradera item IDs
+            max_concurrency: Maximum number of concurrent GetItem calls
+            
+        Returns:
+            Dictionary mapping item ID to processed item (or an {"error": ...} dict)
+        """
+        unique_ids = list(dict.fromkeys(int(item_id) for item_id in item_ids))
+        if not unique_ids:
+            return {}
+        
+        futures: Dict[int, Future] = {}
+        owned: List[int] = []
+        with self._inflight_lock:
+            for item_id in unique_ids:
+                future = self._inflight_items.get(item_id)
+                if future is None:
+                    future = Future()
+                    self._inflight_items[item_id] = future
+                    owned.append(item_id)
+                futures[item_id] = future
+        
+        def fetch(item_id: int):
+            try:
+                result = self.get_item(item_id)
+            except Exception as e:
+                logger.error(f"Error fetching item {item_id}: {str(e)}")
+                result = {"error": str(e)}
+            with self._inflight_lock:
+                self._inflight_items.pop(item_id, None)
+            futures[item_id].set_result(result)
+        
+        if owned:
+            # Each fetch runs in a copy of the caller's context, so request profiles see its spans
+            contexts = [contextvars.copy_context() for _ in owned]
+            with ThreadPoolExecutor(max_workers=min(max_concurrency, len(owned))) as executor:
+                list(executor.map(lambda context, item_id: context.run(fetch, item_id), contexts, owned))
+        
+        return {item_id: future.result() for item_id, future in futures.items()}
+    
+    def _normalize_get_item(self, item: Dict) -> Dict:
+        """Map a GetItem result onto the field names used by search items"""
+        seller = item.get('Seller') or {}
+        status = item.get('Status') or {}
+        normalized = dict(item)
+        normalized.setdefault('SellerId', seller.get('Id', 0))
+        normalized.setdefault('SellerAlias', seller.get('Alias', ''))
+        normalized.setdefault('BidCount', item.get('TotalBids', 0))
+        normalized.setdefault('ItemUrl', item.get('ItemLink', ''))
+        normalized.setdefault('IsEnded', status.get('Ended', 'false') if isinstance(status, dict) else 'false')
+        normalized.setdefault('HasBids', 'true' if int(normalized.get('BidCount') or 0) > 0 else 'false')
+        return normalized
+    
+    def place_bid(self, item_id: int, bid_amount: int, deadline: Optional[float] = None) -> Dict:
         """
         Place a bid on an auction
         
         Args:
             item_id: Tradera item ID
             bid_amount: Bid amount in SEK
+            deadline: Auction end as epoch seconds; transient failures are not retried past it
             
         Returns:
             Dictionary with bid result
@@ -288,35 +660,80 @@ class TraderaAPI:
         if not self.user_id or not self.token:
             return {"error": "User token not set. Authentication required for bidding."}
         
-        # Create request body
-        request_body = f"""
-        <Buy xmlns="{self.api_ns}">
-          <itemId>{item_id}</itemId>
-          <buyAmount>{bid_amount}</buyAmount>
-        </Buy>
-        """
-        
-        # Set SOAPAction header
-        self.headers["SOAPAction"] = "http://api.tradera.com/Buy"
-        
         # Create full SOAP envelope
-        soap_envelope = self._create_soap_envelope(request_body, include_auth=True)
+        soap_envelope = self._create_buy_envelope(item_id, bid_amount)
+        
+        # Per-call headers, so concurrent calls never send each other's SOAPAction
+        headers = dict(self.headers, SOAPAction="http://api.tradera.com/Buy")
         
         # Make the request
-        response = requests.post(
-            self.buyer_service_url,
-            headers=self.headers,
-            data=soap_envelope
-        )
+        try:
+            response = self._post("buy", self.buyer_service_url, headers, soap_envelope, deadline=deadline)
+        except TraderaUnavailableError as e:
+            logger.error(f"Error placing bid: {e}")
+            return {"error": str(e), "unavailable": True}
+        except _OutcomeUnknown as e:
+            # Sending it again could place the bid twice
+            logger.error(f"Error placing bid: {e}")
+            return {"error": f"Connection lost after the bid was sent, it may have been placed: {e}"}
         
         # Check for errors
         if response.status_code != 200:
             logger.error(f"Error placing bid: {response.status_code} - {response.text}")
             return {"error": f"API error: {response.status_code}", "details": response.text}
         
-        # Parse XML response
+        return self._parse_buy_response(response.text)
+    
+    def prepare_bid(self, item_id: int, bid_amount: int, timeout: float = 10.0) -> PreparedBid:
+        """
+        Prepare a bid a few seconds before the deadline
+        
+        Resolves DNS, opens a keep-alive connection to BuyerService and
+        pre-serializes the Buy request, so that PreparedBid.fire() only has to
+        write to the socket.
+        
+        Args:
+            item_id: Tradera item ID
+            bid_amount: Bid amount in SEK
+            timeout: Socket timeout in seconds
+            
+        Returns:
+            PreparedBid ready to be fired
+        """
+        if not self.user_id or not self.token:
+            raise ValueError("User token not set. Authentication required for bidding.")
+        
+        body = self._create_buy_envelope(item_id, bid_amount).encode("utf-8")
+        parsed = urlparse(self.buyer_service_url)
+        host = parsed.hostname if parsed.port is None else f"{parsed.hostname}:{parsed.port}"
+        head = (
+            f"POST {parsed.path or '/'} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            f"Content-Type: {self.headers['Content-Type']}\r\n"
+            f"SOAPAction: http://api.tradera.com/Buy\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: keep-alive\r\n"
+            f"\r\n"
+        ).encode("latin-1")
+        
+        prepared = PreparedBid(self, item_id, bid_amount, self.buyer_service_url, head + body, timeout)
+        prepared.connect()
+        return prepared
+    
+    def _create_buy_envelope(self, item_id: int, bid_amount: int) -> str:
+        """Create the complete SOAP envelope for a Buy request"""
+        request_body = f"""
+        <Buy xmlns="{self.api_ns}">
+          <itemId>{item_id}</itemId>
+          <buyAmount>{bid_amount}</buyAmount>
+        </Buy>
+        """
+        return self._create_soap_envelope(request_body, include_auth=True)
+    
+    def _parse_buy_response(self, text: str) -> Dict:
+        """Parse a Buy SOAP response into a bid result dictionary"""
         try:
-            response_dict = xmltodict.parse(response.text)
+            response_dict = _parse_xml(text)
             soap_body = response_dict.get('soap:Envelope', {}).get('soap:Body', {})
             buy_result = soap_body.get('BuyResponse', {}).get('BuyResult', {})
             
@@ -346,18 +763,18 @@ class TraderaAPI:
         </FetchToken>
         """
         
-        # Set SOAPAction header
-        self.headers["SOAPAction"] = "http://api.tradera.com/FetchToken"
+        # Per-call headers, so concurrent calls never send each other's SOAPAction
+        headers = dict(self.headers, SOAPAction="http://api.tradera.com/FetchToken")
         
         # Create full SOAP envelope
         soap_envelope = self._create_soap_envelope(request_body, include_auth=False)
         
         # Make the request
-        response = requests.post(
-            self.public_service_url,
-            headers=self.headers,
-            data=soap_envelope
-        )
+        try:
+            response = self._post("fetch_token", self.public_service_url, headers, soap_envelope)
+        except TraderaUnavailableError as e:
+            logger.error(f"Error fetching token: {e}")
+            return {"error": str(e), "unavailable": True}
         
         # Check for errors
         if response.status_code != 200:
@@ -366,7 +783,7 @@ class TraderaAPI:
         
         # Parse XML response
         try:
-            response_dict = xmltodict.parse(response.text)
+            response_dict = _parse_xml(response.text)
             soap_body = response_dict.get('soap:Envelope', {}).get('soap:Body', {})
             fetch_result = soap_body.get('FetchTokenResponse', {}).get('FetchTokenResult', {})
             
@@ -386,3 +803,41 @@ class TraderaAPI:
         except Exception as e:
             logger.error(f"Error parsing token response: {str(e)}")
             return {"error": f"Response parsing error: {str(e)}"}
+
+
+def create_tradera_api() -> TraderaAPI:
+    """Create a client from TRADERA_APP_ID, TRADERA_APP_KEY and TRADERA_SANDBOX"""
+    return TraderaAPI(
+        os.getenv("TRADERA_APP_ID", ""),
+        os.getenv("TRADERA_APP_KEY", ""),
+        sandbox=int(os.getenv("TRADERA_SANDBOX", "0")),
+    )
+
+
+class LazyTraderaAPI:
+    """
+    Shared TraderaAPI client, built from the environment on first use
+
+    TRADERA_APP_ID, TRADERA_APP_KEY and TRADERA_SANDBOX are read when the client
+    is first needed rather than at import time. Attribute access is forwarded
+    to the client, so the object can be used wherever a TraderaAPI is expected.
+    """
+
+    def __init__(self):
+        self._api: Optional[TraderaAPI] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> TraderaAPI:
+        """Return the client, creating it on first use"""
+        if self._api is None:
+            with self._lock:
+                if self._api is None:
+                    self._api = create_tradera_api()
+        return self._api
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+
+# Process-wide client shared by the routers
+shared_tradera_api = LazyTraderaAPI()
@@ -0,0 +1,145 @@
+"""
+User Statistics Aggregates
+
+Per-user statistics (auctions found, auctions with bids, won, lost, total
+spent and per-category breakdowns) maintained incrementally as auctions are
+ingested and bids are placed, instead of being computed by scanning the
+`auctions` and `bids` tables. Each user's aggregate is persisted as a single
+row in `user_statistics`, so reading statistics is O(1) regardless of history.
+
+Events are written as increments with the `increment_user_statistics` SQL
+function (migration 0005), which adds to the stored row atomically. The API
+processes and the worker all record events, so none of them may write back
+a whole row computed from its own copy.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("total_auctions_found", "auctions_with_bids", "auctions_won", "auctions_lost")
+
+
+def _empty_statistics() -> Dict[str, Any]:
+    return {
+        "total_auctions_found": 0,
+        "auctions_with_bids": 0,
+        "auctions_won": 0,
+        "auctions_lost": 0,
+        "total_spent": 0,
+        "categories": {},
+    }
+
+
+def _category_of(auction: Dict[str, Any]) -> str:
+    category = auction.get("category_id", auction.get("category"))
+    return "uncategorized" if category in (None, "", 0, "0") else str(category)
+
+
+def _from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Statistics dictionary from a user_statistics row"""
+    stats = _empty_statistics()
+    for name in COUNTERS:
+        stats[name] = int(row.get(name) or 0)
+    stats["total_spent"] = float(row.get("total_spent") or 0)
+    stats["categories"] = row.get("categories") or {}
+    return stats
+
+
+def _merge(stats: Dict[str, Any], delta: Dict[str, Any]):
+    """Add a delta to statistics in place (what increment_user_statistics does in SQL)"""
+    for name in (*COUNTERS, "total_spent"):
+        stats[name] += delta[name]
+    for key, counts in delta["categories"].items():
+        category = stats["categories"].setdefault(key, {})
+        for name, value in counts.items():
+            category[name] = category.get(name, 0) + value
+
+
+class UserStatsAggregator:
+    """Incrementally maintained per-user statistics"""
+
+    def __init__(self, get_client: Optional[Callable[[], Any]] = None):
+        """
+        Initialize the aggregator
+
+        Args:
+            get_client: Callable returning the Supabase client (None keeps aggregates in memory only)
+        """
+        self.get_client = get_client
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: Any) -> Dict[str, Any]:
+        """
+        Get statistics for a user
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Statistics dictionary
+
+        Raises:
+            Exception: If the statistics row can't be read
+        """
+        key = str(user_id)
+        if self.get_client is not None:
+            # Other processes increment the row too, so it is read every time
+            response = self.get_client().table("user_statistics").select("*").eq("user_id", key).execute()
+            return _from_row(response.data[0]) if response.data else _empty_statistics()
+        with self._lock:
+            stats = self._stats.get(key) or _empty_statistics()
+            return {**stats, "categories": {k: dict(v) for k, v in stats["categories"].items()}}
+
+    def record_auctions_found(self, user_id: Any, auctions: Iterable[Dict[str, Any]]):
+        """Record newly found auctions (call once per auction, when it is first stored)"""
+        auctions = list(auctions)
+        if user_id is None or not auctions:
+            return
+        self._apply(user_id, auctions, "total_auctions_found")
+
+    def record_first_bid(self, user_id: Any, auction: Dict[str, Any]):
+        """Record the user's first bid on an auction"""
+        if user_id is None:
+            return
+        self._apply(user_id, [auction], "auctions_with_bids")
+
+    def record_result(self, user_id: Any, auction: Dict[str, Any], won: bool, amount: float = 0):
+        """
+        Record the outcome of an auction the user bid on
+
+        Args:
+            user_id: User ID
+            auction: Auction row
+            won: Whether the user won the auction
+            amount: Amount paid if won
+        """
+        if user_id is None:
+            return
+        self._apply(user_id, [auction], "auctions_won" if won else "auctions_lost", spent=amount if won else 0)
+
+    def _apply(self, user_id: Any, auctions, counter: str, spent: float = 0):
+        key = str(user_id)
+        delta = {name: 0 for name in COUNTERS} | {"total_spent": 0, "categories": {}}
+        delta[counter] = len(auctions)
+        delta["total_spent"] = spent
+        for auction in auctions:
+            # New categories start with every counter, like the aggregate itself
+            category = delta["categories"].setdefault(
+                _category_of(auction), {name: 0 for name in COUNTERS} | {"total_spent": 0}
+            )
+            category[counter] += 1
+            category["total_spent"] += spent
+
+        if self.get_client is None:
+            with self._lock:
+                _merge(self._stats.setdefault(key, _empty_statistics()), delta)
+            return
+        params = {f"p_{name}": delta[name] for name in (*COUNTERS, "total_spent", "categories")}
+        try:
+            self.get_client().rpc("increment_user_statistics", {"p_user_id": key, **params}).execute()
+        except Exception as e:
+            logger.error(f"Error saving statistics for user {key}: {e}")
@@ -0,0 +1,242 @@
+"""
+Job Worker
+
+Pulls jobs from the durable job queue and executes them, several at a time:
+- run_script: run a search script (payload: script_id)
+- refresh_auction: refresh auctions from Tradera (payload: auction_ids)
+- fire_bid: prepare and fire a bid at a given time (payload: auction_id, amount,
+  user_id, token, optional bid_config_id and fire_at epoch seconds; without an
+  amount, the bid config's strategy decides it)
+- downsample_history: thin out old price history (payload: optional
+  older_than_days, bucket_minutes)
+
+Each job runs as a consumer span continuing the trace that enqueued it.
+
+Run standalone (any number of processes sharing JOB_QUEUE_PATH):
+    python worker.py
+or inside the API process by setting JOB_WORKER_ENABLED=true.
+"""
+
+import asyncio
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+from fastapi import HTTPException
+
+import tracing
+from job_queue import JobQueue, get_job_queue, RUN_SCRIPT, REFRESH_AUCTION, FIRE_BID, DOWNSAMPLE_HISTORY
+
+logger = logging.getLogger(__name__)
+
+# The token is sealed into `sealed_token` when the job is created through the API
+FIRE_BID_REQUIRED = ("auction_id", "user_id", "sealed_token")
+
+
+async def handle_run_script(payload: Dict[str, Any]):
+    """Run a search script"""
+    from routes.scripts import run_script
+    return await run_script(int(payload["script_id"]))
+
+
+async def handle_refresh_auction(payload: Dict[str, Any]):
+    """Refresh one or more auctions from Tradera"""
+    from routes.auctions import refresh_auctions, RefreshRequest
+    auction_ids = payload.get("auction_ids") or [payload["auction_id"]]
+    return await refresh_auctions(RefreshRequest(auction_ids=auction_ids))
+
+
+async def handle_fire_bid(payload: Dict[str, Any]):
+    """Stage a bid on a warm connection and fire it at `fire_at`"""
+    from db import get_supabase_client, user_stats
+    from sniper import BidSniper, BidIdempotencyGuard
+    from bid_strategy import decide_for
+    from tradera_api import create_tradera_api
+
+    # A malformed job fails the same way on every attempt
+    missing = [key for key in FIRE_BID_REQUIRED if payload.get(key) in (None, "")]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"fire_bid payload is missing {', '.join(missing)}")
+
+    supabase = get_supabase_client()
+    auction_response = supabase.table("auctions").select("*").eq("id", payload["auction_id"]).execute()
+    if not auction_response.data:
+        raise HTTPException(status_code=404, detail="Auction not found")
+    auction = auction_response.data[0]
+
+    bid_config = None
+    if payload.get("bid_config_id"):
+        config_response = supabase.table("bid_configs").select("*").eq("id", payload["bid_config_id"]).execute()
+        bid_config = config_response.data[0] if config_response.data else None
+
+    # Without an explicit amount, the bid config's strategy decides from the stored auction state
+    amount = payload.get("amount")
+    if amount is None:
+        if bid_config is None:
+            raise HTTPException(status_code=400, detail="fire_bid needs an amount or a bid_config_id")
+        decision = decide_for(bid_config, auction)
+        if decision.amount is None:
+            raise HTTPException(status_code=409, detail=f"Not bidding: {decision.reason}")
+        amount = decision.amount
+
+    # A client of its own: the user token must not leak into the shared client
+    api = create_tradera_api()
+    api.set_user_token(payload["user_id"], get_job_queue().unseal(payload["sealed_token"]))
+    sniper = BidSniper(api, guard=BidIdempotencyGuard(get_client=get_supabase_client))
+
+    # Checked before the guard records this bid, like a manual bid (for statistics)
+    previous_bids = (supabase.table("bids").select("id").eq("auction_id", auction["id"])
+                     .eq("user_id", str(payload["user_id"])).limit(1).execute())
+
+    prepared = await asyncio.to_thread(sniper.prepare, int(auction["tradera_id"]), amount)
+    delay = float(payload.get("fire_at") or 0) - time.time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+    result = await asyncio.to_thread(sniper.fire, auction["id"], prepared, bid_config, payload["user_id"])
+    if "error" in result:
+        # The guard already recorded the attempt; firing again could double-bid
+        raise HTTPException(status_code=409, detail=result["error"])
+
+    if not previous_bids.data:
+        user_stats.record_first_bid(payload["user_id"], auction)
+    if result.get("status") == "Bought":
+        user_stats.record_result(payload["user_id"], auction, won=True, amount=amount)
+    return result
+
+
+async def handle_downsample_history(payload: Dict[str, Any]):
+    """Downsample old price history observations"""
+    from price_history import price_history
+    removed = await asyncio.to_thread(
+        price_history.downsample_stored,
+        int(payload.get("older_than_days", 7)),
+        int(payload.get("bucket_minutes", 60)),
+    )
+    return {"removed": removed}
+
+
+DEFAULT_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {
+    RUN_SCRIPT: handle_run_script,
+    REFRESH_AUCTION: handle_refresh_auction,
+    FIRE_BID: handle_fire_bid,
+    DOWNSAMPLE_HISTORY: handle_downsample_history,
+}
+
+
+class JobWorker:
+    """Leases jobs and runs them concurrently, refilling each slot as soon as its job finishes"""
+
+    def __init__(self, queue: Optional[JobQueue] = None,
+                 handlers: Optional[Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]]] = None,
+                 worker_id: Optional[str] = None, concurrency: int = 10,
+                 lease_seconds: float = 120.0, poll_interval: float = 1.0):
+        """
+        Initialize the worker
+
+        Args:
+            queue: Job queue (default: the process-wide queue)
+            handlers: Coroutine functions keyed by job type
+            worker_id: Identifier used for leases (default: hostname and a random suffix)
+            concurrency: Maximum number of jobs running at once
+            lease_seconds: Lease duration; must exceed the longest job
+            poll_interval: Seconds to wait when the queue is empty
+        """
+        self.queue = queue or get_job_queue()
+        self.handlers = handlers or DEFAULT_HANDLERS
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+    async def run_once(self) -> int:
+        """
+        Lease up to `concurrency` jobs and wait until all of them have run
+
+        Returns:
+            Number of jobs processed
+        """
+        jobs = await self._lease(self.concurrency)
+        await asyncio.gather(*(self._run_job(job) for job in jobs))
+        return len(jobs)
+
+    async def _lease(self, limit: int):
+        return await asyncio.to_thread(
+            self.queue.lease, self.worker_id, limit, self.lease_seconds, list(self.handlers)
+        )
+
+    async def _run_job(self, job: Dict[str, Any]):
+        handler = self.handlers[job["type"]]
+        with tracing.traced(f"job.{job['type']}", tracing.CONSUMER, parent=tracing.extract(job["payload"]),
+                            **{"job.id": job["id"], "job.attempt": job.get("attempts")}) as span:
+            try:
+                await handler(job["payload"])
+            except HTTPException as e:
+                # Client errors (missing rows, duplicate bids) won't succeed on retry
+                retry = e.status_code >= 500
+                logger.error(f"Job {job['id']} ({job['type']}) failed: {e.detail}")
+                span.set_status(tracing.STATUS_ERROR, str(e.detail))
+                await asyncio.to_thread(self.queue.fail, job["id"], str(e.detail), self.worker_id, retry)
+            except Exception as e:
+                logger.error(f"Job {job['id']} ({job['type']}) failed: {e}")
+                span.record_exception(e)
+                await asyncio.to_thread(self.queue.fail, job["id"], str(e), self.worker_id)
+            else:
+                await asyncio.to_thread(self.queue.complete, job["id"], self.worker_id)
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        """
+        Process jobs until `stop` is set
+
+        Free slots are leased again as soon as a job finishes rather than after
+        the whole batch, so a fire_bid isn't held back behind a long script run.
+        Jobs still running when `stop` is set are finished first.
+        """
+        stop = stop or asyncio.Event()
+        running = set()
+        logger.info(f"Job worker {self.worker_id} started")
+        while not stop.is_set():
+            free = self.concurrency - len(running)
+            if free > 0:
+                try:
+                    jobs = await self._lease(free)
+                except Exception as e:
+                    logger.error(f"Job worker {self.worker_id} error: {e}")
+                    jobs = []
+                running.update(asyncio.create_task(self._run_job(job)) for job in jobs)
+
+            # With every slot busy, wait for a job to finish; otherwise the queue is
+            # drained, so poll again after the interval (or sooner, if a job finishes)
+            stopped = asyncio.create_task(stop.wait())
+            timeout = None if len(running) >= self.concurrency else self.poll_interval
+            done, _ = await asyncio.wait(running | {stopped}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            stopped.cancel()
+            for task in done - {stopped}:
+                running.discard(task)
+                if task.exception():
+                    logger.error(f"Job worker {self.worker_id} error: {task.exception()}")
+        await asyncio.gather(*running, return_exceptions=True)
+        logger.info(f"Job worker {self.worker_id} stopped")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s",
+    )
+    tracing.add_trace_ids_to_logs()
+
+    async def main():
+        from loop_monitor import event_loop_monitor, loop_monitor_enabled
+        stop = asyncio.Event()
+        tasks = [JobWorker().run(stop)]
+        # Bids fire from this loop, so stalls matter here most
+        if loop_monitor_enabled():
+            tasks.append(event_loop_monitor.run(stop))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
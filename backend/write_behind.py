@@ -0,0 +1,319 @@
+"""
+Write-Behind Buffer
+
+Bookkeeping writes that follow a confirmed bid (the `bids` row, the auction's
+bid count and next bid) don't need to delay the bid response. They are
+appended to a local spill log (one JSON line per write, fsync'd) and queued
+in memory, then written to the database in coalesced batches:
+- inserts into the same table are sent as one upsert, keyed on a unique
+  column so a replayed insert is ignored rather than duplicated
+- updates to the same row are merged into one update (later values win)
+
+A write the database rejects for its own values (e.g. a bid row of a deleted
+auction) is split out of its batch and dropped with an error log, so it can't
+hold back the writes queued after it; any other error keeps the whole batch.
+
+After a batch is stored, a checkpoint is appended to the log (or the log is
+truncated when nothing is pending). On startup `replay()` re-queues whatever
+the log holds after its last checkpoint, so a crash loses nothing that was
+acknowledged. A log file belongs to a single process: the default path carries
+the PID (write_behind.<pid>.log), and `replay()` also takes over the logs of
+processes that are no longer running.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from db import is_permanent_error
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.5
+
+
+def write_behind_enabled() -> bool:
+    """Whether bid bookkeeping is written behind (WRITE_BEHIND_ENABLED)"""
+    return os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+
+
+def default_log_path() -> str:
+    """Spill log of this process: WRITE_BEHIND_LOG with the PID before the extension"""
+    root, ext = os.path.splitext(os.getenv("WRITE_BEHIND_LOG", "write_behind.log"))
+    return f"{root}.{os.getpid()}{ext}"
+
+
+def _process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_log(path: str) -> Tuple[List[Dict[str, Any]], int]:
+    """Writes in a spill log after its last checkpoint, and the checkpoint"""
+    ops = []
+    checkpoint = 0
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A write torn by a crash was never acknowledged
+                logger.warning(f"Skipping unreadable line {number} of {path}")
+                continue
+            if "checkpoint" in entry:
+                checkpoint = max(checkpoint, entry["checkpoint"])
+            else:
+                ops.append(entry)
+    return [op for op in ops if op["seq"] > checkpoint], checkpoint
+
+
+def coalesce(ops: List[Dict[str, Any]]) -> Tuple[Dict[Tuple[str, str], List[Dict[str, Any]]],
+                                                 Dict[Tuple[str, Any], Dict[str, Any]]]:
+    """
+    Merge queued writes into as few database calls as possible
+
+    Args:
+        ops: Queued writes in order
+
+    Returns:
+        Tuple of (rows to upsert by (table, conflict column), merged values by (table, row ID))
+    """
+    inserts: Dict[Tuple[str, str], Dict[Any, Dict[str, Any]]] = {}
+    updates: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+    for op in ops:
+        if op["op"] == "insert":
+            rows = inserts.setdefault((op["table"], op["on_conflict"]), {})
+            rows[op["row"][op["on_conflict"]]] = op["row"]
+        else:
+            updates.setdefault((op["table"], op["id"]), {}).update(op["values"])
+    return {key: list(rows.values()) for key, rows in inserts.items()}, updates
+
+
+class WriteBehindBuffer:
+    """Durable, coalescing queue of database writes"""
+
+    def __init__(self, get_client: Callable[[], Any], log_path: Optional[str] = None,
+                 flush_interval: float = FLUSH_INTERVAL, fsync: bool = True):
+        """
+        Initialize the buffer
+
+        Args:
+            get_client: Callable returning the Supabase client
+            log_path: Spill log file (default: WRITE_BEHIND_LOG, or write_behind.log, suffixed with the PID;
+                only the default path takes over the logs of stopped processes)
+            flush_interval: Seconds between background flushes
+            fsync: Sync the log to disk on every write (off only for tests and benchmarks)
+        """
+        self.get_client = get_client
+        self.log_path = log_path or default_log_path()
+        self.adopt_logs = log_path is None
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._seq = 0
+        self._log = None
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.rejected = 0
+
+    def insert(self, table: str, row: Dict[str, Any], on_conflict: str):
+        """
+        Queue an insert
+
+        Args:
+            table: Table name
+            row: Row to insert
+            on_conflict: Unique column identifying the row (a replayed insert is ignored)
+        """
+        if row.get(on_conflict) is None:
+            raise ValueError(f"Write-behind insert into {table} needs a value for {on_conflict}")
+        self._enqueue({"op": "insert", "table": table, "row": row, "on_conflict": on_conflict})
+
+    def update(self, table: str, row_id: Any, values: Dict[str, Any]):
+        """Queue an update of the row with ID `row_id`"""
+        self._enqueue({"op": "update", "table": table, "id": row_id, "values": values})
+
+    def pending(self, table: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Queued writes not yet stored"""
+        with self._lock:
+            return [op for op in self._pending if table is None or op["table"] == table]
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _open_log(self):
+        if self._log is None:
+            self._log = open(self.log_path, "a+", encoding="utf-8")
+        return self._log
+
+    def _append(self, entry: Dict[str, Any]):
+        log = self._open_log()
+        log.write(json.dumps(entry, default=str) + "\n")
+        log.flush()
+        if self.fsync:
+            os.fsync(log.fileno())
+
+    def _enqueue(self, op: Dict[str, Any]):
+        with self._lock:
+            self._seq += 1
+            op["seq"] = self._seq
+            # Durable before acknowledged
+            self._append(op)
+            self._pending.append(op)
+
+    def flush(self) -> int:
+        """
+        Store queued writes
+
+        Returns:
+            Number of queued writes stored or rejected (0 if there was nothing to store or the write failed)
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return 0
+            inserts, updates = coalesce(batch)
+            try:
+                client = self.get_client()
+                for (table, on_conflict), rows in inserts.items():
+                    self._upsert(client, table, rows, on_conflict)
+                for (table, row_id), values in updates.items():
+                    try:
+                        client.table(table).update(values).eq("id", row_id).execute()
+                    except Exception as e:
+                        if not is_permanent_error(e):
+                            raise
+                        self._reject(table, {"id": row_id, **values}, e)
+            except Exception as e:
+                # Everything stays queued and logged; inserts and updates are safe to repeat
+                self.failed_flushes += 1
+                logger.error(f"Error writing {len(batch)} buffered writes: {e}")
+                return 0
+
+            with self._lock:
+                # Writes queued meanwhile were appended after the batch
+                del self._pending[:len(batch)]
+                if self._pending:
+                    self._append({"checkpoint": batch[-1]["seq"]})
+                else:
+                    log = self._open_log()
+                    log.truncate(0)
+                    log.flush()
+            self.flushed += len(batch)
+            return len(batch)
+
+    def _upsert(self, client: Any, table: str, rows: List[Dict[str, Any]], on_conflict: str):
+        """Upsert rows, halving the batch until the rows the database rejects are isolated"""
+        try:
+            client.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=True).execute()
+            return
+        except Exception as e:
+            if not is_permanent_error(e):
+                raise
+            if len(rows) == 1:
+                self._reject(table, rows[0], e)
+                return
+        middle = len(rows) // 2
+        self._upsert(client, table, rows[:middle], on_conflict)
+        self._upsert(client, table, rows[middle:], on_conflict)
+
+    def _reject(self, table: str, row: Dict[str, Any], error: Exception):
+        # Logged in full, since the spill log forgets it with the next checkpoint
+        self.rejected += 1
+        logger.error(f"Dropping buffered write to {table} rejected by the database: "
+                     f"{json.dumps(row, default=str)} ({error})")
+
+    def _orphaned_logs(self) -> List[str]:
+        """Spill logs of processes that are no longer running"""
+        root, ext = os.path.splitext(os.getenv("WRITE_BEHIND_LOG", "write_behind.log"))
+        orphans = [path for path in [root + ext] if os.path.exists(path)]
+        for path in glob.glob(f"{glob.escape(root)}.*{ext}"):
+            # write_behind.<pid>.log, or write_behind.<pid>-<previous owner>.log while being taken over
+            owner = path[len(root) + 1:len(path) - len(ext)].split("-")[0]
+            if owner.isdigit() and int(owner) != os.getpid() and not _process_running(int(owner)):
+                orphans.append(path)
+        return orphans
+
+    def _adopt(self, path: str) -> int:
+        """Move the writes of another process's log into this one"""
+        root, ext = os.path.splitext(os.getenv("WRITE_BEHIND_LOG", "write_behind.log"))
+        name = path[len(root) + 1:len(path) - len(ext)] if path != root + ext else "0"
+        claimed = f"{root}.{os.getpid()}-{name.split('-')[-1]}{ext}"
+        try:
+            # Only one of the processes starting together gets the file
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return 0
+        ops, _ = _read_log(claimed)
+        for op in ops:
+            # Logged again under this process's sequence numbers
+            self._enqueue({key: value for key, value in op.items() if key != "seq"})
+        os.remove(claimed)
+        if ops:
+            logger.info(f"Took over {len(ops)} buffered writes from {path}")
+        return len(ops)
+
+    def replay(self) -> int:
+        """
+        Re-queue writes from the spill logs left by previous processes
+
+        Returns:
+            Number of writes re-queued
+        """
+        replayed = 0
+        if os.path.exists(self.log_path):
+            ops, checkpoint = _read_log(self.log_path)
+            with self._lock:
+                self._seq = max([self._seq, checkpoint] + [op["seq"] for op in ops])
+                known = {op["seq"] for op in self._pending}
+                self._pending[:0] = [op for op in ops if op["seq"] not in known]
+            if ops:
+                logger.info(f"Replaying {len(ops)} buffered writes from {self.log_path}")
+            replayed += len(ops)
+        if self.adopt_logs:
+            for path in self._orphaned_logs():
+                replayed += self._adopt(path)
+        return replayed
+
+    async def run(self, stop: asyncio.Event):
+        """Flush periodically until `stop` is set, then flush what is left"""
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._pending:
+                await asyncio.to_thread(self.flush)
+        await asyncio.to_thread(self.flush)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue length and write counters"""
+        return {"pending": len(self._pending), "flushed": self.flushed, "failed_flushes": self.failed_flushes,
+                "rejected": self.rejected}
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def _get_supabase_client():
+    from db import get_supabase_client
+    return get_supabase_client()
+
+
+# Process-wide buffer for bid bookkeeping
+write_behind = WriteBehindBuffer(get_client=_get_supabase_client)